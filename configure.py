@@ -1,7 +1,8 @@
-import sys, wx, wx.lib, os, re, pickle, traceback, json, copy
+import sys, wx, wx.lib, os, re, pickle, traceback, json, copy, hashlib
 # Quisk will alter quisk_conf_defaults to include the user's config file.
 import quisk_conf_defaults as conf
 import _quisk as QS
+import quisk_utils
 from quisk_widgets import QuiskPushbutton, QuiskCheckbutton, QuiskBitField, SliderBoxH, SliderBoxHH
 from quisk_widgets import FreqFormatter
 from quisk_widgets import wxVersion
@@ -48,6 +49,8 @@ name2format = {
 
 # Increasing the software version will display a message to re-read the soapy device.
 soapy_software_version = 3
+# Increase the cache version when the data saved by ParseConfig() changes.
+config_cache_version = 1
 wxpython_gtk3_bug = 0
 
 def FormatKhz(dnum):	# Round to 3 decimal places; remove ending ".000"
@@ -580,13 +583,16 @@ class Configuration:
   def SaveState(self):
     if not self.settings_changed:
       return
-    try:
-      fp = open(self.StatePath, "w")
-    except:
-      traceback.print_exc()
-      return
-    json.dump(Settings, fp, indent=2)
-    fp.close()
+    text = json.dumps(Settings, indent=2)
+    writer = getattr(application, 'state_writer', None)
+    if writer:		# write in the background
+      writer.SaveText(self.StatePath, text)
+    else:
+      try:
+        quisk_utils.WriteFileAtomic(self.StatePath, text)
+      except:
+        traceback.print_exc()
+        return
     self.settings_changed = False
   def ParseConfig(self):
     # ParseConfig() fills self.sections, self.receiver_data, and
@@ -609,13 +615,15 @@ class Configuration:
     #     Then some help text starting with "# "
     #     Then a list of possible value#explain with the default first
     #     Then a blank line to end.
+    #
+    # The results are saved in a cache file and parsing is skipped if the files are unchanged.
     self.format4name = {}
     for name in name2format:
       self.format4name[name] = name2format[name][0]
     self.format4name['hardware_file_type'] = 'text'
-    self._ParserConf('quisk_conf_defaults.py')
+    filenames = ['quisk_conf_defaults.py']
     # Read any user-defined radio types
-    for dirname in os.listdir('.'):
+    for dirname in sorted(os.listdir('.')):
       if not os.path.isdir(dirname) or dirname[-3:] != 'pkg':
         continue
       if dirname in ('freedvpkg', 'sdriqpkg', 'soapypkg'):
@@ -623,10 +631,69 @@ class Configuration:
       filename = os.path.join(dirname, 'quisk_hardware.py')
       if not os.path.isfile(filename):
         continue
+      filenames.append(filename)
+    # Dicts and lists are evaluated with conf, so the user's config files are part of the key
+    key_files = filenames + [path for path in (getattr(conf, 'config_file_path', ''), getattr(conf, 'config_file_path2', ''))
+        if path and os.path.isfile(path)]
+    cache_path = os.path.join(application.QuiskFilesDir, "quisk_config_cache.pickle")
+    if self._ReadConfigCache(cache_path, key_files):
+      return
+    self._ParserConf(filenames[0])
+    for filename in filenames[1:]:
       try:
         self._ParserConf(filename)
       except:
         traceback.print_exc()
+    self._WriteConfigCache(cache_path, key_files)
+  def _ConfigCacheKey(self, filenames, hashes=None):
+    # Return the cache key, a list of (filename, mtime, size, sha1) for each file.
+    # If hashes is given, it is a list of the previous key and the sha1 is only calculated for changed files.
+    key = []
+    for index, filename in enumerate(filenames):
+      st = os.stat(filename)
+      old = hashes[index] if hashes and index < len(hashes) else None
+      if old and old[0] == filename and old[1] == st.st_mtime_ns and old[2] == st.st_size:
+        digest = old[3]
+      else:
+        with open(filename, "rb") as fp:
+          digest = hashlib.sha1(fp.read()).hexdigest()
+      key.append((filename, st.st_mtime_ns, st.st_size, digest))
+    return key
+  def _ReadConfigCache(self, cache_path, filenames):
+    # Fill self.sections, self.receiver_data, self.receiver_explain and self.format4name from the cache file.
+    # Return True if the cache is valid for the current files.
+    try:
+      with open(cache_path, "rb") as fp:
+        cache = pickle.load(fp)
+      if cache["version"] != config_cache_version or cache["python"] != sys.version_info[0:2]:
+        return False
+      if [k[0] for k in cache["key"]] != filenames:
+        return False
+      key = self._ConfigCacheKey(filenames, cache["key"])
+      if [k[3] for k in key] != [k[3] for k in cache["key"]]:
+        return False
+    except:
+      return False
+    self.sections = cache["sections"]
+    self.receiver_data = cache["receiver_data"]
+    self.receiver_explain = cache["receiver_explain"]
+    self.format4name = cache["format4name"]
+    if key != cache["key"]:		# files were touched but are unchanged
+      self._WriteConfigCache(cache_path, filenames, key)
+    return True
+  def _WriteConfigCache(self, cache_path, filenames, key=None):
+    try:
+      if key is None:
+        key = self._ConfigCacheKey(filenames)
+      cache = {"version":config_cache_version, "python":sys.version_info[0:2], "key":key,
+        "sections":self.sections, "receiver_data":self.receiver_data,
+        "receiver_explain":self.receiver_explain, "format4name":self.format4name}
+      temp = cache_path + ".tmp"
+      with open(temp, "wb") as fp:
+        pickle.dump(cache, fp, pickle.HIGHEST_PROTOCOL)
+      os.replace(temp, cache_path)
+    except:
+      traceback.print_exc()
   def _ParserConf(self, filename):
     re_AeqB = re.compile(r"^#?(\w+)\s*=\s*([^#]+)#*(.*)")		# item values "a = b"
     section = None
@@ -890,6 +957,8 @@ class QAdjustPhase(wx.Frame):
     self.Bind(wx.EVT_CLOSE, self.OnBtnExit)
     QS.softrock_corrections(1)
     QS.set_ampl_phase(0.0, 0.0, self.is_tx)
+    if not self.is_tx:	# stop the adaptive image rejection while measuring
+      QS.set_image_reject(0, 1, 0.0)
     self.grid.GoToCell(0, 2)
   def MakeControls(self):		# Make controls for phase/amplitude adjustment
     panel = self.panel
@@ -1266,6 +1335,9 @@ class QAdjustPhase(wx.Frame):
     QS.softrock_corrections(0)
     ampl, phase = application.GetAmplPhase(self.rx_tx)
     QS.set_ampl_phase(ampl, phase, self.is_tx)
+    if not self.is_tx and conf.iq_equalizer_taps:
+      application.image_reject_band = application.lastBand
+      QS.set_image_reject(conf.iq_equalizer_taps, conf.iq_equalizer_frames, 0.5)
     application.w_phase = None
     self.Destroy()
   def OnBtnHelp(self, event=None):
@@ -1326,6 +1398,7 @@ class RadioNotebook(wx.Notebook):	# The second-level notebook for each radio nam
     self.SetBackgroundColour(parent.bg_color)
     self.radio_name = radio_name
     self.pages = []
+    self.page_makers = {}	# Pages other than Hardware are made when first shown
     self.Bind(wx.EVT_NOTEBOOK_PAGE_CHANGED, self.OnPageChanging)
   def MakePages(self):
     radio_name = self.radio_name
@@ -1337,9 +1410,7 @@ class RadioNotebook(wx.Notebook):	# The second-level notebook for each radio nam
       page = RadioHardware(self, radio_name)
     self.AddPage(page, "Hardware")
     self.pages.append(page)
-    page = RadioSound(self, radio_name)
-    self.AddPage(page, "Sound")
-    self.pages.append(page)
+    self.AddLazyPage("Sound", RadioSound)
     for section, names in local_conf.sections:
       if section == 'Sound':		# There is a special page for these sections
         continue
@@ -1348,15 +1419,28 @@ class RadioNotebook(wx.Notebook):	# The second-level notebook for each radio nam
       if section == 'Filters':
         continue
       if section == 'Remote':
-        page = RadioRemote(self, radio_name, section, names)
-        self.AddPage(page, section)
-        self.pages.append(page)
+        self.AddLazyPage(section, RadioRemote, section, names)
         continue
-      page = RadioSection(self, radio_name, section, names)
-      self.AddPage(page, section)
-      self.pages.append(page)
-    page = RadioBands(self, radio_name)
-    self.AddPage(page, "Bands")
+      self.AddLazyPage(section, RadioSection, section, names)
+    self.AddLazyPage("Bands", RadioBands)
+  def AddLazyPage(self, text, page_class, *args):	# Add an empty page; make the real page when it is shown
+    page = wx.Panel(self)
+    page.SetBackgroundColour(self.GetBackgroundColour())
+    self.AddPage(page, text)
+    self.page_makers[page] = (page_class, args)
+  def MakeLazyPage(self, empty):
+    if empty not in self.page_makers:
+      return
+    page_class, args = self.page_makers.pop(empty)
+    for index in range(self.GetPageCount()):
+      if self.GetPage(index) is empty:
+        break
+    else:
+      return
+    page = page_class(self, self.radio_name, *args)
+    self.InsertPage(index, page, self.GetPageText(index), select=True)
+    self.RemovePage(index + 1)
+    empty.Destroy()
     self.pages.append(page)
     #if "use_rx_udp" in radio_dict and radio_dict["use_rx_udp"] == '10':
     #  page = RadioFilters(self, radio_name)
@@ -1371,6 +1455,8 @@ class RadioNotebook(wx.Notebook):	# The second-level notebook for each radio nam
     event.Skip()
     index = event.GetSelection()
     page = self.GetPage(index)
+    if page in self.page_makers:
+      wx.CallAfter(self.MakeLazyPage, page)
     if sys.platform != 'win32':		# Work around a bug in wxPython 4.2.1 and gtk3
       w, h = application.main_frame.GetSize()	# Change main window size by +/- one pixel to recalculate sizes
       if wxpython_gtk3_bug:
@@ -1727,7 +1813,7 @@ class MidiButton(QuiskControl):
       elif idName in ("CW U/L", "CWL", "CWU", "SSB U/L", "LSB", "USB", "AM", "FM", "DGT",
                       "DGT-U", "DGT-L", "DGT-FM", "DGT-IQ", "FDV", "FDV-U", "IMD", ):
         item = modes.Append(-1, idName)
-      elif idName in ("Graph", "GraphP1", "GraphP2", "WFall", "Scope", "Config", "Audio FFT", "Bscope", "RX Filter", "Help"):
+      elif idName in ("Graph", "GraphP1", "GraphP2", "WFall", "Scope", "Config", "Audio FFT", "Bscope", "Sweep", "RX Filter", "Help"):
         item = screens.Append(-1, idName)
       else:
         item = None
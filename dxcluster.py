@@ -4,8 +4,14 @@
 import threading
 import socket
 import time
+import heapq
+import bisect
 import quisk_conf_defaults as conf
 
+# Spots are considered duplicates if they have the same call sign and the same frequency
+# after rounding to this many Hertz.
+DX_FREQ_ROUND = 1000
+
 class DxEntry:
   def __init__(self):
     self.info = []
@@ -36,6 +42,19 @@ class DxEntry:
       return True
     else:
       return False
+
+  def key(self):
+    return (self.dx, (self.freq + DX_FREQ_ROUND // 2) // DX_FREQ_ROUND)
+
+  def merged(self, element):
+    # Return a new entry with the info of element added. Entries in a snapshot are never changed.
+    entry = DxEntry()
+    entry.freq = element.freq
+    entry.dx = self.dx
+    entry.info = self.info[:]
+    entry.timestamp = self.timestamp
+    entry.join(element)
+    return entry
     
   def join (self, element):
     for i in range (0, len(element.info)):
@@ -79,52 +98,152 @@ class DxEntry:
       return True
     return False   
   
+
+class DxSpotStore:
+  """Store DX spots keyed by (call sign, rounded frequency).
+
+  A dictionary is used to find duplicates and a heap of (expire time, key) is used to remove old spots.
+  The store is changed only by the cluster thread.  Readers use the snapshot, a tuple of entries sorted
+  by frequency, which is replaced and never changed."""
+  def __init__(self):
+    self.spots = {}
+    self.expire_heap = []
+    self.snapshot = ()
+    self.snap_freqs = ()
+    self.changed = False
+  def Add(self, entry):
+    key = entry.key()
+    old = self.spots.get(key)
+    if old is not None:
+      entry = old.merged(entry)
+    self.spots[key] = entry
+    heapq.heappush(self.expire_heap, (entry.timestamp + conf.dxClExpireTime * 60, key))
+    self.changed = True
+  def Expire(self, now=None):
+    if now is None:
+      now = time.time()
+    heap = self.expire_heap
+    while heap and heap[0][0] < now:
+      tm, key = heapq.heappop(heap)
+      entry = self.spots.get(key)
+      # A later spot of the same station pushed a newer time onto the heap.
+      if entry is not None and entry.isExpired():
+        del self.spots[key]
+        self.changed = True
+  def MakeSnapshot(self):
+    if not self.changed:
+      return False
+    self.changed = False
+    snap = sorted(self.spots.values(), key=DxEntry.getFreq)
+    self.snap_freqs = tuple(x.freq for x in snap)
+    self.snapshot = tuple(snap)
+    return True
+
 class DxCluster(threading.Thread):
   def __init__(self):
     self.error = 'Starting'
-    self.dxSpots = []
+    self.dxSpots = ()		# The current snapshot of spots sorted by frequency
+    self.dxFreqs = ()		# The frequencies of dxSpots
     threading.Thread.__init__(self)
+    self.daemon = True
     self.doQuit = threading.Event()
     self.doQuit.clear()
     self.dxLock = threading.Lock()
-    self.addr = conf.dxClHost + ':' + str(conf.dxClPort)
+    self.store = DxSpotStore()
+    self.new_snapshot = None
+    self.new_spots = []		# Spots received since the last call to NewSpots()
+    self.nodes = self.ParseNodes(conf.dxClHost, conf.dxClPort)
+    self.node_index = 0
+    self.SetNode()
+    self.sock = None
+
+  @staticmethod
+  def ParseNodes(hosts, port):
+    # The host may be a comma separated list of nodes "host" or "host:port".
+    nodes = []
+    for host in hosts.split(','):
+      host = host.strip()
+      if not host:
+        continue
+      if host.count(':') == 1:		# Not an IPv6 address
+        host, p = host.split(':')
+        try:
+          nodes.append((host, int(p)))
+        except ValueError:
+          nodes.append((host, port))
+      else:
+        nodes.append((host, port))
+    if not nodes:
+      nodes.append((hosts.strip(), port))
+    return nodes
+
+  def SetNode(self):
+    self.host, self.port = self.nodes[self.node_index]
+    self.addr = self.host + ':' + str(self.port)
     self.msg_no_spots = "No DX Cluster data from " + self.addr
     self.msg_one_spot = '1 DX spot received from ' + self.addr
     self.msg_spots =    ' DX spots received from ' + self.addr
-    
+
   def run(self):
-    self.telnetConnect()
-    if self.error:
-      self.sock.close()
-      return
-    while not self.doQuit.isSet():
+    backoff = 2.0
+    while not self.doQuit.is_set():
+      self.telnetConnect()
+      if not self.error:
+        backoff = 2.0
+        self.ReadSpots()
+      if self.sock:
+        self.sock.close()
+        self.sock = None
+      if self.doQuit.is_set():
+        break
+      # Try the next node, and wait longer after each failure.
+      error = self.error
+      self.node_index = (self.node_index + 1) % len(self.nodes)
+      self.SetNode()
+      self.error = "%s; trying %s in %.0f seconds" % (error, self.addr, backoff)
+      self.doQuit.wait(backoff)
+      backoff = min(backoff * 2, conf.dxClMaxBackoff)
+
+  def ReadSpots(self):
+    store = self.store
+    while not self.doQuit.is_set():
       try:
-        by = self.sock.recv(1024)
-      except TimeoutError:
-        continue
+        by = self.sock.recv(4096)
+      except (TimeoutError, socket.timeout):
+        by = None
       except:
         by = b''
+      if by == b'':
+        self.error = "Restarting " + self.addr
+        return
       if by:
+        self.bytes += by
+        index = self.bytes.rfind(b"\n")
+        if index >= 0:
+          lines = self.bytes[0:index].decode(encoding='utf-8', errors='replace')
+          del self.bytes[0:index + 1]
+          new_spots = []
+          for message in lines.split('\n'):
+            dxEntry = DxEntry()
+            if dxEntry.parseMessage(message):
+              store.Add(dxEntry)
+              new_spots.append(dxEntry)
+          if new_spots:
+            with self.dxLock:
+              self.new_spots += new_spots
+              del self.new_spots[0:-100]	# Limit the list if no one reads it
+      store.Expire()
+      if store.MakeSnapshot():
         with self.dxLock:
-          self.bytes += by
-      else:
-        self.sock.close()
-        self.error = "Restarting " + self.addr
-        time.sleep(2)
-        if not self.doQuit.isSet():
-          self.telnetConnect()
-          if self.error:
-            self.sock.close()
-            return
-    self.sock.close()
-        
-  def telnetConnect(self):    
+          self.new_snapshot = (store.snapshot, store.snap_freqs)
+
+  def telnetConnect(self):
     self.bytes = bytearray(0)
     self.error = 'Starting'
     self.sock = socket.socket()
     self.sock.settimeout(20)
     try:
-      self.sock.connect( (conf.dxClHost, conf.dxClPort) )
+      self.sock.connect( (self.host, self.port) )
     except:
       self.error = "Failed to connect to " + self.addr
       return
@@ -156,25 +275,30 @@ class DxCluster(threading.Thread):
     self.bytes = bytearray(0)
 
   def Poll(self):
+    # Install the newest snapshot from the cluster thread.  Return True if the spots changed.
     with self.dxLock:
-      index = self.bytes.find(b"\n")
-      if index >= 0:
-        message = self.bytes[0:index + 1]
-        self.bytes = self.bytes[index + 1:]
-      else:
-        return
-    message = message.decode(encoding='utf-8', errors='replace')
-    dxEntry = DxEntry()
-    if dxEntry.parseMessage(message):
-      for i, listElement in enumerate(self.dxSpots):
-        if (listElement.equal(dxEntry)):
-          listElement.join (dxEntry)
-          return True
-        if listElement.isExpired():
-          del (self.dxSpots[i])
-      self.dxSpots.append(dxEntry)
-      return True
-        
+      snap = self.new_snapshot
+      self.new_snapshot = None
+    if snap is None:
+      return False
+    self.dxSpots, self.dxFreqs = snap
+    return True
+
+  def NewSpots(self):
+    # Return the list of spots received since the last call.
+    with self.dxLock:
+      spots = self.new_spots
+      self.new_spots = []
+    return spots
+
+  def GetSpots(self, freq1, freq2):
+    # Return the spots with freq1 < frequency < freq2.
+    spots = self.dxSpots
+    freqs = self.dxFreqs
+    i1 = bisect.bisect_right(freqs, freq1)
+    i2 = bisect.bisect_left(freqs, freq2)
+    return spots[i1:i2]
+
   def stop(self):
     self.doQuit.set()
 
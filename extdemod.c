@@ -2,11 +2,14 @@
 #include <stdlib.h>
 #include <math.h>
 #include <complex.h>
+#include <pthread.h>
 #include "quisk.h"
 
 // If you set add_extern_demod in your config file, you will get another
-// button that will call this module.  Change it to what you want.  Save
-// a copy because new releases of Quisk will overwrite this file.
+// button that will call this module.  The button uses the demodulator plug-in
+// in extern_demod_plugin if there is one.  Otherwise it uses quisk_extern_demod()
+// below.  A plug-in is a Python function or a function in a shared library, and
+// it is loaded when Quisk starts, so you do not need to change this file.
 //
 // NOTE:  NEW RELEASES OF QUISK WILL OVERWRITE THIS FILE!
 
@@ -45,3 +48,363 @@ int quisk_extern_demod(complex double * cSamples, int nSamples, double decim)
 	}
 	return nSamples;	// Number of play samples
 }
+
+// Demodulator plug-ins receive blocks of decimated I/Q samples at 48000 sps and return stereo
+// audio at the same rate.  The samples and the audio have a full scale of 1.0.  The sound thread must never wait, so the blocks go to a worker
+// thread through a bounded queue.  If the queue is full the block is dropped.  The audio from
+// the worker is saved in a FIFO and the sound thread takes the audio that is ready.
+//
+// A Python plug-in is called as func(iq, audio, rate).  The iq is a read-only memoryview of
+// complex128 samples and audio is a writable memoryview of complex128 samples.  Both wrap the
+// C buffers, so numpy.asarray(iq) does not copy the samples.  The function writes the real and
+// imaginary parts of audio for the left and right channels, and returns the number of audio samples.
+// Do not keep a reference to iq or audio after the function returns.
+//
+// A C plug-in has the same arguments; the samples are interleaved I and Q doubles:
+//     int demod(double * iq, int nIQ, double * audio, int max_audio, int rate);
+
+#define PLUGIN_MAX		8		// maximum number of plug-ins
+#define PLUGIN_QUEUE		8		// number of blocks in the queue to the worker
+#define PLUGIN_FIFO		65536		// size of the audio FIFO in samples
+
+typedef int (*demod_func)(double *, int, double *, int, int);
+
+static struct demod_plugin {
+	char name[QUISK_SC_SIZE];
+	PyObject * function;		// Python callable or NULL
+	demod_func c_function;		// function in a shared library or NULL
+	int calls;			// number of blocks demodulated
+	long long samples;		// number of I/Q samples demodulated
+	int drops;			// blocks dropped because the queue was full
+	int errors;			// number of exceptions or bad return values
+	double time_total;		// total seconds in the plug-in
+	double time_max;		// maximum seconds for one block
+	double time_last;		// seconds for the last block
+} demod_plugins[PLUGIN_MAX];
+
+static struct {
+	int count;			// number of plug-ins
+	int active;			// index of the plug-in for the EXT button, or -1 for none
+	struct {
+		complex double * iq;	// decimated I/Q samples
+		int n_iq;
+		int rate;
+		int plugin;
+	} queue[PLUGIN_QUEUE];
+	int q_head, q_tail, q_count;	// the queue of blocks
+	complex double * fifo;		// the audio from the worker
+	int f_read, f_write, f_count;
+	int underruns;			// times the sound thread found less audio than it needed
+	complex double * audio;		// output buffer for the plug-in
+	int thread_started;
+	int quit;
+	pthread_t thread;
+	pthread_mutex_t mutex;
+	pthread_cond_t cond;
+} plugin_state = {.active = -1, .mutex = PTHREAD_MUTEX_INITIALIZER, .cond = PTHREAD_COND_INITIALIZER};
+
+static int call_python_plugin(PyObject * function, complex double * iq, int n_iq, complex double * audio, int rate)
+{	// Call a Python plug-in with memoryviews of the C buffers.  Return the number of audio samples or -1.
+	PyObject * mv_iq, * mv_audio, * result;
+	Py_buffer buf;
+	Py_ssize_t shape, stride;
+	long n = -1;
+
+	shape = n_iq;
+	stride = sizeof(complex double);
+	memset(&buf, 0, sizeof(buf));
+	buf.buf = iq;
+	buf.len = n_iq * sizeof(complex double);
+	buf.readonly = 1;
+	buf.itemsize = sizeof(complex double);
+	buf.format = "Zd";
+	buf.ndim = 1;
+	buf.shape = &shape;
+	buf.strides = &stride;
+	mv_iq = PyMemoryView_FromBuffer(&buf);
+	shape = SAMP_BUFFER_SIZE;
+	buf.buf = audio;
+	buf.len = SAMP_BUFFER_SIZE * sizeof(complex double);
+	buf.readonly = 0;
+	mv_audio = PyMemoryView_FromBuffer(&buf);
+	if (mv_iq && mv_audio) {
+		result = PyObject_CallFunction(function, "OOi", mv_iq, mv_audio, rate);
+		if (result) {
+			n = PyLong_AsLong(result);
+			Py_DECREF(result);
+		}
+	}
+	if (PyErr_Occurred()) {
+		PyErr_Print();
+		n = -1;
+	}
+	// The memoryviews must not be used after the buffers change
+	if (mv_iq) {
+		if ( ! (result = PyObject_CallMethod(mv_iq, "release", NULL)))
+			PyErr_Clear();
+		Py_XDECREF(result);
+		Py_DECREF(mv_iq);
+	}
+	if (mv_audio) {
+		if ( ! (result = PyObject_CallMethod(mv_audio, "release", NULL)))
+			PyErr_Clear();
+		Py_XDECREF(result);
+		Py_DECREF(mv_audio);
+	}
+	return n;
+}
+
+static void * plugin_worker(void * arg)
+{	// Thread to run the plug-ins on the blocks in the queue
+	struct demod_plugin * plugin;
+	PyObject * function;
+	PyGILState_STATE gstate;
+	demod_func c_function;
+	int i, n, n_iq;
+	double time0;
+
+	pthread_mutex_lock(&plugin_state.mutex);
+	while ( ! plugin_state.quit) {
+		if (plugin_state.q_count == 0) {
+			pthread_cond_wait(&plugin_state.cond, &plugin_state.mutex);
+			continue;
+		}
+		i = plugin_state.q_head;
+		plugin = demod_plugins + plugin_state.queue[i].plugin;
+		c_function = plugin->c_function;
+		n_iq = plugin_state.queue[i].n_iq;
+		pthread_mutex_unlock(&plugin_state.mutex);
+		time0 = QuiskTimeSec();
+		if (c_function) {
+			n = (*c_function)((double *)plugin_state.queue[i].iq, n_iq,
+				(double *)plugin_state.audio, SAMP_BUFFER_SIZE, plugin_state.queue[i].rate);
+		}
+		else {
+			gstate = PyGILState_Ensure();
+			function = plugin->function;	// The function may be changed by the GUI thread holding the GIL
+			Py_XINCREF(function);
+			if (function)
+				n = call_python_plugin(function, plugin_state.queue[i].iq, n_iq, plugin_state.audio, plugin_state.queue[i].rate);
+			else
+				n = 0;
+			Py_XDECREF(function);
+			PyGILState_Release(gstate);
+		}
+		time0 = QuiskTimeSec() - time0;
+		pthread_mutex_lock(&plugin_state.mutex);
+		plugin->calls++;
+		plugin->samples += n_iq;
+		plugin->time_total += time0;
+		plugin->time_last = time0;
+		if (plugin->time_max < time0)
+			plugin->time_max = time0;
+		if (n < 0 || n > SAMP_BUFFER_SIZE) {
+			plugin->errors++;
+			n = 0;
+		}
+		for (i = 0; i < n; i++) {	// Copy the audio to the FIFO; discard the oldest audio if it is full
+			plugin_state.fifo[plugin_state.f_write] = plugin_state.audio[i] * CLIP32;
+			if (++plugin_state.f_write >= PLUGIN_FIFO)
+				plugin_state.f_write = 0;
+			if (plugin_state.f_count < PLUGIN_FIFO)
+				plugin_state.f_count++;
+			else if (++plugin_state.f_read >= PLUGIN_FIFO)
+				plugin_state.f_read = 0;
+		}
+		if (++plugin_state.q_head >= PLUGIN_QUEUE)
+			plugin_state.q_head = 0;
+		plugin_state.q_count--;
+	}
+	pthread_mutex_unlock(&plugin_state.mutex);
+	return NULL;
+}
+
+static int plugin_start(void)
+{	// Allocate the buffers and start the worker thread.  Return 1 if it is running.
+	int i;
+
+	if (plugin_state.thread_started)
+		return 1;
+	for (i = 0; i < PLUGIN_QUEUE; i++) {
+		if ( ! plugin_state.queue[i].iq)
+			plugin_state.queue[i].iq = (complex double *)malloc(SAMP_BUFFER_SIZE * sizeof(complex double));
+		if ( ! plugin_state.queue[i].iq)
+			return 0;
+	}
+	if ( ! plugin_state.fifo)
+		plugin_state.fifo = (complex double *)malloc(PLUGIN_FIFO * sizeof(complex double));
+	if ( ! plugin_state.audio)
+		plugin_state.audio = (complex double *)malloc(SAMP_BUFFER_SIZE * sizeof(complex double));
+	if ( ! plugin_state.fifo || ! plugin_state.audio)
+		return 0;
+	plugin_state.q_head = plugin_state.q_tail = plugin_state.q_count = 0;
+	plugin_state.f_read = plugin_state.f_write = plugin_state.f_count = 0;
+	plugin_state.quit = 0;
+	if (pthread_create(&plugin_state.thread, NULL, plugin_worker, NULL) != 0) {
+		QuiskPrintf("Failure to start the demodulator plug-in thread\n");
+		return 0;
+	}
+	plugin_state.thread_started = 1;
+	return 1;
+}
+
+void quisk_demod_plugin_stop(void)
+{	// Stop the worker thread.  The caller must not hold the GIL because the worker may be waiting for it.
+	if ( ! plugin_state.thread_started)
+		return;
+	pthread_mutex_lock(&plugin_state.mutex);
+	plugin_state.quit = 1;
+	pthread_cond_signal(&plugin_state.cond);
+	pthread_mutex_unlock(&plugin_state.mutex);
+	pthread_join(plugin_state.thread, NULL);
+	plugin_state.thread_started = 0;
+}
+
+int quisk_demod_plugin_active(void)
+{	// Is there a plug-in for the EXT button?
+	return plugin_state.active >= 0;
+}
+
+int quisk_demod_plugin(complex double * cSamples, int nSamples, int rate)
+{	// Send the decimated samples to the active plug-in, and return the audio that is ready.
+	// Called from the sound thread.  At most nSamples of audio are returned.
+	int i, n;
+
+	if ( ! plugin_start())
+		return 0;
+	pthread_mutex_lock(&plugin_state.mutex);
+	if (plugin_state.active < 0) {		// set_demod_plugin("") ran after quisk_demod_plugin_active() was checked
+		pthread_mutex_unlock(&plugin_state.mutex);
+		return 0;
+	}
+	if (plugin_state.q_count >= PLUGIN_QUEUE) {	// The plug-in is too slow
+		demod_plugins[plugin_state.active].drops++;
+	}
+	else if (nSamples > 0) {
+		i = plugin_state.q_tail;
+		for (n = 0; n < nSamples; n++)
+			plugin_state.queue[i].iq[n] = cSamples[n] / CLIP32;
+		plugin_state.queue[i].n_iq = nSamples;
+		plugin_state.queue[i].rate = rate;
+		plugin_state.queue[i].plugin = plugin_state.active;
+		if (++plugin_state.q_tail >= PLUGIN_QUEUE)
+			plugin_state.q_tail = 0;
+		plugin_state.q_count++;
+		pthread_cond_signal(&plugin_state.cond);
+	}
+	n = plugin_state.f_count;
+	if (n > nSamples)
+		n = nSamples;
+	else if (n < nSamples && demod_plugins[plugin_state.active].calls > 0)
+		plugin_state.underruns++;
+	for (i = 0; i < n; i++) {
+		cSamples[i] = plugin_state.fifo[plugin_state.f_read];
+		if (++plugin_state.f_read >= PLUGIN_FIFO)
+			plugin_state.f_read = 0;
+	}
+	plugin_state.f_count -= n;
+	pthread_mutex_unlock(&plugin_state.mutex);
+	return n;
+}
+
+PyObject * quisk_add_demod_plugin(PyObject * self, PyObject * args, PyObject * keywds)	// Called from the GUI thread
+{	// Add or replace the demodulator plug-in "name".  The plug-in is a Python callable or the address of a C function.
+	char * name;
+	PyObject * function = NULL;
+	unsigned long long address = 0;
+	struct demod_plugin * plugin;
+	int i;
+	static char * kwlist[] = {"name", "function", "address", NULL} ;
+
+	if (!PyArg_ParseTupleAndKeywords (args, keywds, "s|OK", kwlist, &name, &function, &address))
+		return NULL;
+	if (function == Py_None)
+		function = NULL;
+	if (function && ! PyCallable_Check(function)) {
+		PyErr_SetString (PyExc_TypeError, "The demodulator plug-in function is not callable");
+		return NULL;
+	}
+	if ( ! function && ! address) {
+		PyErr_SetString (PyExc_ValueError, "The demodulator plug-in needs a function or an address");
+		return NULL;
+	}
+	for (i = 0; i < plugin_state.count; i++)
+		if ( ! strcmp(demod_plugins[i].name, name))
+			break;
+	if (i >= PLUGIN_MAX) {
+		PyErr_SetString (PyExc_ValueError, "Too many demodulator plug-ins");
+		return NULL;
+	}
+	plugin = demod_plugins + i;
+	pthread_mutex_lock(&plugin_state.mutex);
+	Py_XINCREF(function);
+	Py_XDECREF(plugin->function);
+	plugin->function = function;
+	plugin->c_function = function ? NULL : (demod_func)(intptr_t)address;
+	if (i == plugin_state.count) {
+		strMcpy(plugin->name, name, QUISK_SC_SIZE);
+		plugin->calls = plugin->drops = plugin->errors = 0;
+		plugin->samples = 0;
+		plugin->time_total = plugin->time_max = plugin->time_last = 0;
+		plugin_state.count++;
+	}
+	pthread_mutex_unlock(&plugin_state.mutex);
+	Py_INCREF (Py_None);
+	return Py_None;
+}
+
+PyObject * quisk_set_demod_plugin(PyObject * self, PyObject * args)	// Called from the GUI thread
+{	// Use the plug-in "name" for the EXT button, or "" for quisk_extern_demod().
+	char * name;
+	int i;
+
+	if (!PyArg_ParseTuple (args, "s", &name))
+		return NULL;
+	for (i = 0; i < plugin_state.count; i++)
+		if ( ! strcmp(demod_plugins[i].name, name))
+			break;
+	if (i >= plugin_state.count) {
+		if (name[0]) {
+			PyErr_SetString (PyExc_ValueError, "Unknown demodulator plug-in");
+			return NULL;
+		}
+		i = -1;
+	}
+	pthread_mutex_lock(&plugin_state.mutex);
+	plugin_state.active = i;
+	pthread_mutex_unlock(&plugin_state.mutex);
+	Py_INCREF (Py_None);
+	return Py_None;
+}
+
+PyObject * quisk_get_demod_plugins(PyObject * self, PyObject * args)	// Called from the GUI thread
+{	// Return a list of dictionaries with the name and counters of each plug-in.
+	PyObject * list, * dict;
+	struct demod_plugin * plugin;
+	int i;
+
+	if (!PyArg_ParseTuple (args, ""))
+		return NULL;
+	list = PyList_New(0);
+	pthread_mutex_lock(&plugin_state.mutex);
+	for (i = 0; i < plugin_state.count; i++) {
+		plugin = demod_plugins + i;
+		dict = Py_BuildValue("{sssisisLsisisdsdsdsi}",
+			"name", plugin->name,
+			"active", i == plugin_state.active,
+			"calls", plugin->calls,
+			"samples", plugin->samples,
+			"drops", plugin->drops,
+			"errors", plugin->errors,
+			"avg_usec", plugin->calls ? plugin->time_total / plugin->calls * 1e6 : 0.0,
+			"max_usec", plugin->time_max * 1e6,
+			"last_usec", plugin->time_last * 1e6,
+			"underruns", i == plugin_state.active ? plugin_state.underruns : 0);
+		if (dict) {
+			PyList_Append(list, dict);
+			Py_DECREF(dict);
+		}
+	}
+	pthread_mutex_unlock(&plugin_state.mutex);
+	return list;
+}
@@ -19,6 +19,16 @@ void quisk_filt_cInit(struct quisk_cFilter * filter, double * coefs, int taps)
 	filter->nBuf = 0;
 }
 
+void quisk_filt_cFree(struct quisk_cFilter * filter)
+{	// Free the memory of a filter.  The filter must be initialized again before it is used.
+	free(filter->cpxCoefs);
+	free(filter->cSamples);
+	free(filter->cBuf);
+	filter->cpxCoefs = NULL;
+	filter->cSamples = NULL;
+	filter->cBuf = NULL;
+}
+
 void quisk_filt_dInit(struct quisk_dFilter * filter, double * coefs, int taps)
 {	// Prepare a new filter using coefs and taps.  Samples are double.
 	filter->dCoefs = coefs;
@@ -32,6 +42,16 @@ void quisk_filt_dInit(struct quisk_dFilter * filter, double * coefs, int taps)
 	filter->nBuf = 0;
 }
 
+void quisk_filt_dFree(struct quisk_dFilter * filter)
+{	// Free the memory of a filter.  The filter must be initialized again before it is used.
+	free(filter->cpxCoefs);
+	free(filter->dSamples);
+	free(filter->dBuf);
+	filter->cpxCoefs = NULL;
+	filter->dSamples = NULL;
+	filter->dBuf = NULL;
+}
+
 void quisk_filt_differInit(struct quisk_dFilter * filter, int taps)
 {	// Prepare a new classic differentiating filter. taps must be odd.
 	int j, k;
@@ -417,6 +437,91 @@ int quisk_cDecim2HB45(complex double * cSamples, int count, struct quisk_cHB45Fi
 }
 
 
+void quisk_filt_fInit(struct quisk_fFilter * filter, double * coefs, int taps)
+{	// Prepare a new single precision filter using coefs and taps.  Samples are complex float.
+	// The coefficients are reversed and each sample is stored twice so the filter loop
+	// reads memory in order and the compiler can use SIMD instructions.
+	int i;
+
+	filter->fCoefs = (float *)malloc(taps * sizeof(float));
+	for (i = 0; i < taps; i++)
+		filter->fCoefs[i] = (float)coefs[taps - 1 - i];
+	filter->cSamples = (complex float *)malloc(taps * 2 * sizeof(complex float));
+	memset(filter->cSamples, 0, taps * 2 * sizeof(complex float));
+	filter->index = 0;
+	filter->nTaps = taps;
+	filter->decim_index = 0;
+}
+
+void quisk_filt_fFree(struct quisk_fFilter * filter)
+{	// Free the memory of a filter.  The filter must be initialized again before it is used.
+	free(filter->fCoefs);
+	free(filter->cSamples);
+	filter->fCoefs = NULL;
+	filter->cSamples = NULL;
+}
+
+int quisk_fDecimate(complex float * cSamples, int count, struct quisk_fFilter * filter, int decim)
+{	// Filter and decimate complex float samples.
+	int i, k, nOut, nTaps;
+	complex float * ptSample;
+	float * ptCoef;
+	float re, im;
+
+	nOut = 0;
+	nTaps = filter->nTaps;
+	ptCoef = filter->fCoefs;
+	for (i = 0; i < count; i++) {
+		filter->cSamples[filter->index] = filter->cSamples[filter->index + nTaps] = cSamples[i];
+		if (++filter->index >= nTaps)
+			filter->index = 0;
+		if (++filter->decim_index >= decim) {
+			filter->decim_index = 0;		// output a sample
+			ptSample = filter->cSamples + filter->index;	// oldest sample
+			re = im = 0;
+			for (k = 0; k < nTaps; k++) {
+				re += crealf(ptSample[k]) * ptCoef[k];
+				im += cimagf(ptSample[k]) * ptCoef[k];
+			}
+			cSamples[nOut++] = re + I * im;
+		}
+	}
+	return nOut;
+}
+
+int quisk_fDecim2HB45(complex float * cSamples, int count, struct quisk_fHB45Filter * filter)
+{	// This is the single precision version of quisk_cDecim2HB45().
+	int i, k, nOut;
+	complex float * samples, * center;
+	complex float out;
+	static float coef[12] = { 0.000018566625444266, -0.000118469698701817, 0.000457318798253456,
+	-0.001347840471412094, 0.003321838571445455, -0.007198422696929033, 0.014211106939802483,
+	-0.026424776824073383, 0.048414810444971007, -0.096214669073304823, 0.314881034738348550,
+	0.500000000000000000 }; // Rate 96, cutoff 16-24-32, atten 120 dB.  Coef[0] and [44] are zero.
+
+	nOut = 0;
+	samples = filter->samples;
+	center = filter->center;
+	for (i = 0; i < count; i++) {
+		if (filter->toggle == 0){
+			filter->toggle = 1;
+			memmove(center + 1, center, sizeof(complex float) * 10);
+			center[0] = cSamples[i];
+		}
+		else {
+			filter->toggle = 0;
+			memmove(samples + 1, samples, sizeof(complex float) * 21);
+			samples[0] = cSamples[i];
+			// output a sample
+			out = center[10] * coef[11];
+			for (k = 0; k < 11; k++)
+				out += (samples[k] + samples[21 - k]) * coef[k];
+			cSamples[nOut++] = out;
+		}
+	}
+	return nOut;
+}
+
 int quisk_dInterp2HB45(double * dsamples, int count, struct quisk_dHB45Filter * filter)
 {  // Half-Band interpolation by 2
 	int i, k, nOut, nCoef, nSamp;
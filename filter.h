@@ -36,8 +36,24 @@ struct quisk_dHB45Filter {   // Real half band decimate by 2 filter with 45 coef
 	double center[11];
 } ;
 
+struct quisk_fFilter {		// Single precision filter for complex float samples
+	float * fCoefs;				// filter coefficients in reverse order
+	int nTaps;					// dimension of fCoefs
+	int decim_index;			// used to count samples for decimation
+	int index;					// next available position in cSamples
+	complex float * cSamples;	// storage for old samples; each sample is stored twice
+} ;
+
+struct quisk_fHB45Filter {   // Single precision complex half band decimate by 2 filter with 45 coefficients
+	int toggle;
+	complex float samples[22];
+	complex float center[11];
+} ;
+
 void quisk_filt_cInit(struct quisk_cFilter *, double *, int);
+void quisk_filt_cFree(struct quisk_cFilter *);
 void quisk_filt_dInit(struct quisk_dFilter *, double *, int);
+void quisk_filt_dFree(struct quisk_dFilter *);
 void quisk_filt_differInit(struct quisk_dFilter *, int);
 void quisk_filt_tune(struct quisk_dFilter *, double, int);
 complex double quisk_dC_out(double, struct quisk_dFilter *);
@@ -53,6 +69,10 @@ int quisk_dInterp2HB45(double *, int, struct quisk_dHB45Filter *);
 int quisk_cInterp2HB45(complex double *, int, struct quisk_cHB45Filter *);
 int quisk_dFilter(double *, int, struct quisk_dFilter *);
 int quisk_cFilter(complex double *, int, struct quisk_cFilter *);
+void quisk_filt_fInit(struct quisk_fFilter *, double *, int);
+void quisk_filt_fFree(struct quisk_fFilter *);
+int quisk_fDecimate(complex float *, int, struct quisk_fFilter *, int);
+int quisk_fDecim2HB45(complex float *, int, struct quisk_fHB45Filter *);
 
 extern double quiskMicFilt48Coefs[325];
 extern double quiskMic5Filt48Coefs[424];
@@ -6,7 +6,7 @@ from __future__ import print_function
 from __future__ import absolute_import
 from __future__ import division
 
-import socket, traceback, time, math, os
+import socket, traceback, time, math, os, threading
 import wx
 import _quisk as QS
 import quisk_utils
@@ -17,6 +17,62 @@ DEBUG = 0
 DEBUG_I2C = 0
 DEBUG_SENSORS = 0
 
+class CommandFuture:
+  "The result of a command sent with the Hermes-Lite2 command queue"
+  def __init__(self, commands, tag):
+    self.commands = commands
+    self.tag = tag
+    self.status = None		# None while waiting, 0 for success, 1 for an error
+    self.response = None		# the C0 to C4 response bytes
+    self.callbacks = []
+  def done(self):
+    return self.status is not None
+  def add_done_callback(self, callback):	# Call callback(future) from the GUI thread when the command is finished
+    if self.status is None:
+      self.callbacks.append(callback)
+    else:
+      callback(self)
+  def result(self, timeout=1.0):	# Wait for the command to finish.  Return the response, or None for an error.
+    time0 = time.time()
+    while self.status is None and time.time() - time0 < timeout:
+      time.sleep(0.001)
+      self.commands.Poll()
+    if self.status == 0:
+      return self.response
+    return None
+  def SetResult(self, status, response):
+    self.status = status
+    if status == 0:
+      self.response = response
+    for callback in self.callbacks:
+      try:
+        callback(self)
+      except:
+        traceback.print_exc()
+    self.callbacks = []
+
+class CommandQueue:
+  "Send commands to the Hermes-Lite2 with the command queue in C. The results are returned as futures."
+  def __init__(self):
+    self.futures = {}		# the futures waiting for a result indexed by tag
+  def Send(self, c0, c1, c2, c3, c4, delay=0.0, callback=None):
+    # Add a command to the queue.  Wait delay seconds after the previous command finishes.
+    tag = QS.hermeslite_command(c0, c1, c2, c3, c4, delay)
+    future = CommandFuture(self, tag)
+    if tag:
+      self.futures[tag] = future
+    else:
+      print("ERROR: Hermes-Lite command queue is full")
+      future.SetResult(1, None)
+    if callback:
+      future.add_done_callback(callback)
+    return future
+  def Poll(self):	# Record the results of finished commands.  Called from the GUI thread.
+    for tag, status, response in QS.hermeslite_results():
+      future = self.futures.pop(tag, None)
+      if future:
+        future.SetResult(status, response)
+
 class IOBoard:
   "This class controls the N2ADR IO Board for the HermesLite 2"
   REG_TX_FREQ_BYTE4 = 0
@@ -46,26 +102,17 @@ class IOBoard:
     self.current_vfo = 0
     self.old_receive = None
     self.slow = 0
+    self.probing = False			# waiting for the read to check for the IO board
   def HeartBeat(self):	# Called at 10 Hz for housekeeping tasks
     if not self.hardware.is_HermesLite2:
       return
     if not QS.get_params('rx_udp_started'):
       return
     if self.have_IO_Board is None:
-      resp = self.hardware.ReadI2C(0x7d, 0x41, 0)	# Check for the N2ADR HL2 IO Board
-      if resp and resp[1] == 0xF1:
-        self.have_IO_Board = True
-        if self.DEBUG or DEBUG_I2C:
-          print ('Have IO_Board')
-        self.hardware.WriteI2C(0x7d, 0x1D, self.REG_CONTROL, 1)
-        if self.DEBUG: print ("IO Board RESET")
-        self.hardware.ImmediateChange('hermes_iob_rxin')
-      else:
-        self.have_board_counter -= 1
-        if self.have_board_counter == 0:
-          self.have_IO_Board = False
-          if self.DEBUG or DEBUG_I2C:
-            print ('No IO board')
+      if not self.probing:		# Check for the N2ADR HL2 IO Board
+        self.probing = True
+        self.hardware.ReadI2C(0x7d, 0x41, 0, callback=self.OnProbe)
+      return
     if not self.have_IO_Board:
       return
     if self.hardware.vfo_frequency != self.current_vfo:		# defeat phase error in ChangeFrequency()
@@ -95,6 +142,21 @@ class IOBoard:
         self.old_receive = ret
         f = ret[3] | ret[2] << 8 | ret[1] << 16 | ret[0] << 24
         print ('IO Board Freq: 0x%X 0x%X 0x%X 0x%X   %d' % (tuple(ret) + (f,)))
+  def OnProbe(self, resp):	# The response to the read that checks for the IO board
+    self.probing = False
+    if resp and resp[1] == 0xF1:
+      self.have_IO_Board = True
+      if self.DEBUG or DEBUG_I2C:
+        print ('Have IO_Board')
+      self.hardware.WriteI2C(0x7d, 0x1D, self.REG_CONTROL, 1)
+      if self.DEBUG: print ("IO Board RESET")
+      self.hardware.ImmediateChange('hermes_iob_rxin')
+    else:
+      self.have_board_counter -= 1
+      if self.have_board_counter == 0:
+        self.have_IO_Board = False
+        if self.DEBUG or DEBUG_I2C:
+          print ('No IO board')
   def Receive(self, register):	# Get the response from the IO board
     if not self.have_IO_Board:
       return None
@@ -148,6 +210,155 @@ class IOBoard:
     if self.DEBUG: print ("IO Board: antenna 0x%X" % ant)
     self.hardware.WriteI2C(0x7d, 0x1D, 31, ant)
 
+class GatewareProgrammer(threading.Thread):
+  """Program the Gateware (FPGA firmware) of a Hermes over Ethernet in a background thread.
+  The radio acknowledges each 256 byte block.  The radio does not number the blocks, so a block can not be sent
+  again: if only its acknowledgement was lost, the block would be written twice.  A missing acknowledgement
+  fails the attempt, and the flash is erased and programmed again.  The callbacks progress(text, fraction) and
+  done(success, text, info) are called from this thread.  This class does not use wx, so it can be used in a
+  script to program several radios."""
+  block_size = 256
+  def __init__(self, ip, mac, port, image, progress=None, done=None,
+        attempts=3, timeout=0.5, erase_time=10.0, restart_time=15.0):
+    threading.Thread.__init__(self)
+    self.daemon = True
+    self.ip = ip
+    self.mac = bytearray(mac)
+    self.port = port
+    self.image = bytearray(image)
+    self.progress = progress
+    self.done = done
+    self.attempts = attempts		# number of times to erase and program
+    self.timeout = timeout		# time to wait for an acknowledgement in seconds
+    self.erase_time = erase_time
+    self.restart_time = restart_time	# time to wait for the radio to restart, or zero to not wait
+    self.blocks = (len(self.image) + self.block_size - 1) // self.block_size
+    self.cancelled = False
+  def cancel(self):
+    self.cancelled = True
+  def Progress(self, text, fraction):
+    if self.progress:
+      self.progress(text, fraction)
+  def IsReply(self, reply, code):
+    reply = bytearray(reply)
+    return reply[0:3] == bytearray((0xEF, 0xFE, code)) and reply[3:9] == self.mac
+  def ReadAcks(self, sock, timeout):	# Wait for an acknowledgement.  Return the number of acknowledgements read.
+    acks = 0
+    sock.settimeout(timeout)
+    while True:
+      try:
+        reply = sock.recv(1500)
+      except (socket.timeout, socket.error):
+        break
+      if self.IsReply(reply, 0x04):
+        acks += 1
+        sock.settimeout(0.0)		# read any other waiting acknowledgements
+    return acks
+  def MakePackets(self):		# Return the program packets with the last block padded with 0xFF
+    cmd = bytearray((0xEF, 0xFE, 0x03, 0x01))
+    cmd += bytearray((self.blocks >> 24 & 0xFF, self.blocks >> 16 & 0xFF, self.blocks >> 8 & 0xFF, self.blocks & 0xFF))
+    packets = []
+    for block in range(self.blocks):
+      prog = self.image[block * self.block_size:(block + 1) * self.block_size]
+      prog += bytearray(b"\xFF" * (self.block_size - len(prog)))
+      packets.append(bytes(cmd + prog))
+    return packets
+  def Erase(self, sock):		# Send the erase command and make the packets while the flash is erased
+    cmd = bytearray(64)
+    cmd[0:4] = 0xEF, 0xFE, 0x03, 0x02
+    sock.send(bytes(cmd))
+    self.Progress("Erase old program...", 0.0)
+    packets = self.MakePackets()
+    time0 = time.time()
+    sock.settimeout(self.timeout)
+    while time.time() - time0 < self.erase_time:
+      if self.cancelled:
+        return None
+      self.Progress("Erase old program...", (time.time() - time0) / self.erase_time)
+      try:
+        reply = sock.recv(1500)
+      except socket.timeout:
+        continue
+      if self.IsReply(reply, 0x03):
+        return packets
+    return None
+  def Program(self, sock, packets):	# Send the blocks and check the acknowledgements.  Return an error message or "".
+    acks = 0
+    for block in range(self.blocks):
+      if self.cancelled:
+        return "Programming was cancelled."
+      if block % 16 == 0:
+        self.Progress("Programming...", float(block) / self.blocks)
+      sock.send(packets[block])
+      n = self.ReadAcks(sock, self.timeout)
+      if not n:
+        return "No acknowledgement for block %d." % block
+      acks += n
+    acks += self.ReadAcks(sock, self.timeout)	# late acknowledgements
+    if acks != self.blocks:
+      return "The radio acknowledged %d blocks, not %d." % (acks, self.blocks)
+    return ""
+  def WaitRestart(self, sock):		# Wait for the radio to answer a Discover.  Return the reply or None.
+    cmd = bytearray(63)
+    cmd[0:3] = 0xEF, 0xFE, 0x02
+    sock.settimeout(1.0)
+    time0 = time.time()
+    while time.time() - time0 < self.restart_time:
+      if self.cancelled:
+        return None
+      self.Progress("Waiting for the radio to start...", (time.time() - time0) / self.restart_time)
+      if time.time() - time0 < 5.0:
+        time.sleep(1.0)
+        continue
+      sock.send(bytes(cmd))
+      try:
+        reply = bytearray(sock.recv(1500))
+      except socket.timeout:
+        continue
+      if reply[0] == 0xEF and reply[1] == 0xFE and reply[3:9] == self.mac:
+        return reply
+    return None
+  def run(self):
+    info = {'blocks':self.blocks, 'attempts':0, 'reply':None}
+    success = False
+    text = "No Hermes hardware was found."
+    try:
+      sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+      sock.connect((self.ip, self.port))
+    except:
+      traceback.print_exc()
+      sock = None
+    for attempt in range(self.attempts):
+      if sock is None or self.cancelled:
+        break
+      info['attempts'] = attempt + 1
+      try:
+        packets = self.Erase(sock)
+        if packets is None:
+          text = "Failure to erase the old program."
+          continue
+        text = self.Program(sock, packets)
+        if text:
+          continue
+        success = True
+        text = "Programmed %d blocks." % self.blocks
+        if attempt:
+          text += " The flash was erased and programmed %d times." % (attempt + 1)
+        if self.restart_time > 0:
+          info['reply'] = self.WaitRestart(sock)
+          if info['reply'] is None:
+            text += " The radio did not restart."
+        break
+      except:
+        traceback.print_exc()
+        text = "Network error during programming."
+    if self.cancelled and not success:
+      text = "Programming was cancelled."
+    if sock:
+      sock.close()
+    if self.done:
+      self.done(success, text, info)
+
 class Hardware(BaseHardware):
   var_rates = ['48', '96', '192', '384']
   def __init__(self, app, conf):
@@ -178,6 +389,7 @@ class Hardware(BaseHardware):
     self.delay_config = True			# Delay sending message to HL2 until after sound starts
     self.TFRC_counter = 0		# Call for power etc. at intervals
     self.key_was_down = 0
+    self.commands = CommandQueue()		# commands for the Hermes-Lite2
     self.io_board = IOBoard(self)
     try:
       self.repeater_delay = conf.repeater_delay		# delay for changing repeater frequency in seconds
@@ -222,7 +434,96 @@ class Hardware(BaseHardware):
       self.SetControlByte(c0, 2, 0x6B)
     self.ChangeTxLNA(conf.hermes_TxLNA_dB)
     self.MakePowerCalibration()
+    # OpenHPSDR protocol 2 uses separate command packets for each port instead of the control bytes.
+    # The packets are sent from the sound thread when they change.  The first four bytes are the sequence number.
+    # DDC0 is the Tx/Rx receiver and DDC1, DDC2, ... are the sub-receivers.
+    self.protocol2 = conf.hermes_protocol == 2
+    if self.protocol2:
+      self.var_rates = ['48', '96', '192', '384', '768', '1536']
+      self.p2_rate = 48			# sample rate in ksps for all DDCs
+      self.p2_ddc_count = 1		# number of DDCs in use
+      self.p2_rx_specific = bytearray(1444)		# sent to port 1025
+      self.p2_tx_specific = bytearray(60)		# sent to port 1026
+      self.p2_high_priority = bytearray(1444)		# sent to port 1027; the run and PTT bits are added by the sound thread
+      self.p2_rx_specific[4] = 1			# number of ADCs
+      for ddc in range(10):
+        self.p2_rx_specific[22 + 6 * ddc] = 24	# bits per sample
+      self.P2RxSpecific()
+  def P2RxSpecific(self):		# Send the protocol 2 DDC enable bits and sample rates
+    for ddc in range(10):
+      if ddc < self.p2_ddc_count:
+        self.p2_rx_specific[7 + ddc // 8] |= 1 << (ddc % 8)
+      else:
+        self.p2_rx_specific[7 + ddc // 8] &= ~(1 << (ddc % 8))
+      self.p2_rx_specific[18 + 6 * ddc] = self.p2_rate >> 8 & 0xff		# sample rate in ksps, MSB first
+      self.p2_rx_specific[19 + 6 * ddc] = self.p2_rate      & 0xff
+    QS.pc_to_hermes_p2(1025, self.p2_rx_specific)
+  def P2Phase(self, index, freq):	# Set the protocol 2 phase word at this index in the high priority packet
+    phase = self.Freq2Phase(freq)
+    self.p2_high_priority[index    ] = phase >> 24 & 0xff
+    self.p2_high_priority[index + 1] = phase >> 16 & 0xff
+    self.p2_high_priority[index + 2] = phase >>  8 & 0xff
+    self.p2_high_priority[index + 3] = phase       & 0xff
+  def P2PreOpen(self):		# Use the protocol 2 discover packet
+    discover_request = b"\x00\x00\x00\x00\x02" + b"\x00" * 55
+    socket_discover = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    socket_discover.setblocking(0)
+    socket_discover.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+    found = False
+    st = "No capture device found."
+    port = self.conf.rx_udp_port
+    for i in range(5):
+      if found:
+        break
+      try:
+        for broadcast_addr in self.broadcast_addrs:
+          socket_discover.sendto(discover_request, (broadcast_addr, port))
+          time.sleep(0.01)
+      except:
+        if DEBUG > 1: traceback.print_exc()
+      for j in range(5):
+        try:
+          data, addr = socket_discover.recvfrom(1500)
+        except:
+          time.sleep(0.02)
+          continue
+        data = bytearray(data)
+        # Bytes 5:11 are the MAC, 11 is the board type, 13 is the firmware version, 20 is the number of DDCs
+        if len(data) < 60 or data[4] not in (0x02, 0x03):
+          continue
+        ver = self.conf.hermes_code_version
+        bid = self.conf.hermes_board_id
+        if ver >= 0 and data[13] != ver:
+          continue
+        if bid >= 0 and data[11] != bid:
+          continue
+        if data[4] == 0x03:
+          st = "The radio at %s is busy." % addr[0]
+          continue
+        self.hermes_mac = data[5:11]
+        self.hermes_ip = addr[0]
+        self.hermes_code_version = data[13]
+        self.hermes_board_id = data[11]
+        QS.set_hermes_id(data[13], data[11])
+        dta = list(data[5:11]) + [data[13], data[20], data[11], self.hermes_ip]
+        st = 'Capture from OpenHPSDR protocol 2: Mac %2x:%2x:%2x:%2x:%2x:%2x, Code version %d, DDC %d, ID %d, IP %s' % tuple(dta)
+        if DEBUG: print (st)
+        found = True
+        break
+    socket_discover.close()
+    if not found and self.conf.udp_rx_ip:
+      self.hermes_ip = self.conf.udp_rx_ip
+      st = 'Capture from OpenHPSDR protocol 2 device at specified IP %s' % self.hermes_ip
+      found = True
+    if found:
+      msg = QS.open_rx_udp(self.hermes_ip, port)
+      if msg[0:8] != "Capture ":
+        st = msg		# Error
+    self.config_text = st
   def pre_open(self):
+    if self.protocol2:
+      self.P2PreOpen()
+      return
     # This socket is used for the Metis Discover protocol
     self.discover_request = b"\xEF\xFE\x02" + b"\x00" * 60
     self.socket_discover = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
@@ -478,8 +779,16 @@ class Hardware(BaseHardware):
       self.pc2hermes[11] = vfo       & 0xff
     if DEBUG > 1: print("Change freq Tx", tx_freq, "Rx", vfo_freq)
     QS.pc_to_hermes(self.pc2hermes)
+    if self.protocol2:
+      self.P2Phase(9, self.vfo_frequency - self.transverter_offset)		# DDC0
+      self.P2Phase(329, self.tx_frequency - self.transverter_offset)		# DUC0
+      QS.pc_to_hermes_p2(1027, self.p2_high_priority)
     return tx_freq, vfo_freq
   def Freq2Phase(self, freq=None):		# Return the phase increment as calculated by the FPGA
+    if self.protocol2:		# the phase word is sent to the FPGA
+      if freq is None:
+        freq = self.vfo_frequency - self.transverter_offset
+      return int(float(freq) * 2**32 / self.conf.rx_udp_clock + 0.5) & 0xFFFFFFFF
     # This code attempts to duplicate the calculation of phase increment in the FPGA code.
     clock = ((int(self.conf.rx_udp_clock) + 24000) // 48000) * 48000		# this assumes the nominal clock is a multiple of 48kHz
     M2 = 2 ** 57 // clock
@@ -497,6 +806,7 @@ class Hardware(BaseHardware):
   def ReturnFrequency(self):	# Return the current tuning and VFO frequency
     return None, None			# frequencies have not changed
   def HeartBeat(self):
+    self.commands.Poll()
     self.TFRC_counter += 1
     key_down = QS.is_key_down()
     if key_down and not self.key_was_down:	# reset on key down
@@ -610,6 +920,16 @@ class Hardware(BaseHardware):
       rate = self.application.vardecim_set		# May be None or from different hardware
     else:
       rate = int(self.var_rates[index]) * 1000
+    if self.protocol2:
+      if rate and str(rate // 1000) in self.var_rates:
+        self.var_index = self.var_rates.index(str(rate // 1000))
+      else:
+        self.var_index = 0
+        rate = 48000
+      self.p2_rate = rate // 1000
+      self.P2RxSpecific()
+      if DEBUG: print ("Change sample rate to", rate)
+      return rate
     if rate == 48000:
       self.var_index = 0
     elif rate == 96000:
@@ -626,6 +946,8 @@ class Hardware(BaseHardware):
     if DEBUG: print ("Change sample rate to", rate)
     return rate
   def VarDecimRange(self):
+    if self.protocol2:
+      return (48000, 1536000)
     return (48000, 384000)
   ## Hardware AGC is no longer supported in HL2 identifying as version >=40   
   def ChangeAGC(self, value):
@@ -660,6 +982,9 @@ class Hardware(BaseHardware):
     self.pc2hermes[4 * 10 + 3] = value & 0x1F			# C0 index == 0b1010, C4[4:0] attenuator, 0 to 31 dB
     self.SetControlBit(0b1010, 5, value)			# enable attenuator
     QS.pc_to_hermes(self.pc2hermes)
+    if self.protocol2:
+      self.p2_high_priority[1443] = value & 0x1F		# ADC0 step attenuator
+      QS.pc_to_hermes_p2(1027, self.p2_high_priority)
     if DEBUG: print ("Change attenuator to", value)
   def ChangePreamp(self, value):
     self.SetControlBit(0b0000, 10, value)			# enable preamp
@@ -686,6 +1011,9 @@ class Hardware(BaseHardware):
     # C0 index == 0, C4[5:3]: number of receivers 0b000 -> one receiver; C4[2] duplex on
     self.pc2hermes[3] = 0x04 | count << 3
     QS.pc_to_hermes(self.pc2hermes)
+    if self.protocol2:
+      self.p2_ddc_count = count + 1
+      self.P2RxSpecific()
     if DEBUG: print("Change MultiRx count to", count)
   def MultiRxFrequency(self, index, vfo, band):	# index of multi rx receiver: 0, 1, 2, ...
     self.io_board.NewRxFreq(index + 1, vfo)
@@ -709,6 +1037,9 @@ class Hardware(BaseHardware):
       self.pc2hermes[jndex + 2] = vfo >>  8 & 0xff
       self.pc2hermes[jndex + 3] = vfo       & 0xff
     QS.pc_to_hermes(self.pc2hermes)
+    if self.protocol2 and index < 9:
+      self.P2Phase(9 + 4 * (index + 1), vfo)		# DDC1, DDC2, ...
+      QS.pc_to_hermes_p2(1027, self.p2_high_priority)
   def SetVNA(self, key_down=None, vna_start=None, vna_stop=None, vna_count=None, do_tx=False):
     if vna_count is not None:	# must be called first
       if DEBUG: print("vna_count", vna_count)
@@ -875,44 +1206,29 @@ class Hardware(BaseHardware):
       i2caddr,value0 = 0xac,(value0%256)
     else:
       i2caddr,value0 = 0xa8,(255-(value0%256))
-    self.pc2hermeslitewritequeue[0:5] = 0x7d,0x06,i2caddr,0x20,value0
-    self.WriteQueue()
+    if not self.is_HermesLite2:
+      return
+    # The delays are done by the command queue so the GUI does not wait
+    self.Command(0x7d, 0x06, i2caddr, 0x20, value0)
     ## Wait >10ms as that is the longest EEPROM write cycle time
-    time.sleep(0.015)
     value1 = (value1%256) if self.hermes_code_version >= 60 else (255-(value1%256))
-    self.pc2hermeslitewritequeue[0:5] = 0x7d,0x06,i2caddr,0x30,value1 
-    self.WriteQueue()
+    self.Command(0x7d, 0x06, i2caddr, 0x30, value1, delay=0.015)
     ## Double write bias to EEPROM
-    time.sleep(0.030)
-    self.pc2hermeslitewritequeue[0:5] = 0x7d,0x06,i2caddr,0x30,value1 
-    self.WriteQueue()    
-    time.sleep(0.015)
-    self.pc2hermeslitewritequeue[0:5] = 0x7d,0x06,i2caddr,0x20,value0
-    self.WriteQueue()
+    self.Command(0x7d, 0x06, i2caddr, 0x30, value1, delay=0.030)
+    self.Command(0x7d, 0x06, i2caddr, 0x20, value0, delay=0.015)
     if DEBUG: print ("Write bias", value0, value1)
-  def _wait_queue(self):
-    # Wait for the write to finish
-    for i in range(50):
-      wp = QS.get_hermeslite_writepointer()
-      if wp == 0:
-        return True
-      time.sleep(0.010)
-    else:
-      print("ERROR: Hermes-Lite write queue timeout, queue 0x%X 0x%X 0x%X 0x%X 0x%X" % tuple(self.old_writequeue))
-      QS.set_hermeslite_writepointer(0)
-    return False
+  def Command(self, c0, c1, c2, c3, c4, delay=0.0, callback=None):
+    # Add a command to the Hermes-Lite2 command queue and return a CommandFuture.  This does not wait.
+    # The optional callback(future) is called from the GUI thread when the command is finished.
+    if DEBUG: print("Hermes-Lite command queue request,      queue 0x%X 0x%X 0x%X 0x%X 0x%X" % (c0, c1, c2, c3, c4))
+    return self.commands.Send(c0, c1, c2, c3, c4, delay, callback)
   def WriteQueue(self, wait=False):
     if not self.is_HermesLite2:
       return False
-    self._wait_queue()
-    # Send next write
-    self.old_writequeue = self.pc2hermeslitewritequeue[:]
-    QS.pc_to_hermeslite_writequeue(self.pc2hermeslitewritequeue)
-    QS.set_hermeslite_writepointer(1)
-    if DEBUG: print("Hermes-Lite write queue request,        queue 0x%X 0x%X 0x%X 0x%X 0x%X" % tuple(self.pc2hermeslitewritequeue))
+    future = self.Command(*self.pc2hermeslitewritequeue)
     if wait:
       # Wait for the write to complete
-      return self._wait_queue()
+      return future.result() is not None
     return True
   ## In HL2 firmware identifying as version >=40, AD9866 access is available
   ## See AD9866 datasheet for details, some examples:
@@ -1037,24 +1353,25 @@ class Hardware(BaseHardware):
     self.pc2hermeslitewritequeue[0:5] = 0x7d,0x06,i2caddr,addr,value
     self.WriteQueue()
     if DEBUG: print ("Write EEPROM", addr, value)
-  def ReadEEPROM(self, addr):
+  def ReadEEPROM(self, addr, callback=None):
     ## To read the bias settings for bias0 and bias1
     ## hw.ReadEEPROM(2)
     ## hw.ReadEEPROM(3)
+    ## With a callback, return at once and call callback(value) when the value is read
     if self.hermes_code_version >= 60: 
       i2caddr = 0xac
     else:
       i2caddr = 0xa8
     faddr = ((addr << 4)%256) | 0xc
-    QS.clear_hermeslite_response()
-    self.pc2hermeslitewritequeue[0:5] = 0x7d,0x07,i2caddr,faddr,0
-    self.WriteQueue()
-    for j in range(50):
-      time.sleep(0.001)
-      resp = QS.get_hermeslite_response()
-      ##print("RESP:",j,resp[0],resp[1],resp[2],resp[3],resp[4])
-      if resp[0] != 0: break
-    if resp[0] == 0:
+    if not self.is_HermesLite2:
+      return -1
+    future = self.Command(0x7d, 0x07, i2caddr, faddr, 0)
+    if callback:
+      future.add_done_callback(lambda f: callback(self._EEPROMValue(f.response, addr)))
+      return future
+    return self._EEPROMValue(future.result(), addr)
+  def _EEPROMValue(self, resp, addr):
+    if resp is None:
       if DEBUG: print("EEPROM read did not return a value")
       return -1
     else:
@@ -1074,31 +1391,42 @@ class Hardware(BaseHardware):
       return v0
   def WriteI2C(self, bus, i2caddr, control, value):
     # bus is 0x7c or 0x7d
-    self.pc2hermeslitewritequeue[0:5] = bus, 0x06, i2caddr, control, value
-    QS.clear_hermeslite_response()
-    if self.WriteQueue(wait=True):
-      if DEBUG_I2C > 1 or DEBUG: print ("Write I2C bus 0x%X, i2caddr 0x%X, control 0x%X, value 0x%X" % (bus, i2caddr, control, value))
-    else:
-      if DEBUG_I2C or DEBUG:
-        print ("Write I2C bus ERROR 0x%X, i2caddr 0x%X, control 0x%X, value 0x%X" % (bus, i2caddr, control, value))
-  def ReadI2C(self, bus, i2caddr, control):
+    # The write is queued and this returns at once.
+    if not self.is_HermesLite2:
+      return None
+    def OnDone(future):
+      if future.status == 0:
+        if DEBUG_I2C > 1 or DEBUG: print ("Write I2C bus 0x%X, i2caddr 0x%X, control 0x%X, value 0x%X" % (bus, i2caddr, control, value))
+      else:
+        if DEBUG_I2C or DEBUG:
+          print ("Write I2C bus ERROR 0x%X, i2caddr 0x%X, control 0x%X, value 0x%X" % (bus, i2caddr, control, value))
+    return self.Command(bus, 0x06, i2caddr, control, value, callback=OnDone)
+  def ReadI2C(self, bus, i2caddr, control, callback=None):
     # bus is 0x7c or 0x7d
     # Beware of byte order!
-    self.pc2hermeslitewritequeue[0:5] = bus, 0x07, i2caddr, control, 0
-    QS.clear_hermeslite_response()
-    if self.WriteQueue(wait=True):
-      resp = QS.get_hermeslite_response()
-      resp[0] = (resp[0] >> 1) & 0x3F	# 6-bit bus in C0
-      if DEBUG_I2C or DEBUG:
-        print ("Read  I2C bus 0x%X, 0x%X, 0x%X, 0x%X, 0x%X " % tuple(resp))
-      return resp
-    else:
+    # With a callback, return a future at once and call callback(resp) when the read is finished; else wait.
+    if not self.is_HermesLite2:
+      return None
+    future = self.Command(bus, 0x07, i2caddr, control, 0)
+    if callback:
+      future.add_done_callback(lambda f: callback(self._I2CResponse(f.response)))
+      return future
+    return self._I2CResponse(future.result())
+  def _I2CResponse(self, resp):
+    if resp is None:
       if DEBUG_I2C or DEBUG:
         print("ReadI2C timed out and did not return a value")
       return None
+    resp = bytearray(resp)
+    resp[0] = (resp[0] >> 1) & 0x3F	# 6-bit bus in C0
+    if DEBUG_I2C or DEBUG:
+      print ("Read  I2C bus 0x%X, 0x%X, 0x%X, 0x%X, 0x%X " % tuple(resp))
+    return resp
   def ProgramGateware(self, event):	# Program the Gateware (FPGA firmware) over Ethernet
     title = "Program the Gateware"
     main_frame = self.application.main_frame
+    if getattr(self, 'gateware_programmer', None) and self.gateware_programmer.is_alive():
+      return
     dlg = wx.FileDialog(main_frame, message='Choose an RBF file for programming the Gateware',
          style=wx.FD_OPEN, wildcard="RBF files (*.rbf)|*.rbf")
     if dlg.ShowModal() == wx.ID_OK:
@@ -1107,8 +1435,6 @@ class Hardware(BaseHardware):
     else:
       dlg.Destroy()
       return
-    timeout = 0.2	# socket timeout in seconds
-    erase_time = 50	# in units of timeout
     hermes_ip = self.hermes_ip
     hermes_mac = self.hermes_mac
     if not hermes_ip:
@@ -1118,7 +1444,8 @@ class Hardware(BaseHardware):
       return
     try:
       fp = open(path, "rb")
-      size = os.stat(path).st_size
+      image = fp.read()
+      fp.close()
     except:
       msg = wx.MessageDialog(main_frame, "Can not read the RBF file specified.", title, wx.OK|wx.ICON_ERROR)
       msg.ShowModal()
@@ -1135,117 +1462,38 @@ class Hardware(BaseHardware):
       msg = wx.MessageDialog(main_frame, "Failure to find a running Hermes and stop the samples.", title, wx.OK|wx.ICON_ERROR)
       msg.ShowModal()
       msg.Destroy()
-      fp.close()
       return
-    blocks = (size + 255) // 256
-    dlg = wx.ProgressDialog(title, "Erase old program...", blocks + 1, main_frame, wx.PD_APP_MODAL)
-    program_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    program_socket.settimeout(timeout)
-    port = self.conf.rx_udp_port
-    program_socket.connect((hermes_ip, port))
-    cmd = bytearray(64)		# Erase command
-    cmd[0] = 0xEF
-    cmd[1] = 0xFE
-    cmd[2] = 0x03
-    cmd[3] = 0x02
-    program_socket.send(cmd)
-    success = False
-    for i in range(erase_time):
-      dlg.Update(i * blocks // erase_time)
-      try:
-        reply = program_socket.recv(1500)
-      except socket.timeout:
-        pass
-      else:
-        reply = bytearray(reply)
-        if reply[0:3] == bytearray(b"\xEF\xFE\03") and reply[3:9] == hermes_mac:
-          success = True
-          break
-    if not success:
-      dlg.Destroy()
-      self.application.Yield()
-      fp.close()
-      msg = wx.MessageDialog(main_frame, "Failure to erase the old program. Please push the Program button again.", title, wx.OK|wx.ICON_ERROR)
-      msg.ShowModal()
-      msg.Destroy()
-      program_socket.close()
+    # The programming is done in a thread so the GUI keeps running
+    self.gateware_dlg = wx.ProgressDialog(title, "Erase old program...", 1000, main_frame, wx.PD_CAN_ABORT)
+    self.gateware_programmer = GatewareProgrammer(hermes_ip, hermes_mac, self.conf.rx_udp_port, image,
+        progress=lambda text, fraction: wx.CallAfter(self.OnGatewareProgress, text, fraction),
+        done=lambda success, text, info: wx.CallAfter(self.OnGatewareDone, success, text, info))
+    self.gateware_programmer.start()
+  def OnGatewareProgress(self, text, fraction):
+    if not self.gateware_dlg:
       return
-    dlg.Update(0, "Programming...")
-    cmd = bytearray(8)
-    cmd[0] = 0xEF
-    cmd[1] = 0xFE
-    cmd[2] = 0x03
-    cmd[3] = 0x01
-    cmd[4] = (blocks >> 24) & 0xFF
-    cmd[5] = (blocks >> 16) & 0xFF
-    cmd[6] = (blocks >>  8) & 0xFF
-    cmd[7] = (blocks      ) & 0xFF
-    for block in range(blocks):
-      dlg.Update(block)
-      prog = fp.read(256)
-      if block == blocks - 1:	# last block may have an odd number of bytes
-        prog = prog + bytearray(b"\xFF" * (256 - len(prog)))
-      if len(prog) != 256:
-        print ("read wrong number of bytes for block", block)
-        success = False
-        break
-      try:
-        program_socket.send(cmd + prog)
-        reply = program_socket.recv(1500)
-      except socket.timeout:
-        print ("Socket timeout while programming block", block)
-        success = False
-        break
-      else:
-        reply = bytearray(reply)
-        if reply[0:3] != bytearray(b"\xEF\xFE\04") or reply[3:9] != hermes_mac:
-          print ("Program failed at block", block)
-          success = False
-          break
-    fp.close()
-    for i in range(10):         # throw away extra packets
-      try:
-        program_socket.recv(1500)
-      except socket.timeout:
-        break
-    if success:
-      dlg.Update(0, "Waiting for Hermes to start...")
-      wait_secs = 15    # number of seconds to wait for restart
-      cmd = bytearray(63)       # Discover
-      cmd[0] = 0xEF
-      cmd[1] = 0xFE
-      cmd[2] = 0x02
-      program_socket.settimeout(1.0)
-      for i in range(wait_secs):
-        dlg.Update(i * blocks // wait_secs)
-        if i < 5:
-          time.sleep(1.0)
-          continue
-        program_socket.send(cmd)
-        try:
-          reply = program_socket.recv(1500)
-        except socket.timeout:
-          pass
-        else:
-          reply = bytearray(reply)
-          #print ("0x%X 0x%X %d 0x%X 0x%X 0x%X 0x%X 0x%X 0x%X %d %d" % tuple(reply[0:11]))
-          if reply[0] == 0xEF and reply[1] == 0xFE and reply[10] == 6:
-            self.hermes_mac = reply[3:9]
-            self.hermes_code_version = reply[9]
-            st = 'Capture from Hermes device: Mac %2x:%2x:%2x:%2x:%2x:%2x, Code version %d, ID %d' % tuple(reply[3:11])
-            st += ', IP %s' % self.hermes_ip
-            self.config_text = st
-            #print (st)
-            self.application.config_text = st
-            self.application.main_frame.SetConfigText(st)
-            QS.set_params(hermes_pause=0)
-            break
-      dlg.Destroy()
-      self.application.Yield()
+    fraction = max(0.0, min(fraction, 1.0))
+    ret = self.gateware_dlg.Update(int(fraction * 999), text)
+    if not ret[0]:		# Cancel button
+      self.gateware_programmer.cancel()
+  def OnGatewareDone(self, success, text, info):
+    title = "Program the Gateware"
+    if self.gateware_dlg:
+      self.gateware_dlg.Destroy()
+      self.gateware_dlg = None
+    reply = info['reply']
+    if reply:
+      self.hermes_mac = reply[3:9]
+      self.hermes_code_version = reply[9]
+      st = 'Capture from Hermes device: Mac %2x:%2x:%2x:%2x:%2x:%2x, Code version %d, ID %d' % tuple(reply[3:11])
+      st += ', IP %s' % self.hermes_ip
+      self.config_text = st
+      self.application.config_text = st
+      self.application.main_frame.SetConfigText(st)
+    if success:		# Keep the samples paused after a failure; the radio does not have a working program
+      QS.set_params(hermes_pause=0)
+      msg = wx.MessageDialog(self.application.main_frame, text, title, wx.OK|wx.ICON_INFORMATION)
     else:
-      dlg.Destroy()
-      self.application.Yield()
-      msg = wx.MessageDialog(main_frame, "Programming failed. Please push the Program button again.", title, wx.OK|wx.ICON_ERROR)
-      msg.ShowModal()
-      msg.Destroy()
-    program_socket.close()
+      msg = wx.MessageDialog(self.application.main_frame, text + " Please push the Program button again.", title, wx.OK|wx.ICON_ERROR)
+    msg.ShowModal()
+    msg.Destroy()
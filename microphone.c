@@ -8,6 +8,7 @@
 #include <sys/types.h>
 #include "microphone.h"
 #include "filter.h"
+#include <pthread.h>
 
 #ifdef MS_WINDOWS
 #include <winsock2.h>
@@ -92,6 +93,8 @@ static int hermes_filter_rx;		// hermes filter to use for Rx
 static int hermes_filter_tx;		// hermes filter to use for Tx
 
 static void serial_key_samples(complex double *, int);
+static void ps_start_thread(void);
+static PyObject * ps_get_status(void);
 static play_state_t last_play_state;
 
 #define TX_BLOCK_SHORTS		600		// transmit UDP packet with this many shorts (two bytes) (perhaps + 1)
@@ -643,7 +646,9 @@ PyObject * quisk_get_tx_filter(PyObject * self, PyObject * args)
 
 	// Create space for the fft of size data_width
 	pt = samples = (fftw_complex *) fftw_malloc(sizeof(fftw_complex) * data_width);
+	quisk_fftw_plan_lock();
 	plan = fftw_plan_dft_1d(data_width, pt, pt, FFTW_FORWARD, FFTW_MEASURE);
+	quisk_fftw_plan_unlock();
 	average = (double *) malloc(sizeof(double) * (data_width + nTaps));
 	fft_window = (double *) malloc(sizeof(double) * data_width);
 	bufI = (double *) malloc(sizeof(double) * nTaps);
@@ -708,7 +713,9 @@ PyObject * quisk_get_tx_filter(PyObject * self, PyObject * args)
 	free(bufI);
 	free(average);
 	free(fft_window);
+	quisk_fftw_plan_lock();
 	fftw_destroy_plan(plan);
+	quisk_fftw_plan_unlock();
 	fftw_free(samples);
 
 	return tuple2;
@@ -783,7 +790,6 @@ void quisk_hermes_tx_send(int tx_socket, int * tx_records)
 	static unsigned int seq = 0;
 	static unsigned char C0_index = 0;
 	complex double cw_samples[63 * 2];
-	static double writequeue_time0 = 0;
 	static unsigned char rx1_freq[4];	// frequency of the first receiver
 
 	//printf("hermes_tx_send start 1: hermes_num_samples %d\n", hermes_num_samples);
@@ -835,41 +841,44 @@ void quisk_hermes_tx_send(int tx_socket, int * tx_records)
 	sendbuf[8] = 0x7F;
 	sendbuf[9] = 0x7F;
 	sendbuf[10] = 0x7F;
-	offset = C0_index * 4;		// offset into quisk_pc_to_hermes is C0[7:1] * 4
-	sendbuf[11] = C0_index << 1 | hermes_mox_bit;			// C0
-	sendbuf[12] = quisk_pc_to_hermes[offset++];		// C1
-	sendbuf[13] = quisk_pc_to_hermes[offset++];		// C2
-	sendbuf[14] = quisk_pc_to_hermes[offset++];		// C3
-	sendbuf[15] = quisk_pc_to_hermes[offset++];		// C4
-	switch (C0_index) {
-	case 0:	// Do not change receiver count without stopping Hermes and restarting
-		sendbuf[15] = quisk_multirx_count << 3 | 0x04;	// Send the old count, not the changed count
-		if (hermes_mox_bit)		// send filter selection on J16
-			sendbuf[13] = hermes_filter_tx << 1;
-		else
-			sendbuf[13] = hermes_filter_rx << 1;
-		break;
-	case 2:		// Rx1 frequency
-		rx1_freq[0] = sendbuf[12];
-		rx1_freq[1] = sendbuf[13];
-		rx1_freq[2] = sendbuf[14];
-		rx1_freq[3] = sendbuf[15];
-		break;
-	case 3:		// Rx2 frequency
-		if (PsInUse && hermes_mox_bit) {
-			sendbuf[12] = rx1_freq[0];
-			sendbuf[13] = rx1_freq[1];
-			sendbuf[14] = rx1_freq[2];
-			sendbuf[15] = rx1_freq[3];
+	// Hermes-Lite commands without an ACK can also use the first C0-C4 slot
+	if ( ! quisk_hl2_cmd_next(sendbuf + 11, 0)) {
+		offset = C0_index * 4;		// offset into quisk_pc_to_hermes is C0[7:1] * 4
+		sendbuf[11] = C0_index << 1 | hermes_mox_bit;			// C0
+		sendbuf[12] = quisk_pc_to_hermes[offset++];		// C1
+		sendbuf[13] = quisk_pc_to_hermes[offset++];		// C2
+		sendbuf[14] = quisk_pc_to_hermes[offset++];		// C3
+		sendbuf[15] = quisk_pc_to_hermes[offset++];		// C4
+		switch (C0_index) {
+		case 0:	// Do not change receiver count without stopping Hermes and restarting
+			sendbuf[15] = quisk_multirx_count << 3 | 0x04;	// Send the old count, not the changed count
+			if (hermes_mox_bit)		// send filter selection on J16
+				sendbuf[13] = hermes_filter_tx << 1;
+			else
+				sendbuf[13] = hermes_filter_rx << 1;
+			break;
+		case 2:		// Rx1 frequency
+			rx1_freq[0] = sendbuf[12];
+			rx1_freq[1] = sendbuf[13];
+			rx1_freq[2] = sendbuf[14];
+			rx1_freq[3] = sendbuf[15];
+			break;
+		case 3:		// Rx2 frequency
+			if (PsInUse && hermes_mox_bit) {
+				sendbuf[12] = rx1_freq[0];
+				sendbuf[13] = rx1_freq[1];
+				sendbuf[14] = rx1_freq[2];
+				sendbuf[15] = rx1_freq[3];
+			}
+			break;
+		case 10:
+			if (PsInUse && hermes_mox_bit)
+				sendbuf[13] |= 0x40;	// assert pure signal
+			break;
 		}
-		break;
-	case 10:
-		if (PsInUse && hermes_mox_bit)
-			sendbuf[13] |= 0x40;	// assert pure signal
-		break;
+		if (++C0_index > 16)
+			C0_index = 0;
 	}
-	if (++C0_index > 16)
-		C0_index = 0;
 	pt_buf = sendbuf + 16;
 	for (i = 0; i < 63; i++) {		// add 63 samples
 		*pt_buf++ = 0x00;			// Left/Right audio sample
@@ -890,26 +899,8 @@ void quisk_hermes_tx_send(int tx_socket, int * tx_records)
 	sendbuf[522] = 0x7F;
 
 	// Changes for HermesLite v2 thanks to Steve, KF7O
-	// Add a delay between ACK requests so two successive requests are spaced.
-	if (writequeue_time0 == 0)
-		writequeue_time0 = QuiskTimeSec() + 0.050;	// initial delay
-	if (quisk_hermeslite_writepointer == 1 && QuiskTimeSec() - writequeue_time0 > 0.020) {
-		writequeue_time0 = QuiskTimeSec();
-		// Only send periodic hermeslite writes in second part of frame
-		sendbuf[523] = quisk_hermeslite_writequeue[0] << 1 | hermes_mox_bit;
-		sendbuf[524] = quisk_hermeslite_writequeue[1];
-		sendbuf[525] = quisk_hermeslite_writequeue[2];
-		sendbuf[526] = quisk_hermeslite_writequeue[3];
-		sendbuf[527] = quisk_hermeslite_writequeue[4];
-
-		if ((sendbuf[523] & 0x80) == 0) {
-			// No acknowledge requested so fire and forget
-			quisk_hermeslite_writepointer = 0;
-		}
-		else {
-			quisk_hermeslite_writepointer = 2;
-		}
-	} else {
+	// Send the next Hermes-Lite command in the second C0-C4 slot.
+	if ( ! quisk_hl2_cmd_next(sendbuf + 523, 1)) {
 		offset = C0_index * 4;		// offset into quisk_pc_to_hermes is C0[7:1] * 4
 		sendbuf[523] = C0_index << 1 | hermes_mox_bit;		// C0
 		sendbuf[524] = quisk_pc_to_hermes[offset++];		// C1
@@ -1336,7 +1327,7 @@ int quisk_process_microphone(int mic_sample_rate, complex double * cSamples, int
 		(*quisk_pt_sample_write)(cSamples, count);
 	}
 	else if (quisk_use_rx_udp == 10) {	// Send Hermes mic samples when key is up or down
-		if ( ! quisk_rx_udp_started)
+		if ( ! quisk_rx_udp_started || quisk_hermes_protocol != 1)	// protocol 2 does not send Tx samples
 			;
 		else {
 			if ((rxMode == CWL || rxMode == CWU) && quiskSpotLevel < 0)	// CW and no Spot
@@ -1395,6 +1386,8 @@ PyObject * quisk_get_tx_audio(PyObject * self, PyObject * args)
 		return PyInt_FromLong(PsEnable);
 	if (strcmp(name, "PsCal") == 0)
 		return PyInt_FromLong(PsCal);
+	if (strcmp(name, "PsStatus") == 0)
+		return ps_get_status();
 	Py_INCREF (Py_None);
 	return Py_None;
 }
@@ -1414,6 +1407,8 @@ PyObject * quisk_set_tx_audio(PyObject * self, PyObject * args, PyObject * keywd
 		vox_level = (int)(pow(10.0, vlevel / 20.0) * CLIP16);	// Convert dB to 16-bit sample
 	if (clevel != -9999)
 		quisk_mic_clip = pow(10.0, clevel / 20.0);	// Convert dB to factor
+	if (PsEnable || PsCal)
+		ps_start_thread();
 	Py_INCREF (Py_None);
 	return Py_None;
 }
@@ -1673,16 +1668,286 @@ static void splint(double xa[], double ya[], double y2a[], int n, double x, doub
 #define DEBUG_PS	0
 #define HOLD		0		// Make calibration run permanent
 #define RX1_GAIN	0.238
+#define PS_TABLE_SIZE	1024		// Number of intervals in the predistortion gain table from amplitude 0.0 to 1.0
+
+struct BPD {		// data for one amplitude bin
+	int XP_count;
+	double table_XP;
+	double XP_mag;
+	double mag_X;
+	double mag_P;
+	double phase_P;
+	complex double XP_gain;
+	double XP_gain_mag;
+	double XP_gain_phase;
+};
+
+struct ps_table_t {	// Tx gain versus amplitude; the last entry repeats so we can interpolate at 1.0
+	complex double gain[PS_TABLE_SIZE + 2];
+	double mag[PS_TABLE_SIZE + 2];
+};
+
+struct ps_fit_t {	// a fit request from the sound thread to the fit thread
+	struct BPD Bins[NUM_BINS];
+	double starting_phase;
+	int final;		// This is the final fit of a calibration
+	int Fault;		// Result: the fit failed and the table must not be used
+};
+
+static struct ps_table_t ps_tables[2];		// the sound thread uses ps_tables[ps_active]; the fit thread writes the other
+static int ps_active;				// changed only by the sound thread
+static struct ps_fit_t ps_job;			// written by the sound thread only when the fit thread is idle
+static enum {
+	PS_FIT_IDLE,
+	PS_FIT_REQUEST,
+	PS_FIT_DONE
+} volatile ps_fit_state = PS_FIT_IDLE;
+static pthread_mutex_t ps_mutex = PTHREAD_MUTEX_INITIALIZER;
+static pthread_cond_t ps_cond = PTHREAD_COND_INITIALIZER;
+static int ps_thread_started;			// zero if we must fit on the sound thread
+
+static struct {		// convergence and error metrics returned by get_tx_audio("PsStatus")
+	int state;		// state of the sound thread state machine
+	int calibrated;		// the predistortion table is in use
+	int fits;		// number of completed fits
+	int faults;		// number of rejected fits
+	int bins;		// number of bins with data in the last fit
+	double am_am;		// RMS relative amplitude error of the amplifier in the last fit
+	double am_pm;		// RMS phase error of the amplifier in the last fit in radians
+	double change;		// RMS change of the gain table in the last accepted fit, or -1
+	double fit_secs;	// time to compute the last fit
+} ps_status = {0, 0, 0, 0, 0, 0, 0, -1, 0};
+
+static void ps_fit(struct ps_fit_t * job, struct ps_table_t * table, struct ps_table_t * old_table)
+{  // Fit a spline to the bin data and fill the gain table.  Called from the fit thread.
+	int i, bin, num_bin_data, spline_P_size;
+	double G0, phase, aaa, ppp, xp, xpg, xp0, xpg0, am_am, am_pm, change, time0;
+	double quadX[4], quadY[4], quadZ[4];
+	double spline_P_X[NUM_BINS + 1];
+	double spline_P_mag[NUM_BINS + 1];
+	double spline_P_mag2[NUM_BINS + 1];
+	double spline_P_phase[NUM_BINS + 1];
+	double spline_P_phase2[NUM_BINS + 1];
+	struct BPD * Bins = job->Bins;
+
+	time0 = QuiskTimeSec();
+	job->Fault = 0;
+	for (bin = 1; bin < NUM_BINS - 1; bin++) {
+		if (Bins[bin].XP_count > 0) {	// This bin has data.
+			Bins[bin].XP_gain_mag = cabs(Bins[bin].XP_gain);
+			phase = carg(Bins[bin].XP_gain) - job->starting_phase;
+			if (phase < - M_PI)
+				phase += 2 * M_PI;
+			else if (phase > M_PI)
+				phase -= 2 * M_PI;
+			Bins[bin].XP_gain_phase = phase;
+		}
+		else {
+			Bins[bin].XP_gain_mag = 1.0;
+			Bins[bin].XP_gain_phase = 0.0;
+		}
+	}
+	Bins[0].XP_count = 1;
+	Bins[0].XP_mag = 0.0;
+	i = 1;
+	for (bin = 1; bin < 6; bin++) {
+		if (Bins[bin].XP_count) {
+			quadX[i] = Bins[bin].XP_mag;
+			quadY[i] = Bins[bin].XP_gain_mag;
+			quadZ[i] = Bins[bin].XP_gain_phase;
+			if (i == 3)
+				break;
+			i++;
+		}
+	}
+	if (i == 3) {
+		polint(quadX, quadY, 0.0, &Bins[0].XP_gain_mag);
+		polint(quadX, quadZ, 0.0, &Bins[0].XP_gain_phase);
+	}
+	else {
+		Bins[0].XP_gain_mag = 1.0;
+		Bins[0].XP_gain_phase = 0.0;
+		job->Fault = 1;
+		if (DEBUG_PS || PsCal)
+			printf("Failure to find G0 at zero\n");
+	}
+
+	Bins[NUM_BINS - 1].XP_count = 1;
+	Bins[NUM_BINS - 1].XP_mag = 1.0;
+	i = 3;
+	for (bin = NUM_BINS - 2; bin >= NUM_BINS - 6; bin--) {
+		if (Bins[bin].XP_count) {
+			quadX[i] = Bins[bin].XP_mag;
+			quadY[i] = Bins[bin].XP_gain_mag;
+			quadZ[i] = Bins[bin].XP_gain_phase;
+			if (--i == 0)
+				break;
+		}
+	}
+	if (i == 0) {
+		polint(quadX, quadY, 1.0, &Bins[NUM_BINS - 1].XP_gain_mag);
+		polint(quadX, quadZ, 1.0, &Bins[NUM_BINS - 1].XP_gain_phase);
+	}
+	else {
+		Bins[NUM_BINS - 1].XP_gain_mag = 1.0;
+		Bins[NUM_BINS - 1].XP_gain_phase = 0.0;
+		job->Fault = 1;
+		if (DEBUG_PS || PsCal)
+			printf("Failure to find G0 at one\n");
+	}
+
+	G0 = Bins[NUM_BINS - 1].XP_gain_mag;
+	num_bin_data = 0;
+	xp0 = -1.0;
+	xpg0 = -1.0;
+	am_am = am_pm = 0.0;
+	for (bin = 0; bin < NUM_BINS; bin++) {
+		if (bin == NUM_BINS - 1) {
+			num_bin_data++;
+			Bins[NUM_BINS - 1].mag_P = 1.0;
+			Bins[NUM_BINS - 1].phase_P = - Bins[NUM_BINS - 1].XP_gain_phase;
+			Bins[NUM_BINS - 1].mag_X = 1.0;
+		}
+		else if (Bins[bin].XP_count) {
+			num_bin_data++;
+			Bins[bin].mag_P = G0 / Bins[bin].XP_gain_mag;
+			Bins[bin].phase_P = - Bins[bin].XP_gain_phase;
+			Bins[bin].mag_X = Bins[bin].XP_mag / Bins[bin].mag_P;
+			xp = Bins[bin].mag_X * Bins[bin].mag_P;
+			if (xp < xp0) {
+				if (DEBUG_PS || PsCal)
+					printf("xp is not monotonic at bin %d\n", bin);
+				job->Fault = 1;
+			}
+			xpg = xp * Bins[bin].XP_gain_mag;
+			if (xpg < xpg0) {
+				if (DEBUG_PS || PsCal)
+					printf("xpg is not monotonic at bin %d\n", bin);
+				job->Fault = 1;
+			}
+			xp0 = xp;
+			xpg0 = xpg;
+		}
+		else {
+			Bins[bin].mag_P = 0.0;
+			Bins[bin].phase_P = 0.0;
+			Bins[bin].mag_X = 0.0;
+		}
+		if (Bins[bin].XP_count) {	// distortion of the amplifier relative to a linear gain G0
+			aaa = Bins[bin].XP_gain_mag / G0 - 1.0;
+			am_am += aaa * aaa;
+			am_pm += Bins[bin].XP_gain_phase * Bins[bin].XP_gain_phase;
+		}
+	}
+	ps_status.bins = num_bin_data;
+	ps_status.am_am = sqrt(am_am / num_bin_data);
+	ps_status.am_pm = sqrt(am_pm / num_bin_data);
+	if (num_bin_data < NUM_BINS  * 7 / 10) {
+		if (DEBUG_PS || job->final)
+			printf("Not enough data for corrections %d\n", num_bin_data);
+		job->Fault = 1;
+	}
+	if ( ! job->Fault) {
+#if DEBUG_PS
+		printf("Create a new predistortion\n");
+#endif
+		spline_P_size = 0;
+		for (bin = 0; bin < NUM_BINS; bin++) {
+			if (Bins[bin].XP_count) {
+				spline_P_size++;
+				spline_P_X[spline_P_size] = Bins[bin].mag_X;
+				spline_P_mag[spline_P_size] = Bins[bin].mag_P;
+				spline_P_phase[spline_P_size] = Bins[bin].phase_P;
+			}
+		}
+		spline(spline_P_X, spline_P_mag, spline_P_size, 2E30, 2E30, spline_P_mag2);
+		spline(spline_P_X, spline_P_phase, spline_P_size, 2E30, 2E30, spline_P_phase2);
+		change = 0.0;
+		for (i = 0; i <= PS_TABLE_SIZE; i++) {	// evaluate the spline once for each table entry
+			splint(spline_P_X, spline_P_mag, spline_P_mag2, spline_P_size, (double)i / PS_TABLE_SIZE, &aaa);
+			splint(spline_P_X, spline_P_phase, spline_P_phase2, spline_P_size, (double)i / PS_TABLE_SIZE, &ppp);
+			table->gain[i] = aaa * cexp(I * ppp);
+			table->mag[i] = aaa;
+			if (old_table) {
+				aaa = cabs(table->gain[i] - old_table->gain[i]);
+				change += aaa * aaa;
+			}
+		}
+		table->gain[PS_TABLE_SIZE + 1] = table->gain[PS_TABLE_SIZE];
+		table->mag[PS_TABLE_SIZE + 1] = table->mag[PS_TABLE_SIZE];
+		ps_status.change = old_table ? sqrt(change / (PS_TABLE_SIZE + 1)) : -1.0;
+	}
+	ps_status.fit_secs = QuiskTimeSec() - time0;
+}
+
+static void * ps_fit_thread(void * arg)
+{  // Wait for fit requests from the sound thread
+	pthread_mutex_lock(&ps_mutex);
+	while (1) {
+		while (ps_fit_state != PS_FIT_REQUEST)
+			pthread_cond_wait(&ps_cond, &ps_mutex);
+		pthread_mutex_unlock(&ps_mutex);
+		ps_fit(&ps_job, ps_tables + (1 - ps_active), ps_status.calibrated ? ps_tables + ps_active : NULL);
+		pthread_mutex_lock(&ps_mutex);
+		ps_fit_state = PS_FIT_DONE;
+	}
+	return NULL;
+}
+
+static void ps_start_thread(void)
+{  // Start the fit thread.  Called from the GUI thread.
+	pthread_t thread;
+
+	if (ps_thread_started)
+		return;
+	if (pthread_create(&thread, NULL, ps_fit_thread, NULL) == 0) {
+		pthread_detach(thread);
+		ps_thread_started = 1;
+	}
+	else {
+		printf("Failure to start the predistortion thread; fit on the sound thread\n");
+	}
+}
+
+static PyObject * ps_get_status(void)
+{
+	return Py_BuildValue("{s:i,s:i,s:i,s:i,s:i,s:d,s:d,s:d,s:d}", "state", ps_status.state,
+		"calibrated", ps_status.calibrated, "fits", ps_status.fits, "faults", ps_status.faults,
+		"bins", ps_status.bins, "am_am", ps_status.am_am, "am_pm", ps_status.am_pm,
+		"change", ps_status.change, "fit_secs", ps_status.fit_secs);
+}
+
+static int ps_fit_request(struct BPD * Bins, double starting_phase, int final)
+{  // Copy the data to ps_job and start a fit.  Return 1 if the request was accepted.  Called from the sound thread.
+	int bin;
+
+	if (ps_fit_state == PS_FIT_REQUEST)		// the fit thread is busy with an old request and is reading ps_job
+		return 0;
+	for (bin = 0; bin < NUM_BINS; bin++)
+		ps_job.Bins[bin] = Bins[bin];
+	ps_job.starting_phase = starting_phase;
+	ps_job.final = final;
+	if ( ! ps_thread_started) {
+		ps_fit(&ps_job, ps_tables + (1 - ps_active), ps_status.calibrated ? ps_tables + ps_active : NULL);
+		ps_fit_state = PS_FIT_DONE;
+		return 1;
+	}
+	pthread_mutex_lock(&ps_mutex);
+	ps_fit_state = PS_FIT_REQUEST;
+	pthread_cond_signal(&ps_cond);
+	pthread_mutex_unlock(&ps_mutex);
+	return 1;
+}
+
 void PreDistort(complex double * amp_in_samples, complex double * amp_out_samples, int nSamples, complex double * tx_samples, int num_tx)
 {
-	int i, bin, num_bin_data;
-	double G0, phase, mag_in, mag_out, new_mag, aaa, ppp;
-	double error, xp, xpg, xp0, xpg0;
-	double quadX[4], quadY[4], quadZ[4];
+	int i, k, bin, num_bin_data;
+	double mag_in, mag_out, new_mag, aaa, frac;
+	double error;
 	complex double in_sample, out_sample;
+	struct ps_table_t * table;
 	static int state = 0;
 	static int Fault;
-	static int isCalibrated = 0;
 	static int ramp_counter, ramp_count0;
 	static int input_samples = 0;
 	static double tx_to_RX1_gain = 0;
@@ -1694,24 +1959,6 @@ void PreDistort(complex double * amp_in_samples, complex double * amp_out_sample
 	static int old_state;
 	static double time0;
 #endif
-	static int spline_P_size;
-	static double spline_P_X[NUM_BINS + 1];
-	static double spline_P_mag[NUM_BINS + 1];
-	static double spline_P_mag2[NUM_BINS + 1];
-	static double spline_P_phase[NUM_BINS + 1];
-	static double spline_P_phase2[NUM_BINS + 1];
-
-	struct BPD {
-		int XP_count;
-		double table_XP;
-		double XP_mag;
-		double mag_X;
-		double mag_P;
-		double phase_P;
-		complex double XP_gain;
-		double XP_gain_mag;
-		double XP_gain_phase;
-	};
 	static struct BPD Bins[NUM_BINS];
 		
 	static enum {
@@ -1720,13 +1967,14 @@ void PreDistort(complex double * amp_in_samples, complex double * amp_out_sample
 		StopCW
 	} tx_state = NothingHappens;
 
+	ps_status.state = state;
 	if (quisk_multirx_count == 0) {
 		state = 0;
 		return;
 	}
 	if (PsCal) {
 		if (state == 0) {
-			isCalibrated = 0;
+			ps_status.calibrated = 0;
 			state = 10;
 #if DEBUG_PS > 2
 			time0 = QuiskTimeSec();
@@ -1744,12 +1992,21 @@ void PreDistort(complex double * amp_in_samples, complex double * amp_out_sample
 
 	if (num_tx) {
 		input_samples += num_tx;
-		if (isCalibrated) {	// perform predistortion of Tx samples; multiply input X by P
+		if (ps_status.calibrated) {	// perform predistortion of Tx samples; multiply input X by P
+			table = ps_tables + ps_active;
 			for (i = 0; i < num_tx; i++) {
 				mag_in = cabs(tx_samples[i]) / CLIP16;
-				splint(spline_P_X, spline_P_mag, spline_P_mag2, spline_P_size, mag_in, &aaa);
-				splint(spline_P_X, spline_P_phase, spline_P_phase2, spline_P_size, mag_in, &ppp);
-				tx_samples[i] *= aaa * cexp(I * ppp);
+				frac = mag_in * PS_TABLE_SIZE;
+				if (frac < PS_TABLE_SIZE) {
+					k = (int)frac;
+					frac -= k;
+				}
+				else {
+					k = PS_TABLE_SIZE;
+					frac = 0.0;
+				}
+				tx_samples[i] *= table->gain[k] + frac * (table->gain[k + 1] - table->gain[k]);
+				aaa = table->mag[k] + frac * (table->mag[k + 1] - table->mag[k]);
 				new_mag = mag_in * aaa;
 				if (new_mag > 1.0) {
 					tx_samples[i] /= new_mag;
@@ -1887,131 +2144,23 @@ void PreDistort(complex double * amp_in_samples, complex double * amp_out_sample
 			clip_tx = 0.0;
 		}
 #endif
-		for (bin = 1; bin < NUM_BINS - 1; bin++) {
-			if (Bins[bin].XP_count > 0) {	// This bin has data.
-				Bins[bin].XP_gain_mag = cabs(Bins[bin].XP_gain);
-				phase = carg(Bins[bin].XP_gain) - starting_phase;
-				if (phase < - M_PI)
-					phase += 2 * M_PI;
-				else if (phase > M_PI)
-					phase -= 2 * M_PI;
-				Bins[bin].XP_gain_phase = phase;
-			}
-			else {
-				Bins[bin].XP_gain_mag = 1.0;
-				Bins[bin].XP_gain_phase = 0.0;
-			}
-		}
-		Bins[0].XP_count = 1;
-		Bins[0].XP_mag = 0.0;
-		i = 1;
-		for (bin = 1; bin < 6; bin++) {
-			if (Bins[bin].XP_count) {
-				quadX[i] = Bins[bin].XP_mag;
-				quadY[i] = Bins[bin].XP_gain_mag;
-				quadZ[i] = Bins[bin].XP_gain_phase;
-				if (i == 3)
-					break;
-				i++;
-			}
-		}
-		if (i == 3) {
-			polint(quadX, quadY, 0.0, &Bins[0].XP_gain_mag);
-			polint(quadX, quadZ, 0.0, &Bins[0].XP_gain_phase);
-		}
-		else {
-			Bins[0].XP_gain_mag = 1.0;
-			Bins[0].XP_gain_phase = 0.0;
-			Fault = 1;
-			if (DEBUG_PS || PsCal)
-				printf("Failure to find G0 at zero\n");
-		}
-
-		Bins[NUM_BINS - 1].XP_count = 1;
-		Bins[NUM_BINS - 1].XP_mag = 1.0;
-		i = 3;
-		for (bin = NUM_BINS - 2; bin >= NUM_BINS - 6; bin--) {
-			if (Bins[bin].XP_count) {
-				quadX[i] = Bins[bin].XP_mag;
-				quadY[i] = Bins[bin].XP_gain_mag;
-				quadZ[i] = Bins[bin].XP_gain_phase;
-				if (--i == 0)
-					break;
-			}
-		}
-		if (i == 0) {
-			polint(quadX, quadY, 1.0, &Bins[NUM_BINS - 1].XP_gain_mag);
-			polint(quadX, quadZ, 1.0, &Bins[NUM_BINS - 1].XP_gain_phase);
-		}
-		else {
-			Bins[NUM_BINS - 1].XP_gain_mag = 1.0;
-			Bins[NUM_BINS - 1].XP_gain_phase = 0.0;
-			Fault = 1;
-			if (DEBUG_PS || PsCal)
-				printf("Failure to find G0 at one\n");
-		}
-		state++;
+		if (ps_fit_request(Bins, starting_phase, state == 16))	// fit the data on the fit thread; else wait until the fit thread is idle
+			state++;
 		break;
 	case 4:
 	case 17:
-		G0 = Bins[NUM_BINS - 1].XP_gain_mag;
-		num_bin_data = 0;
-		xp0 = -1.0;
-		xpg0 = -1.0;
-		for (bin = 0; bin < NUM_BINS; bin++) {
-			if (bin == NUM_BINS - 1) {
-				num_bin_data++;
-				Bins[NUM_BINS - 1].mag_P = 1.0;
-				Bins[NUM_BINS - 1].phase_P = - Bins[NUM_BINS - 1].XP_gain_phase;
-				Bins[NUM_BINS - 1].mag_X = 1.0;
-			}
-			else if (Bins[bin].XP_count) {
-				num_bin_data++;
-				Bins[bin].mag_P = G0 / Bins[bin].XP_gain_mag;
-				Bins[bin].phase_P = - Bins[bin].XP_gain_phase;
-				Bins[bin].mag_X = Bins[bin].XP_mag / Bins[bin].mag_P;
-				xp = Bins[bin].mag_X * Bins[bin].mag_P;
-				if (xp < xp0) {
-					if (DEBUG_PS || PsCal)
-						printf("xp is not monotonic at bin %d\n", bin);
-					Fault = 1;
-				}
-				xpg = xp * Bins[bin].XP_gain_mag;
-				if (xpg < xpg0) {
-					if (DEBUG_PS || PsCal)
-						printf("xpg is not monotonic at bin %d\n", bin);
-					Fault = 1;
-				}
-				xp0 = xp;
-				xpg0 = xpg;
-			}
-			else {
-				Bins[bin].mag_P = 0.0;
-				Bins[bin].phase_P = 0.0;
-				Bins[bin].mag_X = 0.0;
-			}
-		}
-		if (num_bin_data < NUM_BINS  * 7 / 10) {
-			if (DEBUG_PS || state == 17)
-				printf("Not enough data for corrections %d\n", num_bin_data);
+		if (ps_fit_state != PS_FIT_DONE)	// wait for the fit
+			break;
+		__sync_synchronize();		// read the table after the fit thread has written it
+		ps_fit_state = PS_FIT_IDLE;
+		ps_status.fits++;
+		if (ps_job.Fault)
 			Fault = 1;
+		if (Fault) {
+			ps_status.faults++;
 		}
-		if ( ! Fault) {
-#if DEBUG_PS
-			printf("Create a new predistortion\n");
-#endif
-			spline_P_size = 0;
-			for (bin = 0; bin < NUM_BINS; bin++) {
-				if (Bins[bin].XP_count) {
-					spline_P_size++;
-					spline_P_X[spline_P_size] = Bins[bin].mag_X;
-					spline_P_mag[spline_P_size] = Bins[bin].mag_P;
-					spline_P_phase[spline_P_size] = Bins[bin].phase_P;
-				}
-			}
-
-			spline(spline_P_X, spline_P_mag, spline_P_size, 2E30, 2E30, spline_P_mag2);
-			spline(spline_P_X, spline_P_phase, spline_P_size, 2E30, 2E30, spline_P_phase2);
+		else {
+			ps_active = 1 - ps_active;	// swap in the new table
 		}
 		state++;
 		break;
@@ -2031,7 +2180,7 @@ void PreDistort(complex double * amp_in_samples, complex double * amp_out_sample
 		input_samples = 0;
 		break;
 	case 10:
-		isCalibrated = 0;
+		ps_status.calibrated = 0;
 		input_samples = 0;
 		quisk_set_key_down(1);
 		max_out_mag = 0;
@@ -2095,7 +2244,7 @@ void PreDistort(complex double * amp_in_samples, complex double * amp_out_sample
 		tx_state = NothingHappens;
 		PsCal = 0;
 		if ( ! Fault)
-			isCalibrated = 1;
+			ps_status.calibrated = 1;
 		input_samples = 0;
 		state = 0;
 		break;
@@ -18,6 +18,8 @@ HWND quisk_mainwin_handle;		// Handle of the main window on Windows
 #include <arpa/inet.h>
 #include <netinet/in.h>
 #include <ifaddrs.h>
+#include <pthread.h>
+#include <sched.h>
 #endif
 
 ///static HANDLE CWkey_mutex;
@@ -32,9 +34,13 @@ HWND quisk_mainwin_handle;		// Handle of the main window on Windows
 #include "quisk.h"
 #include "filter.h"
 #include <stdint.h>
+#include <stddef.h>
 
 #ifdef MS_WINDOWS
 CRITICAL_SECTION QuiskCriticalSection;
+static SRWLOCK fftw_plan_lock = SRWLOCK_INIT;
+#else
+static pthread_mutex_t fftw_plan_mutex = PTHREAD_MUTEX_INITIALIZER;
 #endif
 
 #define DEBUG		0
@@ -96,6 +102,31 @@ struct watfall_t {
 	struct watfall_row_t * current_row;
 } ;
 
+// The spectrum history is a ring of rows in a file that Python maps into memory.  The layout must agree with
+// SpectrumHistory in quisk_utils.py.
+#define SPECTRUM_HIST_HEADER	4096	// bytes reserved for struct spectrum_hist_t at the start of the file
+
+struct spectrum_hist_t {	// header at the start of the history file
+	char magic[8];
+	int32_t width;		// number of dB values in each row
+	int32_t max_rows;	// number of rows in the ring
+	int32_t row_bytes;	// size of each row including struct spectrum_row_t
+	int32_t reserved;
+	int64_t total_rows;	// number of rows written; the newest row is (total_rows - 1) % max_rows
+	double db_min;		// the dB value is db_min + value * db_step
+	double db_step;
+} ;
+
+struct spectrum_row_t {
+	double time;		// time of the row in seconds since the epoch
+	int64_t vfo;		// VFO frequency in Hertz
+	int32_t span;		// frequency span of the row in Hertz
+	int32_t center;		// frequency of the center of the row relative to the VFO
+	int32_t reserved;
+	int32_t width;		// number of values in the row
+	uint8_t data[8];	// extend to size
+} ;
+
 static fft_data fft_data_array[FFT_ARRAY_SIZE];		// Data for several FFTs
 static int fft_data_index = 0;						// Write the current samples to this FFT
 static fftw_plan quisk_fft_plan;
@@ -131,6 +162,7 @@ int quisk_isFDX;			// Are we in full duplex mode?
 static int filter_bandwidth[MAX_RX_FILTERS];		// Current filter bandwidth in Hertz
 static int filter_start_offset; 	// Current filter +/- start offset frequency from rx_tune_freq in Hertz for filter zero
 static int quisk_decim_srate;				// Sample rate after decimation
+static int quisk_float_pipeline;			// Use single precision for the high rate decimation filters
 static int quisk_filter_srate=48000;		// Frequency for filters
 static int split_rxtx;						// Are we in split rx/tx mode?
 static int kill_audio;					// Replace radio sound with silence
@@ -212,8 +244,7 @@ play_state_t quisk_play_state;
 
 static int is_little_endian;		// Test byte order; is it little-endian?
 unsigned char quisk_pc_to_hermes[17 * 4];			// data to send from PC to Hermes hardware
-unsigned char quisk_hermeslite_writequeue[5]; // One-time writes to Hermes-Lite
-unsigned int quisk_hermeslite_writepointer = 0;
+static unsigned char quisk_hermeslite_writequeue[5]; // One-time writes to Hermes-Lite from pc_to_hermeslite_writequeue()
 static unsigned char quisk_hermes_to_pc[5 * 4];		// data received from the Hermes hardware
 static unsigned char quisk_hermeslite_response[5]; // response from Hermes-Lite commands
 unsigned int quisk_hermes_code_version = -1;		// code version returned by the Hermes hardware
@@ -231,6 +262,32 @@ static int hpsdr_AIN4_count;	// number of current samples
 static int hpsdr_AIN5_count;	// number of current samples
 static int hardware_ptt;		// hardware PTT switch
 
+// Hermes-Lite2 command queue.  Python adds commands and the sound thread sends them in the C0 to C4 slots
+// of the Tx frames.  A command with the ACK bit 0x40 in C0 must receive its response before the next command is sent.
+// Commands without the ACK bit are sent immediately, two per frame if possible.
+#define HL2_CMD_QUEUE_SIZE		256		// must be a power of two
+#define HL2_ACK_SPACING			0.020	// minimum time between ACK requests in seconds
+#define HL2_ACK_TIMEOUT			0.500	// time to wait for an ACK in seconds
+struct hl2_cmd_t {
+	unsigned char cc[5];	// C0 address, C1, C2, C3, C4
+	unsigned int tag;		// identifies the command in its result
+	double delay;			// seconds to wait after the previous command is finished
+};
+struct hl2_result_t {
+	unsigned int tag;
+	int status;				// 0 for success, 1 for an ACK timeout
+	unsigned char response[5];	// C0 to C4 of the ACK response, or zero
+};
+static struct hl2_cmd_t hl2_cmd_queue[HL2_CMD_QUEUE_SIZE];
+static volatile unsigned int hl2_cmd_write, hl2_cmd_read;		// Python writes, the sound thread reads
+static struct hl2_result_t hl2_result_queue[HL2_CMD_QUEUE_SIZE];
+static volatile unsigned int hl2_result_write, hl2_result_read;	// the sound thread writes, Python reads
+static unsigned int hl2_cmd_tag;			// the last tag returned to Python
+static int hl2_cmd_waiting;					// the first command was sent and is waiting for its ACK
+static double hl2_ack_time;					// time of the last ACK request
+static double hl2_done_time;				// time the last command was finished
+static volatile unsigned int hl2_legacy_tag;	// tag of the command from set_hermeslite_writepointer()
+
 int quisk_hardware_cwkey;		// hardware CW key from UDP or USB
 static int old_hardware_cwkey;		// previous hardware CW key
 int quisk_remote_cwkey;			// remote CW key (sent from control head)
@@ -256,7 +313,7 @@ static int measure_audio_count;
 static int measure_audio_time=1;
 
 // This is used to measure the squelch level
-static struct  _MeasureSquelch {
+struct _MeasureSquelch {
 	int squelch_active;
 	// These are used for FM squelch
 	double rf_sum;
@@ -264,9 +321,128 @@ static struct  _MeasureSquelch {
 	int rf_count;
 	// These are used for SSB squelch
 	double * in_fft;
+	complex double * out_fft;
 	int index;
 	int sq_open;
-} MeasureSquelch[MAX_RX_CHANNELS];
+};
+
+// The receive chain keeps all of its changing state in a struct quisk_rx, so there can be any number of receivers.
+// The receivers in quisk_process_samples() use quisk_rx_bank[bank].  Each QS.Receiver object has its own.
+// Settings such as the filter coefficients and the squelch level are read but not changed.
+struct rx_fir_t {		// Rx FIR filter sample buffers
+	int indexC;					// current index into bufFilterC for rx_dfilter()
+	complex double bufFilterC[MAX_FILTER_SIZE];
+	int indexIQ;				// current index into bufFilterI and bufFilterQ for rx_cfilter()
+	double bufFilterI[MAX_FILTER_SIZE];
+	double bufFilterQ[MAX_FILTER_SIZE];
+};
+
+struct rx_nb_t {		// Noise blanker
+	complex double * cSaved;
+	double * dSaved;
+	double save_sum;
+	int save_size, hwindow_size, state, index, win_index;
+	int sample_rate;
+};
+
+struct rx_notch_t {		// Auto notch; the arrays are allocated with fftw_malloc() so they can use the shared FFT plans
+	int old1, count1, old2, count2;
+	int index;
+	int fltrSig;
+	double * data_in;
+	double * data_out;
+	complex double * notch_fft;
+	double * fltr_in;
+	double * fltr_out;
+	complex double * fltr_fft;
+	double * average_fft;
+};
+
+struct rx_delay_t {		// Delay line for the SSB squelch
+	double * buffer;
+	int index;
+	int buf_size;
+};
+
+struct rx_frac_t {		// Fractional decimation
+	double dindex;
+	complex double c0, c1, c2, c3;
+};
+
+struct rx_decim_t {		// Decimation filters
+	struct quisk_cHB45Filter HalfBand1;
+	struct quisk_cHB45Filter HalfBand2;
+	struct quisk_cHB45Filter HalfBand3;
+	struct quisk_cHB45Filter HalfBand4;
+	struct quisk_cHB45Filter HalfBand5;
+	struct quisk_cFilter filtSdriq111;
+	struct quisk_cFilter filtSdriq53;
+	struct quisk_cFilter filtSdriq133;
+	struct quisk_cFilter filtSdriq167;
+	struct quisk_cFilter filtSdriq185;
+	struct quisk_cFilter filtDecim3;
+	struct quisk_cFilter filtDecim3B;
+	struct quisk_cFilter filtDecim3C;
+	struct quisk_cFilter filtDecim5;
+	struct quisk_cFilter filtDecim5B;
+	struct quisk_cFilter filtDecim5S;
+	struct quisk_cFilter filtDecim48to24;
+	struct quisk_cFilter filtI3D25;
+	struct quisk_cFilter filt300D5;
+	struct quisk_fHB45Filter fHalfBand[5];		// single precision filters for float_pipeline
+	struct quisk_fFilter fDecim3[3];
+	struct quisk_fFilter fDecim5[3];
+};
+
+struct rx_demod_t {		// Demodulation filters
+	complex double fm_1;			// Sample delayed by one
+	double dc_remove;		// DC removal for AM
+	double FM_www;
+	double FM_nnn, FM_a_0, FM_a_1, FM_b_1, FM_x_1, FM_y_1;   // filter for FM
+	//double FM_phase;
+	struct quisk_cHB45Filter HalfBand4;
+	struct quisk_cHB45Filter HalfBand5;
+	struct quisk_dHB45Filter HalfBand6;
+	struct quisk_dHB45Filter HalfBand7;
+	struct quisk_dFilter filtAudio48p3;
+	struct quisk_dFilter filtAudio24p3;
+	struct quisk_dFilter filtAudio24p4;
+	struct quisk_dFilter filtAudio12p2;
+	struct quisk_dFilter filtAudio24p6;
+	struct quisk_dFilter filtAudioFmHp;
+	struct quisk_cFilter filtDecim16to8;
+	struct quisk_cFilter filtDecim48to24;
+	struct quisk_cFilter filtDecim48to16;
+	//struct quisk_dFilter filtFMdiff;
+};
+
+struct quisk_rx {
+	int initialized;		// the filters were initialized and must be freed before they are initialized again
+	int sample_rate;		// input sample rate
+	int decim_srate;		// sample rate after decimation
+	int filter_srate;		// sample rate of the Rx filter
+	int plan_rate;			// sample rate used to plan decim2, decim3 and decim5
+	int decim2, decim3, decim5;
+	int auto_notch;			// use the auto notch
+	int notch_sidetone;		// for CW, the auto notch accepts a signal at this frequency
+	double * filtI;			// Rx filter coefficients
+	double * filtQ;
+	int filter_size;		// number of filter coefficients, or zero for no filter
+	int bandwidth;			// Rx filter bandwidth in Hertz
+	double audio_sum;		// sum of the squared audio samples to measure the audio level
+	int audio_count;
+	complex float * fSamples;	// buffer for float_pipeline
+	struct rx_fir_t fir;
+	struct rx_nb_t nb;
+	struct rx_notch_t notch;
+	struct rx_delay_t delay;
+	struct rx_frac_t frac;
+	struct _MeasureSquelch squelch;
+	struct rx_decim_t decim;
+	struct rx_demod_t demod;
+};
+
+static struct quisk_rx quisk_rx_bank[MAX_RX_CHANNELS];		// the receivers for quisk_process_samples()
 
 // These are used for playback of a WAV file.
 static int wavStart;			// Sound data starts at this offset
@@ -619,16 +795,14 @@ static int fFracDecim(double * dSamples, int nSamples, double fdecim)
 	return nout;
 }
 #endif
-static int cFracDecim(complex double * cSamples, int nSamples, double fdecim)
+static int cFracDecim(struct rx_frac_t * st, complex double * cSamples, int nSamples, double fdecim)
 {
 // Fractional decimation of I/Q signals works poorly because it introduces aliases and birdies.
 	int i, nout;
 	double xm0, xm1, xm2, xm3;
-	static double dindex = 1;
-	static complex double c0=0, c1=0, c2=0, c3=0;
-	static int in=0, out=0;
+	double dindex = st->dindex;
+	complex double c0 = st->c0, c1 = st->c1, c2 = st->c2, c3 = st->c3;
 
-	in += nSamples;
 	nout = 0;
 	for (i = 0; i < nSamples; i++) {
 		c3 = cSamples[i];
@@ -646,7 +820,6 @@ static int cFracDecim(complex double * cSamples, int nSamples, double fdecim)
 					(xm1 * xm2 * xm3 * c0 / -6.0 + xm0 * xm2 * xm3 * c1 / 2.0 +
 					xm0 * xm1 * xm3 * c2 / -2.0 + xm0 * xm1 * xm2 * c3 / 6.0);
 #endif
-			out++;
 			dindex += fdecim - 1;
 			c0 = c1;
 			c1 = c2;
@@ -660,30 +833,58 @@ static int cFracDecim(complex double * cSamples, int nSamples, double fdecim)
 			dindex -= 1;
 		}
 	}
-	//QuiskPrintf ("in %d out %d\n", in, out);
+	st->dindex = dindex;
+	st->c0 = c0;
+	st->c1 = c1;
+	st->c2 = c2;
+	st->c3 = c3;
 	return nout;
 }
 
+// The fftw planner is not thread safe, and plans are made in both the GUI thread and the sound thread.
+// Hold this lock around every fftw_plan_*() and fftw_destroy_plan() call and wisdom access.
+void quisk_fftw_plan_lock(void)
+{
+#ifdef MS_WINDOWS
+	AcquireSRWLockExclusive(&fftw_plan_lock);
+#else
+	pthread_mutex_lock(&fftw_plan_mutex);
+#endif
+}
+
+void quisk_fftw_plan_unlock(void)
+{
+#ifdef MS_WINDOWS
+	ReleaseSRWLockExclusive(&fftw_plan_lock);
+#else
+	pthread_mutex_unlock(&fftw_plan_mutex);
+#endif
+}
+
 // Create an fftw plan; attempt to use loaded wisdom cache or update existing cache.
 static fftw_plan quisk_create_or_cache_fftw_plan_dft_1d(int fft_size, fftw_complex *in, fftw_complex *out, int sign, unsigned flags)
 {
-	fftw_plan plan = fftw_plan_dft_1d(fft_size, in, out, sign, flags | FFTW_WISDOM_ONLY);
+	fftw_plan plan;
+
+	quisk_fftw_plan_lock();
+	plan = fftw_plan_dft_1d(fft_size, in, out, sign, flags | FFTW_WISDOM_ONLY);
 	if(!plan) {
 		// Nothing in the wisdom file for this config; create and save new wisdom
 		plan = fftw_plan_dft_1d(fft_size, in, out, sign, flags);
 		fftw_export_wisdom_to_filename(fftw_wisdom_name);
 	}
+	quisk_fftw_plan_unlock();
 	return plan;
 }
 
 #define QUISK_NB_HWINDOW_SECS	500.E-6	// half-size of blanking window in seconds
-static void NoiseBlanker(complex double * cSamples, int nSamples)
+static void NoiseBlanker(struct quisk_rx * rx, complex double * cSamples, int nSamples, int level)
 {
-	static complex double * cSaved = NULL;
-	static double  * dSaved = NULL;
-	static double save_sum;
-	static int save_size, hwindow_size, state, index, win_index;
-	static int sample_rate = -1;
+	struct rx_nb_t * nb = &rx->nb;
+	complex double * cSaved;
+	double  * dSaved;
+	double save_sum;
+	int save_size, hwindow_size, state, index, win_index;
 	int i, j, k, is_pulse;
 	double mag, limit;
 	complex double samp;
@@ -692,28 +893,36 @@ static void NoiseBlanker(complex double * cSamples, int nSamples)
 	static int debug_count = 0;
 #endif
 
-	if (quisk_noise_blanker <= 0)
+	if (level <= 0 || rx->sample_rate <= 0)
 		return;
-	if (quisk_sound_state.sample_rate != sample_rate) {	// Initialization
-		sample_rate = quisk_sound_state.sample_rate;
-		state = 0;
-		index = 0;
-		win_index = 0;
-		save_sum = 0.0;
-		hwindow_size = (int)(sample_rate * QUISK_NB_HWINDOW_SECS + 0.5);
-		save_size = hwindow_size * 3;	// number of samples in the average
-		i = save_size * sizeof(double);
-		dSaved = (double *) realloc(dSaved, i);
-		memset (dSaved, 0, i);
-		i = save_size * sizeof(complex double);
-		cSaved = (complex double *)realloc(cSaved, i);
-		memset (cSaved, 0, i);
+	if (rx->sample_rate != nb->sample_rate) {	// Initialization
+		nb->sample_rate = rx->sample_rate;
+		nb->state = 0;
+		nb->index = 0;
+		nb->win_index = 0;
+		nb->save_sum = 0.0;
+		nb->hwindow_size = (int)(nb->sample_rate * QUISK_NB_HWINDOW_SECS + 0.5);
+		nb->save_size = nb->hwindow_size * 3;	// number of samples in the average
+		i = nb->save_size * sizeof(double);
+		nb->dSaved = (double *) realloc(nb->dSaved, i);
+		memset (nb->dSaved, 0, i);
+		i = nb->save_size * sizeof(complex double);
+		nb->cSaved = (complex double *)realloc(nb->cSaved, i);
+		memset (nb->cSaved, 0, i);
 #if DEBUG
 		QuiskPrintf ("Noise blanker: save_size %d  hwindow_size %d\n",
-			save_size, hwindow_size);
+			nb->save_size, nb->hwindow_size);
 #endif
 	}
-	switch(quisk_noise_blanker) {
+	cSaved = nb->cSaved;
+	dSaved = nb->dSaved;
+	save_sum = nb->save_sum;
+	save_size = nb->save_size;
+	hwindow_size = nb->hwindow_size;
+	state = nb->state;
+	index = nb->index;
+	win_index = nb->win_index;
+	switch(level) {
 	case 1:
 	default:
 		limit = 6.0;
@@ -780,6 +989,10 @@ static void NoiseBlanker(complex double * cSamples, int nSamples)
 		if (++index >= save_size)
 			index = 0;
 	}
+	nb->save_sum = save_sum;
+	nb->state = state;
+	nb->index = index;
+	nb->win_index = win_index;
 	return;
 }
 
@@ -791,49 +1004,86 @@ static void NoiseBlanker(complex double * cSamples, int nSamples)
 #define NOTCH_DATA_START_SIZE	(NOTCH_FILTER_SIZE - 1)
 #define NOTCH_DATA_OUTPUT_SIZE	(NOTCH_DATA_SIZE - NOTCH_DATA_START_SIZE)
 #define NOTCH_FFT_SIZE			(NOTCH_DATA_SIZE / 2 + 1)
-static void dAutoNotch(double * dsamples, int nSamples, int sidetone, int rate)
+static fftw_plan notch_planFwd=NULL;		// The FFT plans are shared by all receivers
+static fftw_plan notch_planRev, notch_fltrFwd, notch_fltrRev;
+static double notch_fft_window[NOTCH_DATA_SIZE];
+
+static void dAutoNotchReset(struct rx_notch_t * nt)
+{	// Allocate and initialize the auto notch
+	int i;
+
+	if ( ! nt->data_in) {
+		nt->data_in = (double *)fftw_malloc(NOTCH_DATA_SIZE * sizeof(double));
+		nt->data_out = (double *)fftw_malloc(NOTCH_DATA_SIZE * sizeof(double));
+		nt->notch_fft = (complex double *)fftw_malloc(NOTCH_FFT_SIZE * sizeof(complex double));
+		nt->fltr_in = (double *)fftw_malloc(NOTCH_DATA_SIZE * sizeof(double));
+		nt->fltr_out = (double *)fftw_malloc(NOTCH_FILTER_DESIGN_SIZE * sizeof(double));
+		nt->fltr_fft = (complex double *)fftw_malloc(NOTCH_FFT_SIZE * sizeof(complex double));
+		nt->average_fft = (double *)malloc(NOTCH_FFT_SIZE * sizeof(double));
+	}
+	quisk_fftw_plan_lock();		// the shared plans may be made by the GUI thread (Receiver) or the sound thread
+	if ( ! notch_planFwd) {		// set up FFT plans
+		notch_planFwd = fftw_plan_dft_r2c_1d(NOTCH_DATA_SIZE, nt->data_in, nt->notch_fft, FFTW_MEASURE);
+		notch_planRev = fftw_plan_dft_c2r_1d(NOTCH_DATA_SIZE, nt->notch_fft, nt->data_out, FFTW_MEASURE);		// destroys notch_fft
+		notch_fltrFwd = fftw_plan_dft_r2c_1d(NOTCH_DATA_SIZE, nt->fltr_in, nt->fltr_fft, FFTW_MEASURE);
+		notch_fltrRev = fftw_plan_dft_c2r_1d(NOTCH_FILTER_DESIGN_SIZE, nt->fltr_fft, nt->fltr_out, FFTW_MEASURE);
+		for (i = 0; i < NOTCH_FILTER_SIZE; i++)
+			notch_fft_window[i] = 0.50 - 0.50 * cos(2. * M_PI * i / (NOTCH_FILTER_SIZE));	// Hanning
+			//notch_fft_window[i] = 0.54 - 0.46 * cos(2. * M_PI * i / (NOTCH_FILTER_SIZE));	// Hamming
+	}
+	quisk_fftw_plan_unlock();
+	nt->index = NOTCH_DATA_START_SIZE;
+	nt->fltrSig = -1;
+	nt->old1 = nt->old2 = 0;
+	nt->count1 = nt->count2 = -4;
+	memset(nt->data_out, 0, sizeof(double) * NOTCH_DATA_SIZE);
+	memset(nt->data_in, 0, sizeof(double) * NOTCH_DATA_SIZE);
+	memset(nt->average_fft, 0, sizeof(double) * NOTCH_FFT_SIZE);
+}
+
+static void dAutoNotchFree(struct rx_notch_t * nt)
+{
+	if ( ! nt->data_in)
+		return;
+	fftw_free(nt->data_in);
+	fftw_free(nt->data_out);
+	fftw_free(nt->notch_fft);
+	fftw_free(nt->fltr_in);
+	fftw_free(nt->fltr_out);
+	fftw_free(nt->fltr_fft);
+	free(nt->average_fft);
+	nt->data_in = NULL;
+}
+
+static void dAutoNotch(struct rx_notch_t * nt, double * dsamples, int nSamples, int sidetone, int rate)
 {
 	int i, j, k, i1, i2, inp, signal, delta_sig, delta_i1, half_width;
 	double d, d1, d2, avg;
-	static int old1, count1, old2, count2;
-	static int index;
-	static fftw_plan planFwd=NULL;
-	static fftw_plan planRev,fltrFwd, fltrRev;
-	static double data_in[NOTCH_DATA_SIZE];
-	static double data_out[NOTCH_DATA_SIZE];
-	static complex double notch_fft[NOTCH_FFT_SIZE];
-	static double fft_window[NOTCH_DATA_SIZE];
-	static double fltr_in[NOTCH_DATA_SIZE];
-	static double fltr_out[NOTCH_FILTER_DESIGN_SIZE];
-	static complex double fltr_fft[NOTCH_FFT_SIZE];
-	static double average_fft[NOTCH_FFT_SIZE];
-	static int fltrSig;
+	int old1, count1, old2, count2;
+	int index;
+	double * data_in, * data_out, * fltr_in, * fltr_out, * average_fft;
+	complex double * notch_fft, * fltr_fft;
+	int fltrSig;
 #if NOTCH_DEBUG
 	static char * txt;
 	double dmax;
 #endif
 
-	if ( ! planFwd) {		// set up FFT plans
-		planFwd = fftw_plan_dft_r2c_1d(NOTCH_DATA_SIZE, data_in, notch_fft, FFTW_MEASURE);
-		planRev = fftw_plan_dft_c2r_1d(NOTCH_DATA_SIZE, notch_fft, data_out, FFTW_MEASURE);		// destroys notch_fft
-		fltrFwd = fftw_plan_dft_r2c_1d(NOTCH_DATA_SIZE, fltr_in, fltr_fft, FFTW_MEASURE);
-		fltrRev = fftw_plan_dft_c2r_1d(NOTCH_FILTER_DESIGN_SIZE, fltr_fft, fltr_out, FFTW_MEASURE);
-		for (i = 0; i < NOTCH_FILTER_SIZE; i++)
-			fft_window[i] = 0.50 - 0.50 * cos(2. * M_PI * i / (NOTCH_FILTER_SIZE));	// Hanning
-			//fft_window[i] = 0.54 - 0.46 * cos(2. * M_PI * i / (NOTCH_FILTER_SIZE));	// Hamming
-	}
-	if ( ! dsamples) {		// initialize
-		index = NOTCH_DATA_START_SIZE;
-		fltrSig = -1;
-		old1 = old2 = 0;
-		count1 = count2 = -4;
-		memset(data_out, 0, sizeof(double) * NOTCH_DATA_SIZE);
-		memset(data_in, 0, sizeof(double) * NOTCH_DATA_SIZE);
-		memset(average_fft, 0, sizeof(double) * NOTCH_FFT_SIZE);
-		return;
-	}
-	if ( ! quisk_auto_notch)
-		return;
+	if ( ! nt->data_in)
+		dAutoNotchReset(nt);
+	old1 = nt->old1;
+	count1 = nt->count1;
+	old2 = nt->old2;
+	count2 = nt->count2;
+	index = nt->index;
+	fltrSig = nt->fltrSig;
+	data_in = nt->data_in;
+	data_out = nt->data_out;
+	notch_fft = nt->notch_fft;
+	fltr_in = nt->fltr_in;
+	fltr_out = nt->fltr_out;
+	fltr_fft = nt->fltr_fft;
+	average_fft = nt->average_fft;
 	// index into FFT data = frequency * 2 * NOTCH_FFT_SIZE / rate
 	// index into filter design = frequency * 2 * NOTCH_FILTER_FFT_SIZE / rate
 	for (inp = 0; inp < nSamples; inp++) {
@@ -841,7 +1091,7 @@ static void dAutoNotch(double * dsamples, int nSamples, int sidetone, int rate)
 		dsamples[inp] = data_out[index];
 		if (++index >= NOTCH_DATA_SIZE) {	// we have a full FFT of samples
 			index = NOTCH_DATA_START_SIZE;
-			fftw_execute(planFwd);		// Calculate forward FFT
+			fftw_execute_dft_r2c(notch_planFwd, data_in, notch_fft);		// Calculate forward FFT
 			// Find maximum FFT bins
 			delta_sig = (300 * 2 * NOTCH_FFT_SIZE + rate / 2) / rate;	// small frequency interval
 			delta_i1 = (400 * 2 * NOTCH_FFT_SIZE + rate / 2) / rate;	// small frequency interval
@@ -937,28 +1187,34 @@ static void dAutoNotch(double * dsamples, int nSamples, int sidetone, int rate)
 							fltr_fft[j] = 0.0;
 					}
 				}
-				fftw_execute(fltrRev);
+				fftw_execute_dft_c2r(notch_fltrRev, fltr_fft, fltr_out);
 				// center the coefficient zero, make the filter symetric, reduce the size by one
 				memmove(fltr_out + NOTCH_FILTER_DESIGN_SIZE / 2 - 1, fltr_out, sizeof(double) * (NOTCH_FILTER_SIZE / 2 - 1));
 				for (i = NOTCH_FILTER_DESIGN_SIZE / 2 - 2, j = NOTCH_FILTER_DESIGN_SIZE / 2; i >= 0; i--, j++)
 					fltr_out[i] = fltr_out[j];
 				for (i = 0; i < NOTCH_FILTER_SIZE; i++)
-					fltr_in[i] = fltr_out[i] * fft_window[i] / NOTCH_FILTER_DESIGN_SIZE;
+					fltr_in[i] = fltr_out[i] * notch_fft_window[i] / NOTCH_FILTER_DESIGN_SIZE;
 				for (i = NOTCH_FILTER_SIZE; i < NOTCH_DATA_SIZE; i++)
 					fltr_in[i] = 0.0;
-				fftw_execute(fltrFwd);		// The filter is fltr_fft[]
+				fftw_execute_dft_r2c(notch_fltrFwd, fltr_in, fltr_fft);		// The filter is fltr_fft[]
 			}
 #if NOTCH_DEBUG
 			QuiskPrintf("Max %12.0lf  frequency index1 %3d %5d %12.0lf  index2 %3d %5d %12.0lf  avg %12.0lf  %s\n", dmax, count1, i1, d1, count2, i2, d2, avg, txt);
 #endif
 			for (i = 0; i < NOTCH_FFT_SIZE; i++)	// Apply the filter
 				notch_fft[i] *= fltr_fft[i];
-			fftw_execute(planRev);		// Calculate inverse FFT
+			fftw_execute_dft_c2r(notch_planRev, notch_fft, data_out);		// Calculate inverse FFT
 			memmove(data_in, data_in + NOTCH_DATA_OUTPUT_SIZE, NOTCH_DATA_START_SIZE * sizeof(double));
 			for (i = NOTCH_DATA_START_SIZE; i < NOTCH_DATA_SIZE; i++)
 				data_out[i] /= NOTCH_DATA_SIZE / 20;	// Empirical
 		}
 	}
+	nt->old1 = old1;
+	nt->count1 = count1;
+	nt->old2 = old2;
+	nt->count2 = count2;
+	nt->index = index;
+	nt->fltrSig = fltrSig;
 	return;
 }
 
@@ -987,7 +1243,9 @@ void quisk_calc_audio_graph(double scale, complex double * csamples, double * ds
 		fft_window = (double *)malloc(audio_fft_size * sizeof(double));
 		audio_average_fft = (double *)malloc(audio_fft_size * sizeof(double));
 		audio_fft = (complex double *)malloc(audio_fft_size * sizeof(complex double));
+		quisk_fftw_plan_lock();
 		plan = fftw_plan_dft_1d(audio_fft_size, audio_fft, audio_fft, FFTW_FORWARD, FFTW_MEASURE);
+		quisk_fftw_plan_unlock();
 		for (i = 0; i < audio_fft_size; i++) {
 			audio_average_fft[i] = 0;
 			fft_window[i] = 0.50 - 0.50 * cos(2. * M_PI * i / audio_fft_size);	// Hanning window loss 50%
@@ -1029,18 +1287,40 @@ void quisk_calc_audio_graph(double scale, complex double * csamples, double * ds
 }
 
 static PyObject * get_audio_graph(PyObject * self, PyObject * args)
-{
-	int i;
+{	// Return a tuple of the audio FFT in dB, or None if it is not ready.  If a writable buffer is given, write
+	// the dB values into it as doubles and return the number of values.
+	int i, n;
 	double d2;
-	PyObject * tuple2;
+	double * out;
+	PyObject * tuple2, * obj=NULL;
+	Py_buffer view;
 
-	if (!PyArg_ParseTuple (args, ""))
+	if (!PyArg_ParseTuple (args, "|O", &obj))
 		return NULL;
 
 	if ( ! audio_fft_ready) {		// a new graph is not yet available
 		Py_INCREF (Py_None);
 		return Py_None;
 	}
+	if (obj) {
+		if (PyObject_GetBuffer(obj, &view, PyBUF_WRITABLE) != 0)
+			return NULL;
+		n = view.len / sizeof(double);
+		if (n > data_width)
+			n = data_width;
+		out = (double *)view.buf;
+		for (i = 0; i < data_width; i++) {
+			d2 = audio_average_fft[i];
+			if (d2 < 1E-10)
+				d2 = 1E-10;
+			if (i < n)
+				out[i] = 20.0 * log10(d2);
+			audio_average_fft[i] = 0;
+		}
+		PyBuffer_Release(&view);
+		audio_fft_ready = 0;
+		return PyInt_FromLong(n);
+	}
 	tuple2 = PyTuple_New(data_width);
 	for (i = 0; i < data_width; i++) {
 		d2 = audio_average_fft[i];
@@ -1054,43 +1334,34 @@ static PyObject * get_audio_graph(PyObject * self, PyObject * args)
 	return tuple2;
 }
 
-static void d_delay(double * dsamples, int nSamples, int bank, int samp_delay)
+static void d_delay(double * dsamples, int nSamples, struct rx_delay_t * delay, int samp_delay)
 { // delay line (FIFO) to delay dsamples by samp_delay samples
 	int i;
 	double sample;
-	static struct {
-		double * buffer;
-		int index;
-		int buf_size;
-	} delay[MAX_RX_CHANNELS] = {{NULL, 0, 0}};
-
-	if ( ! delay[0].buffer)
-		for (i = 1; i < MAX_RX_CHANNELS; i++)
-			delay[i].buffer = NULL;
-	if ( ! delay[bank].buffer) {
-		delay[bank].buffer = (double *)malloc(samp_delay * sizeof(double));
-		delay[bank].index = 0;
-		delay[bank].buf_size = samp_delay;
+
+	if ( ! delay->buffer) {
+		delay->buffer = (double *)malloc(samp_delay * sizeof(double));
+		delay->index = 0;
+		delay->buf_size = samp_delay;
 		for (i = 0; i < samp_delay; i++)
-			delay[bank].buffer[i] = 0;
+			delay->buffer[i] = 0;
 	}
 	for (i = 0; i < nSamples; i++) {
-		sample = delay[bank].buffer[delay[bank].index];
-		delay[bank].buffer[delay[bank].index] = dsamples[i];
+		sample = delay->buffer[delay->index];
+		delay->buffer[delay->index] = dsamples[i];
 		dsamples[i] = sample;
-		if (++delay[bank].index >= delay[bank].buf_size)
-			delay[bank].index = 0;
+		if (++delay->index >= delay->buf_size)
+			delay->index = 0;
 	}
 }
 
-static void ssb_squelch(double * dsamples, int nSamples, int samp_rate, struct _MeasureSquelch * MS)
+static void ssb_squelch(double * dsamples, int nSamples, int samp_rate, int bandwidth, struct _MeasureSquelch * MS)
 {
 	int i, bw, bw1, bw2, inp;
 	double d, arith_avg, geom_avg, ratio;
-	complex double c;
-	static fftw_plan plan = NULL;
+	complex double c, * out_fft;
+	static fftw_plan plan = NULL;		// The plan and window are shared by all receivers
 	static double * fft_window;
-	static complex double * out_fft;
 #ifdef QUISK_PRINT_LEVELS
 	static int timer = 0;
 	timer += nSamples;
@@ -1098,16 +1369,21 @@ static void ssb_squelch(double * dsamples, int nSamples, int samp_rate, struct _
 
 	if ( ! MS->in_fft) {
 		MS->in_fft = (double *)fftw_malloc(SQUELCH_FFT_SIZE * sizeof(double));
+		// out_fft[0] is DC, then positive frequencies, then out_fft[N/2] is Nyquist.
+		MS->out_fft = (complex double *)fftw_malloc((SQUELCH_FFT_SIZE / 2 + 1) * sizeof(complex double));
 		MS->index = 0;
 		MS->sq_open = 0;
 	}
+	out_fft = MS->out_fft;
 	if ( ! plan) {		// malloc new space and initialize
-		fft_window = (double *)malloc(SQUELCH_FFT_SIZE * sizeof(double));
-		out_fft = (complex double *)fftw_malloc((SQUELCH_FFT_SIZE / 2 + 1) * sizeof(complex double));
-		// out_fft[0] is DC, then positive frequencies, then out_fft[N/2] is Nyquist.
-		plan = fftw_plan_dft_r2c_1d(SQUELCH_FFT_SIZE, MS->in_fft, out_fft, FFTW_MEASURE);
-		for (i = 0; i < SQUELCH_FFT_SIZE; i++)
-			fft_window[i] = 0.50 - 0.50 * cos(2. * M_PI * i / SQUELCH_FFT_SIZE);	// Hanning window
+		quisk_fftw_plan_lock();		// the shared plan may be made by the GUI thread (Receiver) or the sound thread
+		if ( ! plan) {
+			fft_window = (double *)malloc(SQUELCH_FFT_SIZE * sizeof(double));
+			for (i = 0; i < SQUELCH_FFT_SIZE; i++)
+				fft_window[i] = 0.50 - 0.50 * cos(2. * M_PI * i / SQUELCH_FFT_SIZE);	// Hanning window
+			plan = fftw_plan_dft_r2c_1d(SQUELCH_FFT_SIZE, MS->in_fft, out_fft, FFTW_MEASURE);
+		}
+		quisk_fftw_plan_unlock();
 		return;
 	}
 	for (inp = 0; inp < nSamples; inp++) {
@@ -1117,7 +1393,7 @@ static void ssb_squelch(double * dsamples, int nSamples, int samp_rate, struct _
 			for (i = 0; i < SQUELCH_FFT_SIZE; i++)
 				MS->in_fft[i] *= fft_window[i];	// multiply by window
 			fftw_execute_dft_r2c(plan, MS->in_fft, out_fft);	// Calculate forward FFT
-			bw = filter_bandwidth[0];	// Calculate the FFT bins within the filter bandwidth
+			bw = bandwidth;		// Calculate the FFT bins within the filter bandwidth
 			if (bw > 3000)
 				bw = 3000;
 			bw1 = 300 * SQUELCH_FFT_SIZE / samp_rate;		// start 300 Hz
@@ -1179,82 +1455,68 @@ static void ssb_squelch(double * dsamples, int nSamples, int samp_rate, struct _
 	MS->squelch_active = MS->sq_open == 0;
 }
 
-static complex double dRxFilterOut(complex double sample, int bank, int nFilter)
-{	// Rx FIR filter; bank is the static storage index, and must be different for different data streams.
-	// Multiple filters are at nFilter.
+static complex double dRxFilterOut(struct quisk_rx * rx, complex double sample)
+{	// Rx FIR filter with real coefficients rx->filtI.
 	complex double cx;
 	int j, k;
-	static int init = 0;
-	static struct stStorage {
-		int indexFilter;						// current index into sample buffer
-		complex double bufFilterC[MAX_FILTER_SIZE];	// Digital filter sample buffer
-	} Storage[MAX_RX_CHANNELS];
-	struct stStorage * ptBuf = Storage + bank;
+	struct rx_fir_t * ptBuf = &rx->fir;
 	double * filtI;
 
-	if ( ! init) {
-		init = 1;
-		for (j = 0; j < MAX_RX_CHANNELS; j++)
-			memset(Storage + j, 0, sizeof(struct stStorage));
-	}
-
-	if ( ! sizeFilter)
+	if ( ! rx->filter_size)
 		return sample;
-	if (ptBuf->indexFilter >= sizeFilter)
-		ptBuf->indexFilter = 0;
-	ptBuf->bufFilterC[ptBuf->indexFilter] = sample;
+	if (ptBuf->indexC >= rx->filter_size)
+		ptBuf->indexC = 0;
+	ptBuf->bufFilterC[ptBuf->indexC] = sample;
 	cx = 0;
-	filtI = cFilterI[nFilter];
-	j = ptBuf->indexFilter;
-	for (k = 0; k < sizeFilter; k++) {
+	filtI = rx->filtI;
+	j = ptBuf->indexC;
+	for (k = 0; k < rx->filter_size; k++) {
 		cx += ptBuf->bufFilterC[j] * filtI[k];
-		if (++j >= sizeFilter)
+		if (++j >= rx->filter_size)
 			j = 0;
 	}
-	ptBuf->indexFilter++;
+	ptBuf->indexC++;
 	return cx;
 }
 
-complex double cRxFilterOut(complex double sample, int bank, int nFilter)
-{	// Rx FIR filter; bank is the static storage index, and must be different for different data streams.
-	// Multiple filters are at nFilter.
+static complex double cRxFilterOutRx(struct quisk_rx * rx, complex double sample)
+{	// Rx FIR filter with coefficients rx->filtI for I and rx->filtQ for Q.
 	double accI, accQ;
 	double * filtI, * filtQ;
 	int j, k;
-	static int init = 0;
-	static struct stStorage {
-		int indexFilter;						// current index into sample buffer
-		double bufFilterI[MAX_FILTER_SIZE];		// Digital filter sample buffer
-		double bufFilterQ[MAX_FILTER_SIZE];		// Digital filter sample buffer
-	} Storage[MAX_RX_CHANNELS];
-	struct stStorage * ptBuf = Storage + bank;
-
-	if ( ! init) {
-		init = 1;
-		for (j = 0; j < MAX_RX_CHANNELS; j++)
-			memset(Storage + j, 0, sizeof(struct stStorage));
-	}
+	struct rx_fir_t * ptBuf = &rx->fir;
 
-	if ( ! sizeFilter)
+	if ( ! rx->filter_size)
 		return sample;
-	if (ptBuf->indexFilter >= sizeFilter)
-		ptBuf->indexFilter = 0;
-	ptBuf->bufFilterI[ptBuf->indexFilter] = creal(sample);
-	ptBuf->bufFilterQ[ptBuf->indexFilter] = cimag(sample);
-	filtI = cFilterI[nFilter];
-	filtQ = cFilterQ[nFilter];
+	if (ptBuf->indexIQ >= rx->filter_size)
+		ptBuf->indexIQ = 0;
+	ptBuf->bufFilterI[ptBuf->indexIQ] = creal(sample);
+	ptBuf->bufFilterQ[ptBuf->indexIQ] = cimag(sample);
+	filtI = rx->filtI;
+	filtQ = rx->filtQ;
 	accI = accQ = 0;
-	j = ptBuf->indexFilter;
-	for (k = 0; k < sizeFilter; k++) {
+	j = ptBuf->indexIQ;
+	for (k = 0; k < rx->filter_size; k++) {
 		accI += ptBuf->bufFilterI[j] * filtI[k];
 		accQ += ptBuf->bufFilterQ[j] * filtQ[k];
-		if (++j >= sizeFilter)
+		if (++j >= rx->filter_size)
 			j = 0;
 	}
-	ptBuf->indexFilter++;
+	ptBuf->indexIQ++;
 	return accI + I * accQ;
 }
 
+complex double cRxFilterOut(complex double sample, int bank, int nFilter)
+{	// Rx FIR filter; bank is the receiver in quisk_rx_bank, and must be different for different data streams.
+	// Multiple filters are at nFilter.
+	struct quisk_rx * rx = quisk_rx_bank + bank;
+
+	rx->filtI = cFilterI[nFilter];
+	rx->filtQ = cFilterQ[nFilter];
+	rx->filter_size = sizeFilter;
+	return cRxFilterOutRx(rx, sample);
+}
+
 static void AddTestTone(complex double * cSamples, int nSamples)
 {
 	int i;
@@ -1630,16 +1892,16 @@ void quisk_file_microphone(complex double * cSamples, int nSamples)
 	}
 }
 
-int PlanDecimation(int * pt2, int * pt3, int * pt5)	// search for a suitable decimation scheme
+int PlanDecimation(int rate, int * pt2, int * pt3, int * pt5)	// search for a suitable decimation scheme
 {
 	int i, best, try, i2, i3, i5, decim2, decim3, decim5;
 
-	best = quisk_sound_state.sample_rate;
+	best = rate;
 	decim2 = decim3 = decim5 = 0;
 	for (i2 = 0; i2 <= 6; i2++) {		// limit to number of /2 filters, currently 6
 		for (i3 = 0; i3 <= 3; i3++) {		// limit to number of /3 filters, currently 3
 			for (i5 = 0; i5 <= 3; i5++) {		// limit to number of /5 filters, currently 3
-				try = quisk_sound_state.sample_rate;
+				try = rate;
 				for (i = 0; i < i2; i++)
 					try /= 2;
 				for (i = 0; i < i3; i++)
@@ -1659,7 +1921,7 @@ int PlanDecimation(int * pt2, int * pt3, int * pt5)	// search for a suitable dec
 		best = best * 24 / 25;
 	if (DEBUG)
 		QuiskPrintf ("Plan Decimation: rate %i, best %i, decim2 %i, decim3 %i, decim5 %i\n",
-			quisk_sound_state.sample_rate, best, decim2, decim3, decim5);
+			rate, best, decim2, decim3, decim5);
 	if (best > 72000)
 		QuiskPrintf("Failure to plan a suitable decimation in quisk_process_decimate\n");
 	if (pt2) {	// return decimations
@@ -1670,492 +1932,588 @@ int PlanDecimation(int * pt2, int * pt3, int * pt5)	// search for a suitable dec
 	return best;
 }
 
-static int quisk_process_decimate(complex double * cSamples, int nSamples, int bank, rx_mode_type rx_mode)
-{	// Changes here will require changes to get_filter_rate();
+static void rx_decimate_init(struct rx_decim_t * st)
+{	// Initialize the decimation filters
+	int i3;
+
+	memset(&st->HalfBand1, 0, sizeof(struct quisk_cHB45Filter));
+	memset(&st->HalfBand2, 0, sizeof(struct quisk_cHB45Filter));
+	memset(&st->HalfBand3, 0, sizeof(struct quisk_cHB45Filter));
+	memset(&st->HalfBand4, 0, sizeof(struct quisk_cHB45Filter));
+	memset(&st->HalfBand5, 0, sizeof(struct quisk_cHB45Filter));
+	quisk_filt_cInit(&st->filtSdriq111, quiskFilt111D2Coefs, sizeof(quiskFilt111D2Coefs)/sizeof(double));
+	quisk_filt_cInit(&st->filtSdriq53, quiskFilt53D1Coefs, sizeof(quiskFilt53D1Coefs)/sizeof(double));
+	quisk_filt_cInit(&st->filtSdriq133, quiskFilt133D2Coefs, sizeof(quiskFilt133D2Coefs)/sizeof(double));
+	quisk_filt_cInit(&st->filtSdriq167, quiskFilt167D3Coefs, sizeof(quiskFilt167D3Coefs)/sizeof(double));
+	quisk_filt_cInit(&st->filtSdriq185, quiskFilt185D3Coefs, sizeof(quiskFilt185D3Coefs)/sizeof(double));
+	quisk_filt_cInit(&st->filtDecim3,  quiskFilt144D3Coefs, sizeof(quiskFilt144D3Coefs)/sizeof(double));
+	quisk_filt_cInit(&st->filtDecim3B, quiskFilt144D3Coefs, sizeof(quiskFilt144D3Coefs)/sizeof(double));
+	quisk_filt_cInit(&st->filtDecim3C, quiskFilt144D3Coefs, sizeof(quiskFilt144D3Coefs)/sizeof(double));
+	quisk_filt_cInit(&st->filtDecim5,  quiskFilt240D5CoefsSharp, sizeof(quiskFilt240D5CoefsSharp)/sizeof(double));
+	quisk_filt_cInit(&st->filtDecim5B, quiskFilt240D5CoefsSharp, sizeof(quiskFilt240D5CoefsSharp)/sizeof(double));
+	quisk_filt_cInit(&st->filtDecim5S, quiskFilt240D5CoefsSharp, sizeof(quiskFilt240D5CoefsSharp)/sizeof(double));
+	quisk_filt_cInit(&st->filtDecim48to24, quiskFilt48dec24Coefs, sizeof(quiskFilt48dec24Coefs)/sizeof(double));
+	quisk_filt_cInit(&st->filtI3D25, quiskFiltI3D25Coefs, sizeof(quiskFiltI3D25Coefs)/sizeof(double));
+	quisk_filt_cInit(&st->filt300D5, quiskFilt300D5Coefs, sizeof(quiskFilt300D5Coefs)/sizeof(double));
+	memset(st->fHalfBand, 0, sizeof(st->fHalfBand));
+	for (i3 = 0; i3 < 3; i3++) {
+		quisk_filt_fInit(st->fDecim3 + i3, quiskFilt144D3Coefs, sizeof(quiskFilt144D3Coefs)/sizeof(double));
+		quisk_filt_fInit(st->fDecim5 + i3, quiskFilt240D5CoefsSharp, sizeof(quiskFilt240D5CoefsSharp)/sizeof(double));
+	}
+}
+
+static void rx_decimate_free(struct rx_decim_t * st)
+{	// Free the memory of the decimation filters
+	int i3;
+
+	free(st->HalfBand1.cBuf);
+	free(st->HalfBand2.cBuf);
+	free(st->HalfBand3.cBuf);
+	free(st->HalfBand4.cBuf);
+	free(st->HalfBand5.cBuf);
+	quisk_filt_cFree(&st->filtSdriq111);
+	quisk_filt_cFree(&st->filtSdriq53);
+	quisk_filt_cFree(&st->filtSdriq133);
+	quisk_filt_cFree(&st->filtSdriq167);
+	quisk_filt_cFree(&st->filtSdriq185);
+	quisk_filt_cFree(&st->filtDecim3);
+	quisk_filt_cFree(&st->filtDecim3B);
+	quisk_filt_cFree(&st->filtDecim3C);
+	quisk_filt_cFree(&st->filtDecim5);
+	quisk_filt_cFree(&st->filtDecim5B);
+	quisk_filt_cFree(&st->filtDecim5S);
+	quisk_filt_cFree(&st->filtDecim48to24);
+	quisk_filt_cFree(&st->filtI3D25);
+	quisk_filt_cFree(&st->filt300D5);
+	for (i3 = 0; i3 < 3; i3++) {
+		quisk_filt_fFree(st->fDecim3 + i3);
+		quisk_filt_fFree(st->fDecim5 + i3);
+	}
+}
+
+static int rx_decimate(struct quisk_rx * rx, complex double * cSamples, int nSamples)
+{	// Decimate from rx->sample_rate to rx->decim_srate.  Changes here will require changes to get_filter_rate();
 	int i, i2, i3, i5;
-	static int decim2, decim3, decim5;
-	static int old_rate = 0;
-	static struct stStorage {
-		struct quisk_cHB45Filter HalfBand1;
-		struct quisk_cHB45Filter HalfBand2;
-		struct quisk_cHB45Filter HalfBand3;
-		struct quisk_cHB45Filter HalfBand4;
-		struct quisk_cHB45Filter HalfBand5;
-		struct quisk_cFilter filtSdriq111;
-		struct quisk_cFilter filtSdriq53;
-		struct quisk_cFilter filtSdriq133;
-		struct quisk_cFilter filtSdriq167;
-		struct quisk_cFilter filtSdriq185;
-		struct quisk_cFilter filtDecim3;
-		struct quisk_cFilter filtDecim3B;
-		struct quisk_cFilter filtDecim3C;
-		struct quisk_cFilter filtDecim5;
-		struct quisk_cFilter filtDecim5B;
-		struct quisk_cFilter filtDecim5S;
-		struct quisk_cFilter filtDecim48to24;
-		struct quisk_cFilter filtI3D25;
-		struct quisk_cFilter filt300D5;
-	} Storage[MAX_RX_CHANNELS] ;
-
-	if ( ! cSamples) {	// Initialize all filters
-		for (i = 0; i < MAX_RX_CHANNELS; i++) {
-			memset(&Storage[i].HalfBand1, 0, sizeof(struct quisk_cHB45Filter));
-			memset(&Storage[i].HalfBand2, 0, sizeof(struct quisk_cHB45Filter));
-			memset(&Storage[i].HalfBand3, 0, sizeof(struct quisk_cHB45Filter));
-			memset(&Storage[i].HalfBand4, 0, sizeof(struct quisk_cHB45Filter));
-			memset(&Storage[i].HalfBand5, 0, sizeof(struct quisk_cHB45Filter));
-			quisk_filt_cInit(&Storage[i].filtSdriq111, quiskFilt111D2Coefs, sizeof(quiskFilt111D2Coefs)/sizeof(double));
-			quisk_filt_cInit(&Storage[i].filtSdriq53, quiskFilt53D1Coefs, sizeof(quiskFilt53D1Coefs)/sizeof(double));
-			quisk_filt_cInit(&Storage[i].filtSdriq133, quiskFilt133D2Coefs, sizeof(quiskFilt133D2Coefs)/sizeof(double));
-			quisk_filt_cInit(&Storage[i].filtSdriq167, quiskFilt167D3Coefs, sizeof(quiskFilt167D3Coefs)/sizeof(double));
-			quisk_filt_cInit(&Storage[i].filtSdriq185, quiskFilt185D3Coefs, sizeof(quiskFilt185D3Coefs)/sizeof(double));
-			quisk_filt_cInit(&Storage[i].filtDecim3,  quiskFilt144D3Coefs, sizeof(quiskFilt144D3Coefs)/sizeof(double));
-			quisk_filt_cInit(&Storage[i].filtDecim3B, quiskFilt144D3Coefs, sizeof(quiskFilt144D3Coefs)/sizeof(double));
-			quisk_filt_cInit(&Storage[i].filtDecim3C, quiskFilt144D3Coefs, sizeof(quiskFilt144D3Coefs)/sizeof(double));
-			quisk_filt_cInit(&Storage[i].filtDecim5,  quiskFilt240D5CoefsSharp, sizeof(quiskFilt240D5CoefsSharp)/sizeof(double));
-			quisk_filt_cInit(&Storage[i].filtDecim5B, quiskFilt240D5CoefsSharp, sizeof(quiskFilt240D5CoefsSharp)/sizeof(double));
-			quisk_filt_cInit(&Storage[i].filtDecim5S, quiskFilt240D5CoefsSharp, sizeof(quiskFilt240D5CoefsSharp)/sizeof(double));
-			quisk_filt_cInit(&Storage[i].filtDecim48to24, quiskFilt48dec24Coefs, sizeof(quiskFilt48dec24Coefs)/sizeof(double));
-			quisk_filt_cInit(&Storage[i].filtI3D25, quiskFiltI3D25Coefs, sizeof(quiskFiltI3D25Coefs)/sizeof(double));
-			quisk_filt_cInit(&Storage[i].filt300D5, quiskFilt300D5Coefs, sizeof(quiskFilt300D5Coefs)/sizeof(double));
-		}
-		return 0;
-	}
-	if (quisk_sound_state.sample_rate != old_rate) {
-		old_rate = quisk_sound_state.sample_rate;
-		PlanDecimation(&decim2, &decim3, &decim5);
+
+	if (rx->sample_rate != rx->plan_rate) {
+		rx->plan_rate = rx->sample_rate;
+		PlanDecimation(rx->sample_rate, &rx->decim2, &rx->decim3, &rx->decim5);
 	}
 	// Decimate: Lower the sample rate to 48000 sps (or approx).  Filters are designed for
 	// a pass bandwidth of 20 kHz and a stop bandwidth of 24 kHz.
 	// We use 48 ksps to accommodate wide digital modes.
-	switch((quisk_sound_state.sample_rate + 100) / 1000) {
+	switch((rx->sample_rate + 100) / 1000) {
 	case 41:
-		quisk_decim_srate = 48000;
+		rx->decim_srate = 48000;
 		break;
 	case 53:	// SDR-IQ
-		quisk_decim_srate = quisk_sound_state.sample_rate;
-		nSamples = quisk_cDecimate(cSamples, nSamples, &Storage[bank].filtSdriq53, 1);
+		rx->decim_srate = rx->sample_rate;
+		nSamples = quisk_cDecimate(cSamples, nSamples, &rx->decim.filtSdriq53, 1);
 		break;
 	case 111:	// SDR-IQ
-		quisk_decim_srate = quisk_sound_state.sample_rate / 2;
-		nSamples = quisk_cDecimate(cSamples, nSamples, &Storage[bank].filtSdriq111, 2);
+		rx->decim_srate = rx->sample_rate / 2;
+		nSamples = quisk_cDecimate(cSamples, nSamples, &rx->decim.filtSdriq111, 2);
 		break;
 	case 133:	// SDR-IQ
-		quisk_decim_srate = quisk_sound_state.sample_rate / 2;
-		nSamples = quisk_cDecimate(cSamples, nSamples, &Storage[bank].filtSdriq133, 2);
+		rx->decim_srate = rx->sample_rate / 2;
+		nSamples = quisk_cDecimate(cSamples, nSamples, &rx->decim.filtSdriq133, 2);
 		break;
 	case 185:	// SDR-IQ
-		quisk_decim_srate = quisk_sound_state.sample_rate / 3;
-		nSamples = quisk_cDecimate(cSamples, nSamples, &Storage[bank].filtSdriq185, 3);
+		rx->decim_srate = rx->sample_rate / 3;
+		nSamples = quisk_cDecimate(cSamples, nSamples, &rx->decim.filtSdriq185, 3);
 		break;
 	case 370:
-		quisk_decim_srate = quisk_sound_state.sample_rate / 6;
-		nSamples = quisk_cDecim2HB45(cSamples, nSamples, &Storage[bank].HalfBand2);
-		nSamples = quisk_cDecimate(cSamples, nSamples, &Storage[bank].filtSdriq185, 3);
+		rx->decim_srate = rx->sample_rate / 6;
+		nSamples = quisk_cDecim2HB45(cSamples, nSamples, &rx->decim.HalfBand2);
+		nSamples = quisk_cDecimate(cSamples, nSamples, &rx->decim.filtSdriq185, 3);
 		break;
 	case 740:
-		quisk_decim_srate = quisk_sound_state.sample_rate / 12;
-		nSamples = quisk_cDecim2HB45(cSamples, nSamples, &Storage[bank].HalfBand2);
-		nSamples = quisk_cDecim2HB45(cSamples, nSamples, &Storage[bank].HalfBand3);
-		nSamples = quisk_cDecimate(cSamples, nSamples, &Storage[bank].filtSdriq185, 3);
+		rx->decim_srate = rx->sample_rate / 12;
+		nSamples = quisk_cDecim2HB45(cSamples, nSamples, &rx->decim.HalfBand2);
+		nSamples = quisk_cDecim2HB45(cSamples, nSamples, &rx->decim.HalfBand3);
+		nSamples = quisk_cDecimate(cSamples, nSamples, &rx->decim.filtSdriq185, 3);
 		break;
 	case 1333:
-		quisk_decim_srate = quisk_sound_state.sample_rate / 24;
-		nSamples = quisk_cDecim2HB45(cSamples, nSamples, &Storage[bank].HalfBand1);
-		nSamples = quisk_cDecim2HB45(cSamples, nSamples, &Storage[bank].HalfBand2);
-		nSamples = quisk_cDecim2HB45(cSamples, nSamples, &Storage[bank].HalfBand3);
-		nSamples = quisk_cDecimate(cSamples, nSamples, &Storage[bank].filtSdriq167, 3);
+		rx->decim_srate = rx->sample_rate / 24;
+		nSamples = quisk_cDecim2HB45(cSamples, nSamples, &rx->decim.HalfBand1);
+		nSamples = quisk_cDecim2HB45(cSamples, nSamples, &rx->decim.HalfBand2);
+		nSamples = quisk_cDecim2HB45(cSamples, nSamples, &rx->decim.HalfBand3);
+		nSamples = quisk_cDecimate(cSamples, nSamples, &rx->decim.filtSdriq167, 3);
 		break;
 	default:
-		quisk_decim_srate = quisk_sound_state.sample_rate;
-		i2 = decim2;	// decimate by 2 except for the final /2 filter
+		rx->decim_srate = rx->sample_rate;
+		i2 = rx->decim2;	// decimate by 2 except for the final /2 filter
+		i3 = rx->decim3;
+		i5 = rx->decim5;
+		if (quisk_float_pipeline && (i2 > 1 || i3 > 0 || i5 > 0)) {
+			// Run the high rate filters in single precision.  Float samples have half the memory traffic.
+			for (i = 0; i < nSamples; i++)
+				rx->fSamples[i] = cSamples[i];
+			for (i = 0; i2 > 1 && i < 5; i++, i2--) {
+				nSamples = quisk_fDecim2HB45(rx->fSamples, nSamples, rx->decim.fHalfBand + i);
+				rx->decim_srate /= 2;
+			}
+			for (i = 0; i3 > 0; i++, i3--) {
+				nSamples = quisk_fDecimate(rx->fSamples, nSamples, rx->decim.fDecim3 + i, 3);
+				rx->decim_srate /= 3;
+			}
+			for (i = 0; i5 > 0; i++, i5--) {
+				nSamples = quisk_fDecimate(rx->fSamples, nSamples, rx->decim.fDecim5 + i, 5);
+				rx->decim_srate /= 5;
+			}
+			for (i = 0; i < nSamples; i++)
+				cSamples[i] = rx->fSamples[i];
+		}
 		if (i2 > 1) {
-			nSamples = quisk_cDecim2HB45(cSamples, nSamples, &Storage[bank].HalfBand1);
-			quisk_decim_srate /= 2;
+			nSamples = quisk_cDecim2HB45(cSamples, nSamples, &rx->decim.HalfBand1);
+			rx->decim_srate /= 2;
 			i2--;
 		}
 		if (i2 > 1) {
-			nSamples = quisk_cDecim2HB45(cSamples, nSamples, &Storage[bank].HalfBand2);
-			quisk_decim_srate /= 2;
+			nSamples = quisk_cDecim2HB45(cSamples, nSamples, &rx->decim.HalfBand2);
+			rx->decim_srate /= 2;
 			i2--;
 		}
 		if (i2 > 1) {
-			nSamples = quisk_cDecim2HB45(cSamples, nSamples, &Storage[bank].HalfBand3);
-			quisk_decim_srate /= 2;
+			nSamples = quisk_cDecim2HB45(cSamples, nSamples, &rx->decim.HalfBand3);
+			rx->decim_srate /= 2;
 			i2--;
 		}
 		if (i2 > 1) {
-			nSamples = quisk_cDecim2HB45(cSamples, nSamples, &Storage[bank].HalfBand4);
-			quisk_decim_srate /= 2;
+			nSamples = quisk_cDecim2HB45(cSamples, nSamples, &rx->decim.HalfBand4);
+			rx->decim_srate /= 2;
 			i2--;
 		}
 		if (i2 > 1) {
-			nSamples = quisk_cDecim2HB45(cSamples, nSamples, &Storage[bank].HalfBand5);
-			quisk_decim_srate /= 2;
+			nSamples = quisk_cDecim2HB45(cSamples, nSamples, &rx->decim.HalfBand5);
+			rx->decim_srate /= 2;
 			i2--;
 		}
-		i3 = decim3;	// decimate by 3
+		// decimate by 3
 		if (i3 > 0) {
-			nSamples = quisk_cDecimate(cSamples, nSamples, &Storage[bank].filtDecim3, 3);
-			quisk_decim_srate /= 3;
+			nSamples = quisk_cDecimate(cSamples, nSamples, &rx->decim.filtDecim3, 3);
+			rx->decim_srate /= 3;
 			i3--;
 		}
 		if (i3 > 0) {
-			nSamples = quisk_cDecimate(cSamples, nSamples, &Storage[bank].filtDecim3B, 3);
-			quisk_decim_srate /= 3;
+			nSamples = quisk_cDecimate(cSamples, nSamples, &rx->decim.filtDecim3B, 3);
+			rx->decim_srate /= 3;
 			i3--;
 		}
 		if (i3 > 0) {
-			nSamples = quisk_cDecimate(cSamples, nSamples, &Storage[bank].filtDecim3C, 3);
-			quisk_decim_srate /= 3;
+			nSamples = quisk_cDecimate(cSamples, nSamples, &rx->decim.filtDecim3C, 3);
+			rx->decim_srate /= 3;
 			i3--;
 		}
-		i5 = decim5;	// decimate by 5
+		// decimate by 5
 		if (i5 > 0) {
-			nSamples = quisk_cDecimate(cSamples, nSamples, &Storage[bank].filtDecim5, 5);
-			quisk_decim_srate /= 5;
+			nSamples = quisk_cDecimate(cSamples, nSamples, &rx->decim.filtDecim5, 5);
+			rx->decim_srate /= 5;
 			i5--;
 		}
 		if (i5 > 0) {
-			nSamples = quisk_cDecimate(cSamples, nSamples, &Storage[bank].filtDecim5B, 5);
-			quisk_decim_srate /= 5;
+			nSamples = quisk_cDecimate(cSamples, nSamples, &rx->decim.filtDecim5B, 5);
+			rx->decim_srate /= 5;
 			i5--;
 		}
 		if (i5 > 0) {
-			nSamples = quisk_cDecimate(cSamples, nSamples, &Storage[bank].filtDecim5S, 5);
-			quisk_decim_srate /= 5;
+			nSamples = quisk_cDecimate(cSamples, nSamples, &rx->decim.filtDecim5S, 5);
+			rx->decim_srate /= 5;
 			i5--;
 		}
 		if (i2 > 0) {	// decimate by 2 last - Unnecessary???
-			nSamples = quisk_cDecimate(cSamples, nSamples, &Storage[bank].filtDecim48to24, 2);
-			quisk_decim_srate /= 2;
+			nSamples = quisk_cDecimate(cSamples, nSamples, &rx->decim.filtDecim48to24, 2);
+			rx->decim_srate /= 2;
 			i2--;
 		}
-		if (quisk_decim_srate >= 50000) {
-			quisk_decim_srate = quisk_decim_srate * 24 / 25;
-			nSamples = quisk_cInterpDecim(cSamples, nSamples, &Storage[bank].filt300D5, 6, 5);	// 60 kSps
-			nSamples = quisk_cInterpDecim(cSamples, nSamples, &Storage[bank].filtDecim5S, 4, 5);	// 48 kSps
+		if (rx->decim_srate >= 50000) {
+			rx->decim_srate = rx->decim_srate * 24 / 25;
+			nSamples = quisk_cInterpDecim(cSamples, nSamples, &rx->decim.filt300D5, 6, 5);	// 60 kSps
+			nSamples = quisk_cInterpDecim(cSamples, nSamples, &rx->decim.filtDecim5S, 4, 5);	// 48 kSps
 		}
 		if (i2 != 0 || i3 != 0 || i5 != 0)
-			QuiskPrintf ("Failure in quisk.c in integer decimation for rate %d\n", quisk_sound_state.sample_rate);
-		if (DEBUG && quisk_decim_srate != 48000)
-			QuiskPrintf("Failure to achieve rate 48000. Rate is %i\n", quisk_decim_srate);
+			QuiskPrintf ("Failure in quisk.c in integer decimation for rate %d\n", rx->sample_rate);
+		if (DEBUG && rx->decim_srate != 48000)
+			QuiskPrintf("Failure to achieve rate 48000. Rate is %i\n", rx->decim_srate);
 		break;
 	}
 	return nSamples;
 }
 
-static int quisk_process_demodulate(complex double * cSamples, double * dsamples, int nSamples, int bank, int nFilter, rx_mode_type rx_mode)
+static void rx_demodulate_init(struct rx_demod_t * st)
+{	// Initialize the demodulation filters
+	memset(&st->HalfBand4, 0, sizeof(struct quisk_cHB45Filter));
+	memset(&st->HalfBand5, 0, sizeof(struct quisk_cHB45Filter));
+	memset(&st->HalfBand6, 0, sizeof(struct quisk_dHB45Filter));
+	memset(&st->HalfBand7, 0, sizeof(struct quisk_dHB45Filter));
+	quisk_filt_dInit(&st->filtAudio48p3, quiskLpFilt48Coefs, sizeof(quiskLpFilt48Coefs)/sizeof(double));
+	quisk_filt_dInit(&st->filtAudio24p3, quiskAudio24p3Coefs, sizeof(quiskAudio24p3Coefs)/sizeof(double));
+	quisk_filt_dInit(&st->filtAudio24p4, quiskAudio24p4Coefs, sizeof(quiskAudio24p4Coefs)/sizeof(double));
+	quisk_filt_dInit(&st->filtAudio12p2, quiskAudio24p4Coefs, sizeof(quiskAudio24p4Coefs)/sizeof(double));
+	quisk_filt_dInit(&st->filtAudio24p6, quiskAudio24p6Coefs, sizeof(quiskAudio24p6Coefs)/sizeof(double));
+	quisk_filt_dInit(&st->filtAudioFmHp, quiskAudioFmHpCoefs, sizeof(quiskAudioFmHpCoefs)/sizeof(double));
+	quisk_filt_cInit(&st->filtDecim16to8, quiskFilt16dec8Coefs, sizeof(quiskFilt16dec8Coefs)/sizeof(double));
+	quisk_filt_cInit(&st->filtDecim48to24, quiskFilt48dec24Coefs, sizeof(quiskFilt48dec24Coefs)/sizeof(double));
+	quisk_filt_cInit(&st->filtDecim48to16, quiskAudio24p3Coefs, sizeof(quiskAudio24p3Coefs)/sizeof(double));
+	//quisk_filt_dInit(&st->filtFMdiff, quiskDiff48Coefs, sizeof(quiskDiff48Coefs)/sizeof(double));
+	//quisk_filt_differInit(&st->filtFMdiff, 9);
+	st->fm_1 = 10;
+	st->dc_remove = 0;
+	st->FM_x_1 = st->FM_y_1 = 0;
+	st->FM_www = tan(M_PI * FM_FILTER_DEMPH / 48000);   // filter for FM at 48 ksps
+	st->FM_nnn = 1.0 / (1.0 + st->FM_www);
+	st->FM_a_0 = st->FM_www * st->FM_nnn;
+	st->FM_a_1 = st->FM_a_0;
+	st->FM_b_1 = st->FM_nnn * (st->FM_www - 1.0);
+	//QuiskPrintf ("dsamples[i] = y_1 = di * %12.6lf + x_1 * %12.6lf - y_1 * %12.6lf\n", FM_a_0, FM_a_1, FM_b_1);
+}
+
+static void rx_demodulate_free(struct rx_demod_t * st)
+{	// Free the memory of the demodulation filters
+	free(st->HalfBand4.cBuf);
+	free(st->HalfBand5.cBuf);
+	free(st->HalfBand6.dBuf);
+	free(st->HalfBand7.dBuf);
+	quisk_filt_dFree(&st->filtAudio48p3);
+	quisk_filt_dFree(&st->filtAudio24p3);
+	quisk_filt_dFree(&st->filtAudio24p4);
+	quisk_filt_dFree(&st->filtAudio12p2);
+	quisk_filt_dFree(&st->filtAudio24p6);
+	quisk_filt_dFree(&st->filtAudioFmHp);
+	quisk_filt_cFree(&st->filtDecim16to8);
+	quisk_filt_cFree(&st->filtDecim48to24);
+	quisk_filt_cFree(&st->filtDecim48to16);
+}
+
+static int rx_demodulate(struct quisk_rx * rx, complex double * cSamples, double * dsamples, int nSamples, rx_mode_type rx_mode)
 {	// Changes here will require changes to get_filter_rate();
 	int i;
 	complex double cx;
 	double d, di, dd;
 //static int count=0;
 //static double phase=0;
-	static struct stStorage {
-		complex double fm_1;			// Sample delayed by one
-		double dc_remove;		// DC removal for AM
-		double FM_www;
-		double FM_nnn, FM_a_0, FM_a_1, FM_b_1, FM_x_1, FM_y_1;   // filter for FM
-		//double FM_phase;
-		struct quisk_cHB45Filter HalfBand4;
-		struct quisk_cHB45Filter HalfBand5;
-		struct quisk_dHB45Filter HalfBand6;
-		struct quisk_dHB45Filter HalfBand7;
-		struct quisk_dFilter filtAudio48p3;
-		struct quisk_dFilter filtAudio24p3;
-		struct quisk_dFilter filtAudio24p4;
-		struct quisk_dFilter filtAudio12p2;
-		struct quisk_dFilter filtAudio24p6;
-		struct quisk_dFilter filtAudioFmHp;
-		struct quisk_cFilter filtDecim16to8;
-		struct quisk_cFilter filtDecim48to24;
-		struct quisk_cFilter filtDecim48to16;
-		//struct quisk_dFilter filtFMdiff;
-	} Storage[MAX_RX_CHANNELS] ;
-
-	if ( ! cSamples) {	// Initialize all filters
-		for (i = 0; i < MAX_RX_CHANNELS; i++) {
-			memset(&Storage[i].HalfBand4, 0, sizeof(struct quisk_cHB45Filter));
-			memset(&Storage[i].HalfBand5, 0, sizeof(struct quisk_cHB45Filter));
-			memset(&Storage[i].HalfBand6, 0, sizeof(struct quisk_dHB45Filter));
-			memset(&Storage[i].HalfBand7, 0, sizeof(struct quisk_dHB45Filter));
-			quisk_filt_dInit(&Storage[i].filtAudio48p3, quiskLpFilt48Coefs, sizeof(quiskLpFilt48Coefs)/sizeof(double));
-			quisk_filt_dInit(&Storage[i].filtAudio24p3, quiskAudio24p3Coefs, sizeof(quiskAudio24p3Coefs)/sizeof(double));
-			quisk_filt_dInit(&Storage[i].filtAudio24p4, quiskAudio24p4Coefs, sizeof(quiskAudio24p4Coefs)/sizeof(double));
-			quisk_filt_dInit(&Storage[i].filtAudio12p2, quiskAudio24p4Coefs, sizeof(quiskAudio24p4Coefs)/sizeof(double));
-			quisk_filt_dInit(&Storage[i].filtAudio24p6, quiskAudio24p6Coefs, sizeof(quiskAudio24p6Coefs)/sizeof(double));
-			quisk_filt_dInit(&Storage[i].filtAudioFmHp, quiskAudioFmHpCoefs, sizeof(quiskAudioFmHpCoefs)/sizeof(double));
-			quisk_filt_cInit(&Storage[i].filtDecim16to8, quiskFilt16dec8Coefs, sizeof(quiskFilt16dec8Coefs)/sizeof(double));
-			quisk_filt_cInit(&Storage[i].filtDecim48to24, quiskFilt48dec24Coefs, sizeof(quiskFilt48dec24Coefs)/sizeof(double));
-			quisk_filt_cInit(&Storage[i].filtDecim48to16, quiskAudio24p3Coefs, sizeof(quiskAudio24p3Coefs)/sizeof(double));
-			//quisk_filt_dInit(&Storage[i].filtFMdiff, quiskDiff48Coefs, sizeof(quiskDiff48Coefs)/sizeof(double));
-			//quisk_filt_differInit(&Storage[i].filtFMdiff, 9);
-			Storage[i].fm_1 = 10;
-			Storage[i].FM_www = tan(M_PI * FM_FILTER_DEMPH / 48000);   // filter for FM at 48 ksps
-			Storage[i].FM_nnn = 1.0 / (1.0 + Storage[i].FM_www);
-			Storage[i].FM_a_0 = Storage[i].FM_www * Storage[i].FM_nnn;
-			Storage[i].FM_a_1 = Storage[i].FM_a_0;
-			Storage[i].FM_b_1 = Storage[i].FM_nnn * (Storage[i].FM_www - 1.0);
-			//QuiskPrintf ("dsamples[i] = y_1 = di * %12.6lf + x_1 * %12.6lf - y_1 * %12.6lf\n", FM_a_0, FM_a_1, FM_b_1);
-		}
-		return 0;
-	}
 
 	//quisk_calc_audio_graph(pow(2, 31) - 1, cSamples, NULL, nSamples, 0);
 	// Filter and demodulate signal, copy capture buffer cSamples to play buffer dsamples.
-	// quisk_decim_srate is the sample rate after integer decimation.
-	MeasureSquelch[bank].squelch_active = 0;
+	// rx->decim_srate is the sample rate after integer decimation.
+	rx->squelch.squelch_active = 0;
 	switch(rx_mode) {
 	case CWL:		// lower sideband CW at 6 ksps
-		quisk_filter_srate = quisk_decim_srate / 8;
-		nSamples = quisk_cDecim2HB45(cSamples, nSamples, &Storage[bank].HalfBand5);
-		nSamples = quisk_cDecim2HB45(cSamples, nSamples, &Storage[bank].HalfBand4);
-		nSamples = quisk_cDecimate(cSamples, nSamples, &Storage[bank].filtDecim48to24, 2);
+		rx->filter_srate = rx->decim_srate / 8;
+		nSamples = quisk_cDecim2HB45(cSamples, nSamples, &rx->demod.HalfBand5);
+		nSamples = quisk_cDecim2HB45(cSamples, nSamples, &rx->demod.HalfBand4);
+		nSamples = quisk_cDecimate(cSamples, nSamples, &rx->demod.filtDecim48to24, 2);
 		for (i = 0; i < nSamples; i++) {
-			cx = cRxFilterOut(cSamples[i], bank, nFilter);
+			cx = cRxFilterOutRx(rx, cSamples[i]);
 			dsamples[i] = dd = creal(cx) + cimag(cx);
-			if(bank == 0) {
-				measure_audio_sum += dd * dd;
-				measure_audio_count += 1;
-			}
+			rx->audio_sum += dd * dd;
+			rx->audio_count += 1;
 		}
-		if(bank == 0)
-			dAutoNotch(dsamples, nSamples, rit_freq, quisk_filter_srate);
+		if (rx->auto_notch)
+			dAutoNotch(&rx->notch, dsamples, nSamples, rx->notch_sidetone, rx->filter_srate);
 		if (ssb_squelch_enabled) {
-			ssb_squelch(dsamples, nSamples, quisk_filter_srate, MeasureSquelch + bank);
-			d_delay(dsamples, nSamples, bank, SQUELCH_FFT_SIZE);
+			ssb_squelch(dsamples, nSamples, rx->filter_srate, rx->bandwidth, &rx->squelch);
+			d_delay(dsamples, nSamples, &rx->delay, SQUELCH_FFT_SIZE);
 		}
-		nSamples = quisk_dInterpolate(dsamples, nSamples, &Storage[bank].filtAudio12p2, 2);
-		nSamples = quisk_dInterp2HB45(dsamples, nSamples, &Storage[bank].HalfBand6);
-		nSamples = quisk_dInterp2HB45(dsamples, nSamples, &Storage[bank].HalfBand7);
+		nSamples = quisk_dInterpolate(dsamples, nSamples, &rx->demod.filtAudio12p2, 2);
+		nSamples = quisk_dInterp2HB45(dsamples, nSamples, &rx->demod.HalfBand6);
+		nSamples = quisk_dInterp2HB45(dsamples, nSamples, &rx->demod.HalfBand7);
 		break;
 	case CWU:		// upper sideband CW at 6 ksps
-		quisk_filter_srate = quisk_decim_srate / 8;
-		nSamples = quisk_cDecim2HB45(cSamples, nSamples, &Storage[bank].HalfBand5);
-		nSamples = quisk_cDecim2HB45(cSamples, nSamples, &Storage[bank].HalfBand4);
-		nSamples = quisk_cDecimate(cSamples, nSamples, &Storage[bank].filtDecim48to24, 2);
+		rx->filter_srate = rx->decim_srate / 8;
+		nSamples = quisk_cDecim2HB45(cSamples, nSamples, &rx->demod.HalfBand5);
+		nSamples = quisk_cDecim2HB45(cSamples, nSamples, &rx->demod.HalfBand4);
+		nSamples = quisk_cDecimate(cSamples, nSamples, &rx->demod.filtDecim48to24, 2);
 		for (i = 0; i < nSamples; i++) {
-			cx = cRxFilterOut(cSamples[i], bank, nFilter);
+			cx = cRxFilterOutRx(rx, cSamples[i]);
 			dsamples[i] = dd = creal(cx) - cimag(cx);
-			if(bank == 0) {
-				measure_audio_sum += dd * dd;
-				measure_audio_count += 1;
-			}
+			rx->audio_sum += dd * dd;
+			rx->audio_count += 1;
 		}
-		if(bank == 0)
-			dAutoNotch(dsamples, nSamples, rit_freq, quisk_filter_srate);
+		if (rx->auto_notch)
+			dAutoNotch(&rx->notch, dsamples, nSamples, rx->notch_sidetone, rx->filter_srate);
 		if (ssb_squelch_enabled) {
-			ssb_squelch(dsamples, nSamples, quisk_filter_srate, MeasureSquelch + bank);
-			d_delay(dsamples, nSamples, bank, SQUELCH_FFT_SIZE);
+			ssb_squelch(dsamples, nSamples, rx->filter_srate, rx->bandwidth, &rx->squelch);
+			d_delay(dsamples, nSamples, &rx->delay, SQUELCH_FFT_SIZE);
 		}
-		nSamples = quisk_dInterpolate(dsamples, nSamples, &Storage[bank].filtAudio12p2, 2);
-		nSamples = quisk_dInterp2HB45(dsamples, nSamples, &Storage[bank].HalfBand6);
-		nSamples = quisk_dInterp2HB45(dsamples, nSamples, &Storage[bank].HalfBand7);
+		nSamples = quisk_dInterpolate(dsamples, nSamples, &rx->demod.filtAudio12p2, 2);
+		nSamples = quisk_dInterp2HB45(dsamples, nSamples, &rx->demod.HalfBand6);
+		nSamples = quisk_dInterp2HB45(dsamples, nSamples, &rx->demod.HalfBand7);
 		break;
 	case LSB:	// lower sideband SSB at 12 ksps
-		quisk_filter_srate = quisk_decim_srate / 4;
-		nSamples = quisk_cDecim2HB45(cSamples, nSamples, &Storage[bank].HalfBand5);
-		nSamples = quisk_cDecimate(cSamples, nSamples, &Storage[bank].filtDecim48to24, 2);
+		rx->filter_srate = rx->decim_srate / 4;
+		nSamples = quisk_cDecim2HB45(cSamples, nSamples, &rx->demod.HalfBand5);
+		nSamples = quisk_cDecimate(cSamples, nSamples, &rx->demod.filtDecim48to24, 2);
 		for (i = 0; i < nSamples; i++) {
-			cx = cRxFilterOut(cSamples[i], bank, nFilter);
+			cx = cRxFilterOutRx(rx, cSamples[i]);
 			dsamples[i] = dd = creal(cx) + cimag(cx);
-			if(bank == 0) {
-				measure_audio_sum += dd * dd;
-				measure_audio_count += 1;
-			}
+			rx->audio_sum += dd * dd;
+			rx->audio_count += 1;
 		}
-		if(bank == 0)
-			dAutoNotch(dsamples, nSamples, 0, quisk_filter_srate);
+		if (rx->auto_notch)
+			dAutoNotch(&rx->notch, dsamples, nSamples, 0, rx->filter_srate);
 		if (ssb_squelch_enabled) {
-			ssb_squelch(dsamples, nSamples, quisk_filter_srate, MeasureSquelch + bank);
-			d_delay(dsamples, nSamples, bank, SQUELCH_FFT_SIZE);
+			ssb_squelch(dsamples, nSamples, rx->filter_srate, rx->bandwidth, &rx->squelch);
+			d_delay(dsamples, nSamples, &rx->delay, SQUELCH_FFT_SIZE);
 		}
 		//quisk_calc_audio_graph(pow(2, 31) - 1, NULL, dsamples, nSamples, 1);
-		nSamples = quisk_dInterpolate(dsamples, nSamples, &Storage[bank].filtAudio24p4, 2);
-		nSamples = quisk_dInterp2HB45(dsamples, nSamples, &Storage[bank].HalfBand7);
+		nSamples = quisk_dInterpolate(dsamples, nSamples, &rx->demod.filtAudio24p4, 2);
+		nSamples = quisk_dInterp2HB45(dsamples, nSamples, &rx->demod.HalfBand7);
 		//quisk_calc_audio_graph(pow(2, 31) - 1, NULL, dsamples, nSamples, 1);
 		break;
 	case USB:	 // upper sideband SSB at 12 ksps
 	default:
-		quisk_filter_srate = quisk_decim_srate / 4;
-		nSamples = quisk_cDecim2HB45(cSamples, nSamples, &Storage[bank].HalfBand5);
-		nSamples = quisk_cDecimate(cSamples, nSamples, &Storage[bank].filtDecim48to24, 2);
+		rx->filter_srate = rx->decim_srate / 4;
+		nSamples = quisk_cDecim2HB45(cSamples, nSamples, &rx->demod.HalfBand5);
+		nSamples = quisk_cDecimate(cSamples, nSamples, &rx->demod.filtDecim48to24, 2);
 		for (i = 0; i < nSamples; i++) {
-			cx = cRxFilterOut(cSamples[i], bank, nFilter);
+			cx = cRxFilterOutRx(rx, cSamples[i]);
 			dsamples[i] = dd = creal(cx) - cimag(cx);
-			if(bank == 0) {
-				measure_audio_sum += dd * dd;
-				measure_audio_count += 1;
-			}
+			rx->audio_sum += dd * dd;
+			rx->audio_count += 1;
 		}
-		if(bank == 0)
-			dAutoNotch(dsamples, nSamples, 0, quisk_filter_srate);
+		if (rx->auto_notch)
+			dAutoNotch(&rx->notch, dsamples, nSamples, 0, rx->filter_srate);
 		if (ssb_squelch_enabled) {
-			ssb_squelch(dsamples, nSamples, quisk_filter_srate, MeasureSquelch + bank);
-			d_delay(dsamples, nSamples, bank, SQUELCH_FFT_SIZE);
+			ssb_squelch(dsamples, nSamples, rx->filter_srate, rx->bandwidth, &rx->squelch);
+			d_delay(dsamples, nSamples, &rx->delay, SQUELCH_FFT_SIZE);
 		}
-		nSamples = quisk_dInterpolate(dsamples, nSamples, &Storage[bank].filtAudio24p4, 2);
-		nSamples = quisk_dInterp2HB45(dsamples, nSamples, &Storage[bank].HalfBand7);
+		nSamples = quisk_dInterpolate(dsamples, nSamples, &rx->demod.filtAudio24p4, 2);
+		nSamples = quisk_dInterp2HB45(dsamples, nSamples, &rx->demod.HalfBand7);
 		//quisk_calc_audio_graph(pow(2, 31) - 1, NULL, dsamples, nSamples, 1);
 		break;
 	case AM:		// AM at 24 ksps
-		quisk_filter_srate = quisk_decim_srate / 2;
-		nSamples = quisk_cDecimate(cSamples, nSamples, &Storage[bank].filtDecim48to24, 2);
+		rx->filter_srate = rx->decim_srate / 2;
+		nSamples = quisk_cDecimate(cSamples, nSamples, &rx->demod.filtDecim48to24, 2);
 		for (i = 0; i < nSamples; i++) {
-			cx = dRxFilterOut(cSamples[i], bank, nFilter);
+			cx = dRxFilterOut(rx, cSamples[i]);
 			di = cabs(cx);
-			d = di + Storage[bank].dc_remove * 0.99;	// DC removal; R.G. Lyons page 553
-			di = d - Storage[bank].dc_remove;
-			Storage[bank].dc_remove = d;
+			d = di + rx->demod.dc_remove * 0.99;	// DC removal; R.G. Lyons page 553
+			di = d - rx->demod.dc_remove;
+			rx->demod.dc_remove = d;
 			dsamples[i] = di;
-			if(bank == 0) {
-				measure_audio_sum += di * di;
-				measure_audio_count += 1;
-			}
+			rx->audio_sum += di * di;
+			rx->audio_count += 1;
 		}
-		nSamples = quisk_dFilter(dsamples, nSamples, &Storage[bank].filtAudio24p6);
-		if(bank == 0)
-			dAutoNotch(dsamples, nSamples, 0, quisk_filter_srate);
+		nSamples = quisk_dFilter(dsamples, nSamples, &rx->demod.filtAudio24p6);
+		if (rx->auto_notch)
+			dAutoNotch(&rx->notch, dsamples, nSamples, 0, rx->filter_srate);
 		if (ssb_squelch_enabled) {
-			ssb_squelch(dsamples, nSamples, quisk_filter_srate, MeasureSquelch + bank);
-			d_delay(dsamples, nSamples, bank, SQUELCH_FFT_SIZE);
+			ssb_squelch(dsamples, nSamples, rx->filter_srate, rx->bandwidth, &rx->squelch);
+			d_delay(dsamples, nSamples, &rx->delay, SQUELCH_FFT_SIZE);
 		}
-		nSamples = quisk_dInterp2HB45(dsamples, nSamples, &Storage[bank].HalfBand7);
+		nSamples = quisk_dInterp2HB45(dsamples, nSamples, &rx->demod.HalfBand7);
 		break;
 	case FM:		// FM at 48 ksps
 	case DGT_FM:
-		quisk_filter_srate = quisk_decim_srate;
+		rx->filter_srate = rx->decim_srate;
 #if 1
 		for (i = 0; i < nSamples; i++) {
-			cx = dRxFilterOut(cSamples[i], bank, nFilter);
-			MeasureSquelch[bank].rf_sum += cabs(cx);
-			MeasureSquelch[bank].rf_count += 1;
+			cx = dRxFilterOut(rx, cSamples[i]);
+			rx->squelch.rf_sum += cabs(cx);
+			rx->squelch.rf_count += 1;
 			// Phase difference in successive samples
-			di = carg(cx * conj(Storage[bank].fm_1));
-			Storage[bank].fm_1 = cx;
+			di = carg(cx * conj(rx->demod.fm_1));
+			rx->demod.fm_1 = cx;
 			dsamples[i] = di;
 		}
 #endif
 #if 0
 		count += nSamples;
 		for (i = 0; i < nSamples; i++) {
-			cx = dRxFilterOut(cSamples[i], bank, nFilter);
+			cx = dRxFilterOut(rx, cSamples[i]);
 			// Integrate phase difference in successive samples and then differentiate. Phase drifts.
-			di = carg(cx * conj(Storage[bank].fm_1));
-			Storage[bank].fm_1 = cx;
-			MeasureSquelch[bank].audio_sum += fabs(di);
-			Storage[bank].FM_phase += di;
-			dsamples[i] = Storage[bank].FM_phase;
+			di = carg(cx * conj(rx->demod.fm_1));
+			rx->demod.fm_1 = cx;
+			rx->squelch.audio_sum += fabs(di);
+			rx->demod.FM_phase += di;
+			dsamples[i] = rx->demod.FM_phase;
 		}
 		if (count >= 48000) {
 			count = 0;
 			printf("Phase %12.4lf\n", dsamples[0]);
 		}
-		nSamples = quisk_dFilter(dsamples, nSamples, &Storage[bank].filtFMdiff);
+		nSamples = quisk_dFilter(dsamples, nSamples, &rx->demod.filtFMdiff);
 #endif
 		for (i = 0; i < nSamples; i++) {
 			dsamples[i] *= 20e5;
 			di = dsamples[i];
 			// FM de-emphasis
-			dsamples[i] = Storage[bank].FM_y_1 = di * Storage[bank].FM_a_0 +
-				Storage[bank].FM_x_1 * Storage[bank].FM_a_1 - Storage[bank].FM_y_1 * Storage[bank].FM_b_1;
-			Storage[bank].FM_x_1 = di;
-		}
-		nSamples = quisk_dDecimate(dsamples, nSamples, &Storage[bank].filtAudio48p3, 4);
-		nSamples = quisk_dFilter(dsamples, nSamples, &Storage[bank].filtAudioFmHp);
-		nSamples = quisk_dInterp2HB45(dsamples, nSamples, &Storage[bank].HalfBand6);
-		nSamples = quisk_dInterp2HB45(dsamples, nSamples, &Storage[bank].HalfBand7);
-		if(bank == 0) {
-			dAutoNotch(dsamples, nSamples, 0, quisk_filter_srate);
-			for (i = 0; i < nSamples; i++) {
-				measure_audio_sum += dsamples[i] * dsamples[i];
-				measure_audio_count += 1;
-			}
+			dsamples[i] = rx->demod.FM_y_1 = di * rx->demod.FM_a_0 +
+				rx->demod.FM_x_1 * rx->demod.FM_a_1 - rx->demod.FM_y_1 * rx->demod.FM_b_1;
+			rx->demod.FM_x_1 = di;
+		}
+		nSamples = quisk_dDecimate(dsamples, nSamples, &rx->demod.filtAudio48p3, 4);
+		nSamples = quisk_dFilter(dsamples, nSamples, &rx->demod.filtAudioFmHp);
+		nSamples = quisk_dInterp2HB45(dsamples, nSamples, &rx->demod.HalfBand6);
+		nSamples = quisk_dInterp2HB45(dsamples, nSamples, &rx->demod.HalfBand7);
+		if (rx->auto_notch)
+			dAutoNotch(&rx->notch, dsamples, nSamples, 0, rx->filter_srate);
+		for (i = 0; i < nSamples; i++) {
+			rx->audio_sum += dsamples[i] * dsamples[i];
+			rx->audio_count += 1;
 		}
-		if (MeasureSquelch[bank].rf_count >= 2400) {
-			MeasureSquelch[bank].squelch = MeasureSquelch[bank].rf_sum / MeasureSquelch[bank].rf_count / CLIP32;
-			if (MeasureSquelch[bank].squelch > 1.E-10)
-				MeasureSquelch[bank].squelch = 20 * log10(MeasureSquelch[bank].squelch);
+		if (rx->squelch.rf_count >= 2400) {
+			rx->squelch.squelch = rx->squelch.rf_sum / rx->squelch.rf_count / CLIP32;
+			if (rx->squelch.squelch > 1.E-10)
+				rx->squelch.squelch = 20 * log10(rx->squelch.squelch);
 			else
-				MeasureSquelch[bank].squelch = -200.0;
-			MeasureSquelch[bank].rf_sum = MeasureSquelch[bank].rf_count = 0;
-			//printf("RF %12.4lf level %12.4lf\n", MeasureSquelch[bank].squelch, squelch_level);
+				rx->squelch.squelch = -200.0;
+			rx->squelch.rf_sum = rx->squelch.rf_count = 0;
+			//printf("RF %12.4lf level %12.4lf\n", rx->squelch.squelch, squelch_level);
 		}
-		MeasureSquelch[bank].squelch_active = MeasureSquelch[bank].squelch < squelch_level;
+		rx->squelch.squelch_active = rx->squelch.squelch < squelch_level;
 		break;
 	case DGT_U:     // digital mode DGT-U at 48 ksps
 	case FDV_U:
-		if (filter_bandwidth[nFilter] < DGT_NARROW_FREQ) {	// filter at 6 ksps
-			quisk_filter_srate = quisk_decim_srate / 8;
-			nSamples = quisk_cDecim2HB45(cSamples, nSamples, &Storage[bank].HalfBand5);
-			nSamples = quisk_cDecim2HB45(cSamples, nSamples, &Storage[bank].HalfBand4);
-			nSamples = quisk_cDecimate(cSamples, nSamples, &Storage[bank].filtDecim48to24, 2);
+		if (rx->bandwidth < DGT_NARROW_FREQ) {	// filter at 6 ksps
+			rx->filter_srate = rx->decim_srate / 8;
+			nSamples = quisk_cDecim2HB45(cSamples, nSamples, &rx->demod.HalfBand5);
+			nSamples = quisk_cDecim2HB45(cSamples, nSamples, &rx->demod.HalfBand4);
+			nSamples = quisk_cDecimate(cSamples, nSamples, &rx->demod.filtDecim48to24, 2);
 		}
 		else {	// filter at 48 ksps
-			quisk_filter_srate = quisk_decim_srate;
+			rx->filter_srate = rx->decim_srate;
 		}
 		for (i = 0; i < nSamples; i++) {
-			cx = cRxFilterOut(cSamples[i], bank, nFilter);
+			cx = cRxFilterOutRx(rx, cSamples[i]);
 			dsamples[i] = dd = creal(cx) - cimag(cx);
-			if(bank == 0) {
-				measure_audio_sum += dd * dd;
-				measure_audio_count += 1;
-			}
+			rx->audio_sum += dd * dd;
+			rx->audio_count += 1;
 		}
-		if(bank == 0)
-			dAutoNotch(dsamples, nSamples, 0, quisk_filter_srate);
-		if (filter_bandwidth[nFilter] < DGT_NARROW_FREQ) {
-			nSamples = quisk_dInterpolate(dsamples, nSamples, &Storage[bank].filtAudio12p2, 2);
-			nSamples = quisk_dInterp2HB45(dsamples, nSamples, &Storage[bank].HalfBand6);
-			nSamples = quisk_dInterp2HB45(dsamples, nSamples, &Storage[bank].HalfBand7);
+		if (rx->auto_notch)
+			dAutoNotch(&rx->notch, dsamples, nSamples, 0, rx->filter_srate);
+		if (rx->bandwidth < DGT_NARROW_FREQ) {
+			nSamples = quisk_dInterpolate(dsamples, nSamples, &rx->demod.filtAudio12p2, 2);
+			nSamples = quisk_dInterp2HB45(dsamples, nSamples, &rx->demod.HalfBand6);
+			nSamples = quisk_dInterp2HB45(dsamples, nSamples, &rx->demod.HalfBand7);
 		}
 		break;
 	case DGT_L:     // digital mode DGT-L
 	case FDV_L:
-		if (filter_bandwidth[nFilter] < DGT_NARROW_FREQ) {	// filter at 6 ksps
-			quisk_filter_srate = quisk_decim_srate / 8;
-			nSamples = quisk_cDecim2HB45(cSamples, nSamples, &Storage[bank].HalfBand5);
-			nSamples = quisk_cDecim2HB45(cSamples, nSamples, &Storage[bank].HalfBand4);
-			nSamples = quisk_cDecimate(cSamples, nSamples, &Storage[bank].filtDecim48to24, 2);
+		if (rx->bandwidth < DGT_NARROW_FREQ) {	// filter at 6 ksps
+			rx->filter_srate = rx->decim_srate / 8;
+			nSamples = quisk_cDecim2HB45(cSamples, nSamples, &rx->demod.HalfBand5);
+			nSamples = quisk_cDecim2HB45(cSamples, nSamples, &rx->demod.HalfBand4);
+			nSamples = quisk_cDecimate(cSamples, nSamples, &rx->demod.filtDecim48to24, 2);
 		}
 		else {	// filter at 48 ksps
-			quisk_filter_srate = quisk_decim_srate;
+			rx->filter_srate = rx->decim_srate;
 		}
 		for (i = 0; i < nSamples; i++) {
-			cx = cRxFilterOut(cSamples[i], bank, nFilter);
+			cx = cRxFilterOutRx(rx, cSamples[i]);
 			dsamples[i] = dd = creal(cx) + cimag(cx);
-			if(bank == 0) {
-				measure_audio_sum += dd * dd;
-				measure_audio_count += 1;
-			}
+			rx->audio_sum += dd * dd;
+			rx->audio_count += 1;
 		}
-		if(bank == 0)
-			dAutoNotch(dsamples, nSamples, 0, quisk_filter_srate);
-		if (filter_bandwidth[nFilter] < DGT_NARROW_FREQ) {
-			nSamples = quisk_dInterpolate(dsamples, nSamples, &Storage[bank].filtAudio12p2, 2);
-			nSamples = quisk_dInterp2HB45(dsamples, nSamples, &Storage[bank].HalfBand6);
-			nSamples = quisk_dInterp2HB45(dsamples, nSamples, &Storage[bank].HalfBand7);
+		if (rx->auto_notch)
+			dAutoNotch(&rx->notch, dsamples, nSamples, 0, rx->filter_srate);
+		if (rx->bandwidth < DGT_NARROW_FREQ) {
+			nSamples = quisk_dInterpolate(dsamples, nSamples, &rx->demod.filtAudio12p2, 2);
+			nSamples = quisk_dInterp2HB45(dsamples, nSamples, &rx->demod.HalfBand6);
+			nSamples = quisk_dInterp2HB45(dsamples, nSamples, &rx->demod.HalfBand7);
 		}
 		break;
 	case DGT_IQ:     // digital mode DGT-IQ at 48 ksps
-		quisk_filter_srate = quisk_decim_srate;
-		if (filter_bandwidth[nFilter] < 19000) {		// No filtering for wide bandwidth
+		rx->filter_srate = rx->decim_srate;
+		if (rx->bandwidth < 19000) {		// No filtering for wide bandwidth
 			for (i = 0; i < nSamples; i++)
-				cSamples[i] = dRxFilterOut(cSamples[i], bank, nFilter);
+				cSamples[i] = dRxFilterOut(rx, cSamples[i]);
 		}
-		if(bank == 0) {
-			for (i = 0; i < nSamples; i++) {
-				measure_audio_sum = measure_audio_sum + cSamples[i] * conj(cSamples[i]);
-				measure_audio_count += 1;
-			}
+		for (i = 0; i < nSamples; i++) {
+			rx->audio_sum += creal(cSamples[i] * conj(cSamples[i]));
+			rx->audio_count += 1;
 		}
 		break;
 	}
-	if (bank == 0 && measure_audio_count >= quisk_filter_srate * measure_audio_time) {
-		measured_audio = sqrt(measure_audio_sum / measure_audio_count) / CLIP32 * 1e6;
-		measure_audio_sum = measure_audio_count = 0;
+	return nSamples;
+}
+
+static void quisk_rx_init(struct quisk_rx * rx)
+{	// Initialize or reset a receiver
+	if (rx->initialized) {
+		rx_decimate_free(&rx->decim);
+		rx_demodulate_free(&rx->demod);
+	}
+	rx->initialized = 1;
+	rx_decimate_init(&rx->decim);
+	rx_demodulate_init(&rx->demod);
+	memset(&rx->fir, 0, sizeof(struct rx_fir_t));
+	rx->nb.sample_rate = -1;
+	if (rx->notch.data_in)
+		dAutoNotchReset(&rx->notch);
+	rx->frac.dindex = 1;
+	rx->frac.c0 = rx->frac.c1 = rx->frac.c2 = rx->frac.c3 = 0;
+	rx->plan_rate = 0;
+	rx->audio_sum = 0;
+	rx->audio_count = 0;
+	if ( ! rx->fSamples)
+		rx->fSamples = (complex float *)malloc(SAMP_BUFFER_SIZE * sizeof(complex float));
+}
+
+static void quisk_rx_free(struct quisk_rx * rx)
+{	// Free the memory of a receiver
+	if (rx->initialized) {
+		rx_decimate_free(&rx->decim);
+		rx_demodulate_free(&rx->demod);
+	}
+	rx->initialized = 0;
+	free(rx->nb.cSaved);
+	free(rx->nb.dSaved);
+	dAutoNotchFree(&rx->notch);
+	free(rx->delay.buffer);
+	if (rx->squelch.in_fft) {
+		fftw_free(rx->squelch.in_fft);
+		fftw_free(rx->squelch.out_fft);
+	}
+	free(rx->fSamples);
+	rx->nb.cSaved = NULL;
+	rx->nb.dSaved = NULL;
+	rx->delay.buffer = NULL;
+	rx->squelch.in_fft = NULL;
+	rx->fSamples = NULL;
+}
+
+static int quisk_process_decimate(complex double * cSamples, int nSamples, int bank, rx_mode_type rx_mode)
+{	// Decimate the samples for receiver bank in quisk_rx_bank.
+	struct quisk_rx * rx = quisk_rx_bank + bank;
+
+	if ( ! cSamples) {	// Initialize all receivers
+		for (bank = 0; bank < MAX_RX_CHANNELS; bank++)
+			quisk_rx_init(quisk_rx_bank + bank);
+		return 0;
 	}
+	rx->sample_rate = quisk_sound_state.sample_rate;
+	nSamples = rx_decimate(rx, cSamples, nSamples);
+	quisk_decim_srate = rx->decim_srate;
+	return nSamples;
+}
+
+static int quisk_process_demodulate(complex double * cSamples, double * dsamples, int nSamples, int bank, int nFilter, rx_mode_type rx_mode)
+{	// Filter and demodulate the samples for receiver bank in quisk_rx_bank using Rx filter nFilter.
+	struct quisk_rx * rx = quisk_rx_bank + bank;
+
+	if ( ! cSamples)	// The filters are initialized by quisk_process_decimate()
+		return 0;
+	rx->decim_srate = quisk_decim_srate;
+	rx->filtI = cFilterI[nFilter];
+	rx->filtQ = cFilterQ[nFilter];
+	rx->filter_size = sizeFilter;
+	rx->bandwidth = filter_bandwidth[nFilter];
+	rx->auto_notch = bank == 0 && quisk_auto_notch;		// the auto notch is only used for the main receiver
+	rx->notch_sidetone = rit_freq;
+	nSamples = rx_demodulate(rx, cSamples, dsamples, nSamples, rx_mode);
+	quisk_filter_srate = rx->filter_srate;
+	if (bank == 0) {
+		measure_audio_sum += rx->audio_sum;
+		measure_audio_count += rx->audio_count;
+		if (measure_audio_count >= quisk_filter_srate * measure_audio_time) {
+			measured_audio = sqrt(measure_audio_sum / measure_audio_count) / CLIP32 * 1e6;
+			measure_audio_sum = measure_audio_count = 0;
+		}
+	}
+	rx->audio_sum = 0;
+	rx->audio_count = 0;
 	return nSamples;
 }
 
@@ -2286,6 +2644,263 @@ static void process_agc(struct AgcState * dat, complex double * csamples, int co
 	return;
 }
 
+// The polyphase channelizer splits the wideband I/Q samples into "channels" uniformly spaced channels
+// with one inverse FFT for each block of "channels" input samples.  Channel m is centered at m * sample_rate / channels
+// and has a sample rate of sample_rate / channels.  Channel receivers choose the nearest channel and add fine tuning.
+// Their samples are saved in a ring buffer and read by Python with get_channel_rx().
+#define CHANNELIZER_MAX_RX	64		// maximum number of channel receivers
+#define CHANNELIZER_RX_SECS	2.0		// size of the channel receiver ring buffer in seconds
+
+struct channel_rx_t {
+	int active;
+	int channel;			// the channelizer output to use
+	complex double tune_phase;	// phase increment for the fine tuning
+	complex double tune_vector;
+	complex double * ring;		// ring buffer of output samples
+	int ring_size;
+	volatile int write_index;	// changed by the sound thread
+	volatile int read_index;	// changed by the thread calling get_channel_rx()
+};
+
+static struct {
+	int channels;			// number of channels M, or zero if the channelizer is off
+	int taps;			// taps for each channel, so the prototype filter has channels * taps coefficients
+	int sample_rate;		// input sample rate
+	double * coefs;			// prototype low pass filter
+	complex double * history;	// the most recent channels * taps input samples, newest last
+	int fill;			// number of new samples in the current block
+	fftw_complex * fft;		// branch outputs and the channel outputs
+	fftw_plan plan;
+	struct channel_rx_t rx[CHANNELIZER_MAX_RX];
+} channelizer;
+
+#ifdef MS_WINDOWS
+static SRWLOCK channelizer_lock = SRWLOCK_INIT;		// held by the sound thread while it uses the channelizer
+#else
+static pthread_mutex_t channelizer_mutex = PTHREAD_MUTEX_INITIALIZER;
+#endif
+
+static void channelizer_lock_state(void)
+{
+#ifdef MS_WINDOWS
+	AcquireSRWLockExclusive(&channelizer_lock);
+#else
+	pthread_mutex_lock(&channelizer_mutex);
+#endif
+}
+
+static void channelizer_unlock_state(void)
+{
+#ifdef MS_WINDOWS
+	ReleaseSRWLockExclusive(&channelizer_lock);
+#else
+	pthread_mutex_unlock(&channelizer_mutex);
+#endif
+}
+
+static void channelizer_free(void)
+{
+	int i;
+
+	quisk_fftw_plan_lock();
+	if (channelizer.plan)
+		fftw_destroy_plan(channelizer.plan);
+	quisk_fftw_plan_unlock();
+	channelizer.plan = NULL;
+	free(channelizer.coefs);
+	free(channelizer.history);
+	if (channelizer.fft)
+		fftw_free(channelizer.fft);
+	channelizer.coefs = NULL;
+	channelizer.history = NULL;
+	channelizer.fft = NULL;
+	channelizer.channels = 0;
+	for (i = 0; i < CHANNELIZER_MAX_RX; i++) {
+		channelizer.rx[i].active = 0;
+		free(channelizer.rx[i].ring);
+		channelizer.rx[i].ring = NULL;
+	}
+}
+
+static int channelizer_init(int channels, int taps, int sample_rate)
+{	// Design a windowed sinc prototype filter with a cutoff of half the channel spacing.
+	// The channelizer must be off.  Return the number of channels to turn it on, or zero.
+	int i, L;
+	double x, D, w;
+
+	channelizer_free();
+	if (channels < 2 || taps < 1)
+		return 0;
+	L = channels * taps;
+	channelizer.coefs = (double *)malloc(L * sizeof(double));
+	channelizer.history = (complex double *)calloc(L, sizeof(complex double));
+	channelizer.fft = (fftw_complex *)fftw_malloc(channels * sizeof(fftw_complex));
+	quisk_fftw_plan_lock();
+	channelizer.plan = fftw_plan_dft_1d(channels, channelizer.fft, channelizer.fft, FFTW_BACKWARD, FFTW_MEASURE);
+	quisk_fftw_plan_unlock();
+	D = (L - 1) / 2.0;
+	for (i = 0; i < L; i++) {
+		x = (i - D) / channels;
+		w = 0.42 - 0.5 * cos(2.0 * M_PI * i / (L - 1)) + 0.08 * cos(4.0 * M_PI * i / (L - 1));	// Blackman
+		channelizer.coefs[i] = (x == 0 ? 1.0 : sin(M_PI * x) / (M_PI * x)) * w / channels;
+	}
+	channelizer.taps = taps;
+	channelizer.sample_rate = sample_rate;
+	channelizer.fill = 0;
+	return channels;
+}
+
+static void channelizer_process(complex double * cSamples, int nSamples)
+{	// Called from the sound thread with the wideband samples.
+	int i, k, p, m, M, L, n;
+	complex double c;
+	double * coefs;
+	complex double * hist;
+	struct channel_rx_t * rx;
+
+	M = channelizer.channels;
+	L = M * channelizer.taps;
+	coefs = channelizer.coefs;
+	hist = channelizer.history;
+	for (i = 0; i < nSamples; i++) {
+		// New samples fill the last M places of the history, and the history moves left once for each block.
+		hist[L - M + channelizer.fill] = cSamples[i];
+		if (++channelizer.fill < M)
+			continue;
+		channelizer.fill = 0;
+		// Branch filters: v[k] = sum(h[k + p * M] * x[newest - k - p * M])
+		for (k = 0; k < M; k++) {
+			c = 0;
+			for (p = 0; p < channelizer.taps; p++)
+				c += coefs[k + p * M] * hist[L - 1 - k - p * M];
+			channelizer.fft[k] = c;
+		}
+		fftw_execute(channelizer.plan);	// channel m is fft[m]
+		memmove(hist, hist + M, (L - M) * sizeof(complex double));
+		for (m = 0; m < CHANNELIZER_MAX_RX; m++) {
+			rx = channelizer.rx + m;
+			if ( ! rx->active)
+				continue;
+			c = channelizer.fft[rx->channel] * rx->tune_vector;
+			rx->tune_vector *= rx->tune_phase;
+			n = rx->write_index;
+			rx->ring[n] = c;
+			if (++n >= rx->ring_size)
+				n = 0;
+			if (n != rx->read_index)	// discard samples if the ring is full
+				rx->write_index = n;
+		}
+	}
+	for (m = 0; m < CHANNELIZER_MAX_RX; m++) {	// correct the tuning amplitude
+		rx = channelizer.rx + m;
+		if (rx->active)
+			rx->tune_vector /= cabs(rx->tune_vector);
+	}
+}
+
+static PyObject * set_channelizer(PyObject * self, PyObject * args)	// Called by the GUI thread
+{	// Set the number of channels and the taps per channel; or zero channels to turn off the channelizer.
+	int channels, taps, rate;
+
+	if (!PyArg_ParseTuple (args, "ii", &channels, &taps))
+		return NULL;
+	channels = channels < 2 ? 0 : channels;
+	if (channels != channelizer.channels || taps != channelizer.taps || quisk_sound_state.sample_rate != channelizer.sample_rate) {
+		channelizer_lock_state();	// wait for the sound thread to finish with the channelizer
+		channelizer.channels = 0;	// the sound thread does not use the channelizer until it is turned on again
+		channelizer_unlock_state();
+		channels = channelizer_init(channels, taps, quisk_sound_state.sample_rate);		// the FFT planning may be slow
+		channelizer_lock_state();
+		channelizer.channels = channels;
+		channelizer_unlock_state();
+	}
+	rate = channelizer.channels ? channelizer.sample_rate / channelizer.channels : 0;
+	return PyInt_FromLong(rate);
+}
+
+static PyObject * set_channel_rx(PyObject * self, PyObject * args)	// Called by the GUI thread
+{	// Start a channel receiver at a frequency offset from the center, or stop it if active is zero.
+	int index, active, freq, M, rate, channel;
+	double offset;
+	struct channel_rx_t * rx;
+
+	if (!PyArg_ParseTuple (args, "iii", &index, &active, &freq))
+		return NULL;
+	if (index < 0 || index >= CHANNELIZER_MAX_RX) {
+		PyErr_SetString(QuiskError, "Bad index for the channel receiver");
+		return NULL;
+	}
+	channelizer_lock_state();	// the sound thread is not using the receiver while the lock is held
+	M = channelizer.channels;
+	rx = channelizer.rx + index;
+	rx->active = 0;
+	if ( ! active || M == 0) {
+		channelizer_unlock_state();
+		return PyInt_FromLong(-1);
+	}
+	rate = channelizer.sample_rate / M;
+	channel = (int)floor((double)freq * M / channelizer.sample_rate + 0.5);
+	offset = freq - (double)channel * channelizer.sample_rate / M;
+	if (channel < 0)
+		channel += M;
+	if (channel < 0 || channel >= M) {
+		channelizer_unlock_state();
+		PyErr_SetString(QuiskError, "Channel receiver frequency is out of range");
+		return NULL;
+	}
+	if ( ! rx->ring) {
+		rx->ring_size = (int)(rate * CHANNELIZER_RX_SECS) + 1;
+		rx->ring = (complex double *)malloc(rx->ring_size * sizeof(complex double));
+	}
+	rx->channel = channel;
+	rx->tune_phase = cexp(I * -2.0 * M_PI * offset / rate);
+	rx->tune_vector = 1;
+	rx->read_index = rx->write_index = 0;
+	rx->active = rx->ring != NULL;
+	channelizer_unlock_state();
+	return PyInt_FromLong(channel);
+}
+
+static PyObject * get_channel_rx(PyObject * self, PyObject * args)	// Called by any thread
+{	// Copy the available samples of a channel receiver as complex doubles into a writable buffer. Return the count.
+	int index, count, max, r, w;
+	complex double * out;
+	struct channel_rx_t * rx;
+	Py_buffer view;
+
+	if (!PyArg_ParseTuple (args, "iw*", &index, &view))
+		return NULL;
+	if (index < 0 || index >= CHANNELIZER_MAX_RX) {
+		PyBuffer_Release(&view);
+		PyErr_SetString(QuiskError, "Bad index for the channel receiver");
+		return NULL;
+	}
+	rx = channelizer.rx + index;
+	max = view.len / sizeof(complex double);
+	out = (complex double *)view.buf;
+	count = 0;
+	channelizer_lock_state();
+	if (rx->active) {
+		r = rx->read_index;
+		w = rx->write_index;
+		while (r != w && count < max) {
+			out[count++] = rx->ring[r];
+			if (++r >= rx->ring_size)
+				r = 0;
+		}
+		rx->read_index = r;
+	}
+	channelizer_unlock_state();
+	PyBuffer_Release(&view);
+	return PyInt_FromLong(count);
+}
+
+void quisk_get_tuning(int * vfo, int * rx_freq)
+{	// Return the VFO frequency and the receive tuning offset for the I/Q ring
+	*vfo = vfo_audio;
+	*rx_freq = rx_tune_freq;
+}
+
 int quisk_process_samples(complex double * cSamples, int nSamples)
 {
 // Called when samples are available.
@@ -2445,8 +3060,10 @@ int quisk_process_samples(complex double * cSamples, int nSamples)
 			}
 	}
 
-	if ( ! quisk_is_key_down())
-		NoiseBlanker(cSamples, nSamples);
+	if ( ! quisk_is_key_down()) {
+		quisk_rx_bank[0].sample_rate = quisk_sound_state.sample_rate;	// quisk_process_decimate() is called later
+		NoiseBlanker(quisk_rx_bank, cSamples, nSamples, quisk_noise_blanker);
+	}
 
 	// Put samples into the fft input array.
 	// Thanks to WB4JFI for the code to add a third FFT buffer, July 2010.
@@ -2474,6 +3091,11 @@ int quisk_process_samples(complex double * cSamples, int nSamples)
 	    }
 	}
 
+	channelizer_lock_state();
+	if (channelizer.channels)
+		channelizer_process(cSamples, nSamples);
+	channelizer_unlock_state();
+
 	// Tune the data to frequency
 	if (multiple_sample_rates == 0)
 		tune = rx_tune_freq;
@@ -2488,6 +3110,16 @@ int quisk_process_samples(complex double * cSamples, int nSamples)
 	}
 
 	if (rxMode == EXT) {		// External filter and demodulate
+		if (quisk_demod_plugin_active()) {	// Demodulate the decimated samples with a plug-in
+			nSamples = quisk_process_decimate(cSamples, nSamples, 0, rxMode);
+			if (quisk_decim_srate != 48000) {
+				double_filter_decim = quisk_decim_srate / 48000.0;
+				nSamples = cFracDecim(&quisk_rx_bank[0].frac, cSamples, nSamples, double_filter_decim);
+				quisk_decim_srate = 48000;
+			}
+			nSamples = quisk_demod_plugin(cSamples, nSamples, quisk_decim_srate);
+			goto start_interp;
+		}
 		d = (double)quisk_sound_state.sample_rate / quisk_sound_state.playback_rate;	// total decimation needed
 		nSamples = quisk_extern_demod(cSamples, nSamples, d);
 		goto start_agc;
@@ -2549,39 +3181,39 @@ int quisk_process_samples(complex double * cSamples, int nSamples)
 		default:
 		case 1:		// stereo, higher frequency is real
 			if (quisk_tx_tune_freq < rx_tune_freq) {
-				squelch_real = MeasureSquelch[0].squelch_active;
-				squelch_imag = MeasureSquelch[1].squelch_active;
+				squelch_real = quisk_rx_bank[0].squelch.squelch_active;
+				squelch_imag = quisk_rx_bank[1].squelch.squelch_active;
 				for (i = 0; i < nSamples; i++)
 					cSamples[i] = dsamples[i] + I * dsamples2[i];
 			}
 			else {
-				squelch_real = MeasureSquelch[1].squelch_active;
-				squelch_imag = MeasureSquelch[0].squelch_active;
+				squelch_real = quisk_rx_bank[1].squelch.squelch_active;
+				squelch_imag = quisk_rx_bank[0].squelch.squelch_active;
 				for (i = 0; i < nSamples; i++)
 					cSamples[i] = dsamples2[i] + I * dsamples[i];
 			}
 			break;
 		case 2:		// stereo, lower frequency is real
 			if (quisk_tx_tune_freq >= rx_tune_freq) {
-				squelch_real = MeasureSquelch[0].squelch_active;
-				squelch_imag = MeasureSquelch[1].squelch_active;
+				squelch_real = quisk_rx_bank[0].squelch.squelch_active;
+				squelch_imag = quisk_rx_bank[1].squelch.squelch_active;
 				for (i = 0; i < nSamples; i++)
 					cSamples[i] = dsamples[i] + I * dsamples2[i];
 			}
 			else {
-				squelch_real = MeasureSquelch[1].squelch_active;
-				squelch_imag = MeasureSquelch[0].squelch_active;
+				squelch_real = quisk_rx_bank[1].squelch.squelch_active;
+				squelch_imag = quisk_rx_bank[0].squelch.squelch_active;
 				for (i = 0; i < nSamples; i++)
 					cSamples[i] = dsamples2[i] + I * dsamples[i];
 			}
 			break;
 		case 3:		// mono receive channel
-			squelch_real = squelch_imag = MeasureSquelch[0].squelch_active;
+			squelch_real = squelch_imag = quisk_rx_bank[0].squelch.squelch_active;
 			for (i = 0; i < nSamples; i++)
 				cSamples[i] = dsamples[i] + I * dsamples[i];
 			break;
 		case 4:		// mono transmit channel
-			squelch_real = squelch_imag = MeasureSquelch[1].squelch_active;
+			squelch_real = squelch_imag = quisk_rx_bank[1].squelch.squelch_active;
 			for (i = 0; i < nSamples; i++)
 				cSamples[i] = dsamples2[i] + I * dsamples2[i];
 			break;
@@ -2597,30 +3229,33 @@ int quisk_process_samples(complex double * cSamples, int nSamples)
 		}
 		n = quisk_process_decimate(buf_cSamples, orig_nSamples, 1, multirx_mode[multirx_play_channel]);
 		n = quisk_process_demodulate(buf_cSamples, dsamples2, n, 1, 1, multirx_mode[multirx_play_channel]);
+		// The squelch of this sub-receiver triggers the I/Q ring, but the ring holds the main receiver samples.
+		// The sub-receiver signal is in the dump only if it is within the main receiver sample rate.
+		quisk_iq_ring_squelch(quisk_rx_bank[1].squelch.squelch_active);
 		nSamples = Buffer2Chan(dsamples, nSamples, dsamples2, n);		// buffer dsamples and dsamples2 so the count is equal
 		switch(multirx_play_method) {
 		default:
 		case 0:		// play both
-			squelch_real = squelch_imag = MeasureSquelch[1].squelch_active;
+			squelch_real = squelch_imag = quisk_rx_bank[1].squelch.squelch_active;
 			for (i = 0; i < nSamples; i++)
 				cSamples[i] = dsamples2[i] + I * dsamples2[i];
 			break;
 		case 1:		// play left
-			squelch_real = MeasureSquelch[0].squelch_active;
-			squelch_imag = MeasureSquelch[1].squelch_active;
+			squelch_real = quisk_rx_bank[0].squelch.squelch_active;
+			squelch_imag = quisk_rx_bank[1].squelch.squelch_active;
 			for (i = 0; i < nSamples; i++)
 				cSamples[i] = dsamples[i] + I * dsamples2[i];
 			break;
 		case 2:		// play right
-			squelch_real = MeasureSquelch[1].squelch_active;
-			squelch_imag = MeasureSquelch[0].squelch_active;
+			squelch_real = quisk_rx_bank[1].squelch.squelch_active;
+			squelch_imag = quisk_rx_bank[0].squelch.squelch_active;
 			for (i = 0; i < nSamples; i++)
 				cSamples[i] = dsamples2[i] + I * dsamples[i];
 			break;
 		}
 	}
 	else {		// monophonic sound played on both channels
-		squelch_real = squelch_imag = MeasureSquelch[0].squelch_active;
+		squelch_real = squelch_imag = quisk_rx_bank[0].squelch.squelch_active;
 		for (i = 0; i < nSamples; i++) {
 			d = dsamples[i];
 			cSamples[i] = d + I * d;
@@ -2654,13 +3289,14 @@ int quisk_process_samples(complex double * cSamples, int nSamples)
 	// Perhaps decimate by an additional fraction
 	if (quisk_decim_srate != 48000) {
 		double_filter_decim = quisk_decim_srate / 48000.0;
-		nSamples = cFracDecim(cSamples, nSamples, double_filter_decim);
+		nSamples = cFracDecim(&quisk_rx_bank[0].frac, cSamples, nSamples, double_filter_decim);
 		quisk_decim_srate = 48000;
 	}
 	// Process the Rx path with the WDSP library
 	nSamples = wdspFexchange0(QUISK_WDSP_RX, cSamples, nSamples);
 
 	// Interpolate the samples from 48000 sps to the play rate.
+start_interp:
 	switch (quisk_sound_state.playback_rate / 48000) {
 	case 1:
 		break;
@@ -2784,14 +3420,11 @@ static PyObject * get_overrange(PyObject * self, PyObject * args)
 	return PyInt_FromLong(quisk_get_overrange());
 }
 
-static PyObject * get_filter_rate(PyObject * self, PyObject * args)
-{	// Return the filter sample rate as used by quisk_process_samples.
-	// Changes to quisk_process_decimate or quisk_process_demodulate will require changes here.
-	int rate, decim_srate, filter_srate, mode, bandwidth;
-	// mode is -1 to use the rxMode
-	if (!PyArg_ParseTuple (args, "ii", &mode, &bandwidth))
-		return NULL;
-	rate = quisk_sound_state.sample_rate;
+static int rx_filter_rate(int rate, int mode, int bandwidth)
+{	// Return the filter sample rate for the input sample rate, mode and bandwidth.
+	// Changes to rx_decimate or rx_demodulate will require changes here.
+	int decim_srate, filter_srate;
+
 	switch((rate + 100) / 1000) {
 	case 41:
 		decim_srate = 48000;
@@ -2817,13 +3450,9 @@ static PyObject * get_filter_rate(PyObject * self, PyObject * args)
 		decim_srate = rate / 24;
 		break;
 	default:
-		decim_srate = PlanDecimation(NULL, NULL, NULL);
+		decim_srate = PlanDecimation(rate, NULL, NULL, NULL);
 		break;
 	}
-	if (mode < 0) {
-		mode = rxMode;
-		bandwidth = filter_bandwidth[0];
-	}
 	switch(mode) {
 	case CWL:		// lower sideband CW at 6 ksps
 	case CWU:		// upper sideband CW at 6 ksps
@@ -2855,7 +3484,20 @@ static PyObject * get_filter_rate(PyObject * self, PyObject * args)
 		break;
 	}
 	//QuiskPrintf("Filter rate %d\n", filter_srate);
-	return PyInt_FromLong(filter_srate);
+	return filter_srate;
+}
+
+static PyObject * get_filter_rate(PyObject * self, PyObject * args)
+{	// Return the filter sample rate as used by quisk_process_samples.
+	int mode, bandwidth;
+	// mode is -1 to use the rxMode
+	if (!PyArg_ParseTuple (args, "ii", &mode, &bandwidth))
+		return NULL;
+	if (mode < 0) {
+		mode = rxMode;
+		bandwidth = filter_bandwidth[0];
+	}
+	return PyInt_FromLong(rx_filter_rate(quisk_sound_state.sample_rate, mode, bandwidth));
 }
 
 static PyObject * get_smeter(PyObject * self, PyObject * args)
@@ -2882,7 +3524,9 @@ static void init_bandscope(void)
 		bandscopeWindow = (double *)malloc(bandscope_size * sizeof(double));
 		bandscopeAverage = (double *)malloc((bandscope_size / 2 + 1 + 1) * sizeof(double));
 		bandscopeFFT = (complex double *)malloc((bandscope_size / 2 + 1) * sizeof(complex double));
+		quisk_fftw_plan_lock();
 		bandscopePlan = fftw_plan_dft_r2c_1d(bandscope_size, bandscopeSamples, bandscopeFFT, FFTW_MEASURE);
+		quisk_fftw_plan_unlock();
 		// Create the fft window
 		for (i = 0, j = -bandscope_size / 2; i < bandscope_size; i++, j++)
 			bandscopeWindow[i] = 0.5 + 0.5 * cos(2. * M_PI * j / bandscope_size);	// Hanning
@@ -3024,7 +3668,9 @@ static void py_sample_start(void)
 static void py_sample_stop(void)
 {
 	if (bandscopePlan) {
+		quisk_fftw_plan_lock();
 		fftw_destroy_plan(bandscopePlan);
+		quisk_fftw_plan_unlock();
 		bandscopePlan = NULL;
 	}
 }
@@ -3062,6 +3708,14 @@ static PyObject * get_params(PyObject * self, PyObject * args)
 		return PyInt_FromLong((long)softrock_correct_active);
 	if (strcmp(name, "quisk_tx_inhibit") == 0)
 		return PyInt_FromLong((long)quisk_tx_inhibit);
+	if (strcmp(name, "latency") == 0)	// measured Rx to speaker latency in milliseconds
+		return Py_BuildValue("{sdsdsdsdsisi}",
+			"total", (quisk_sound_state.latency_capt + quisk_sound_state.latency_dsp + quisk_sound_state.latency_play) * 1E3,
+			"capture", quisk_sound_state.latency_capt * 1E3,
+			"dsp", quisk_sound_state.latency_dsp * 1E3,
+			"play", quisk_sound_state.latency_play * 1E3,
+			"low_latency", quisk_sound_state.low_latency,
+			"realtime", quisk_sound_state.realtime);
 	Py_INCREF (Py_None);
 	return Py_None;
 }
@@ -3261,7 +3915,9 @@ static void close_udp10(void)		// Metis-Hermes protocol
 	quisk_rx_udp_started = 0;
 	quisk_multirx_state = 0;
 	if (bandscopePlan) {
+		quisk_fftw_plan_lock();
 		fftw_destroy_plan(bandscopePlan);
+		quisk_fftw_plan_unlock();
 		bandscopePlan = NULL;
 	}
 #ifdef MS_WINDOWS
@@ -3516,6 +4172,141 @@ static int quisk_hermes_is_ready(int rx_udp_socket)
 	}
 }
 
+static void hl2_cmd_done(int status, unsigned char * response)
+{	// The first command in the queue is finished.  Called from the sound thread.
+	struct hl2_cmd_t * cmd;
+	struct hl2_result_t * result;
+
+	cmd = hl2_cmd_queue + (hl2_cmd_read & (HL2_CMD_QUEUE_SIZE - 1));
+	if (hl2_result_write - hl2_result_read < HL2_CMD_QUEUE_SIZE) {	// else the result is lost
+		result = hl2_result_queue + (hl2_result_write & (HL2_CMD_QUEUE_SIZE - 1));
+		result->tag = cmd->tag;
+		result->status = status;
+		if (response)
+			memcpy(result->response, response, 5);
+		else
+			memset(result->response, 0, 5);
+		hl2_result_write++;
+	}
+	if (cmd->tag == hl2_legacy_tag)
+		hl2_legacy_tag = 0;
+	hl2_cmd_waiting = 0;
+	hl2_done_time = QuiskTimeSec();
+	hl2_cmd_read++;
+}
+
+int quisk_hl2_cmd_next(unsigned char * cc, int allow_ack)
+{	// Put the next command into the C0 to C4 slot cc.  Return 1 if the slot was used.  Called from the sound thread.
+	static double start_time = 0;
+	struct hl2_cmd_t * cmd;
+	double now;
+
+	if (hl2_cmd_read == hl2_cmd_write)
+		return 0;
+	now = QuiskTimeSec();
+	if (start_time == 0)
+		start_time = now + 0.050;	// initial delay
+	if (now < start_time)
+		return 0;
+	if (hl2_cmd_waiting) {
+		if (now - hl2_ack_time > HL2_ACK_TIMEOUT) {
+			QuiskPrintf("ERROR: Hermes-Lite command queue timeout, queue 0x%X\n", hl2_cmd_queue[hl2_cmd_read & (HL2_CMD_QUEUE_SIZE - 1)].cc[0]);
+			hl2_cmd_done(1, NULL);
+		}
+		return 0;
+	}
+	cmd = hl2_cmd_queue + (hl2_cmd_read & (HL2_CMD_QUEUE_SIZE - 1));
+	if (now - hl2_done_time < cmd->delay)
+		return 0;
+	if (cmd->cc[0] & 0x40) {		// ACK requested
+		if ( ! allow_ack || now - hl2_ack_time < HL2_ACK_SPACING)
+			return 0;
+		hl2_cmd_waiting = 1;
+		hl2_ack_time = now;
+	}
+	cc[0] = cmd->cc[0] << 1 | hermes_mox_bit;
+	cc[1] = cmd->cc[1];
+	cc[2] = cmd->cc[2];
+	cc[3] = cmd->cc[3];
+	cc[4] = cmd->cc[4];
+	if ( ! hl2_cmd_waiting)		// no acknowledge requested so fire and forget
+		hl2_cmd_done(0, NULL);
+	return 1;
+}
+
+static void hl2_cmd_response(unsigned char * cc)
+{	// Record the ACK response C0 to C4 from the Hermes-Lite.  Called from the sound thread.
+	int dindex;
+
+	dindex = cc[0] >> 1;
+	if ( ! hl2_cmd_waiting) {
+		QuiskPrintf("ERROR: ACK response for 0x%X but no request outstanding\n",dindex);
+		return;
+	}
+	memcpy(quisk_hermeslite_response, cc, 5);	// Save response
+	// Look for match
+	if (dindex == 0x7f) {
+		QuiskPrintf("ERROR: Hermes-Lite did not process ACK command. Send again.\n");
+		hl2_cmd_waiting = 0;
+	}
+	else if (dindex != hl2_cmd_queue[hl2_cmd_read & (HL2_CMD_QUEUE_SIZE - 1)].cc[0]) {
+		QuiskPrintf("ERROR: Nonmatching Hermes-Lite ACK response 0x%X seen\n",dindex);
+	}
+	else {
+		hl2_cmd_done(0, cc);
+	}
+}
+
+static unsigned int hl2_cmd_add(unsigned char * cc, double delay)
+{	// Add a command to the queue.  Return its tag, or zero if the queue is full.  Called from the GUI thread.
+	struct hl2_cmd_t * cmd;
+
+	if (hl2_cmd_write - hl2_cmd_read >= HL2_CMD_QUEUE_SIZE)
+		return 0;
+	cmd = hl2_cmd_queue + (hl2_cmd_write & (HL2_CMD_QUEUE_SIZE - 1));
+	memcpy(cmd->cc, cc, 5);
+	cmd->delay = delay;
+	if (++hl2_cmd_tag == 0)
+		hl2_cmd_tag = 1;
+	cmd->tag = hl2_cmd_tag;
+	hl2_cmd_write++;
+	return cmd->tag;
+}
+
+static void multirx_fft_next_ready(void)
+{	// Choose the sub-receiver for the next FFT. Called from the sound thread.
+	if (multirx_fft_next_state == 2) {		// previous FFT is done
+		if (++multirx_fft_next_index >= quisk_multirx_count)
+			multirx_fft_next_index = 0;
+		multirx_fft_next_state = 0;
+	}
+	if (quisk_multirx_count && multirx_fft_next_state == 0 && multirx_fft_data[multirx_fft_next_index].index >= multirx_fft_width) {		// FFT is read to run
+		memcpy(multirx_fft_next_samples, multirx_fft_data[multirx_fft_next_index].samples, multirx_fft_width * sizeof(fftw_complex));
+		multirx_fft_data[multirx_fft_next_index].index = 0;
+		multirx_fft_next_time = 1.0 / graph_refresh / quisk_multirx_count;
+		multirx_fft_next_state = 1;			// this FFT is ready to run
+	}
+}
+
+static void multirx_alloc_samples(int want_samples)
+{	// Make sure the sub-receiver sample arrays exist and are large enough
+	static int max_multirx_count=0;
+	int i;
+
+	if (multirx_sample_size < want_samples + 2000) {
+		multirx_sample_size = want_samples * 2 + 2000;
+		for (i = 0; i < max_multirx_count; i++) {
+			free(multirx_cSamples[i]);
+			multirx_cSamples[i] = (complex double *)malloc(multirx_sample_size * sizeof(complex double));
+		}
+	}
+	if (quisk_multirx_count > max_multirx_count) {
+		for (i = max_multirx_count; i < quisk_multirx_count; i++)
+			multirx_cSamples[i] = (complex double *)malloc(multirx_sample_size * sizeof(complex double));
+		max_multirx_count = quisk_multirx_count;
+	}
+}
+
 static int read_rx_udp10(complex double * samp)	// Read samples from UDP using the Hermes protocol.
 {		// Size of complex sample array is SAMP_BUFFER_SIZE.  Called from the sound thread.
 	ssize_t bytes;
@@ -3524,7 +4315,6 @@ static int read_rx_udp10(complex double * samp)	// Read samples from UDP using t
 	unsigned int power;
 	static unsigned int seq0;
 	static int tx_records;
-	static int max_multirx_count=0;
 	int i, j, nSamples, xr, xi, index, start, want_samples, dindex, num_records;
 	complex double c;
 	struct timeval tm_wait;
@@ -3543,20 +4333,8 @@ static int read_rx_udp10(complex double * samp)	// Read samples from UDP using t
 	nSamples = 0;
 	want_samples = (int)(quisk_sound_state.data_poll_usec * 1e-6 * quisk_sound_state.sample_rate + 0.5);
 	num_records = 504 / ((quisk_multirx_count + 1) * 6 + 2);	// number of samples in each of two blocks for each receiver
-	if (quisk_multirx_count) {
-		if (multirx_sample_size < want_samples + 2000) {
-			multirx_sample_size = want_samples * 2 + 2000;
-			for (i = 0; i < max_multirx_count; i++) {
-				free(multirx_cSamples[i]);
-				multirx_cSamples[i] = (complex double *)malloc(multirx_sample_size * sizeof(complex double));
-			}
-		}
-		if (quisk_multirx_count > max_multirx_count) {
-			for (i = max_multirx_count; i < quisk_multirx_count; i++)
-				multirx_cSamples[i] = (complex double *)malloc(multirx_sample_size * sizeof(complex double));
-			max_multirx_count = quisk_multirx_count;
-		}
-	}
+	if (quisk_multirx_count)
+		multirx_alloc_samples(want_samples);
 	while (nSamples < want_samples) {		// read several UDP blocks
 		tm_wait.tv_sec = 0;
 		tm_wait.tv_usec = 100000; // Linux seems to have problems with very small time intervals
@@ -3640,27 +4418,7 @@ static int read_rx_udp10(complex double * samp)	// Read samples from UDP using t
 			// Changes for HermesLite v2 thanks to Steve, KF7O
 			dindex = buf[start] >> 1;
 			if (dindex & 0x40) {	// the ACK bit C0[7] is set
-				if (quisk_hermeslite_writepointer > 0) {
-					// Save response
-					quisk_hermeslite_response[0] = buf[start];
-					quisk_hermeslite_response[1] = buf[start+1];
-					quisk_hermeslite_response[2] = buf[start+2];
-					quisk_hermeslite_response[3] = buf[start+3];
-					quisk_hermeslite_response[4] = buf[start+4];
-					// Look for match
-					if (dindex == 0x7f) {
-						QuiskPrintf("ERROR: Hermes-Lite did not process ACK command. Send again.\n");
-						quisk_hermeslite_writepointer = 1;
-					} else if (dindex != (quisk_hermeslite_writequeue[0])) {
-						QuiskPrintf("ERROR: Nonmatching Hermes-Lite ACK response 0x%X seen\n",dindex);
-					} else {
-						//QuiskPrintf("Response received                       queue 0x%X 0x%X 0x%X 0x%X 0x%X\n", quisk_hermeslite_writequeue[0],
-						//quisk_hermeslite_writequeue[1], quisk_hermeslite_writequeue[2], quisk_hermeslite_writequeue[3], quisk_hermeslite_writequeue[4]);
-						quisk_hermeslite_writepointer = 0;
-					} 
-				} else {
-					QuiskPrintf("ERROR: ACK response for 0x%X but no request outstanding\n",dindex);
-				}
+				hl2_cmd_response(buf + start);
 			} else {
 				dindex = dindex >> 2;
 			}
@@ -3804,20 +4562,489 @@ static int read_rx_udp10(complex double * samp)	// Read samples from UDP using t
 		( ! quisk_multirx_count || multirx_fft_next_state == 2)) {		// wait until the current FFT is finished
 			quisk_multirx_state = 0;		// Do not change receiver count without stopping Hermes and restarting
 	}
-	if (multirx_fft_next_state == 2) {		// previous FFT is done
-		if (++multirx_fft_next_index >= quisk_multirx_count)
-			multirx_fft_next_index = 0;
+	multirx_fft_next_ready();
+	return nSamples;
+}
+
+// OpenHPSDR protocol 2.  Each stream from the radio comes from its own UDP source port, so one unconnected
+// socket receives all the streams and the packets are sorted by port.  DDC0 is the main receiver and
+// DDC1, DDC2, ... are the sub-receivers.  The receiver specific, transmitter specific and high priority
+// packets are made in Python and sent from the sound thread when they change.
+#define P2_PORT_RX_SPECIFIC		1025	// PC to radio: receiver specific
+#define P2_PORT_TX_SPECIFIC		1026	// PC to radio: transmitter specific
+#define P2_PORT_HIGH_PRIORITY	1027	// PC to radio: high priority
+#define P2_PORT_RX_AUDIO		1028	// PC to radio: audio samples
+#define P2_PORT_TX_IQ			1029	// PC to radio: Tx I/Q samples
+#define P2_PORT_STATUS			1025	// radio to PC: high priority status
+#define P2_PORT_MIC				1026	// radio to PC: microphone samples
+#define P2_PORT_WIDEBAND		1027	// radio to PC: wideband ADC0 samples
+#define P2_PORT_DDC0			1035	// radio to PC: DDC0 I/Q samples; DDC1 is 1036, etc.
+#define P2_MAX_DDC				(QUISK_MAX_SUB_RECEIVERS + 1)
+#define P2_DDC_BYTES			1444	// size of a DDC packet
+#define P2_WIDEBAND_BYTES		1028	// size of a wideband packet
+#define P2_BATCH				32		// maximum number of packets read with one system call
+#define P2_PACKET_SIZE			1500
+
+int quisk_hermes_protocol = 1;		// OpenHPSDR protocol 1 or 2 from the config file
+static struct sockaddr_in p2_radio_addr;	// address of the radio; the port is changed for each packet
+static unsigned int p2_seq_general, p2_seq_rx, p2_seq_tx, p2_seq_high;	// sequence numbers of packets to the radio
+static unsigned char p2_rx_specific[1444];		// packets made in Python; the first four bytes are the sequence number
+static unsigned char p2_tx_specific[60];
+static unsigned char p2_high_priority[1444];
+static int p2_changed;					// packets changed by Python: 1 receiver, 2 transmitter, 4 high priority
+#ifdef MS_WINDOWS
+static SRWLOCK p2_lock = SRWLOCK_INIT;	// protects the packets and p2_changed between the GUI and sound threads
+#else
+static pthread_mutex_t p2_mutex = PTHREAD_MUTEX_INITIALIZER;
+#endif
+static int p2_ddc_count;				// number of DDCs in use starting at DDC0
+static unsigned int p2_ddc_seq[P2_MAX_DDC];		// next expected sequence number for each DDC
+static complex double * p2_fifo[P2_MAX_DDC];	// sub-receiver samples waiting for the DDC0 samples
+static int p2_fifo_count[P2_MAX_DDC];			// number of samples in each fifo
+
+static void p2_lock_packets(void)
+{
+#ifdef MS_WINDOWS
+	AcquireSRWLockExclusive(&p2_lock);
+#else
+	pthread_mutex_lock(&p2_mutex);
+#endif
+}
+
+static void p2_unlock_packets(void)
+{
+#ifdef MS_WINDOWS
+	ReleaseSRWLockExclusive(&p2_lock);
+#else
+	pthread_mutex_unlock(&p2_mutex);
+#endif
+}
+
+static void p2_send_copy(int port, unsigned char * buf, int size, unsigned int * seq)
+{	// Send a private copy of a packet to a radio port.  The first four bytes are the sequence number.
+	struct sockaddr_in addr;
+
+	buf[0] = *seq >> 24;
+	buf[1] = *seq >> 16;
+	buf[2] = *seq >> 8;
+	buf[3] = *seq;
+	(*seq)++;
+	addr = p2_radio_addr;
+	addr.sin_port = htons(port);
+	sendto(rx_udp_socket, (char *)buf, size, 0, (const struct sockaddr *)&addr, sizeof(addr));
+}
+
+static void p2_send(int port, unsigned char * buf, int size, unsigned int * seq)
+{	// Send a packet to a radio port.  Python may change the packet at any time, so send a copy made under the lock.
+	unsigned char packet[P2_PACKET_SIZE];
+
+	p2_lock_packets();
+	memcpy(packet, buf, size);
+	p2_unlock_packets();
+	p2_send_copy(port, packet, size, seq);
+}
+
+static void p2_put16(unsigned char * buf, int value)
+{
+	buf[0] = value >> 8;
+	buf[1] = value;
+}
+
+static void p2_send_general(void)
+{	// The general packet sets the port numbers and the wideband data.  Use the default port numbers.
+	unsigned char buf[60];
+
+	memset(buf, 0, 60);
+	buf[4] = 0x00;		// command
+	p2_put16(buf +  5, P2_PORT_RX_SPECIFIC);
+	p2_put16(buf +  7, P2_PORT_TX_SPECIFIC);
+	p2_put16(buf +  9, P2_PORT_HIGH_PRIORITY);
+	p2_put16(buf + 11, P2_PORT_STATUS);
+	p2_put16(buf + 13, P2_PORT_RX_AUDIO);
+	p2_put16(buf + 15, P2_PORT_TX_IQ);
+	p2_put16(buf + 17, P2_PORT_DDC0);
+	p2_put16(buf + 19, P2_PORT_MIC);
+	p2_put16(buf + 21, P2_PORT_WIDEBAND);
+	if (enable_bandscope && bandscopeSamples)
+		buf[23] = 0x01;		// enable wideband data for ADC0
+	p2_put16(buf + 24, 512);	// wideband samples per packet
+	buf[26] = 16;				// wideband bits per sample
+	buf[27] = 1000 / graph_refresh;	// wideband update rate in milliseconds
+	buf[28] = bandscopeBlockCount;	// wideband packets in each block
+	buf[37] = 0x08;				// the frequencies in the high priority packet are phase words
+	p2_send(1024, buf, 60, &p2_seq_general);
+}
+
+static void p2_send_high_priority(int run)
+{	// Send the high priority packet with the current run and PTT bits
+	unsigned char packet[P2_PACKET_SIZE];
+
+	p2_lock_packets();
+	p2_high_priority[4] = (run ? 0x01 : 0) | (hermes_mox_bit ? 0x02 : 0);
+	memcpy(packet, p2_high_priority, 1444);
+	p2_unlock_packets();
+	p2_send_copy(P2_PORT_HIGH_PRIORITY, packet, 1444, &p2_seq_high);
+}
+
+static void p2_send_changes(void)
+{	// Send the packets that have changed.  Resend the high priority packet as a keep-alive.
+	static int old_mox_bit = 0;
+	static double time0 = 0;
+	int changed;
+	double now;
+
+	p2_lock_packets();
+	changed = p2_changed;
+	p2_changed = 0;
+	p2_unlock_packets();
+	if (changed & 0x01)
+		p2_send(P2_PORT_RX_SPECIFIC, p2_rx_specific, 1444, &p2_seq_rx);
+	if (changed & 0x02)
+		p2_send(P2_PORT_TX_SPECIFIC, p2_tx_specific, 60, &p2_seq_tx);
+	now = QuiskTimeSec();
+	if ((changed & 0x04) || hermes_mox_bit != old_mox_bit || now - time0 > 0.5) {
+		old_mox_bit = hermes_mox_bit;
+		time0 = now;
+		p2_send_high_priority(1);
+	}
+}
+
+static int p2_count_ddc(void)
+{	// Return the number of consecutive DDCs starting at DDC0 enabled in the receiver specific packet
+	int i;
+
+	p2_lock_packets();
+	for (i = 0; i < P2_MAX_DDC; i++)
+		if ( ! (p2_rx_specific[7 + i / 8] & (1 << (i % 8))))
+			break;
+	p2_unlock_packets();
+	return i;
+}
+
+static void p2_flush(void)
+{	// Throw away all pending packets
+	unsigned char buf[P2_PACKET_SIZE];
+	struct timeval tm_wait;
+	fd_set fds;
+
+	while (1) {
+		tm_wait.tv_sec = 0;
+		tm_wait.tv_usec = 0;
+		FD_ZERO (&fds);
+		FD_SET (rx_udp_socket, &fds);
+		if (select (rx_udp_socket + 1, &fds, NULL, NULL, &tm_wait) != 1)
+			break;
+		recv(rx_udp_socket, (char *)buf, P2_PACKET_SIZE,  0);
+	}
+}
+
+static int quisk_hermes_p2_is_ready(void)
+{		// Start the radio; return 1 when we are ready to receive data
+	int i;
+
+	if (rx_udp_socket == INVALID_SOCKET)
+		return 0;
+	switch (quisk_multirx_state) {
+	case 0:			// Start or restart
+	case 20:		// Temporary shutdown
+		quisk_rx_udp_started = 0;
+		p2_send_high_priority(0);		// send Stop
+		quisk_multirx_state++;
+		QuiskSleepMicrosec(9000);
+		return 0;
+	case 1:
+	case 21:
+		p2_flush();
+		// change to state 2 for startup
+		// change to state 22 for temporary shutdown
+		quisk_multirx_state++;
+		return 0;
+	case 2:
+		p2_ddc_count = p2_count_ddc();
+		if (p2_ddc_count < 1)
+			p2_ddc_count = 1;
+		quisk_multirx_count = p2_ddc_count - 1;		// number of sub-receivers
+		for (i = 0; i < quisk_multirx_count; i++)
+			if ( ! multirx_fft_data[i].samples)		// Check that buffer exists
+				multirx_fft_data[i].samples = (fftw_complex *)malloc(multirx_fft_width * sizeof(fftw_complex));
+		for (i = 0; i < p2_ddc_count; i++) {
+			p2_ddc_seq[i] = 0;
+			p2_fifo_count[i] = 0;
+			if (i > 0 && ! p2_fifo[i])
+				p2_fifo[i] = (complex double *)malloc(SAMP_BUFFER_SIZE * sizeof(complex double));
+		}
+		p2_lock_packets();
+		p2_changed = 0;
+		p2_unlock_packets();
+		p2_send_general();
+		p2_send(P2_PORT_RX_SPECIFIC, p2_rx_specific, 1444, &p2_seq_rx);
+		p2_send(P2_PORT_TX_SPECIFIC, p2_tx_specific, 60, &p2_seq_tx);
+		p2_send_high_priority(1);		// send Run
+		quisk_multirx_state++;
+		return 1;
+	case 3:		// running state
+	default:
+		return 1;
+	case 22:
+		quisk_multirx_state++;
+		return 0;
+	case 23:	// we are in a temporary shutdown
+		return 0;
+	}
+}
+
+static int p2_recv_batch(unsigned char (* bufs)[P2_PACKET_SIZE], int * lengths, int * ports)
+{	// Read up to P2_BATCH packets with one call if possible. Return the number of packets, or -1 on timeout.
+	struct sockaddr_in addrs[P2_BATCH];
+	struct timeval tm_wait;
+	fd_set fds;
+	int i, n;
+
+	tm_wait.tv_sec = 0;
+	tm_wait.tv_usec = 100000; // Linux seems to have problems with very small time intervals
+	FD_ZERO (&fds);
+	FD_SET (rx_udp_socket, &fds);
+	if (select (rx_udp_socket + 1, &fds, NULL, NULL, &tm_wait) != 1)		// blocking wait
+		return -1;
+#ifdef __linux__
+	struct mmsghdr msgs[P2_BATCH];
+	struct iovec iovecs[P2_BATCH];
+
+	memset(msgs, 0, sizeof(msgs));
+	for (i = 0; i < P2_BATCH; i++) {
+		iovecs[i].iov_base = bufs[i];
+		iovecs[i].iov_len = P2_PACKET_SIZE;
+		msgs[i].msg_hdr.msg_iov = iovecs + i;
+		msgs[i].msg_hdr.msg_iovlen = 1;
+		msgs[i].msg_hdr.msg_name = addrs + i;
+		msgs[i].msg_hdr.msg_namelen = sizeof(struct sockaddr_in);
+	}
+	n = recvmmsg(rx_udp_socket, msgs, P2_BATCH, MSG_DONTWAIT, NULL);
+	if (n < 0)
+		return 0;
+	for (i = 0; i < n; i++) {
+		lengths[i] = msgs[i].msg_len;
+		ports[i] = ntohs(addrs[i].sin_port);
+	}
+#else
+#ifdef MS_WINDOWS
+	int addrlen;
+#else
+	socklen_t addrlen;
+#endif
+	for (n = 0; n < P2_BATCH; n++) {
+		if (n > 0) {		// only read packets that are already waiting
+			tm_wait.tv_sec = 0;
+			tm_wait.tv_usec = 0;
+			FD_ZERO (&fds);
+			FD_SET (rx_udp_socket, &fds);
+			if (select (rx_udp_socket + 1, &fds, NULL, NULL, &tm_wait) != 1)
+				break;
+		}
+		addrlen = sizeof(struct sockaddr_in);
+		i = recvfrom(rx_udp_socket, (char *)bufs[n], P2_PACKET_SIZE, 0, (struct sockaddr *)(addrs + n), &addrlen);
+		if (i <= 0)
+			break;
+		lengths[n] = i;
+		ports[n] = ntohs(addrs[n].sin_port);
+	}
+#endif
+	return n;
+}
+
+static int p2_ddc_samples(unsigned char * buf, int bytes, complex double * samp)
+{	// Convert the 24-bit samples in a DDC packet.  Return the number of samples or -1 for an error.
+	int i, index, count, xr, xi;
+
+	count = buf[14] << 8 | buf[15];		// samples in this packet
+	if ((buf[12] << 8 | buf[13]) != 24 || 16 + count * 6 > bytes)
+		return -1;
+	for (i = 0, index = 16; i < count; i++, index += 6) {
+		xi = buf[index    ] << 24 | buf[index + 1] << 16 | buf[index + 2] << 8;
+		xr = buf[index + 3] << 24 | buf[index + 4] << 16 | buf[index + 5] << 8;
+		samp[i] = xr + xi * I;
+	}
+	return count;
+}
+
+static void p2_status(unsigned char * buf)
+{	// Record the high priority status from the radio
+	unsigned int power;
+
+	if (buf[5])		// ADC overload bits
+		quisk_sound_state.overrange++;
+	hardware_ptt = buf[4] & 0x01;
+	quisk_hardware_cwkey = (buf[4] & 0x02) >> 1;	// dot
+	hpsdr_AIN5 += buf[6] << 8 | buf[7];		// exciter power
+	power = buf[14] << 8 | buf[15];		// forward power
+	hpsdr_AIN1_avg += power;
+	hpsdr_AIN1_peak = fmax(hpsdr_AIN1_peak, (double)power);
+	hpsdr_AIN5_count++;
+	power = buf[22] << 8 | buf[23];		// reverse power
+	hpsdr_AIN2_avg += power;
+	hpsdr_AIN2_peak = fmax(hpsdr_AIN2_peak, (double)power);
+	hpsdr_AIN3 += buf[51] << 8 | buf[52];	// PA current
+	hpsdr_AIN3_count++;
+	if (quisk_hardware_cwkey != old_hardware_cwkey) {
+		old_hardware_cwkey = quisk_hardware_cwkey;
+		quisk_set_play_state();
+	}
+}
+
+static void p2_wideband(unsigned char * buf)
+{	// Record the ADC samples for the bandscope.  The samples are big-endian.
+	unsigned int seq;
+	int i, j;
+
+	seq = buf[0] << 24 | buf[1] << 16 | buf[2] << 8 | buf[3];
+	seq = seq & (bandscopeBlockCount - 1);	// 0, 1, 2, ...
+	if (bandscopeState == 99)	// wait until the complete block is used
+		return;
+	if (bandscopeState == 0 && seq != 0)	// wait for the start of a block
+		return;
+	if (seq != bandscopeState) {
+		bandscopeState = 0;		// Error
+		return;
+	}
+	for (i = 0, j = 4; i < 512; i++, j += 2)
+		bandscopeSamples[i + 512 * seq] = ((double)(short)(buf[j] << 8 | buf[j + 1])) / bandscopeScale;
+	if (++bandscopeState >= bandscopeBlockCount)
+		bandscopeState = 99;
+}
+
+static int read_rx_udp_p2(complex double * samp)	// Read samples from UDP using OpenHPSDR protocol 2.
+{		// Size of complex sample array is SAMP_BUFFER_SIZE.  Called from the sound thread.
+	static unsigned char (* bufs)[P2_PACKET_SIZE] = NULL;
+	int lengths[P2_BATCH], ports[P2_BATCH];
+	unsigned int seq;
+	int i, j, k, n, nSamples, want_samples, ddc, count;
+	complex double * fifo;
+
+	if ( ! quisk_hermes_p2_is_ready()) {
+		quisk_rx_udp_started = 0;
+		multirx_fft_next_index = 0;
 		multirx_fft_next_state = 0;
+		for (i = 0; i < QUISK_MAX_SUB_RECEIVERS; i++)
+			multirx_fft_data[i].index = 0;
+		return 0;
 	}
-	if (quisk_multirx_count && multirx_fft_next_state == 0 && multirx_fft_data[multirx_fft_next_index].index >= multirx_fft_width) {		// FFT is read to run
-		memcpy(multirx_fft_next_samples, multirx_fft_data[multirx_fft_next_index].samples, multirx_fft_width * sizeof(fftw_complex));
-		multirx_fft_data[multirx_fft_next_index].index = 0;
-		multirx_fft_next_time = 1.0 / graph_refresh / quisk_multirx_count;
-		multirx_fft_next_state = 1;			// this FFT is ready to run
+	if ( ! bufs)
+		bufs = malloc(P2_BATCH * P2_PACKET_SIZE);
+	p2_send_changes();
+	nSamples = 0;
+	want_samples = (int)(quisk_sound_state.data_poll_usec * 1e-6 * quisk_sound_state.sample_rate + 0.5);
+	if (quisk_multirx_count)
+		multirx_alloc_samples(want_samples);
+	// Leave room in samp for a complete batch of DDC0 packets
+	while (nSamples < want_samples && nSamples + P2_BATCH * 256 < SAMP_BUFFER_SIZE) {
+		n = p2_recv_batch(bufs, lengths, ports);
+		if (n < 0) {
+#if DEBUG_IO
+			QuiskPrintf("Udp socket timeout\n");
+#endif
+			break;
+		}
+		for (k = 0; k < n; k++) {
+			unsigned char * buf = bufs[k];
+			if (ports[k] >= P2_PORT_DDC0 && ports[k] < P2_PORT_DDC0 + p2_ddc_count) {
+				if (lengths[k] != P2_DDC_BYTES) {
+					quisk_sound_state.read_error++;
+					continue;
+				}
+				ddc = ports[k] - P2_PORT_DDC0;
+				seq = buf[0] << 24 | buf[1] << 16 | buf[2] << 8 | buf[3];
+				if (seq != p2_ddc_seq[ddc]) {
+#if DEBUG_IO
+					QuiskPrintf("read_rx_udp_p2: DDC%d bad sequence want %d got %d\n", ddc, p2_ddc_seq[ddc], seq);
+#endif
+					quisk_sound_state.read_error++;
+				}
+				p2_ddc_seq[ddc] = seq + 1;
+				if (ddc == 0) {
+					count = p2_ddc_samples(buf, lengths[k], samp + nSamples);
+					if (count > 0) {
+						nSamples += count;
+						quisk_rx_udp_started = 1;
+					}
+				}
+				else {
+					if (p2_fifo_count[ddc] + 256 > SAMP_BUFFER_SIZE) {	// overflow; throw away the old samples
+						quisk_sound_state.read_error++;
+						p2_fifo_count[ddc] = 0;
+					}
+					fifo = p2_fifo[ddc] + p2_fifo_count[ddc];
+					count = p2_ddc_samples(buf, lengths[k], fifo);
+					if (count > 0) {
+						p2_fifo_count[ddc] += count;
+						j = ddc - 1;
+						for (i = 0; i < count && multirx_fft_data[j].index < multirx_fft_width; i++)
+							multirx_fft_data[j].samples[multirx_fft_data[j].index++] = fifo[i];
+					}
+				}
+				if (count < 0)
+					quisk_sound_state.read_error++;
+			}
+			else if (ports[k] == P2_PORT_STATUS && lengths[k] >= 60) {
+				p2_status(buf);
+			}
+			else if (ports[k] == P2_PORT_WIDEBAND && lengths[k] == P2_WIDEBAND_BYTES) {
+				if (bandscopeSamples)
+					p2_wideband(buf);
+			}
+			// Microphone samples are not used
+		}
+	}
+	// The sub-receivers must have the same number of samples as the main receiver
+	for (j = 0; j < quisk_multirx_count; j++) {
+		ddc = j + 1;
+		count = p2_fifo_count[ddc];
+		if (count >= nSamples) {
+			memcpy(multirx_cSamples[j], p2_fifo[ddc], nSamples * sizeof(complex double));
+			memmove(p2_fifo[ddc], p2_fifo[ddc] + nSamples, (count - nSamples) * sizeof(complex double));
+			p2_fifo_count[ddc] = count - nSamples;
+		}
+		else {		// not enough samples yet; pad with zeros at the start
+			memset(multirx_cSamples[j], 0, (nSamples - count) * sizeof(complex double));
+			memcpy(multirx_cSamples[j] + nSamples - count, p2_fifo[ddc], count * sizeof(complex double));
+			p2_fifo_count[ddc] = 0;
+		}
+	}
+	if (p2_count_ddc() != p2_ddc_count &&		// change in number of receivers
+		( ! quisk_multirx_count || multirx_fft_next_state == 2)) {		// wait until the current FFT is finished
+			quisk_multirx_state = 0;		// restart with the new receivers
 	}
+	multirx_fft_next_ready();
 	return nSamples;
 }
 
+static void close_udp_p2(void)		// OpenHPSDR protocol 2
+{
+	quisk_using_udp = 0;
+	if (rx_udp_socket != INVALID_SOCKET) {
+		shutdown(rx_udp_socket, QUISK_SHUT_RD);
+		p2_send_high_priority(0);		// send Stop
+		QuiskSleepMicrosec(5000);
+		p2_send_high_priority(0);
+		QuiskSleepMicrosec(100000);
+		close(rx_udp_socket);
+		rx_udp_socket = INVALID_SOCKET;
+	}
+	quisk_rx_udp_started = 0;
+	quisk_multirx_state = 0;
+	if (bandscopePlan) {
+		quisk_fftw_plan_lock();
+		fftw_destroy_plan(bandscopePlan);
+		quisk_fftw_plan_unlock();
+		bandscopePlan = NULL;
+	}
+#ifdef MS_WINDOWS
+	if (cleanupWSA) {
+		cleanupWSA = 0;
+		WSACleanup();
+	}
+#endif
+}
+
 static int read_rx_udp17(complex double * cSamples0)	// Read samples from UDP
 {		// Size of complex sample array is SAMP_BUFFER_SIZE
 	ssize_t bytes;
@@ -4049,7 +5276,25 @@ static PyObject * open_rx_udp(PyObject * self, PyObject * args)
 #else
 		inet_aton(ip, &Addr.sin_addr);
 #endif
-		if (connect(rx_udp_socket, (const struct sockaddr *)&Addr, sizeof(Addr)) != 0) {
+		if (quisk_use_rx_udp == 10 && quisk_hermes_protocol == 2) {
+			// Protocol 2 streams come from different radio ports, so the socket is not connected
+			p2_radio_addr = Addr;
+			memset(&Addr, 0, sizeof(Addr));
+			Addr.sin_family = AF_INET;
+			Addr.sin_port = htons(0);
+			Addr.sin_addr.s_addr = htonl(INADDR_ANY);
+			if (bind(rx_udp_socket, (const struct sockaddr *)&Addr, sizeof(Addr)) != 0) {
+				close(rx_udp_socket);
+				rx_udp_socket = INVALID_SOCKET;
+				sprintf(buf, "Failed to bind UDP socket for %s", ip);
+			}
+			else {
+				sprintf(buf, "Capture from UDP %s protocol 2", ip);
+				quisk_sample_source(NULL, close_udp_p2, read_rx_udp_p2);
+				init_bandscope();
+			}
+		}
+		else if (connect(rx_udp_socket, (const struct sockaddr *)&Addr, sizeof(Addr)) != 0) {
 			shutdown(rx_udp_socket, QUISK_SHUT_BOTH);
 			close(rx_udp_socket);
 			rx_udp_socket = INVALID_SOCKET;
@@ -4112,6 +5357,15 @@ static PyObject * open_sound(PyObject * self, PyObject * args)
 	strMcpy(quisk_sound_state.mic_ip, mip, IP_SIZE);
 	strMcpy(quisk_sound_state.IQ_server, QuiskGetConfigString("IQ_Server_IP", ""), IP_SIZE);
 	quisk_sound_state.verbose_sound = quisk_sound_state.verbose_pulse = QuiskGetConfigInt("pulse_audio_verbose_output", 0);
+	quisk_sound_state.low_latency = QuiskGetConfigInt("low_latency_mode", 0);
+	if (quisk_sound_state.low_latency) {	// use small blocks and a short play buffer
+		if (quisk_sound_state.data_poll_usec > 2000)
+			quisk_sound_state.data_poll_usec = 2000;
+		if (quisk_sound_state.latency_millisecs > 50)
+			quisk_sound_state.latency_millisecs = 50;
+	}
+	quisk_sound_state.realtime = 0;
+	quisk_sound_state.latency_capt = quisk_sound_state.latency_dsp = quisk_sound_state.latency_play = 0;
 	fft_error = 0;
 	quisk_open_sound();
 	quisk_open_mic();
@@ -4122,6 +5376,7 @@ static void configure_sound_thread(int job)   // called from the sound thread ex
 {
 #ifdef MS_WINDOWS
 	DWORD taskIndex;
+	HANDLE hTask;
 	TIMECAPS tcaps;
 	static UINT timer_msec;   // timer resolution in milliseconds;
 
@@ -4136,8 +5391,15 @@ static void configure_sound_thread(int job)   // called from the sound thread ex
 				QuiskPrintf("Failed to set thread priority\n");
 #endif
 		taskIndex = 0;
-		if (AvSetMmThreadCharacteristics(TEXT("Pro Audio"), &taskIndex) == 0 && quisk_sound_state.verbose_sound)
+		hTask = AvSetMmThreadCharacteristics(TEXT("Pro Audio"), &taskIndex);
+		if (hTask == 0 && quisk_sound_state.verbose_sound)
 			QuiskPrintf("Failed to set sound thread to Pro Audio\n");
+		if (hTask && quisk_sound_state.low_latency) {
+			if (AvSetMmThreadPriority(hTask, AVRT_PRIORITY_CRITICAL))
+				quisk_sound_state.realtime = 1;
+			else if (quisk_sound_state.verbose_sound)
+				QuiskPrintf("Failed to set sound thread to critical priority\n");
+		}
 		timer_msec = 5;
 		if (timeGetDevCaps(&tcaps, sizeof(TIMECAPS)) == MMSYSERR_NOERROR) {
 			if (timer_msec < tcaps.wPeriodMin)
@@ -4157,6 +5419,31 @@ static void configure_sound_thread(int job)   // called from the sound thread ex
 			QuiskPrintf ("Failed to clear timer resolution\n");
                 break;
 	}
+#else
+	struct sched_param param;
+
+	switch (job) {
+	case 0:		// start sound thread
+		if ( ! quisk_sound_state.low_latency)
+			break;
+		// Use a modest real-time priority so the sound thread runs ahead of the GUI and other programs.
+		// This needs permission, for example "@audio - rtprio 95" in /etc/security/limits.conf.
+		param.sched_priority = sched_get_priority_min(SCHED_FIFO) + 10;
+		if (param.sched_priority > sched_get_priority_max(SCHED_FIFO))
+			param.sched_priority = sched_get_priority_max(SCHED_FIFO);
+		if (pthread_setschedparam(pthread_self(), SCHED_FIFO, &param) == 0)
+			quisk_sound_state.realtime = 1;
+		else if (quisk_sound_state.verbose_sound)
+			QuiskPrintf("Failed to set real-time priority for the sound thread\n");
+		break;
+	case 2:		// stop sound thread
+		if (quisk_sound_state.realtime) {
+			param.sched_priority = 0;
+			pthread_setschedparam(pthread_self(), SCHED_OTHER, &param);
+			quisk_sound_state.realtime = 0;
+		}
+		break;
+	}
 #endif
 }
 
@@ -4199,6 +5486,9 @@ static PyObject * close_sound(PyObject * self, PyObject * args)         // calle
 		return NULL;
 	quisk_close_mic();
 	quisk_close_sound();
+Py_BEGIN_ALLOW_THREADS
+	quisk_demod_plugin_stop();	// The plug-in thread may be waiting for the GIL
+Py_END_ALLOW_THREADS
 #if SAMPLES_FROM_FILE
     QuiskWavClose(&hWav);
 #endif
@@ -4312,6 +5602,50 @@ static PyObject * pc_to_hermes(PyObject * self, PyObject * args)
 	return Py_None;
 }
 
+static PyObject * pc_to_hermes_p2(PyObject * self, PyObject * args)
+{	// Set the receiver specific, transmitter specific or high priority packet for protocol 2
+	int port, size, bit;
+	unsigned char * packet;
+	PyObject * byteArray;
+
+	if (!PyArg_ParseTuple (args, "iO", &port, &byteArray))
+		return NULL;
+	switch (port) {
+	case P2_PORT_RX_SPECIFIC:
+		packet = p2_rx_specific;
+		size = sizeof(p2_rx_specific);
+		bit = 0x01;
+		break;
+	case P2_PORT_TX_SPECIFIC:
+		packet = p2_tx_specific;
+		size = sizeof(p2_tx_specific);
+		bit = 0x02;
+		break;
+	case P2_PORT_HIGH_PRIORITY:
+		packet = p2_high_priority;
+		size = sizeof(p2_high_priority);
+		bit = 0x04;
+		break;
+	default:
+		PyErr_SetString (QuiskError, "Unknown protocol 2 port.");
+		return NULL;
+	}
+	if ( ! PyByteArray_Check(byteArray)) {
+		PyErr_SetString (QuiskError, "Object is not a bytearray.");
+		return NULL;
+	}
+	if (PyByteArray_Size(byteArray) != size) {
+		PyErr_SetString (QuiskError, "Wrong bytearray size for this port.");
+		return NULL;
+	}
+	p2_lock_packets();		// the sound thread sends these packets
+	memmove(packet + 4, PyByteArray_AsString(byteArray) + 4, size - 4);	// the sequence number is added when sent
+	p2_changed |= bit;
+	p2_unlock_packets();
+	Py_INCREF (Py_None);
+	return Py_None;
+}
+
 // Changes for HermesLite v2 thanks to Steve, KF7O
 static PyObject * pc_to_hermeslite_writequeue(PyObject * self, PyObject * args)
 {
@@ -4333,22 +5667,63 @@ static PyObject * pc_to_hermeslite_writequeue(PyObject * self, PyObject * args)
 }
 
 static PyObject * set_hermeslite_writepointer(PyObject * self, PyObject * args)
-{
-	if (!PyArg_ParseTuple (args, "I", &quisk_hermeslite_writepointer))
+{	// Set to 1 to add the writequeue to the command queue, or 0 to stop waiting for the command
+	unsigned int pointer;
+
+	if (!PyArg_ParseTuple (args, "I", &pointer))
 		return NULL;
-	if (quisk_hermeslite_writepointer > 4 || quisk_hermeslite_writepointer < 0) {
+	if (pointer > 4) {
 		PyErr_SetString (QuiskError, "Hermeslite writepointer must be >=0 and <=4.");
 		return NULL;		
 	}
+	if (pointer == 1)
+		hl2_legacy_tag = hl2_cmd_add(quisk_hermeslite_writequeue, 0.0);
+	else if (pointer == 0)
+		hl2_legacy_tag = 0;
 	Py_INCREF (Py_None);
 	return Py_None;
 }
 
 static PyObject * get_hermeslite_writepointer(PyObject * self, PyObject * args)
-{
+{	// Return 2 while the writequeue command is waiting, else zero
+	if (!PyArg_ParseTuple (args, ""))
+		return NULL;
+	return Py_BuildValue("I", hl2_legacy_tag ? 2 : 0);
+}
+
+static PyObject * hermeslite_command(PyObject * self, PyObject * args)
+{	// Add a command C0 to C4 to the Hermes-Lite command queue.  Return its tag, or zero if the queue is full.
+	int c0, c1, c2, c3, c4;
+	double delay = 0;		// time to wait after the previous command in seconds
+	unsigned char cc[5];
+
+	if (!PyArg_ParseTuple (args, "iiiii|d", &c0, &c1, &c2, &c3, &c4, &delay))
+		return NULL;
+	cc[0] = c0;
+	cc[1] = c1;
+	cc[2] = c2;
+	cc[3] = c3;
+	cc[4] = c4;
+	return PyInt_FromLong(hl2_cmd_add(cc, delay));
+}
+
+static PyObject * hermeslite_results(PyObject * self, PyObject * args)
+{	// Return a list of (tag, status, response) for the finished commands
+	struct hl2_result_t * result;
+	PyObject * pylist, * tup;
+
 	if (!PyArg_ParseTuple (args, ""))
 		return NULL;
-	return Py_BuildValue("I",quisk_hermeslite_writepointer);
+	pylist = PyList_New(0);
+	while (hl2_result_read != hl2_result_write) {
+		result = hl2_result_queue + (hl2_result_read & (HL2_CMD_QUEUE_SIZE - 1));
+		tup = Py_BuildValue("(IiN)", result->tag, result->status,
+			PyByteArray_FromStringAndSize((char *)result->response, 5));
+		PyList_Append(pylist, tup);
+		Py_DECREF(tup);
+		hl2_result_read++;
+	}
+	return pylist;
 }
 
 static PyObject * get_hermeslite_response(PyObject * self, PyObject * args)
@@ -4597,7 +5972,7 @@ static PyObject * set_auto_notch(PyObject * self, PyObject * args)
 {
 	if (!PyArg_ParseTuple (args, "i", &quisk_auto_notch))
 		return NULL;
-	dAutoNotch(NULL, 0, 0, 0);
+	dAutoNotchReset(&quisk_rx_bank[0].notch);
 	Py_INCREF (Py_None);
 	return Py_None;
 }
@@ -4713,7 +6088,7 @@ static PyObject * set_sidetone(PyObject * self, PyObject * args)
 		return NULL;
 	sidetonePhase = cexp((I * 2.0 * M_PI * abs(rit_freq)) / quisk_sound_state.playback_rate);
 	if (rxMode == CWL || rxMode == CWU)
-		dAutoNotch(NULL, 0, 0, 0);		// for CW, changing the RIT affects autonotch
+		dAutoNotchReset(&quisk_rx_bank[0].notch);		// for CW, changing the RIT affects autonotch
 	Py_INCREF (Py_None);
 	return Py_None;
 }
@@ -4865,15 +6240,167 @@ static PyObject * set_multirx_play_channel(PyObject * self, PyObject * args)
 	return Py_None;
 }
 
-static PyObject * get_multirx_graph(PyObject * self, PyObject * args)	// Called by the GUI thread
+// Measure the power in a list of frequency windows from the same averaged FFT frame used for the graph.
+#define BAND_POWER_SOURCES	3	// 0 == graph, 1 == bandscope, 2 == sub-receivers
+struct band_power_t {
+	int count;		// number of frequency windows, or zero for no measurement
+	double * freqs;		// start and stop frequency in Hertz for each window
+	double * results;	// for each window: RMS power dB, peak bin dB, noise floor dB
+	double * power;		// sum of the squared amplitude of each FFT bin in order of frequency
+	int power_size;		// size of power[]
+	int ready;		// new results are available
+	int index;		// sub-receiver index for the results
+};
+static struct band_power_t band_power[BAND_POWER_SOURCES];
+
+static double * band_power_alloc(struct band_power_t * bp, int size)
+{	// Return the power accumulator of the given size
+	if (bp->power_size != size) {
+		free(bp->power);
+		bp->power = (double *)calloc(size, sizeof(double));
+		bp->power_size = size;
+	}
+	return bp->power;
+}
+
+static int band_power_compare(const void * a, const void * b)
 {
-	int i, j, k;
-	double d1, d2, scale;
-	static double * fft_window=NULL;		// Window for FFT data
-	PyObject * retrn, * data;
-	static double time0=0;			// time of last graph
+	double d1 = *(const double *)a;
+	double d2 = *(const double *)b;
 
-	if (!PyArg_ParseTuple (args, ""))
+	if (d1 < d2)
+		return -1;
+	if (d1 > d2)
+		return 1;
+	return 0;
+}
+
+static void band_power_measure(struct band_power_t * bp, double freq0, double bin_hz, double scale)
+{	// Calculate the results for all windows from the accumulated power. The frequency of bin k is freq0 + k * bin_hz.
+	// The scale converts the accumulated power to the power of one average frame normalized to full scale.
+	int i, k, k1, k2, n;
+	double sum, peak, d;
+	double * res;
+	static double * sorted = NULL;
+	static int sorted_size = 0;
+
+	if (sorted_size < bp->power_size) {
+		free(sorted);
+		sorted = (double *)malloc(bp->power_size * sizeof(double));
+		sorted_size = bp->power_size;
+	}
+	for (i = 0; i < bp->count; i++) {
+		res = bp->results + i * 3;
+		k1 = (int)ceil((bp->freqs[i * 2] - freq0) / bin_hz);
+		k2 = (int)floor((bp->freqs[i * 2 + 1] - freq0) / bin_hz);
+		if (k1 < 0)
+			k1 = 0;
+		if (k2 >= bp->power_size)
+			k2 = bp->power_size - 1;
+		if (k2 < k1) {		// window is outside the FFT
+			res[0] = res[1] = res[2] = -200.0;
+			continue;
+		}
+		sum = peak = 0;
+		for (k = k1, n = 0; k <= k2; k++, n++) {
+			d = bp->power[k] * scale;
+			sum += d;
+			if (d > peak)
+				peak = d;
+			sorted[n] = d;
+		}
+		qsort(sorted, n, sizeof(double), band_power_compare);
+		res[0] = sum > 1E-20 ? 10.0 * log10(sum) : -200.0;	// total power in the window
+		res[1] = peak > 1E-20 ? 10.0 * log10(peak) : -200.0;
+		d = sorted[n / 2];		// the median bin is the noise floor
+		res[2] = d > 1E-20 ? 10.0 * log10(d) : -200.0;
+	}
+	memset(bp->power, 0, bp->power_size * sizeof(double));
+	bp->ready = 1;
+}
+
+static PyObject * set_band_power(PyObject * self, PyObject * args)	// Called by the GUI thread
+{	// Set the list of (start, stop) frequency windows for a source.
+	int i, source, count;
+	struct band_power_t * bp;
+	PyObject * windows, * seq, * item;
+	double * freqs;
+
+	if (!PyArg_ParseTuple (args, "iO", &source, &windows))
+		return NULL;
+	if (source < 0 || source >= BAND_POWER_SOURCES) {
+		PyErr_SetString(QuiskError, "Bad source for band power");
+		return NULL;
+	}
+	seq = PySequence_Fast(windows, "Band power windows must be a sequence");
+	if ( ! seq)
+		return NULL;
+	count = PySequence_Fast_GET_SIZE(seq);
+	freqs = (double *)malloc((count * 2 + 1) * sizeof(double));
+	for (i = 0; i < count; i++) {
+		item = PySequence_Fast_GET_ITEM(seq, i);
+		if ( ! PyArg_ParseTuple(item, "dd", freqs + i * 2, freqs + i * 2 + 1)) {
+			free(freqs);
+			Py_DECREF(seq);
+			return NULL;
+		}
+	}
+	Py_DECREF(seq);
+	bp = band_power + source;
+	free(bp->freqs);
+	free(bp->results);
+	bp->freqs = freqs;
+	bp->results = (double *)malloc((count * 3 + 1) * sizeof(double));
+	bp->ready = 0;
+	bp->count = count;
+	if (bp->power)
+		memset(bp->power, 0, bp->power_size * sizeof(double));
+	Py_INCREF (Py_None);
+	return Py_None;
+}
+
+static PyObject * get_band_power(PyObject * self, PyObject * args)	// Called by the GUI thread
+{	// Write RMS, peak and noise floor dB for each window into a writable buffer of doubles.
+	// Return the sub-receiver index of the results, or -1 if there are no new results.
+	int source, index;
+	struct band_power_t * bp;
+	Py_buffer view;
+
+	if (!PyArg_ParseTuple (args, "iw*", &source, &view))
+		return NULL;
+	if (source < 0 || source >= BAND_POWER_SOURCES) {
+		PyBuffer_Release(&view);
+		PyErr_SetString(QuiskError, "Bad source for band power");
+		return NULL;
+	}
+	bp = band_power + source;
+	if ( ! bp->ready || bp->count == 0) {
+		PyBuffer_Release(&view);
+		return PyInt_FromLong(-1);
+	}
+	if (view.len < (Py_ssize_t)(bp->count * 3 * sizeof(double))) {
+		PyBuffer_Release(&view);
+		PyErr_SetString(QuiskError, "Buffer is too small for band power");
+		return NULL;
+	}
+	memcpy(view.buf, bp->results, bp->count * 3 * sizeof(double));
+	PyBuffer_Release(&view);
+	bp->ready = 0;
+	index = bp->index;
+	return PyInt_FromLong(index);
+}
+
+static PyObject * get_multirx_graph(PyObject * self, PyObject * args)	// Called by the GUI thread
+{
+	int i, j, k;
+	double d1, d2, scale;
+	double * pwr;
+	complex double c;
+	static double * fft_window=NULL;		// Window for FFT data
+	PyObject * retrn, * data;
+	static double time0=0;			// time of last graph
+
+	if (!PyArg_ParseTuple (args, ""))
 		return NULL;
 	if ( ! fft_window) {
 		// Create the fft window
@@ -4888,6 +6415,21 @@ static PyObject * get_multirx_graph(PyObject * self, PyObject * args)	// Called
 		for (i = 0; i < multirx_fft_width; i++)		// multiply by window
 			multirx_fft_next_samples[i] *= fft_window[i];
 		fftw_execute(multirx_fft_next_plan);
+		if (band_power[2].count) {
+			pwr = band_power_alloc(band_power + 2, multirx_fft_width);
+			k = 0;
+			for (i = multirx_fft_width / 2; i < multirx_fft_width; i++) {
+				c = multirx_fft_next_samples[i];
+				pwr[k++] = creal(c) * creal(c) + cimag(c) * cimag(c);
+			}
+			for (i = 0; i < multirx_fft_width / 2; i++) {
+				c = multirx_fft_next_samples[i];
+				pwr[k++] = creal(c) * creal(c) + cimag(c) * cimag(c);
+			}
+			d1 = 1.0 / 2147483647.0 / multirx_fft_width;
+			band_power[2].index = multirx_fft_next_index;
+			band_power_measure(band_power + 2, - fft_sample_rate / 2.0, (double)fft_sample_rate / multirx_fft_width, d1 * d1);
+		}
 		// Average the fft data into the graph in order of frequency
 		data = PyTuple_New(multirx_data_width);
 		scale = log10(multirx_fft_width) + 31.0 * log10(2.0);
@@ -4962,6 +6504,7 @@ static PyObject * get_bandscope(PyObject * self, PyObject * args)	// Called by t
 	static double the_max = 0;
 	static double time0=0;			// time of last graph
 	double d1, sample, frac, scale;
+	double * pwr;
 	PyObject * tuple2;
 
 	if (!PyArg_ParseTuple (args, "idd", &clock, &zoom, &deltaf))
@@ -4977,11 +6520,26 @@ static PyObject * get_bandscope(PyObject * self, PyObject * args)	// Called by t
 		fftw_execute(bandscopePlan);		// Calculate forward FFT
 		// The return FFT has length bandscope_size / 2 + 1
 		L = bandscope_size / 2 + 1;
-		for (i = 0; i < L; i++)
-			bandscopeAverage[i] += cabs(bandscopeFFT[i]);
+		if (band_power[1].count) {
+			pwr = band_power_alloc(band_power + 1, L);
+			for (i = 0; i < L; i++) {
+				d1 = creal(bandscopeFFT[i]) * creal(bandscopeFFT[i]) + cimag(bandscopeFFT[i]) * cimag(bandscopeFFT[i]);
+				pwr[i] += d1;
+				bandscopeAverage[i] += sqrt(d1);
+			}
+		}
+		else {
+			for (i = 0; i < L; i++)
+				bandscopeAverage[i] += cabs(bandscopeFFT[i]);
+		}
 		bandscopeState = 0;
 		fft_count++;
 		if (QuiskTimeSec() - time0 >= 1.0 / graph_refresh) {	// return FFT data
+			if (band_power[1].count && band_power[1].power_size == L) {
+				d1 = 1.0 / bandscope_size;
+				band_power[1].index = 0;
+				band_power_measure(band_power + 1, 0.0, clock / 2.0 / (L - 1), d1 * d1 / fft_count);
+			}
 			bandscopeAverage[L] = 0.0;	// in case we run off the end
 			// Average the return FFT into the data width
 			tuple2 = PyTuple_New(graph_width);
@@ -5139,12 +6697,534 @@ static void softrock_correct_fft(fft_data * ptFft, int fixit)
 	}
 }
 
+// Signal detector for CW and other carriers.  It runs on the averaged FFT in get_graph() so no extra FFT is needed.
+#define DETECT_MAX_SIGNALS	64	// maximum number of tracked signals
+#define DETECT_SEGMENT		64	// number of FFT bins in each noise floor segment
+struct detect_track_t {
+	double bin;		// FFT bin of the signal including the fraction
+	double snr;		// signal to noise ratio in dB
+	int width;		// width of the signal in bins at -6 dB
+	int hits;		// number of frames the signal was seen
+	int missed;		// number of frames since the signal was last seen
+};
+static struct {
+	int enable;
+	double snr;		// minimum signal to noise amplitude ratio
+	int persist;		// number of frames before a signal is reported
+	int max_width;		// maximum frequency width in Hertz of a narrow band carrier
+	int count;		// number of tracks
+	struct detect_track_t tracks[DETECT_MAX_SIGNALS];
+	double * floor;		// noise floor for each bin
+	double * scratch;
+	double * medians;	// noise floor of each segment
+	int size;
+} signal_detect;
+
+static double detect_select(double * data, int n, int k)
+{	// Return the k-th smallest value of data[0:n].  The data is re-ordered.
+	int i, j, left, right;
+	double pivot, d;
+
+	left = 0;
+	right = n - 1;
+	while (left < right) {
+		pivot = data[(left + right) / 2];
+		i = left;
+		j = right;
+		while (i <= j) {
+			while (data[i] < pivot)
+				i++;
+			while (data[j] > pivot)
+				j--;
+			if (i <= j) {
+				d = data[i];
+				data[i] = data[j];
+				data[j] = d;
+				i++;
+				j--;
+			}
+		}
+		if (k <= j)
+			right = j;
+		else if (k >= i)
+			left = i;
+		else
+			break;
+	}
+	return data[k];
+}
+
+static void detect_signals(double * fft_avg, int size)
+{	// The fft_avg[] is the sum of the FFT amplitudes in order of frequency.
+	int i, j, k, n, nseg, seg, width;
+	double d, d1, d2, center, half;
+	double * medians;
+	struct detect_track_t * tr;
+
+	if (signal_detect.size != size) {
+		free(signal_detect.floor);
+		free(signal_detect.scratch);
+		free(signal_detect.medians);
+		signal_detect.floor = (double *)malloc(size * sizeof(double));
+		signal_detect.scratch = (double *)malloc(size * sizeof(double));
+		signal_detect.medians = (double *)malloc((size / DETECT_SEGMENT + 1) * sizeof(double));
+		signal_detect.size = size;
+		signal_detect.count = 0;
+	}
+	// Estimate the noise floor as the lower quartile of each segment, and interpolate between segment centers.
+	nseg = size / DETECT_SEGMENT;
+	if (nseg < 1)
+		return;
+	n = size / nseg;
+	medians = signal_detect.medians;
+	for (seg = 0; seg < nseg; seg++) {
+		memcpy(signal_detect.scratch, fft_avg + seg * n, n * sizeof(double));
+		medians[seg] = detect_select(signal_detect.scratch, n, n / 4);
+	}
+	for (k = 0; k < size; k++) {
+		d = ((double)k - n / 2) / n;	// position in units of segments
+		seg = (int)floor(d);
+		if (seg < 0)
+			d1 = d2 = medians[0];
+		else if (seg >= nseg - 1)
+			d1 = d2 = medians[nseg - 1];
+		else {
+			d1 = medians[seg];
+			d2 = medians[seg + 1];
+		}
+		d -= seg;
+		signal_detect.floor[k] = d1 + (d2 - d1) * (d < 0 ? 0 : d > 1 ? 1 : d);
+	}
+	for (i = 0; i < signal_detect.count; i++)
+		signal_detect.tracks[i].missed++;
+	// Find the peaks above the noise floor
+	for (k = 2; k < size - 2; k++) {
+		d = fft_avg[k];
+		if (d <= fft_avg[k - 1] || d < fft_avg[k + 1] || d < signal_detect.floor[k] * signal_detect.snr)
+			continue;
+		// Find the width at half amplitude
+		half = d / 2.0;
+		for (i = k - 1; i > 0 && fft_avg[i] > half; i--)
+			;
+		for (j = k + 1; j < size - 1 && fft_avg[j] > half; j++)
+			;
+		width = j - i - 1;
+		if (width > 2) {	// wide signal: use the middle
+			center = (i + j) / 2.0;
+		}
+		else {			// parabolic interpolation for the center
+			d1 = fft_avg[k - 1];
+			d2 = fft_avg[k + 1];
+			center = d1 - 2 * d + d2;
+			center = center < 0 ? k + 0.5 * (d1 - d2) / center : k;
+		}
+		d = 20.0 * log10(d / signal_detect.floor[k]);
+		// Match the peak to a track
+		for (i = 0; i < signal_detect.count; i++) {
+			tr = signal_detect.tracks + i;
+			if (fabs(tr->bin - center) <= 2.0)
+				break;
+		}
+		if (i < signal_detect.count) {
+			if (tr->missed == 0 && tr->snr >= d)	// another peak of the same signal
+				continue;
+			if (tr->missed != 0)
+				tr->hits++;
+		}
+		else if (signal_detect.count < DETECT_MAX_SIGNALS) {
+			tr = signal_detect.tracks + signal_detect.count++;
+			tr->hits = 1;
+		}
+		else {
+			continue;
+		}
+		tr->bin = center;
+		tr->snr = d;
+		tr->width = width;
+		tr->missed = 0;
+		k = j - 1;	// skip the rest of this signal
+	}
+	// Remove signals that are gone
+	for (i = 0, j = 0; i < signal_detect.count; i++) {
+		if (signal_detect.tracks[i].missed <= signal_detect.persist) {
+			if (i != j)
+				signal_detect.tracks[j] = signal_detect.tracks[i];
+			j++;
+		}
+	}
+	signal_detect.count = j;
+}
+
+static PyObject * set_signal_detect(PyObject * self, PyObject * args)	// Called by the GUI thread
+{
+	double snr;
+
+	if (!PyArg_ParseTuple (args, "idii", &signal_detect.enable, &snr, &signal_detect.persist, &signal_detect.max_width))
+		return NULL;
+	signal_detect.snr = pow(10.0, snr / 20.0);
+	if (signal_detect.persist < 1)
+		signal_detect.persist = 1;
+	signal_detect.count = 0;
+	Py_INCREF (Py_None);
+	return Py_None;
+}
+
+static PyObject * get_signals(PyObject * self, PyObject * args)	// Called by the GUI thread
+{	// Write four doubles for each detected signal into a writable buffer: frequency offset in Hertz,
+	// signal to noise ratio in dB, 1.0 for a narrow band carrier or 0.0 for a wide signal, and the number of frames seen.
+	// Return the number of signals.
+	int i, n, max;
+	double bin_hz;
+	double * out;
+	struct detect_track_t * tr;
+	Py_buffer view;
+
+	if (!PyArg_ParseTuple (args, "w*", &view))
+		return NULL;
+	max = view.len / (4 * sizeof(double));
+	out = (double *)view.buf;
+	bin_hz = signal_detect.size ? (double)fft_sample_rate / signal_detect.size : 0;
+	for (i = 0, n = 0; i < signal_detect.count && n < max; i++) {
+		tr = signal_detect.tracks + i;
+		if (tr->hits < signal_detect.persist || tr->missed)
+			continue;
+		*out++ = (tr->bin - signal_detect.size / 2) * bin_hz;
+		*out++ = tr->snr;
+		*out++ = tr->width * bin_hz <= signal_detect.max_width ? 1.0 : 0.0;
+		*out++ = tr->hits;
+		n++;
+	}
+	PyBuffer_Release(&view);
+	return PyInt_FromLong(n);
+}
+
+// Adaptive image rejection for sound card radios.  A short complex FIR filter of the conjugate samples in the sound
+// front end cancels the image caused by frequency dependent I/Q imbalance.  Here we measure the remaining image
+// from the mirror bins of the graph FFT and fit a correction to the filter.  The manual amplitude and phase
+// tables are still applied first, so the filter only corrects what remains.
+static struct {
+	int taps;		// number of FIR taps, odd; zero for no equalizer
+	int frames;		// number of FFTs to accumulate between updates
+	double step;	// fraction of the measured image removed at each update
+	int count;		// number of FFTs accumulated
+	int updates;	// number of coefficient updates
+	int size;		// size of num, den and scratch
+	complex double * num;	// sum of mirror bin products, indexed by the weaker bin
+	double * den;			// sum of the power in the stronger bin
+	double * scratch;
+	complex double coefs[IQ_EQ_MAX_TAPS];	// current filter coefficients
+	double rejection;	// measured image rejection in dB
+} iq_equalizer;
+
+static int iq_equalizer_solve(complex double * A, complex double * b, int n)
+{	// Solve A x = b in place by Gaussian elimination with partial pivoting.  The solution replaces b.
+	int i, j, k, p;
+	complex double t;
+
+	for (k = 0; k < n; k++) {
+		p = k;
+		for (i = k + 1; i < n; i++)
+			if (cabs(A[i * n + k]) > cabs(A[p * n + k]))
+				p = i;
+		if (cabs(A[p * n + k]) < 1E-30)
+			return 0;
+		if (p != k) {
+			for (j = 0; j < n; j++) {
+				t = A[k * n + j];
+				A[k * n + j] = A[p * n + j];
+				A[p * n + j] = t;
+			}
+			t = b[k];
+			b[k] = b[p];
+			b[p] = t;
+		}
+		for (i = k + 1; i < n; i++) {
+			t = A[i * n + k] / A[k * n + k];
+			for (j = k; j < n; j++)
+				A[i * n + j] -= t * A[k * n + j];
+			b[i] -= t * b[k];
+		}
+	}
+	for (k = n - 1; k >= 0; k--) {
+		for (j = k + 1; j < n; j++)
+			b[k] -= A[k * n + j] * b[j];
+		b[k] /= A[k * n + k];
+	}
+	return 1;
+}
+
+static void iq_equalizer_fit(void)
+{	// Fit FIR coefficients r[k] to the measured image R(g) = num[g] / den[g] by weighted least squares, and
+	// subtract step * r[k] from the coefficients.  The filter is centered on the delay D = (taps - 1) / 2.
+	int g, k, l, n, N, D;
+	double w, wsum, img;
+	complex double A[IQ_EQ_MAX_TAPS * IQ_EQ_MAX_TAPS], b[IQ_EQ_MAX_TAPS], z;
+	complex double autoc[IQ_EQ_MAX_TAPS * 2];
+
+	n = iq_equalizer.taps;
+	N = iq_equalizer.size;
+	D = (n - 1) / 2;
+	for (k = 0; k < n * 2; k++)
+		autoc[k] = 0;
+	for (k = 0; k < n; k++)
+		b[k] = 0;
+	wsum = img = 0;
+	for (g = 1; g < N; g++) {
+		w = iq_equalizer.den[g];
+		if (w <= 0)
+			continue;
+		wsum += w;
+		img += cabs(iq_equalizer.num[g]) * cabs(iq_equalizer.num[g]) / w;	// power of the image
+		for (k = 0; k < n * 2 - 1; k++)		// autocorrelation for lag k - (n - 1)
+			autoc[k] += w * cexp(-I * 2.0 * M_PI * g * (k - (n - 1)) / N);
+		for (l = 0; l < n; l++)
+			b[l] += iq_equalizer.num[g] * cexp(I * 2.0 * M_PI * g * (l - D) / N);
+	}
+	if (wsum <= 0)
+		return;
+	iq_equalizer.rejection = img > 0 ? 10.0 * log10(wsum / img) : 200.0;
+	for (l = 0; l < n; l++)		// A[l][k] = sum of w * exp(-j 2 pi g (k - l) / N)
+		for (k = 0; k < n; k++)
+			A[l * n + k] = autoc[k - l + n - 1];
+	z = 1E-3 * wsum;			// regularization for bins with no signals
+	for (k = 0; k < n; k++)
+		A[k * n + k] += z;
+	if ( ! iq_equalizer_solve(A, b, n))
+		return;
+	for (k = 0; k < n; k++)
+		iq_equalizer.coefs[k] -= iq_equalizer.step * b[k];
+	quisk_set_image_reject(iq_equalizer.coefs, n);
+	iq_equalizer.updates++;
+}
+
+static void iq_equalizer_measure(fft_data * ptFft)
+{	// Accumulate mirror bin statistics from the FFT.  For each pair of bins g and -g, the image in the weaker
+	// bin is the product of the two bins divided by the power of the stronger bin.
+	int i, g, N;
+	double p1, p2, noise_floor;
+	complex double prod;
+
+	N = fft_size;
+	if (iq_equalizer.size != N) {
+		iq_equalizer.size = N;
+		iq_equalizer.count = 0;
+		free(iq_equalizer.num);
+		free(iq_equalizer.den);
+		free(iq_equalizer.scratch);
+		iq_equalizer.num = (complex double *)calloc(N, sizeof(complex double));
+		iq_equalizer.den = (double *)calloc(N, sizeof(double));
+		iq_equalizer.scratch = (double *)malloc(N * sizeof(double));
+	}
+	for (i = 0; i < N; i++)
+		iq_equalizer.scratch[i] = creal(ptFft->samples[i]) * creal(ptFft->samples[i]) +
+			cimag(ptFft->samples[i]) * cimag(ptFft->samples[i]);
+	noise_floor = detect_select(iq_equalizer.scratch, N, N / 4);	// lower quartile as the noise floor; reorders scratch
+	for (i = 0; i < N; i++)
+		iq_equalizer.scratch[i] = creal(ptFft->samples[i]) * creal(ptFft->samples[i]) +
+			cimag(ptFft->samples[i]) * cimag(ptFft->samples[i]);
+	for (i = 2; i < N / 2; i++) {	// skip the bins near DC
+		p1 = iq_equalizer.scratch[i];
+		p2 = iq_equalizer.scratch[N - i];
+		prod = ptFft->samples[i] * ptFft->samples[N - i];
+		if (p1 > p2 * 10.0 && p1 > noise_floor * 10.0)	// image of bin i falls in bin -i
+			g = N - i;
+		else if (p2 > p1 * 10.0 && p2 > noise_floor * 10.0)
+			g = i;
+		else
+			continue;
+		if (quisk_invert_spectrum) {	// the FFT is of the conjugate samples
+			g = N - g;
+			prod = conj(prod);
+		}
+		iq_equalizer.num[g] += prod;
+		iq_equalizer.den[g] += p1 > p2 ? p1 : p2;
+	}
+	if (++iq_equalizer.count >= iq_equalizer.frames) {
+		iq_equalizer_fit();
+		iq_equalizer.count = 0;
+		memset(iq_equalizer.num, 0, N * sizeof(complex double));
+		memset(iq_equalizer.den, 0, N * sizeof(double));
+	}
+}
+
+static PyObject * set_image_reject(PyObject * self, PyObject * args)	// Called by the GUI thread
+{	// Start the adaptive image rejection filter with the number of taps, or stop it with zero taps.
+	// The filter always starts from zero and adapts from the current manual corrections.
+	int taps, frames;
+	double step;
+
+	if (!PyArg_ParseTuple (args, "iid", &taps, &frames, &step))
+		return NULL;
+	if (taps > IQ_EQ_MAX_TAPS)
+		taps = IQ_EQ_MAX_TAPS;
+	if (taps > 0)
+		taps |= 1;		// odd number of taps
+	else
+		taps = 0;
+	iq_equalizer.taps = taps;
+	iq_equalizer.frames = frames < 1 ? 1 : frames;
+	iq_equalizer.step = step;
+	iq_equalizer.count = 0;
+	iq_equalizer.updates = 0;
+	iq_equalizer.rejection = 0;
+	iq_equalizer.size = 0;		// clear the statistics
+	memset(iq_equalizer.coefs, 0, sizeof(iq_equalizer.coefs));
+	quisk_set_image_reject(iq_equalizer.coefs, taps);
+	Py_INCREF (Py_None);
+	return Py_None;
+}
+
+static PyObject * get_image_reject(PyObject * self, PyObject * args)	// Called by the GUI thread
+{	// Return the measured image rejection in dB and the number of coefficient updates.
+	if (!PyArg_ParseTuple (args, ""))
+		return NULL;
+	return Py_BuildValue("di", iq_equalizer.rejection, iq_equalizer.updates);
+}
+
+// Panoramic sweep for narrow band radios.  The GUI retunes the hardware to each segment of a wide sweep and calls
+// sweep_start().  The FFTs in get_graph() that hold samples from before the retune and the settling time are
+// discarded, and the power of the next FFTs is averaged.  Then sweep_result() returns the average power of a
+// frequency range of the segment.
+static struct {
+	int state;		// 0 idle, 1 discard, 2 average, 3 done
+	int discard;	// number of FFTs left to discard
+	int average;	// number of FFTs to average
+	int count;		// number of FFTs averaged
+	int size;		// size of power
+	int rate;		// sample rate of the FFTs
+	double * power;	// sum of the squared amplitude in frequency order; zero frequency at size / 2
+} sweep;
+
+static void sweep_add(fft_data * ptFft)
+{	// Add the FFT to the sweep average.  Called from get_graph().
+	int i, k;
+	complex double c;
+
+	if (sweep.state == 1) {
+		if (--sweep.discard <= 0)
+			sweep.state = 2;
+		return;
+	}
+	if (sweep.state != 2)
+		return;
+	if (sweep.size != fft_size) {
+		free(sweep.power);
+		sweep.power = (double *)calloc(fft_size, sizeof(double));
+		sweep.size = fft_size;
+		sweep.count = 0;
+	}
+	k = 0;
+	for (i = fft_size / 2; i < fft_size; i++) {		// Negative frequencies
+		c = ptFft->samples[i];
+		sweep.power[k++] += creal(c) * creal(c) + cimag(c) * cimag(c);
+	}
+	for (i = 0; i < fft_size / 2; i++) {			// Positive frequencies
+		c = ptFft->samples[i];
+		sweep.power[k++] += creal(c) * creal(c) + cimag(c) * cimag(c);
+	}
+	sweep.rate = fft_sample_rate;
+	if (++sweep.count >= sweep.average)
+		sweep.state = 3;
+}
+
+static PyObject * sweep_start(PyObject * self, PyObject * args)	// Called by the GUI thread
+{	// Start a new sweep segment after the hardware was retuned.  Discard the FFTs with samples from before the retune
+	// and from the settling time, then average the power of "average" FFTs.  An average of zero stops the sweep.
+	int i, settle, average;
+
+	if (!PyArg_ParseTuple (args, "ii", &settle, &average))
+		return NULL;
+	if (average <= 0) {
+		sweep.state = 0;
+		Py_INCREF (Py_None);
+		return Py_None;
+	}
+	if (scan_blocks) {
+		PyErr_SetString (QuiskError, "The panoramic sweep does not work with scan blocks");
+		return NULL;
+	}
+	sweep.discard = 1;		// the FFT now being filled
+	for (i = 0; i < FFT_ARRAY_SIZE; i++)	// the FFTs waiting for get_graph()
+		if (fft_data_array[i].filled)
+			sweep.discard++;
+	if (settle > 0 && fft_size > 0)
+		sweep.discard += (settle + fft_size - 1) / fft_size;
+	sweep.average = average;
+	sweep.count = 0;
+	if (sweep.power)
+		memset(sweep.power, 0, sizeof(double) * sweep.size);
+	sweep.state = 1;
+	Py_INCREF (Py_None);
+	return Py_None;
+}
+
+static PyObject * sweep_result(PyObject * self, PyObject * args)	// Called by the GUI thread
+{	// Return None if the segment is not finished.  Otherwise return a tuple of nbins dB values for the frequencies
+	// freq1 to freq2 relative to the center of the segment.  Each value is the average power of the FFT bins with a
+	// center within the bin, or the interpolated power if the bin is narrower than an FFT bin.
+	int i, k, k1, k2, nbins, size;
+	double freq1, freq2, df, bin, x, d, scale;
+	double * power;
+	PyObject * tuple2;
+
+	if (!PyArg_ParseTuple (args, "ddi", &freq1, &freq2, &nbins))
+		return NULL;
+	if (sweep.state != 3 || nbins <= 0) {
+		Py_INCREF (Py_None);
+		return Py_None;
+	}
+	size = sweep.size;
+	power = sweep.power;
+	bin = (double)sweep.rate / size;		// width of an FFT bin in Hertz
+	df = (freq2 - freq1) / nbins;			// width of a result bin in Hertz
+	// Normalize to max == 1 as in get_graph()
+	scale = 20.0 * (log10(size) + 31.0 * log10(2.0)) + 10.0 * log10(sweep.count);
+	tuple2 = PyTuple_New(nbins);
+	for (i = 0; i < nbins; i++) {
+		x = freq1 + df * i;		// start frequency of the result bin
+		k1 = (int)ceil(x / bin) + size / 2;
+		k2 = (int)ceil((x + df) / bin) + size / 2;
+		if (k1 < 0)
+			k1 = 0;
+		if (k2 > size)
+			k2 = size;
+		if (k2 > k1) {		// average the FFT bins
+			d = 0;
+			for (k = k1; k < k2; k++)
+				d += power[k];
+			d /= k2 - k1;
+		}
+		else {				// interpolate between FFT bins
+			x = (x + df / 2) / bin + size / 2;
+			k = (int)floor(x);
+			if (k < 0)
+				d = power[0];
+			else if (k >= size - 1)
+				d = power[size - 1];
+			else
+				d = power[k] + (power[k + 1] - power[k]) * (x - k);
+		}
+		if (d > 1E-30)
+			d = 10.0 * log10(d) - scale;
+		else
+			d = -200;
+		if (d < -200)
+			d = -200;
+		else if (d > 0)
+			d = 0;
+		PyTuple_SetItem(tuple2, i, PyFloat_FromDouble(d));
+	}
+	return tuple2;
+}
+
 static PyObject * get_graph(PyObject * self, PyObject * args)	// Called by the GUI thread
 {
 	int i, j, k, m, n, index, ffts, ii, mm, m0, deltam;
 	fft_data * ptFft;
-	PyObject * tuple2;
+	PyObject * tuple2, * obj=NULL;
+	Py_buffer view;
 	double d1, d2, scale, smeter_scale, zoom, deltaf;
+	double * pwr, * out;
 	complex double c;
 	static double meter = 0;	// RMS s-meter
 	static int job = 1;		// job==0 return raw data ; 1 return FFT ; 2 delete FFT data
@@ -5154,7 +7234,7 @@ static PyObject * get_graph(PyObject * self, PyObject * args)	// Called by the G
 	static double time0=0;			// time of last graph
 	static double time_send_graph;		// time of the last send_graph_data()
 
-	if (!PyArg_ParseTuple (args, "idd", &k, &zoom, &deltaf))
+	if (!PyArg_ParseTuple (args, "idd|O", &k, &zoom, &deltaf, &obj))
 		return NULL;
 	if (k != job) {		// change in data return type; re-initialize
 		job = k;
@@ -5196,6 +7276,21 @@ static PyObject * get_graph(PyObject * self, PyObject * args)	// Called by the G
 			ptFft->filled = 0;
 			continue;
 		}
+		if (job == 0 && obj) {		// write raw data as pairs of doubles into the buffer; return the number of samples
+			if (PyObject_GetBuffer(obj, &view, PyBUF_WRITABLE) != 0)
+				return NULL;
+			n = view.len / (2 * sizeof(double));
+			if (n > data_width)
+				n = data_width;
+			out = (double *)view.buf;
+			for (i = 0; i < n; i++) {
+				*out++ = creal(ptFft->samples[i]);
+				*out++ = cimag(ptFft->samples[i]);
+			}
+			PyBuffer_Release(&view);
+			ptFft->filled = 0;
+			return PyInt_FromLong(n);
+		}
 		if (job == 0) {		// return raw data, not FFT
 			tuple2 = PyTuple_New(data_width);
 			for (i = 0; i < data_width; i++)
@@ -5215,6 +7310,10 @@ static PyObject * get_graph(PyObject * self, PyObject * args)	// Called by the G
 		fftw_execute_dft(quisk_fft_plan, ptFft->samples, ptFft->samples);	// Calculate FFT
 		if (softrock_correct_active == 2)
 			softrock_correct_fft(ptFft, 0);
+		if (sweep.state)
+			sweep_add(ptFft);
+		if (iq_equalizer.taps && ! scan_blocks && ! sweep.state && multiple_sample_rates == 0 && ! quisk_is_key_down())
+			iq_equalizer_measure(ptFft);
 		// Create RMS s-meter value at known bandwidth
 		// The pass band is (rx_tune_freq + filter_start_offset) to += bandwidth
 		// d1 is the tune frequency
@@ -5270,10 +7369,27 @@ static PyObject * get_graph(PyObject * self, PyObject * args)	// Called by the G
 			// The frequency at index k and (fft_size - k) are equal except for sign.
 			count_fft++;
 			k = 0;
-			for (i = fft_size / 2; i < fft_size; i++)			// Negative frequencies
-				fft_avg[k++] += cabs(ptFft->samples[i]);
-			for (i = 0; i < fft_size / 2; i++)					// Positive frequencies
-				fft_avg[k++] += cabs(ptFft->samples[i]);
+			if (band_power[0].count) {	// also sum the squared amplitude for the band power
+				pwr = band_power_alloc(band_power + 0, fft_size);
+				for (i = fft_size / 2; i < fft_size; i++) {		// Negative frequencies
+					c = ptFft->samples[i];
+					d1 = creal(c) * creal(c) + cimag(c) * cimag(c);
+					pwr[k] += d1;
+					fft_avg[k++] += sqrt(d1);
+				}
+				for (i = 0; i < fft_size / 2; i++) {			// Positive frequencies
+					c = ptFft->samples[i];
+					d1 = creal(c) * creal(c) + cimag(c) * cimag(c);
+					pwr[k] += d1;
+					fft_avg[k++] += sqrt(d1);
+				}
+			}
+			else {
+				for (i = fft_size / 2; i < fft_size; i++)			// Negative frequencies
+					fft_avg[k++] += cabs(ptFft->samples[i]);
+				for (i = 0; i < fft_size / 2; i++)					// Positive frequencies
+					fft_avg[k++] += cabs(ptFft->samples[i]);
+			}
 		}
 		ptFft->filled = 0;
 		if (count_fft > 0 && QuiskTimeSec() - time0 >= 1.0 / graph_refresh) {
@@ -5285,6 +7401,14 @@ static PyObject * get_graph(PyObject * self, PyObject * args)	// Called by the G
 			scale *= 20.0;
 			if (remote_control_slave)	// Send graph data to the control head
 				send_graph_data(fft_avg, fft_size, zoom, deltaf, fft_sample_rate, scale);
+			if (band_power[0].count && band_power[0].power_size == fft_size && ! scan_blocks) {
+				smeter_scale = 1.0 / 2147483647.0 / fft_size;
+				band_power[0].index = 0;
+				band_power_measure(band_power + 0, - fft_sample_rate / 2.0, (double)fft_sample_rate / fft_size,
+					smeter_scale * smeter_scale / count_fft);
+			}
+			if (signal_detect.enable && ! scan_blocks)
+				detect_signals(fft_avg, fft_size);
 			// Average the fft data of size fft_size into the size of data_width.
 			n = (int)(zoom * (double)fft_size / data_width + 0.5);
 			if (n < 1)
@@ -5330,6 +7454,47 @@ static PyObject * get_graph(PyObject * self, PyObject * args)	// Called by the G
 	return Py_None;
 }
 
+static PyObject * graph_points(PyObject * self, PyObject * args)	// Called by the GUI thread
+{	// Convert graph data to screen points for DrawLines.  The data is a buffer of doubles, and every "stride"
+	// value is used.  The points buffer holds C int pairs x, y.  The x is x_origin plus the index, and the y is
+	// y_zero - data * y_scale rounded as in Python and limited to 0 to y_max if y_max >= 0.  If peak_hold > 0, the
+	// y may increase by at most peak_hold from the prior y in the points buffer.  Return the number of points.
+	int i, n, y, y_zero, y_max, x_origin, stride, peak_hold;
+	double y_scale;
+	double * data;
+	int * points;
+	Py_buffer data_view, points_view;
+
+	stride = 1;
+	peak_hold = 0;
+	if (!PyArg_ParseTuple (args, "w*w*iidi|ii", &points_view, &data_view, &x_origin, &y_zero, &y_scale, &y_max,
+			&stride, &peak_hold))
+		return NULL;
+	if (stride < 1)
+		stride = 1;
+	n = data_view.len / sizeof(double) / stride;
+	if (n > points_view.len / (int)(2 * sizeof(int)))
+		n = points_view.len / (2 * sizeof(int));
+	data = (double *)data_view.buf;
+	points = (int *)points_view.buf;
+	for (i = 0; i < n; i++, data += stride, points += 2) {
+		y = y_zero - (int)(*data * y_scale + 0.5);
+		if (peak_hold > 0 && y > points[1] && points[0] == x_origin + i)
+			y = y < points[1] + peak_hold ? y : points[1] + peak_hold;
+		if (y_max >= 0) {
+			if (y < 0)
+				y = 0;
+			else if (y > y_max)
+				y = y_max;
+		}
+		points[0] = x_origin + i;
+		points[1] = y;
+	}
+	PyBuffer_Release(&data_view);
+	PyBuffer_Release(&points_view);
+	return PyInt_FromLong(n);
+}
+
 // These functions are used for the Waterfall display.
 static PyObject * watfall_RgbData(PyObject * self, PyObject * args)	// Called by the GUI thread
 {
@@ -5370,6 +7535,28 @@ static PyObject * watfall_RgbData(PyObject * self, PyObject * args)	// Called by
 	return bytes;
 }
 
+static PyObject * watfall_Free(PyObject * self, PyObject * args)	// Called by the GUI thread
+{	// Free the rows made by watfall_RgbData().  The waterfall can not be used after this call.
+	int i;
+	Py_buffer rgb_data;
+	struct watfall_t * pWatfall;
+	struct watfall_row_t * row, * next;
+
+	if (!PyArg_ParseTuple (args, "w*", &rgb_data))
+		return NULL;
+	pWatfall = (struct watfall_t *)rgb_data.buf;
+	row = pWatfall->current_row;
+	for (i = 0; row && i < pWatfall->max_height; i++) {
+		next = row->next_row;
+		free(row);
+		row = next;
+	}
+	pWatfall->current_row = NULL;
+	PyBuffer_Release(&rgb_data);
+	Py_INCREF (Py_None);
+	return Py_None;
+}
+
 static PyObject * watfall_OnGraphData(PyObject * self, PyObject * args)	// Called by the GUI thread
 {
 	int i, l, y_zero, y_scale, x_origin, size;
@@ -5478,6 +7665,146 @@ static PyObject * watfall_GetPixels(PyObject * self, PyObject * args)	// Called
 	return Py_None;
 }
 
+static struct spectrum_hist_t * spectrum_hist_check(Py_buffer * hist)
+{	// Return the header of the spectrum history, or NULL if the buffer is not valid.
+	struct spectrum_hist_t * pHist = (struct spectrum_hist_t *)hist->buf;
+
+	if (hist->len < SPECTRUM_HIST_HEADER || memcmp(pHist->magic, "QUISKSH1", 8) ||
+			pHist->max_rows <= 0 || pHist->row_bytes < (int)offsetof(struct spectrum_row_t, data) + pHist->width ||
+			SPECTRUM_HIST_HEADER + (Py_ssize_t)pHist->max_rows * pHist->row_bytes > hist->len) {
+		PyErr_SetString (QuiskError, "The spectrum history is not valid");
+		PyBuffer_Release(hist);
+		return NULL;
+	}
+	return pHist;
+}
+
+static PyObject * spectrum_hist_add(PyObject * self, PyObject * args)	// Called by the GUI thread
+{	// Quantize a row of dB data and add it to the spectrum history.  Return the number of rows written.
+	int i, size, span, center, l;
+	long long vfo, total;
+	double tm, dB;
+	Py_buffer hist;
+	PyObject * db_list, * obj;
+	struct spectrum_hist_t * pHist;
+	struct spectrum_row_t * pRow;
+
+	if (!PyArg_ParseTuple (args, "w*OdLii", &hist, &db_list, &tm, &vfo, &span, &center))
+		return NULL;
+	if ( ! (pHist = spectrum_hist_check(&hist)))
+		return NULL;
+	if (PySequence_Check(db_list) != 1) {
+		PyBuffer_Release(&hist);
+		PyErr_SetString (QuiskError, "List of dB data is not a sequence");
+		return NULL;
+	}
+	pRow = (struct spectrum_row_t *)((uint8_t *)hist.buf + SPECTRUM_HIST_HEADER +
+			(Py_ssize_t)(pHist->total_rows % pHist->max_rows) * pHist->row_bytes);
+	size = PySequence_Size(db_list);
+	if (size > pHist->width)
+		size = pHist->width;
+	for (i = 0; i < size; i++) {
+		obj = PySequence_GetItem(db_list, i);
+		dB = PyFloat_AsDouble(obj);
+		Py_DECREF(obj);
+		l = (int)((dB - pHist->db_min) / pHist->db_step + 0.5);
+		if (l < 0)
+			l = 0;
+		else if (l > 255)
+			l = 255;
+		pRow->data[i] = l;
+	}
+	pRow->time = tm;
+	pRow->vfo = vfo;
+	pRow->span = span;
+	pRow->center = center;
+	pRow->width = size;
+	total = ++pHist->total_rows;	// the row is complete
+	PyBuffer_Release(&hist);
+	return PyLong_FromLongLong(total);
+}
+
+static PyObject * watfall_HistPixels(PyObject * self, PyObject * args)	// Called by the GUI thread
+{	// Write the Waterfall image from the spectrum history ending at row "row_end" (the top row).
+	// The current display has data_width points over "span" Hertz centered at vfo + center.
+	int i, j, k, l, x, width, height, data_width, span, center, y_zero, y_scale, row_first;
+	long long vfo, row_end;
+	double gain, yz, a, b, freq0;
+	uint8_t rgb[256 * 3];
+	uint8_t * pDest;
+	Py_buffer rgb_data, hist, pixels;
+	struct watfall_t * pWatfall;
+	struct spectrum_hist_t * pHist;
+	struct spectrum_row_t * pRow;
+
+	if (!PyArg_ParseTuple (args, "w*w*w*LLiiiiiiid", &rgb_data, &hist, &pixels, &row_end, &vfo, &span, &center,
+			&data_width, &width, &height, &y_zero, &y_scale, &gain))
+		return NULL;
+	if ( ! (pHist = spectrum_hist_check(&hist))) {
+		PyBuffer_Release(&rgb_data);
+		PyBuffer_Release(&pixels);
+		return NULL;
+	}
+	if (pixels.len < (Py_ssize_t)width * height * 3)
+		height = pixels.len / 3 / width;
+	pWatfall = (struct watfall_t *)rgb_data.buf;
+	// Make a table of the color for each quantized dB value, the same as watfall_OnGraphData()
+	yz = 40.0 + y_zero * 0.69;
+	for (i = 0; i < 256; i++) {
+		l = (int)((pHist->db_min + i * pHist->db_step - gain + yz) * (y_scale + 10) * 0.10 + 128);
+		if (l < 0)
+			l = 0;
+		else if(l > 255)
+			l = 255;
+		rgb[i * 3] = pWatfall->red[l];
+		rgb[i * 3 + 1] = pWatfall->green[l];
+		rgb[i * 3 + 2] = pWatfall->blue[l];
+	}
+	PyBuffer_Release(&rgb_data);
+	row_first = pHist->total_rows > pHist->max_rows ? pHist->total_rows - pHist->max_rows : 0;
+	if (row_end >= pHist->total_rows)
+		row_end = pHist->total_rows - 1;
+	// Frequency of pixel zero relative to the VFO
+	freq0 = center + ((data_width - width) / 2 - data_width / 2) * (double)span / data_width;
+	pDest = pixels.buf;
+	for (j = 0; j < height; j++) {
+		if (row_end - j < row_first || span <= 0) {
+			memset(pDest, 0, width * 3);
+			pDest += width * 3;
+			continue;
+		}
+		pRow = (struct spectrum_row_t *)((uint8_t *)hist.buf + SPECTRUM_HIST_HEADER +
+				(Py_ssize_t)((row_end - j) % pHist->max_rows) * pHist->row_bytes);
+		// The index in the row for pixel x is a * x + b
+		if (pRow->span > 0 && pRow->width > 0) {
+			a = (double)span / data_width * pRow->width / pRow->span;
+			b = (vfo + freq0 - pRow->vfo - pRow->center) * pRow->width / pRow->span + pRow->width / 2;
+		}
+		else {
+			a = 0;
+			b = -1;
+		}
+		for (x = 0; x < width; x++) {
+			k = (int)floor(a * x + b);
+			if (k >= 0 && k < pRow->width) {
+				k = pRow->data[k] * 3;
+				*pDest++ = rgb[k];
+				*pDest++ = rgb[k + 1];
+				*pDest++ = rgb[k + 2];
+			}
+			else {
+				*pDest++ = 0;
+				*pDest++ = 0;
+				*pDest++ = 0;
+			}
+		}
+	}
+	PyBuffer_Release(&hist);
+	PyBuffer_Release(&pixels);
+	Py_INCREF(Py_None);
+	return Py_None;
+}
+
 static PyObject * get_filter(PyObject * self, PyObject * args)
 {
 	int i, j, k, n;
@@ -5495,7 +7822,9 @@ static PyObject * get_filter(PyObject * self, PyObject * args)
 
 	// Create space for the fft of size data_width
 	samples = (fftw_complex *) fftw_malloc(sizeof(fftw_complex) * data_width);
+	quisk_fftw_plan_lock();
 	plan = fftw_plan_dft_1d(data_width, samples, samples, FFTW_FORWARD, FFTW_MEASURE);
+	quisk_fftw_plan_unlock();
 	average = (double *) malloc(sizeof(double) * (data_width + sizeFilter));
 	bufI = (double *) malloc(sizeof(double) * sizeFilter);
 	bufQ = (double *) malloc(sizeof(double) * sizeFilter);
@@ -5561,12 +7890,87 @@ static PyObject * get_filter(PyObject * self, PyObject * args)
 	free(bufQ);
 	free(bufI);
 	free(average);
+	quisk_fftw_plan_lock();
 	fftw_destroy_plan(plan);
+	quisk_fftw_plan_unlock();
 	fftw_free(samples);
 
 	return tuple2;
 }
 
+static PyObject * design_filter(PyObject * self, PyObject * args)	// Called by any thread
+{	// Make an I/Q filter with a rectangular passband of bandwidth bw centered at center.  The lowpass filter is a Blackman
+	// windowed sinc of N taps, or N is calculated if it is zero.  Or use the optional sequence of lowpass coefficients.
+	// Return a tuple (filterI, filterQ).
+	int i, k, N, K, rate, bw, center;
+	double z, w, D;
+	complex double tune, cz;
+	double * filtD;
+	PyObject * lowpass = NULL, * obj, * filtI, * filtQ;
+
+	if (!PyArg_ParseTuple (args, "iiii|O", &rate, &N, &bw, &center, &lowpass))
+		return NULL;
+	center = abs(center);
+	if (lowpass) {
+		if (PySequence_Check(lowpass) != 1) {
+			PyErr_SetString (QuiskError, "Lowpass filter is not a sequence");
+			return NULL;
+		}
+		N = PySequence_Size(lowpass);
+		filtD = (double *)malloc((N + 1) * sizeof(double));
+		for (i = 0; i < N; i++) {
+			obj = PySequence_GetItem(lowpass, i);
+			filtD[i] = PyFloat_AsDouble(obj);
+			Py_XDECREF(obj);
+		}
+		if (PyErr_Occurred()) {
+			free(filtD);
+			return NULL;
+		}
+	}
+	else {
+		if (N <= 0) {
+			z = ((double)bw / 2.0 / rate) * (1.5 - 1.0);	// Shape factor 1.5 at 88 dB
+			N = (int)(4.0 / z);
+			if (N > 1000)
+				N = 1000;
+			N = (N / 2) * 2 + 1;
+		}
+		K = bw * N / rate;
+		filtD = (double *)malloc((N + 1) * sizeof(double));
+		Py_BEGIN_ALLOW_THREADS
+		for (k = - (N + 1) / 2, i = 0; k <= N / 2; k++, i++) {
+			if (k == 0)		// Make a lowpass filter
+				z = (double)K / N;
+			else
+				z = 1.0 / N * sin(M_PI * k * K / N) / sin(M_PI * k / N);
+			w = 0.42 + 0.5 * cos(2. * M_PI * k / N) + 0.08 * cos(4. * M_PI * k / N);	// Blackman window
+			filtD[i] = z * w;
+		}
+		Py_END_ALLOW_THREADS
+		N = i;
+	}
+	filtI = PyTuple_New(N);
+	if (center) {	// Make a bandpass filter by tuning the low pass filter to the center frequency.
+		filtQ = PyTuple_New(N);
+		tune = -I * 2.0 * M_PI * center / rate;
+		D = (N - 1.0) / 2.0;
+		for (i = 0; i < N; i++) {
+			cz = 2.0 * cexp(tune * (i - D)) * filtD[i];
+			PyTuple_SetItem(filtI, i, PyFloat_FromDouble(creal(cz)));
+			PyTuple_SetItem(filtQ, i, PyFloat_FromDouble(cimag(cz)));
+		}
+	}
+	else {
+		for (i = 0; i < N; i++)
+			PyTuple_SetItem(filtI, i, PyFloat_FromDouble(filtD[i]));
+		filtQ = filtI;
+		Py_INCREF(filtQ);
+	}
+	free(filtD);
+	return Py_BuildValue("NN", filtI, filtQ);
+}
+
 static PyObject * quisk_control_midi(PyObject * self, PyObject * args, PyObject * keywds)
 {
 #ifdef QUISK_HAVE_ALSA
@@ -5671,15 +8075,19 @@ static PyObject * Xdft(PyObject * pyseq, int inverse, int window)
 		return PyTuple_New(0);
 	if (size != fft_size) {		// Change in previous size; malloc new space
 		if (fft_size > 0) {
+			quisk_fftw_plan_lock();
 			fftw_destroy_plan(planF);
 			fftw_destroy_plan(planB);
+			quisk_fftw_plan_unlock();
 			fftw_free(samples);
 			free (fft_window);
 		}
 		fft_size = size;	// Create space for one fft
 		samples = (fftw_complex *) fftw_malloc(sizeof(fftw_complex) * fft_size);
+		quisk_fftw_plan_lock();
 		planF = fftw_plan_dft_1d(fft_size, samples, samples, FFTW_FORWARD, FFTW_MEASURE);
 		planB = fftw_plan_dft_1d(fft_size, samples, samples, FFTW_BACKWARD, FFTW_MEASURE);
+		quisk_fftw_plan_unlock();
 		fft_window = (double *) malloc(sizeof(double) * (fft_size + 1));
 		for (i = 0; i <= size/2; i++) {
 			if (1)	// Blackman window
@@ -5973,6 +8381,7 @@ static PyObject * record_app(PyObject * self, PyObject * args)
 	rx_udp_clock = QuiskGetConfigDouble("rx_udp_clock", 122.88e6);
 	graph_refresh = QuiskGetConfigInt("graph_refresh", 7);
 	quisk_use_rx_udp = QuiskGetConfigInt("use_rx_udp", 0);
+	quisk_hermes_protocol = QuiskGetConfigInt("hermes_protocol", 1);
 	quisk_sidetoneFreq = QuiskGetConfigInt("cwTone", 700);
 	waterfall_scroll_mode = QuiskGetConfigInt("waterfall_scroll_mode", 1);
 	quisk_use_sidetone = QuiskGetConfigInt("use_sidetone", 0);
@@ -5980,6 +8389,7 @@ static PyObject * record_app(PyObject * self, PyObject * args)
 	quisk_start_ssb_delay = QuiskGetConfigInt("start_ssb_delay", 100);
 	maximum_tx_secs = QuiskGetConfigInt("maximum_tx_secs", 0);
 	TxRxSilenceMsec = QuiskGetConfigInt("TxRxSilenceMsec", 50);
+	quisk_float_pipeline = QuiskGetConfigInt("float_pipeline", 0);
 	quisk_sound_state.sample_rate = rate;
 	fft_sample_rate = rate;
 	is_little_endian = 1;	// Test machine byte order
@@ -6015,9 +8425,8 @@ static PyObject * record_app(PyObject * self, PyObject * args)
 		free(current_graph);
 	current_graph = (double *) malloc(sizeof(double) * data_width);
 	measure_freq(NULL, 0, 0);
-	dAutoNotch(NULL, 0, 0, 0);
 	quisk_process_decimate(NULL, 0, 0, 0);
-	quisk_process_demodulate(NULL, NULL, 0, 0, 0, 0);
+	dAutoNotchReset(&quisk_rx_bank[0].notch);
 #if DEBUG_IO
 	QuiskPrintTime(NULL, 0);
 #endif
@@ -6075,6 +8484,288 @@ static PyObject * set_sample_bytes(PyObject * self, PyObject * args)
 	return Py_None;
 }
 
+// QS.Receiver(sample_rate, mode=3, frequency=0) is a receiver with its own state.  It uses the same noise blanker,
+// decimation, filter, demodulation, auto notch and AGC as the main receiver, but it does not use the sound thread.
+// Receivers do not share any changing state, so each one can run in a different thread.
+#define RECEIVER_BLOCK		16384		// process this many input samples at a time
+
+typedef struct {
+	PyObject_HEAD
+	struct quisk_rx * rx;
+	struct AgcState agc;
+	int mode;			// the rx_mode_type
+	int frequency;			// tuning frequency in Hertz
+	complex double tune_vector;
+	int noise_blanker;		// noise blanker level, 0 for off
+	int use_agc;			// use the AGC
+	int busy;			// process() is running
+	double * filtI;			// filter coefficients
+	double * filtQ;
+} ReceiverObject;
+
+static void Receiver_dealloc(ReceiverObject * self)
+{
+	if (self->rx) {
+		quisk_rx_free(self->rx);
+		free(self->rx);
+	}
+	free(self->agc.c_samp);
+	free(self->filtI);
+	free(self->filtQ);
+	Py_TYPE(self)->tp_free((PyObject *)self);
+}
+
+static int Receiver_init(ReceiverObject * self, PyObject * args, PyObject * keywds)
+{
+	static char * kwlist[] = {"sample_rate", "mode", "frequency", NULL} ;
+	int sample_rate, mode = USB, frequency = 0;
+
+	if (!PyArg_ParseTupleAndKeywords (args, keywds, "i|ii", kwlist, &sample_rate, &mode, &frequency))
+		return -1;
+	if (sample_rate < 48000) {
+		PyErr_SetString(QuiskError, "The Receiver sample rate must be at least 48000");
+		return -1;
+	}
+	if (self->rx)		// __init__ was called again
+		quisk_rx_free(self->rx);
+	else
+		self->rx = (struct quisk_rx *)calloc(1, sizeof(struct quisk_rx));
+	if ( ! self->filtI)
+		self->filtI = (double *)malloc(MAX_FILTER_SIZE * sizeof(double));
+	if ( ! self->filtQ)
+		self->filtQ = (double *)malloc(MAX_FILTER_SIZE * sizeof(double));
+	if ( ! self->rx || ! self->filtI || ! self->filtQ) {
+		PyErr_NoMemory();
+		return -1;
+	}
+	quisk_rx_init(self->rx);
+	self->rx->sample_rate = sample_rate;
+	dAutoNotchReset(&self->rx->notch);		// make the shared FFT plans now; not in process()
+	ssb_squelch(NULL, 0, 48000, 0, &self->rx->squelch);
+	// Start with a copy of Rx filter zero.
+	memcpy(self->filtI, cFilterI[0], MAX_FILTER_SIZE * sizeof(double));
+	memcpy(self->filtQ, cFilterQ[0], MAX_FILTER_SIZE * sizeof(double));
+	self->rx->filtI = self->filtI;
+	self->rx->filtQ = self->filtQ;
+	self->rx->filter_size = sizeFilter;
+	self->rx->bandwidth = filter_bandwidth[0];
+	self->mode = mode;
+	self->frequency = frequency;
+	self->tune_vector = 1;
+	self->noise_blanker = 0;
+	self->use_agc = 1;
+	free(self->agc.c_samp);
+	self->agc.c_samp = NULL;
+	self->agc.max_out = 0.7;
+	self->agc.sample_rate = 48000;
+	self->agc.buf_size = 0;
+	return 0;
+}
+
+static PyObject * Receiver_set_params(ReceiverObject * self, PyObject * args, PyObject * keywds)
+{  /* Call with keyword arguments ONLY; change receiver parameters */
+	static char * kwlist[] = {"mode", "frequency", "noise_blanker", "auto_notch", "agc", NULL} ;
+
+	if ( ! self->rx) {
+		PyErr_SetString(QuiskError, "The Receiver is not initialized");
+		return NULL;
+	}
+	if (!PyArg_ParseTupleAndKeywords (args, keywds, "|iiiii", kwlist, &self->mode, &self->frequency,
+			&self->noise_blanker, &self->rx->auto_notch, &self->use_agc))
+		return NULL;
+	Py_INCREF (Py_None);
+	return Py_None;
+}
+
+static PyObject * Receiver_set_filter(ReceiverObject * self, PyObject * args)
+{	// Set the filter coefficients for the sample rate returned by filter_rate().
+	PyObject * filterI, * filterQ, * obj;
+	int i, size, bw;
+
+	if (!PyArg_ParseTuple (args, "OOi", &filterI, &filterQ, &bw))
+		return NULL;
+	if ( ! self->rx) {
+		PyErr_SetString(QuiskError, "The Receiver is not initialized");
+		return NULL;
+	}
+	if (PySequence_Check(filterI) != 1 || PySequence_Check(filterQ) != 1) {
+		PyErr_SetString (QuiskError, "Filter is not a sequence");
+		return NULL;
+	}
+	size = PySequence_Size(filterI);
+	if (size != PySequence_Size(filterQ) || size >= MAX_FILTER_SIZE) {
+		PyErr_SetString (QuiskError, "Bad filter size");
+		return NULL;
+	}
+	if (self->busy) {
+		PyErr_SetString(QuiskError, "The Receiver is busy");
+		return NULL;
+	}
+	for (i = 0; i < size; i++) {
+		obj = PySequence_GetItem(filterI, i);
+		self->filtI[i] = PyFloat_AsDouble(obj);
+		Py_XDECREF(obj);
+		obj = PySequence_GetItem(filterQ, i);
+		self->filtQ[i] = PyFloat_AsDouble(obj);
+		Py_XDECREF(obj);
+	}
+	self->rx->filter_size = size;
+	self->rx->bandwidth = bw;
+	Py_INCREF (Py_None);
+	return Py_None;
+}
+
+static PyObject * Receiver_filter_rate(ReceiverObject * self, PyObject * args)
+{
+	if (!PyArg_ParseTuple (args, ""))
+		return NULL;
+	if ( ! self->rx) {
+		PyErr_SetString(QuiskError, "The Receiver is not initialized");
+		return NULL;
+	}
+	return PyInt_FromLong(rx_filter_rate(self->rx->sample_rate, self->mode, self->rx->bandwidth));
+}
+
+static PyObject * Receiver_reset(ReceiverObject * self, PyObject * args)
+{	// Clear all filters and the AGC
+	if (!PyArg_ParseTuple (args, ""))
+		return NULL;
+	if ( ! self->rx) {
+		PyErr_SetString(QuiskError, "The Receiver is not initialized");
+		return NULL;
+	}
+	if (self->busy) {
+		PyErr_SetString(QuiskError, "The Receiver is busy");
+		return NULL;
+	}
+	quisk_rx_init(self->rx);
+	free(self->agc.c_samp);
+	self->agc.c_samp = NULL;
+	self->agc.buf_size = 0;
+	self->tune_vector = 1;
+	Py_INCREF (Py_None);
+	return Py_None;
+}
+
+static int Receiver_block(ReceiverObject * self, complex double * cSamples, double * dSamples, double * out, int nSamples)
+{	// Process one block of input samples in cSamples.  Write the output to out and return the number of doubles written.
+	struct quisk_rx * rx = self->rx;
+	complex double phase;
+	int i, n, is_iq;
+
+	is_iq = self->mode == DGT_IQ;
+	if (self->frequency) {		// tune the receiver to frequency
+		phase = cexp((I * -2.0 * M_PI * self->frequency) / rx->sample_rate);
+		for (i = 0; i < nSamples; i++) {
+			cSamples[i] *= self->tune_vector;
+			self->tune_vector *= phase;
+		}
+		self->tune_vector /= cabs(self->tune_vector);
+	}
+	NoiseBlanker(rx, cSamples, nSamples, self->noise_blanker);
+	n = rx_decimate(rx, cSamples, nSamples);
+	n = rx_demodulate(rx, cSamples, dSamples, n, self->mode);
+	rx->audio_sum = 0;
+	rx->audio_count = 0;
+	if ( ! is_iq)
+		for (i = 0; i < n; i++)
+			cSamples[i] = dSamples[i];
+	if (rx->decim_srate != 48000)
+		n = cFracDecim(&rx->frac, cSamples, n, rx->decim_srate / 48000.0);
+	if (self->use_agc)
+		process_agc(&self->agc, cSamples, n, is_iq);
+	if (is_iq) {
+		for (i = 0; i < n; i++) {
+			*out++ = creal(cSamples[i]);
+			*out++ = cimag(cSamples[i]);
+		}
+		return n * 2;
+	}
+	for (i = 0; i < n; i++)
+		*out++ = creal(cSamples[i]);
+	return n;
+}
+
+static PyObject * Receiver_process(ReceiverObject * self, PyObject * args)
+{	// Process a buffer of complex double I/Q samples at the sample rate.  Return a bytearray of double audio
+	// samples at 48000 sps, or interleaved I/Q doubles for DGT-IQ.  The scale of the samples is CLIP32.
+	PyObject * samples, * bytes;
+	Py_buffer view;
+	complex double * cSamples, * pt;
+	double * dSamples, * out;
+	int i, count, n, nout;
+
+	if (!PyArg_ParseTuple (args, "O", &samples))
+		return NULL;
+	if ( ! self->rx) {
+		PyErr_SetString(QuiskError, "The Receiver is not initialized");
+		return NULL;
+	}
+	if (self->busy) {
+		PyErr_SetString(QuiskError, "The Receiver is busy");
+		return NULL;
+	}
+	if (PyObject_GetBuffer(samples, &view, PyBUF_SIMPLE) != 0)
+		return NULL;
+	if (view.len % sizeof(complex double) != 0) {
+		PyBuffer_Release(&view);
+		PyErr_SetString(QuiskError, "Samples must be complex doubles");
+		return NULL;
+	}
+	count = view.len / sizeof(complex double);
+	cSamples = (complex double *)malloc((RECEIVER_BLOCK + 64) * sizeof(complex double));
+	dSamples = (double *)malloc((RECEIVER_BLOCK + 64) * sizeof(double));
+	// The output rate is not more than the input rate, but each block may add a few samples
+	out = (double *)malloc((count + 64 * (count / RECEIVER_BLOCK + 1)) * 2 * sizeof(double));
+	if ( ! cSamples || ! dSamples || ! out) {
+		free(cSamples);
+		free(dSamples);
+		free(out);
+		PyBuffer_Release(&view);
+		return PyErr_NoMemory();
+	}
+	self->busy = 1;
+	nout = 0;
+	pt = (complex double *)view.buf;
+	Py_BEGIN_ALLOW_THREADS
+	for (i = 0; i < count; i += n) {
+		n = count - i;
+		if (n > RECEIVER_BLOCK)
+			n = RECEIVER_BLOCK;
+		memcpy(cSamples, pt + i, n * sizeof(complex double));
+		nout += Receiver_block(self, cSamples, dSamples, out + nout, n);
+	}
+	Py_END_ALLOW_THREADS
+	self->busy = 0;
+	PyBuffer_Release(&view);
+	bytes = PyByteArray_FromStringAndSize((char *)out, nout * sizeof(double));
+	free(cSamples);
+	free(dSamples);
+	free(out);
+	return bytes;
+}
+
+static PyMethodDef Receiver_methods[] = {
+	{"process", (PyCFunction)Receiver_process, METH_VARARGS, "Demodulate a buffer of complex double samples and return a bytearray of double audio samples."},
+	{"set_params", (PyCFunction)Receiver_set_params, METH_VARARGS|METH_KEYWORDS, "Set mode, frequency, noise_blanker, auto_notch or agc."},
+	{"set_filter", (PyCFunction)Receiver_set_filter, METH_VARARGS, "Set the filter coefficients I and Q, and the bandwidth."},
+	{"filter_rate", (PyCFunction)Receiver_filter_rate, METH_VARARGS, "Return the sample rate for the filter coefficients."},
+	{"reset", (PyCFunction)Receiver_reset, METH_VARARGS, "Clear the filters and the AGC."},
+	{NULL, NULL, 0, NULL}
+};
+
+static PyTypeObject ReceiverType = {
+	PyVarObject_HEAD_INIT(NULL, 0)
+	.tp_name = "_quisk.Receiver",
+	.tp_basicsize = sizeof(ReceiverObject),
+	.tp_dealloc = (destructor)Receiver_dealloc,
+	.tp_flags = Py_TPFLAGS_DEFAULT,
+	.tp_doc = "Receiver(sample_rate, mode=3, frequency=0): a receiver with its own state.",
+	.tp_methods = Receiver_methods,
+	.tp_init = (initproc)Receiver_init,
+	.tp_new = PyType_GenericNew,
+};
+
 static PyMethodDef QuiskMethods[] = {
 	{"add_tone", add_tone, METH_VARARGS, "Add a test tone to the data."},
 	{"dft", dft, METH_VARARGS, "Calculate the discrete Fourier transform."},
@@ -6084,6 +8775,15 @@ static PyMethodDef QuiskMethods[] = {
 	{"get_state", get_state, METH_VARARGS, "Return a count of read and write errors."},
 	{"get_graph", get_graph, METH_VARARGS, "Return a tuple of graph data."},
 	{"get_bandscope", get_bandscope, METH_VARARGS, "Return a tuple of bandscope data."},
+	{"set_band_power", set_band_power, METH_VARARGS, "Set the frequency windows for the band power measurement."},
+	{"get_band_power", get_band_power, METH_VARARGS, "Return the RMS, peak and noise floor for each band power window."},
+	{"set_signal_detect", set_signal_detect, METH_VARARGS, "Set the parameters of the signal detector."},
+	{"set_image_reject", set_image_reject, METH_VARARGS, "Start or stop the adaptive image rejection filter."},
+	{"get_image_reject", get_image_reject, METH_VARARGS, "Return the measured image rejection and the number of updates."},
+	{"get_signals", get_signals, METH_VARARGS, "Return the signals found by the signal detector."},
+	{"set_channelizer", set_channelizer, METH_VARARGS, "Set the number of channels for the polyphase channelizer."},
+	{"set_channel_rx", set_channel_rx, METH_VARARGS, "Start or stop a channel receiver fed by the channelizer."},
+	{"get_channel_rx", get_channel_rx, METH_VARARGS, "Return the samples from a channel receiver."},
 	{"set_multirx_mode", set_multirx_mode, METH_VARARGS, "Select demodulation mode for sub-receivers."},
 	{"set_multirx_freq", set_multirx_freq, METH_VARARGS, "Select how to play audio from sub-receivers."},
 	{"set_multirx_play_method", set_multirx_play_method, METH_VARARGS, "Select how to play audio from sub-receivers."},
@@ -6091,8 +8791,10 @@ static PyMethodDef QuiskMethods[] = {
 	{"get_multirx_graph", get_multirx_graph, METH_VARARGS, "Return a tuple of sub-receiver graph data."},
 	{"get_filter", get_filter, METH_VARARGS, "Return the frequency response of the receive filter."},
 	{"get_filter_rate", get_filter_rate, METH_VARARGS, "Return the sample rate used for the filters."},
+	{"design_filter", design_filter, METH_VARARGS, "Return the I and Q coefficients of a receive filter."},
 	{"get_tx_filter", quisk_get_tx_filter, METH_VARARGS, "Return the frequency response of the transmit filter."},
 	{"get_audio_graph", get_audio_graph, METH_VARARGS, "Return a tuple of the audio graph data."},
+	{"graph_points", graph_points, METH_VARARGS, "Convert graph data to x, y points for DrawLines."},
 	{"softrock_corrections", softrock_corrections, METH_VARARGS, "Control and return SoftRock amplitude and phase corrections."},
 	{"measure_frequency", measure_frequency, METH_VARARGS, "Set the method, return the measured frequency."},
 	{"measure_audio", measure_audio, METH_VARARGS, "Set the method, return the measured audio voltage."},
@@ -6105,11 +8807,14 @@ static PyMethodDef QuiskMethods[] = {
 	{"invert_spectrum", invert_spectrum, METH_VARARGS, "Invert the input RF spectrum"},
 	{"ip_interfaces", ip_interfaces, METH_VARARGS, "Return a list of interface data"},
 	{"pc_to_hermes", pc_to_hermes, METH_VARARGS, "Send this block of control data to the Hermes device"},
+	{"pc_to_hermes_p2", pc_to_hermes_p2, METH_VARARGS, "Set a protocol 2 command packet for the Hermes device"},
 	{"pc_to_hermeslite_writequeue", pc_to_hermeslite_writequeue, METH_VARARGS, "Fill Hermes-Lite write queue"},	
 	{"set_hermeslite_writepointer", set_hermeslite_writepointer, METH_VARARGS, "Set Hermes-Lite write pointer"},	
 	{"get_hermeslite_writepointer", get_hermeslite_writepointer, METH_VARARGS, "Return Hermes-Lite write pointer"},
 	{"clear_hermeslite_response", clear_hermeslite_response, METH_VARARGS, "Clear the Hermes-Lite response array"},
 	{"get_hermeslite_response", get_hermeslite_response, METH_VARARGS, "Get the Hermes-Lite response array"},
+	{"hermeslite_command", hermeslite_command, METH_VARARGS, "Add a command to the Hermes-Lite command queue"},
+	{"hermeslite_results", hermeslite_results, METH_VARARGS, "Return the results of finished Hermes-Lite commands"},
 	{"hermes_to_pc", hermes_to_pc, METH_VARARGS, "Get the block of control data from the Hermes device"},
 	{"record_app", record_app, METH_VARARGS, "Save the App instance."},
 	{"record_graph", record_graph, METH_VARARGS, "Record graph parameters."},
@@ -6122,6 +8827,10 @@ static PyMethodDef QuiskMethods[] = {
 	{"set_ssb_squelch", set_ssb_squelch, METH_VARARGS, "Set the SSB squelch parameters."},
 	{"set_ctcss", set_ctcss, METH_VARARGS, "Set the frequency of the repeater access tone."},
 	{"set_file_name", (PyCFunction)quisk_set_file_name, METH_VARARGS|METH_KEYWORDS, "Set the names and state of the recording and playback files."},
+	{"iq_ring", (PyCFunction)quisk_iq_ring, METH_VARARGS|METH_KEYWORDS, "Set the directory, trigger a dump and return the status of the I/Q ring."},
+	{"add_demod_plugin", (PyCFunction)quisk_add_demod_plugin, METH_VARARGS|METH_KEYWORDS, "Add a Python or C demodulator plug-in for the EXT button."},
+	{"set_demod_plugin", quisk_set_demod_plugin, METH_VARARGS, "Choose the demodulator plug-in for the EXT button."},
+	{"get_demod_plugins", quisk_get_demod_plugins, METH_VARARGS, "Return the names and timing counters of the demodulator plug-ins."},
 	{"get_params", get_params, METH_VARARGS, "Return parameters from quisk."},
 	{"set_params", (PyCFunction)set_params, METH_VARARGS|METH_KEYWORDS, "Set miscellaneous parameters in quisk.c."},
 	{"set_sparams", (PyCFunction)quisk_set_sparams, METH_VARARGS|METH_KEYWORDS, "Set miscellaneous parameters in sound.c."},
@@ -6166,6 +8875,8 @@ static PyMethodDef QuiskMethods[] = {
 	{"play_channels", quisk_play_channels, METH_VARARGS, "Set the I and Q playback channel numbers"},
 	{"micplay_channels", quisk_micplay_channels, METH_VARARGS, "Set the I and Q microphone playback channel numbers"},
 	{"change_scan", change_scan, METH_VARARGS, "Change to a new FFT rate and multiplier"},
+	{"sweep_start", sweep_start, METH_VARARGS, "Start a panoramic sweep segment after a retune."},
+	{"sweep_result", sweep_result, METH_VARARGS, "Return the averaged power of a panoramic sweep segment."},
 	{"change_rate", change_rate, METH_VARARGS, "Change to a new sample rate"},
 	{"change_rates", change_rates, METH_VARARGS, "Change to multiple new sample rates"},
 	{"read_sound", read_sound, METH_VARARGS, "Read from the soundcard."},
@@ -6184,8 +8895,11 @@ static PyMethodDef QuiskMethods[] = {
 	{"wdsp_set_parameter", (PyCFunction)quisk_wdsp_set_parameter, METH_VARARGS|METH_KEYWORDS, "Set parameters for the WDSP SDR library."},
 	{"tmp_record_save", tmp_record_save, METH_VARARGS, "Save the temporary recording in a WAV file."},
 	{"watfall_RgbData", watfall_RgbData, METH_VARARGS, "Return a cookie for the Waterfall pixel data."},
+	{"watfall_Free", watfall_Free, METH_VARARGS, "Free the Waterfall pixel data."},
 	{"watfall_OnGraphData", watfall_OnGraphData, METH_VARARGS, "Record a row of Waterfall FFT dB data."},
 	{"watfall_GetPixels", watfall_GetPixels, METH_VARARGS, "Write the Waterfall image to be displayed."},
+	{"watfall_HistPixels", watfall_HistPixels, METH_VARARGS, "Write the Waterfall image from the spectrum history."},
+	{"spectrum_hist_add", spectrum_hist_add, METH_VARARGS, "Add a row of dB data to the spectrum history."},
 	{"write_fftw_wisdom", write_fftw_wisdom, METH_VARARGS, "Write the current fftw wisdom to the wisdom file."},
 	{"read_fftw_wisdom", read_fftw_wisdom, METH_VARARGS, "Return the current fftw wisdom as a byte array."},
 	{"tci_get_params", (PyCFunction)quisk_tci_get_params, METH_VARARGS, "Return parameters from TCI."},
@@ -6215,6 +8929,10 @@ PyMODINIT_FUNC init_quisk (void)
 	QuiskError = PyErr_NewException ("quisk.error", NULL, NULL);
 	Py_INCREF (QuiskError);
 	PyModule_AddObject (m, "error", QuiskError);
+	if (PyType_Ready(&ReceiverType) == 0) {
+		Py_INCREF (&ReceiverType);
+		PyModule_AddObject (m, "Receiver", (PyObject *)&ReceiverType);
+	}
 
        /* Create Capsules for handing _quisk symbols to C extensions in other Python modules. */
        c_api_object = PyCapsule_New(Quisk_API, "_quisk.QUISK_C_API", NULL);
@@ -6248,6 +8966,10 @@ PyMODINIT_FUNC PyInit__quisk(void)
 	}
 	Py_INCREF (QuiskError);
 	PyModule_AddObject (m, "error", QuiskError);
+	if (PyType_Ready(&ReceiverType) == 0) {
+		Py_INCREF (&ReceiverType);
+		PyModule_AddObject (m, "Receiver", (PyObject *)&ReceiverType);
+	}
 
        /* Create Capsules for handing _quisk symbols to C extensions in other Python modules. */
        c_api_object = PyCapsule_New(Quisk_API, "_quisk.QUISK_C_API", NULL);
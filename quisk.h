@@ -21,6 +21,7 @@
 #define QUISK_MAX_SUB_RECEIVERS		9	// Maximum number of sub-receiver channels in addition to the main receiver
 #define QUISK_INDEX_SUB_RX1		4	// Index of sub-receiver Rx1 in quiskPlaybackDevices
 #define START_CW_DELAY_MAX	250		// Maximum delay for start_cw_delay
+#define IQ_EQ_MAX_TAPS		15		// Maximum taps of the adaptive image rejection filter
 
 // Test the audio: 0 == No test; normal operation;
 // 1 == Copy real data to the output; 2 == copy imaginary data to the output;
@@ -142,6 +143,8 @@ struct sound_dev {				// data for sound capture or playback device
 	int latency_frames;			// desired latency in audio play samples
 	int play_buf_size;			// size of the sound card playback buffer in frames (?? or bytes)
 	int play_buf_bytes;			// size of the sound card playback buffer in bytes
+	int period_frames;			// ALSA: period size for low latency transfers, or zero
+	int alsa_mmap;				// ALSA: the device uses mmap access
         int old_key;                            // previous key up/down state
 	int use_float;				// DirectX: Use IEEE floating point
 	int dataPos;				// DirectX: data position
@@ -170,12 +173,16 @@ struct sound_dev {				// data for sound capture or playback device
 	void * device_data;		// special data for each sound device
         double TimerTime0;              // Used to print debug messages
 	// Variables used to correct differences in sample rates:
-	int cr_correction;
 	int cr_delay;
-	double cr_average_fill;
+	double cr_average_fill;		// the play driver adds the buffer fill 0.0 to 1.0
 	int cr_average_count;
-	int cr_sample_time;
-	int cr_correct_time;
+	double cr_time;			// time of the last rate correction
+	double cr_ratio;		// output samples per input sample
+	double cr_integral;		// integral of the buffer fill error
+	double cr_phase;		// fractional position of the next output sample
+	complex double cr_hist[3];	// last input samples for the interpolator
+	complex double * cr_buffer;	// resampler input and output
+	int cr_buffer_size;
 } ;
 
 extern struct sound_dev quisk_Playback;
@@ -199,6 +206,11 @@ struct sound_conf {
 	int latencyCapt;
 	int latencyPlay;
 	int interrupts;
+	int low_latency;	// low latency mode: small blocks, period-sized transfers, real-time sound thread
+	int realtime;		// the sound thread has real-time priority
+	double latency_capt;	// measured seconds from the ADC to the read of the samples
+	double latency_dsp;	// measured seconds from the read to the play of the samples
+	double latency_play;	// measured seconds of sound in the play buffer ahead of the samples
 	char msg1[QUISK_SC_SIZE];
 	char err_msg[QUISK_SC_SIZE];
 	// These parameters are for the microphone:
@@ -297,12 +309,11 @@ extern int quiskImdLevel;				// level for rxMode IMD
 extern int quiskTxHoldState;			// state machine for Tx wait for repeater frequency shift
 extern double quisk_ctcss_freq;			// frequency in Hertz
 extern unsigned char quisk_pc_to_hermes[17 * 4];		// Data to send from the PC to the Hermes hardware
-extern unsigned char quisk_hermeslite_writequeue[5];		// One-time writes to Hermes-Lite
-extern unsigned int quisk_hermeslite_writepointer;		// 0==No request; 1=Send writequeue; 2==Wait for ACK; 3==0x3F error from HL2
 extern unsigned int quisk_hermes_code_version;			// Hermes code version from Hermes to PC
 extern unsigned int quisk_hermes_board_id;			// Hermes board ID from Hermes to PC
 extern int hermes_mox_bit;					// Hermes mox bit from the PC to Hermes
 extern int quisk_use_rx_udp;					// Method of access to UDP hardware
+extern int quisk_hermes_protocol;				// OpenHPSDR protocol 1 or 2
 extern complex double cRxFilterOut(complex double, int, int);
 extern int quisk_multirx_count;			// number of additional receivers zero or 1, 2, 3, ..
 extern struct sound_dev quisk_DigitalRx1Output;		// Output sound device for sub-receiver 1
@@ -341,6 +352,10 @@ extern PyObject * quisk_dummy_sound_devices(PyObject * , PyObject *);
 extern PyObject * quisk_sound_errors(PyObject *, PyObject *);
 extern PyObject * quisk_set_file_record(PyObject *, PyObject *);
 extern PyObject * quisk_set_file_name(PyObject *, PyObject *, PyObject *);
+extern PyObject * quisk_iq_ring(PyObject *, PyObject *, PyObject *);
+extern PyObject * quisk_add_demod_plugin(PyObject *, PyObject *, PyObject *);
+extern PyObject * quisk_set_demod_plugin(PyObject *, PyObject *);
+extern PyObject * quisk_get_demod_plugins(PyObject *, PyObject *);
 extern PyObject * quisk_set_tx_audio(PyObject *, PyObject *, PyObject *);
 extern PyObject * quisk_get_tx_audio(PyObject *, PyObject *);
 extern PyObject * quisk_is_vox(PyObject *, PyObject *);
@@ -384,14 +399,20 @@ void quisk_open_mic(void);
 void quisk_close_mic(void);
 void quisk_set_key_down(int);
 void quisk_set_tx_mode(void);
+void quisk_fftw_plan_lock(void);
+void quisk_fftw_plan_unlock(void);
 void ptimer(int);
 int quisk_extern_demod(complex double *, int, double);
+int quisk_demod_plugin(complex double *, int, int);
+int quisk_demod_plugin_active(void);
+void quisk_demod_plugin_stop(void);
 void quisk_tmp_microphone(complex double *, int);
 void quisk_tmp_record(complex double * , int, double);
 void quisk_file_microphone(complex double *, int);
 void quisk_file_playback(complex double *, int, double);
 void quisk_tmp_playback(complex double *, int, double);
 void quisk_hermes_tx_send(int, int *);
+int quisk_hl2_cmd_next(unsigned char *, int);
 void quisk_udp_mic_error(char *);
 void quisk_calc_audio_graph(double, complex double *, double *, int, int);
 double QuiskDeltaSec(int);
@@ -400,6 +421,10 @@ void * quisk_make_txIQ(struct sound_dev *, int);
 int quisk_play_sidetone(struct sound_dev *);
 void quisk_set_play_state(void);
 void quisk_poll_hardware_key(void);
+void quisk_set_image_reject(complex double *, int);
+void quisk_get_tuning(int *, int *);
+void quisk_iq_ring_trigger(const char *);
+void quisk_iq_ring_squelch(int);
 void PreDistort(complex double * amp_in_samples, complex double * amp_out_samples, int nSamples, complex double * tx_samples, int num_tx);
 int CircularBuffer(int channel, complex double * cSamples, int nRead, int nWrite);
 
@@ -28,7 +28,7 @@ if sys.path[0] != '':		# Make sure the current working directory is on path
 
 import wx, wx.html, wx.lib.stattext, wx.lib.colourdb, wx.grid
 import math, cmath, time, traceback, string, select, subprocess
-import threading, pickle, webbrowser, json
+import threading, pickle, webbrowser, json, array, collections, queue
 try:
   from xmlrpc.client import ServerProxy
 except ImportError:
@@ -38,6 +38,7 @@ from quisk_widgets import *
 from filters import Filters
 import dxcluster
 import configure
+import quisk_utils
 import quisk_conf_defaults as conf
 import quisk_wdsp
 
@@ -283,6 +284,24 @@ class Timer:
 
 ## T = Timer()		# Make a timer instance
 
+class StartupProfile:
+  """Record the time of each step of startup and print a report.
+
+  Call Mark(msg) at the end of each step, and Report() at the end of startup.
+  """
+  def __init__(self):
+    self.time0 = self.time_last = time.perf_counter()
+    self.steps = []		# list of (msg, seconds)
+  def Mark(self, msg):
+    tm = time.perf_counter()
+    self.steps.append((msg, tm - self.time_last))
+    self.time_last = tm
+  def Report(self):
+    total = self.time_last - self.time0
+    print ("Startup time %.3f seconds" % total)
+    for msg, delta in sorted(self.steps, key=lambda x: x[1], reverse=True):
+      print ("  %8.1f msec  %5.1f%%  %s" % (delta * 1e3, delta * 100.0 / max(total, 1E-9), msg))
+
 class HamlibHandlerSerial:
   "Create a serial port for Hamlib control that emulates the FlexRadio PowerSDR 2.x command set."
   # This implements some Kenwood TS-2000 commands, but it is far from complete.
@@ -1591,6 +1610,8 @@ class ConfigStatus(wx.ScrolledCanvas):
     self.fft_error = -1
     self.latencyCapt = -1
     self.latencyPlay = -1
+    self.latency = None
+    self.demod_plugins = []
     self.y_scale = 0
     self.y_zero = 0
     self.zoom_control = 0
@@ -1701,6 +1722,18 @@ class ConfigStatus(wx.ScrolledCanvas):
       self.MakeRow2("FFT number of errors", self.fft_error)
     if conf.use_rx_udp == 10:		# Hermes UDP protocol
       self.MakeRow2("Hermes-Lite2 Tx buffer errors", self.hl2_txbuf_errors)
+    if self.latency:
+      lat = self.latency
+      t = "capture %.1f  DSP %.1f  play %.1f" % (lat["capture"], lat["dsp"], lat["play"])
+      if lat["low_latency"]:
+        t += "  low latency"
+        if lat["realtime"]:
+          t += ", real-time"
+      self.MakeRow2("Rx to speaker latency msec", "%.1f" % lat["total"], t)
+    for plug in self.demod_plugins:
+      t = "calls %d  max %.0f usec  drops %d  underruns %d  errors %d" % (plug["calls"], plug["max_usec"],
+          plug["drops"], plug["underruns"], plug["errors"])
+      self.MakeRow2("Demod plug-in %s usec" % plug["name"], "%.0f" % plug["avg_usec"], t)
     self.mem_y += self.dy
     if not self.tabstops2:
       return
@@ -1745,6 +1778,8 @@ class ConfigStatus(wx.ScrolledCanvas):
          self.data_poll_usec
      ) = QS.get_state()
     self.mic_max_display = 20.0 * math.log10((self.mic_max_display + 1) / 32767.0)
+    self.latency = QS.get_params("latency")
+    self.demod_plugins = QS.get_demod_plugins()
     if conf.use_rx_udp == 10:		# Hermes UDP protocol
       self.hl2_txbuf_errors = QS.get_params("hl2_txbuf_errors")
     self.RefreshRect(self.mem_rect)
@@ -1860,10 +1895,7 @@ class ConfigFavorites(wx.grid.Grid):
       print ("Bad logic in favorites WriteOut()")
       return
     self.changed = False
-    try:
-      fp = open(self.init_path, 'w')
-    except:
-      return
+    lines = []
     for row in range(self.GetNumberRows()):
       out = []
       for col in range(0, ncols):
@@ -1871,8 +1903,8 @@ class ConfigFavorites(wx.grid.Grid):
         cell = cell.replace('|', ';')
         out.append(cell)
       t = "%20s | %10s | %10s | %30s | %10s | %10s\n" % tuple(out)
-      fp.write(t)
-    fp.close()
+      lines.append(t)
+    application.state_writer.SaveText(self.init_path, ''.join(lines))
   def AddNewFavorite(self):
     self.InsertRows(0)
     self.SetCellValue(0, 0, 'New station');
@@ -1974,6 +2006,15 @@ class ConfigFavorites(wx.grid.Grid):
     if self.changed:
       self.WriteOut()
 
+def DrawLinesBuffer(dc, points, count):
+  """Draw lines through the first count x, y points in points, an array('i') made by QS.graph_points()."""
+  if count < 2:
+    return
+  if hasattr(dc, 'DrawLinesFromBuffer'):	# wxPython 4.1 and later use the buffer directly
+    dc.DrawLinesFromBuffer(memoryview(points)[0:count * 2])
+  else:
+    dc.DrawLines([(points[i], points[i + 1]) for i in range(0, count * 2, 2)])
+
 class GraphDisplay(wx.Window):
   """Display the FFT graph within the graph screen."""
   def __init__(self, parent, x, y, graph_width, height, chary):
@@ -1985,7 +2026,10 @@ class GraphDisplay(wx.Window):
     self.chary = chary
     self.graph_width = graph_width
     self.display_text = ""
-    self.line = [(0, 0), (1,1)]		# initial fake graph data
+    self.points = array.array('i', [-1, 0] * graph_width)	# x, y points of the graph line from QS.graph_points()
+    self.npoints = 0
+    self.static_layer = None	# bitmap of the background, filter display and tick lines
+    self.static_key = None		# the values used to draw the static layer
     self.SetBackgroundColour(conf.color_graph)
     self.Bind(wx.EVT_PAINT, self.OnPaint)
     self.Bind(wx.EVT_LEFT_DOWN, parent.OnLeftDown)
@@ -2007,6 +2051,7 @@ class GraphDisplay(wx.Window):
     self.backgroundBrush = wx.Brush(self.GetBackgroundColour())
     self.filterBrush = wx.Brush(conf.color_bandwidth, wx.SOLID)
     self.horizPen = wx.Pen(conf.color_gl, 1, wx.SOLID)
+    self.graphPen = wx.Pen(conf.color_graphline, 1)
     self.font = wx.Font(conf.graph_msg_font_size, wx.FONTFAMILY_SWISS, wx.NORMAL,
           wx.FONTWEIGHT_NORMAL, False, conf.quisk_typeface)
     self.SetFont(self.font)
@@ -2017,16 +2062,13 @@ class GraphDisplay(wx.Window):
   def OnPaint(self, event):
     #print 'GraphDisplay', self.GetUpdateRegion().GetBox()
     dc = wx.AutoBufferedPaintDC(self)
-    dc.Clear()
-    # Draw the tuning line and filter display to the screen.
-    # If self.tune_rx is zero, draw the Rx filter at the Tx tuning line. There is no separate Rx display.
-    # Otherwise draw both an Rx and Tx tuning display.
-    self.DrawFilter(dc)
-    dc.SetPen(wx.Pen(conf.color_graphline, 1))
-    dc.DrawLines(self.line)
-    dc.SetPen(self.horizPen)
-    for y in self.parent.y_ticks:
-      dc.DrawLine(0, y, self.graph_width, y)	# y line
+    # The background, filter display and tick lines change rarely.  Draw them from a bitmap, and draw the graph line on top.
+    key = self.StaticKey()
+    if key != self.static_key:
+      self.MakeStaticLayer(key)
+    dc.DrawBitmap(self.static_layer, 0, 0)
+    dc.SetPen(self.graphPen)
+    DrawLinesBuffer(dc, self.points, self.npoints)
     if self.display_text:
       dc.SetFont(self.font)
       dc.SetTextBackground(conf.color_graph_msg_bg)
@@ -2039,6 +2081,30 @@ class GraphDisplay(wx.Window):
       dc.SetTextForeground("red")
       dc.SetBackgroundMode(wx.SOLID)
       dc.DrawText(" *** Tx Inhibit ***", 0, self.chary * 15 // 10)
+  def StaticKey(self):
+    # Return the values that determine the static layer.
+    parent = self.parent
+    if self.tune_rx:
+      tx_filter = parent.GetFilterDisplayXWR(rx_filters=False)
+    else:
+      tx_filter = None
+    return (self.graph_width, self.height, self.tune_tx, self.tune_rx, tx_filter,
+       parent.GetFilterDisplayXWR(rx_filters=True), tuple(parent.y_ticks))
+  def MakeStaticLayer(self, key):
+    # Draw the background, the tuning line and filter display, and the tick lines into a bitmap.
+    # If self.tune_rx is zero, draw the Rx filter at the Tx tuning line. There is no separate Rx display.
+    # Otherwise draw both an Rx and Tx tuning display.
+    self.static_key = key
+    self.static_layer = EmptyBitmap(self.graph_width, max(1, self.height))
+    dc = wx.MemoryDC()
+    dc.SelectObject(self.static_layer)
+    dc.SetBackground(self.backgroundBrush)
+    dc.Clear()
+    self.DrawFilter(dc)
+    dc.SetPen(self.horizPen)
+    for y in self.parent.y_ticks:
+      dc.DrawLine(0, y, self.graph_width, y)	# y line
+    dc.SelectObject(wx.NullBitmap)
   def DrawFilter(self, dc):
     dc.SetPen(wx.TRANSPARENT_PEN)
     dc.SetLogicalFunction(wx.COPY)
@@ -2060,19 +2126,11 @@ class GraphDisplay(wx.Window):
   def SetHeight(self, height):
     self.height = height
     self.SetSize((self.graph_width, height))
-  def OnGraphData(self, data):
-    x = 0
-    for y in data:	# y is in dB, -200 to 0
-      y = self.zeroDB - int(y * self.scale / 10.0 + 0.5)
-      try:
-        y0 = self.line[x][1]
-      except IndexError:
-        self.line.append([x, y])
-      else:
-        if y > y0:
-          y = min(y, y0 + self.peak_hold)
-        self.line[x] = [x, y]
-      x = x + 1
+  def OnGraphData(self, data):	# data is a sequence of dB values, -200 to 0
+    self.OnGraphBuffer(array.array('d', data))
+  def OnGraphBuffer(self, data):	# data is a buffer of doubles in dB, -200 to 0
+    # The y values may increase (the signal decrease) by at most self.peak_hold for each new graph.
+    self.npoints = QS.graph_points(self.points, data, 0, self.zeroDB, self.scale / 10.0, -1, 1, self.peak_hold)
     self.Refresh()
   def SetTuningLine(self, tune_tx, tune_rx):
     dc = wx.ClientDC(self)
@@ -2664,13 +2722,20 @@ class StationScreen(wx.Window):		# This code was contributed by Christof, DJ4CM.
         self.stationList.append((mem_f, conf.Xsym_stat_mem, '', mem_mode, ''))
     #add dx spots
     if application.dxCluster:
-      for entry in application.dxCluster.dxSpots:
-        if freq1 < entry.getFreq() < freq2:
-          for i in range (0, entry.getLen()):
-            descr = entry.getSpotter(i) + '\t' + entry.getTime(i) + '\t' + entry.getLocation(i) + '\n' + entry.getComment(i)
-            if i < entry.getLen()-1:
-              descr += '\n'
-          self.stationList.append((entry.freq, conf.Xsym_stat_dx, entry.dx, '', descr))           
+      for entry in application.dxCluster.GetSpots(freq1, freq2):
+        for i in range (0, entry.getLen()):
+          descr = entry.getSpotter(i) + '\t' + entry.getTime(i) + '\t' + entry.getLocation(i) + '\n' + entry.getComment(i)
+          if i < entry.getLen()-1:
+            descr += '\n'
+        self.stationList.append((entry.freq, conf.Xsym_stat_dx, entry.dx, '', descr))
+    # add detected signals
+    for sig_f, snr, narrow in application.detected_signals:
+      if freq1 < sig_f < freq2:
+        if narrow:
+          descr = "Carrier %.0f dB above the noise" % snr
+        else:
+          descr = "Signal %.0f dB above the noise" % snr
+        self.stationList.append((sig_f, conf.Xsym_stat_sig, "%.0fdB" % snr, '', descr))
     # draw stations on graph
     self.stationList.sort()
     lastX = []
@@ -2783,7 +2848,11 @@ class WaterfallDisplay(wx.Window):
     self.Bind(wx.EVT_RIGHT_DOWN, parent.OnRightDown)
     self.Bind(wx.EVT_LEFT_UP, parent.OnLeftUp)
     self.Bind(wx.EVT_MOTION, parent.OnMotion)
-    self.Bind(wx.EVT_MOUSEWHEEL, parent.OnWheel)
+    self.Bind(wx.EVT_MOUSEWHEEL, self.OnWheel)
+    self.history_key = 'main'		# Name of the spectrum history for this waterfall
+    self.history_row = None		# Top row shown from the spectrum history, or None for the live waterfall
+    self.y_zero = conf.waterfall_y_zero
+    self.y_scale = conf.waterfall_y_scale
     self.tune_tx = graph_width // 2	# Current X position of the Tx tuning line
     self.tune_rx = 0				# Current X position of Rx tuning line or zero
     self.marginPen = wx.Pen(conf.color_graph, 1)
@@ -2810,10 +2879,23 @@ class WaterfallDisplay(wx.Window):
       red[i]   = (i - pal2[n][0]) * (pal2[n+1][1] - pal2[n][1]) // (pal2[n+1][0] - pal2[n][0]) + pal2[n][1]
       green[i] = (i - pal2[n][0]) * (pal2[n+1][2] - pal2[n][2]) // (pal2[n+1][0] - pal2[n][0]) + pal2[n][2]
       blue[i]  = (i - pal2[n][0]) * (pal2[n+1][3] - pal2[n][3]) // (pal2[n+1][0] - pal2[n][0]) + pal2[n][3]
+    self.palette = (red, green, blue)
+    self.rgb_data = None
+    self.pixels = None
+    self.MakeBuffers()
+  def MakeBuffers(self):
+    red, green, blue = self.palette
     self.rgb_data = QS.watfall_RgbData(red, green, blue, self.graph_width, application.screen_height)
     self.pixels = bytearray(self.graph_width * application.screen_height * 3)
+  def FreeBuffers(self):	# Free the waterfall rows and pixels; they are made again when needed
+    if self.rgb_data is not None:
+      QS.watfall_Free(self.rgb_data)
+      self.rgb_data = None
+      self.pixels = None
   def OnPaint(self, event):
     dc = wx.PaintDC(self)
+    if self.rgb_data is None:
+      self.MakeBuffers()
     dc.SetTextForeground(conf.color_graphlabels)
     dc.SetBackground(wx.Brush('Black'))
     rit = self.DrawFilter(dc)
@@ -2824,12 +2906,22 @@ class WaterfallDisplay(wx.Window):
     height = self.height - self.margin
     if height <= 0:
       height = 1
-    QS.watfall_GetPixels(self.rgb_data, self.pixels, x_origin, width, height)
+    history = application.spectrum_histories.get(self.history_key)
+    if self.history_row is not None and history:
+      QS.watfall_HistPixels(self.rgb_data, history.buffer, self.pixels, self.history_row, self.VFO, sample_rate,
+          self.zoom_deltaf, self.data_width, width, height, self.y_zero, self.y_scale, float(self.rf_gain))
+    else:
+      self.history_row = None
+      QS.watfall_GetPixels(self.rgb_data, self.pixels, x_origin, width, height)
     if wxVersion in ('2', '3'):
       bmap = wx.BitmapFromBuffer(width, height, self.pixels)
     else:
       bmap = wx.Bitmap.FromBuffer(width, height, self.pixels)
     dc.DrawBitmap(bmap, 0, self.margin)
+    if self.history_row is not None:
+      tm = history.RowInfo(self.history_row)[0]
+      dc.SetTextForeground('White')
+      dc.DrawText(time.strftime("History %Y-%m-%d %H:%M:%S", time.localtime(tm)), 4, self.margin + 2)
     dc.SetPen(self.tuningPen)
     dc.SetLogicalFunction(wx.XOR)
     dc.DrawLine(self.tune_tx, self.margin, self.tune_tx, self.height)
@@ -2838,6 +2930,23 @@ class WaterfallDisplay(wx.Window):
   def SetHeight(self, height):
     self.height = height
     self.SetSize((self.graph_width, height))
+  def OnWheel(self, event):
+    # The Control key and the mouse wheel scroll through the spectrum history.
+    history = application.spectrum_histories.get(self.history_key)
+    if not event.ControlDown() or not history:
+      self.parent.OnWheel(event)
+      return
+    newest = history.TotalRows() - 1
+    if self.history_row is None:
+      row = newest
+    else:
+      row = self.history_row
+    row -= event.GetWheelRotation() // event.GetWheelDelta() * max(1, self.height // 8)
+    if row >= newest:
+      self.history_row = None
+    else:
+      self.history_row = max(row, history.OldestRow())
+    self.Refresh(False)
   def DrawFilter(self, dc):
     # Erase area at the top of the waterfall
     dc.SetPen(wx.TRANSPARENT_PEN)
@@ -2865,8 +2974,12 @@ class WaterfallDisplay(wx.Window):
     # y_zero controls the center position of the colors. Set to a bit over the noise level.
     # y_scale controls how much the colors change when the sample deviates from y_zero.
     gain = self.rf_gain
+    self.y_zero = y_zero
+    self.y_scale = y_scale
     sample_rate = int(self.sample_rate * self.zoom)
     x_origin = int(float(self.VFO) / sample_rate * self.data_width + 0.5)
+    if self.rgb_data is None:
+      self.MakeBuffers()
     QS.watfall_OnGraphData(self.rgb_data, data, y_zero, y_scale, gain, x_origin)
     self.Refresh(False)
   def SetTuningLine(self, tune_tx, tune_rx):
@@ -2947,6 +3060,8 @@ class WaterfallScreen(wx.SplitterWindow):
     self.pane2.display.ChangeZoom(zoom, deltaf, zoom_control)
   def PeakHold(self, name):
     self.pane1.PeakHold(name)
+  def FreeBuffers(self):
+    self.pane2.display.FreeBuffers()
 
 class WaterfallPane(GraphScreen):
   """Create a waterfall screen with an X axis and a waterfall display."""
@@ -2992,6 +3107,7 @@ class MultiRxGraph(GraphScreen):
     self.graph_display = self.display
     self.waterfall_display = WaterfallDisplay(self, self.originX, 0, self.graph_width, 5, self.chary)
     self.waterfall_display.Hide()
+    self.waterfall_display.history_key = 'rx%d' % (index + 1)
     self.waterfall_display.VFO = self.VFO
     self.waterfall_display.data_width = self.data_width
     self.waterfall_y_scale = conf.waterfall_y_scale
@@ -3414,8 +3530,19 @@ class ScopeScreen(wx.Window):
     tick = max(2, h * 3 // 10)
     self.originX = w * 3
     self.width = self.originX + self.graph_width + tick + self.charx * 2
-    self.line = [(0,0), (1,1)]	# initial fake graph data
+    self.scope_data = None
+    self.points = None
+    self.npoints = 0
+    self.MakeBuffers()
     self.fpout = None #open("jim96.txt", "w")
+  def MakeBuffers(self):
+    if self.scope_data is None:
+      self.scope_data = array.array('d', bytes(self.data_width * 16))	# raw samples as pairs of doubles from QS.get_graph()
+      self.points = array.array('i', bytes(self.data_width * 8))	# x, y points from QS.graph_points()
+  def FreeBuffers(self):	# Free the sample and point arrays of the hidden scope
+    self.scope_data = None
+    self.points = None
+    self.npoints = 0
   def OnIdle(self, event):
     if self.doResize:
       self.ResizeGraph()
@@ -3437,7 +3564,7 @@ class ScopeScreen(wx.Window):
     self.MakeXTicks(dc)
     self.MakeText(dc)
     dc.SetPen(wx.Pen(conf.color_graphline, 1))
-    dc.DrawLines(self.line)
+    DrawLinesBuffer(dc, self.points, self.npoints)
   def MakeYTicks(self, dc):
     chary = self.chary
     originX = self.originX
@@ -3498,30 +3625,19 @@ class ScopeScreen(wx.Window):
       t = "%s    X: %d microsec/div" % (t, self.xscale)
     t = "%s   Y: %.0E/div" % (t, self.yvalue)
     dc.DrawText(t, self.originX, self.height - self.chary)
-  def OnGraphData(self, data):
+  def OnGraphData(self, count):	# The count raw samples +/- 0 to 2**31-1 are in self.scope_data
+    data = memoryview(self.scope_data)[0:count * 2]
     if not self.running:
       if self.fpout:
-        for cpx in data:
-          re = int(cpx.real)
-          im = int(cpx.imag)
-          ab = int(abs(cpx))
+        for i in range(0, count * 2, 2):
+          re = int(data[i])
+          im = int(data[i + 1])
+          ab = int(math.hypot(re, im))
           ph = math.atan2(im, re) * 360. / (2.0 * math.pi)
           self.fpout.write("%12d %12d %12d %12.1d\n" % (re, im, ab, ph))
       return		# Preserve data on screen
-    line = []
-    x = self.originX
-    ymax = self.height
-    for cpx in data:	# cpx is complex raw samples +/- 0 to 2**31-1
-      y = cpx.real
-      #y = abs(cpx)
-      y = self.originY - int(y * self.yscale + 0.5)
-      if y > ymax:
-        y = ymax
-      elif y < 0:
-        y = 0
-      line.append((x, y))
-      x = x + 1
-    self.line = line
+    # Plot the real part; every second double
+    self.npoints = QS.graph_points(self.points, data, self.originX, self.originY, self.yscale, self.height, 2)
     self.Refresh()
   def ChangeYscale(self, y_scale):
     self.y_scale = y_scale
@@ -3538,6 +3654,7 @@ class BandscopeScreen(WaterfallScreen):
     self.zoom_control = 0
     WaterfallScreen.__init__(self, frame, width, data_width, graph_width)
     self.sample_rate = self.pane1.sample_rate = self.pane2.sample_rate = int(clock) // 2
+    self.pane2.display.history_key = 'bandscope'
     self.VFO = clock // 4
     self.SetVFO(self.VFO)
   def SetTxFreq(self, tx_freq, rx_freq):
@@ -3567,6 +3684,23 @@ class BandscopeScreen(WaterfallScreen):
     self.pane2.ChangeZoom(zoom, zoom_deltaf, zoom_control)
     self.pane2.display.ChangeZoom(zoom, zoom_deltaf, zoom_control)
 
+class SweepScreen(WaterfallScreen):
+  """Show the panorama made by the panoramic sweep from conf.sweep_start to conf.sweep_stop."""
+  def __init__(self, frame, width, data_width, graph_width):
+    WaterfallScreen.__init__(self, frame, width, data_width, graph_width)
+    self.sample_rate = self.pane1.sample_rate = self.pane2.sample_rate = conf.sweep_stop - conf.sweep_start
+    self.pane2.display.history_key = 'sweep'
+    self.VFO = (conf.sweep_start + conf.sweep_stop) // 2
+    self.SetVFO(self.VFO)
+  def SetTxFreq(self, tx_freq, rx_freq):
+    freq = tx_freq + application.VFO - self.VFO
+    WaterfallScreen.SetTxFreq(self, freq, freq)
+  def SetFrequency(self, freq):		# freq is 7000000, not the offset from VFO
+    freq = freq - self.VFO
+    WaterfallScreen.SetTxFreq(self, freq, freq)
+  def ChangeZoom(self, zoom_control):
+    pass
+
 class FilterScreen(GraphScreen):
   """Create a graph of the receive filter response."""
   def __init__(self, parent, data_width, graph_width):
@@ -3624,8 +3758,20 @@ class AudioFFTScreen(GraphScreen):
     self.VFO = 0
     self.txFreq = 0
     self.sample_rate = sample_rate
-  def OnGraphData(self, data):
-    GraphScreen.OnGraphData(self, data)
+    self.audio_data = None
+    self.MakeBuffers()
+  def MakeBuffers(self):
+    if self.audio_data is None:
+      self.audio_data = array.array('d', bytes(self.data_width * 8))	# the audio FFT in dB from QS.get_audio_graph()
+  def FreeBuffers(self):	# Free the audio FFT array of the hidden screen
+    self.audio_data = None
+    self.raw_graph_data = None
+  def OnGraphData(self, count):		# The audio FFT is in self.audio_data
+    i1 = (self.data_width - self.graph_width) // 2
+    i2 = i1 + self.graph_width
+    data = memoryview(self.audio_data)[i1:i2]
+    self.raw_graph_data = data
+    self.display.OnGraphBuffer(data)
   def ChangeHwFrequency(self, tune, vfo, source='', band='', event=None, rx_freq=None):
     GraphScreen.SetTxFreq(self, tune, tune)
     application.freqDisplay.Display(tune)
@@ -3725,6 +3871,19 @@ class App(wx.App):
     application = self
     self.bottom_widgets = None
     self.dxCluster = None
+    self.spectrum_histories = {}	# The spectrum history for each waterfall
+    self.band_power_windows = {}	# frequency windows for the band power measurement for each source
+    self.detected_signals = []		# list of (frequency, snr, is_narrow) from the signal detector
+    self.image_reject_band = None	# band of the manual corrections used by the adaptive image rejection
+    self.channel_rate = 0		# sample rate of the channelizer channels, or zero
+    self.channel_rx_freqs = {}		# frequency of each channel receiver
+    self.channel_rx_vfo = None
+    self.filter_cache = collections.OrderedDict()	# LRU cache of filter coefficients
+    self.filter_cache_size = 64
+    self.filter_cache_lock = threading.Lock()
+    self.filter_queue = queue.Queue()		# filters to design in the background
+    self.filter_thread = None
+    self.band_power_vfo = None
     self.main_frame = None
     self.remote_control_head = False
     self.remote_control_slave = False
@@ -3767,12 +3926,14 @@ class App(wx.App):
     return key in self.keys_down
   def OnInit(self):
     """Perform most initialization of the app here (called by wxPython on startup)."""
+    self.startup_profile = StartupProfile()
     wx.lib.colourdb.updateColourDB()	# Add additional color names
     import quisk_widgets		# quisk_widgets needs the application object
     quisk_widgets.application = self
     del quisk_widgets
     global conf		# conf is the module for all configuration data
     setattr(conf, 'config_file_path', ConfigPath)
+    setattr(conf, 'config_file_path2', ConfigPath2)
     setattr(conf, 'DefaultConfigDir', DefaultConfigDir)
     if os.path.isfile(ConfigPath):	# See if the user has a config file
       setattr(conf, 'config_file_exists', True)
@@ -3790,6 +3951,8 @@ class App(wx.App):
     self.QuiskFilesDir = os.path.dirname(conf.settings_file_path)	# directory for Quisk files
     if not os.path.isdir(self.QuiskFilesDir):
       self.QuiskFilesDir = DefaultConfigDir
+    self.state_writer = quisk_utils.StateWriter()	# write state files in the background
+    self.state_writer.start()
     self.std_out_err = StdOutput(self)
     self.std_out_err.Logfile("WxPython " + wx.version())
     QS.set_params(quisk_is_vna=0)	# We are not the VNA program
@@ -3800,8 +3963,9 @@ class App(wx.App):
     else:
       self.local_conf = configure.Configuration(self, argv_options.AskMe, argv_options.radio)
     self.local_conf.UpdateConf()
+    self.startup_profile.Mark("Read the configuration")
     # Choose whether to use Unicode or text symbols
-    for k in ('sym_stat_mem', 'sym_stat_fav', 'sym_stat_dx',
+    for k in ('sym_stat_mem', 'sym_stat_fav', 'sym_stat_dx', 'sym_stat_sig',
         'btn_text_range_dn', 'btn_text_range_up', 'btn_text_play', 'btn_text_rec', 'btn_text_file_rec', 
 		'btn_text_file_play', 'btn_text_fav_add',
         'btn_text_fav_recall', 'btn_text_mem_add', 'btn_text_mem_next', 'btn_text_mem_del'):
@@ -4039,12 +4203,9 @@ class App(wx.App):
     state = None
     path = os.path.join(self.QuiskFilesDir, 'quisk_init.json')
     if os.path.isfile(path):
-      try:
-        fp = open(path, "r")
-        state = json.load(fp)
-        fp.close()
-      except:
-        traceback.print_exc()
+      state = quisk_utils.ReadJsonJournal(path)
+      if state is None:
+        print ("Can not read", path)
     else:	# Load from obsolete location
       path = os.path.join(os.path.dirname(ConfigPath), '.quisk_init.pkl')
       if os.path.isfile(path):
@@ -4214,29 +4375,30 @@ class App(wx.App):
     self.wdsp_SNB = 0
     self.wdsp_NR2 = 0
     self.wdsp.open(self.wdsp_channel)
+    # Load the demodulator plug-in for the external demodulator button
+    if conf.add_extern_demod and conf.extern_demod_plugin:
+      if self.AddDemodPlugin(conf.add_extern_demod, conf.extern_demod_plugin):
+        QS.set_demod_plugin(conf.add_extern_demod)
     #print ('data_width %d, FFT size %d, FFT mult %d, average_count %d, rate %d, Refresh %.2f Hz' % (
     #    self.data_width, self.fft_size, self.fft_size / self.data_width, average_count, self.sample_rate,
     #    float(self.sample_rate) / self.fft_size / average_count))
     QS.record_graph(0, 0, 1.0)
     QS.set_tx_audio(vox_level=20, vox_time=self.timeVOX)	# Turn off VOX, set VOX time
-    # Make all the screens and hide all but one.  MultiReceiver creates the graph and waterfall screens.
+    self.startup_profile.Mark("Start the sound system and WDSP")
+    # Make the main screens and hide all but one.  MultiReceiver creates the graph and waterfall screens.
+    # The scope, bandscope, filter, audio FFT and help screens are made by MakeScreen() when first shown.
     self.screen = self.multi_rx_screen
     self.graph = self.multi_rx_screen.graph
     self.waterfall = self.multi_rx_screen.waterfall
-    width = self.multi_rx_screen.graph.width
+    width = self.graph_screen_width = self.multi_rx_screen.graph.width
     self.config_screen = ConfigScreen(frame, width, self.fft_size)
     self.config_screen.Hide()
-    self.scope = ScopeScreen(frame, width, self.data_width, self.graph_width)
-    self.scope.Hide()
-    self.bandscope_screen = BandscopeScreen(frame, width, self.graph_width, self.graph_width, self.bandscope_clock)
-    self.bandscope_screen.Hide()
-    self.filter_screen = FilterScreen(frame, self.data_width, self.graph_width)
-    self.filter_screen.Hide()
-    if self.rate_audio_fft:
-      self.audio_fft_screen = AudioFFTScreen(frame, self.data_width, self.graph_width, self.rate_audio_fft)
-      self.audio_fft_screen.Hide()
-    self.help_screen = HelpScreen(frame, width, self.screen_height // 10)
-    self.help_screen.Hide()
+    self.scope = None
+    self.bandscope_screen = None
+    self.sweep_screen = None
+    self.sweep = None				# The panoramic sweep while the sweep screen is shown
+    self.filter_screen = None
+    self.help_screen = None
     self.station_screen = StationScreen(frame, width, conf.station_display_lines)
     self.station_screen.Hide()
     # Make a vertical box to hold all the screens and the bottom box
@@ -4245,13 +4407,8 @@ class App(wx.App):
     # Add the screens
     vertBox.Add(self.config_screen, 1, wx.EXPAND)
     vertBox.Add(self.multi_rx_screen, 1, wx.EXPAND)
-    vertBox.Add(self.scope, 1, wx.EXPAND)
-    vertBox.Add(self.bandscope_screen, 1, wx.EXPAND)
-    vertBox.Add(self.filter_screen, 1, wx.EXPAND)
-    if self.rate_audio_fft:
-      vertBox.Add(self.audio_fft_screen, 1, wx.EXPAND)
-    vertBox.Add(self.help_screen, 1, wx.EXPAND)
     vertBox.Add(self.station_screen, 0, wx.EXPAND)
+    self.startup_profile.Mark("Make the screens")
     # Add the spacer
     vertBox.Add(Spacer(frame), 0, wx.EXPAND)
     # Add the sizer for the controls
@@ -4264,6 +4421,7 @@ class App(wx.App):
     vertBox.AddSpacer(5)		# Thanks to Christof, DJ4CM
     # End of vertical box.
     self.MakeButtons(frame, gbs)
+    self.startup_profile.Mark("Make the buttons")
     if conf.window_width > 0:
       minw = maxw = conf.window_width
     else:
@@ -4299,19 +4457,20 @@ class App(wx.App):
     msg = QS.open_key(port=conf.quisk_serial_port, cts=conf.quisk_serial_cts, dsr=conf.quisk_serial_dsr)
     if msg:
       print(msg)
+    self.startup_profile.Mark("Open the hardware")
     self.OpenSound()
+    self.startup_profile.Mark("Open the sound devices")
     tune, vfo = Hardware.ReturnFrequency()	# Request initial frequency
     if tune is None or vfo is None:		# Set last-used frequency
       self.bandBtnGroup.SetLabel(self.lastBand, do_cmd=True, direction=0)
     else:			# Set requested frequency
       self.BandFromFreq(tune)
       self.ChangeDisplayFrequency(tune - vfo, vfo)
-    # Record filter rate for the filter screen
-    self.filter_screen.sample_rate = QS.get_filter_rate(-1, -1)
     self.config_screen.InitBitmap()
     self.screenBtnGroup.SetLabel(conf.default_screen, do_cmd=True)
     frame.Show()
     self.Yield()
+    self.startup_profile.Mark("Show the main window")
     self.sound_thread = SoundThread(self.samples_from_python)
     self.sound_thread.start()
     if self.samples_from_python:
@@ -4320,6 +4479,11 @@ class App(wx.App):
       # create DX Cluster and register listener for change notification
       self.dxCluster = dxcluster.DxCluster()
       self.dxCluster.start()
+    if conf.channelizer_channels:
+      self.SetChannelizer()
+    if conf.signal_detect:
+      self.detect_buf = array.array('d', bytes(64 * 4 * 8))	# four doubles for each signal
+      QS.set_signal_detect(1, conf.signal_detect_snr, conf.signal_detect_persist, conf.signal_detect_width)
     # Create shortcut keys for buttons
     if conf.button_layout == 'Large screen':
       for button in self.modeButns.GetButtons():	# mode buttons
@@ -4369,6 +4533,9 @@ class App(wx.App):
       QS.tci_set_params(tci_modulation=self.mode)
       QS.tci_set_params(tci_trx=0)
       QS.tci_set_params(tci_split_enable=0)
+    self.startup_profile.Mark("Finish startup")
+    if conf.startup_profile:
+      self.startup_profile.Report()
     return True
   def OnStartWsjtx(self, ctrl):
     method = ctrl.GetValue()
@@ -4682,6 +4849,7 @@ class App(wx.App):
                 conf.tx_ip, conf.tx_audio_port,
                 conf.mic_sample_rate, conf.mic_channel_I, conf.mic_channel_Q,
 				0.7, conf.mic_playback_rate)
+    QS.iq_ring(directory=conf.iq_ring_dir or self.QuiskFilesDir)
   def OnIdle(self, event):
     if self.screen:
       self.screen.OnIdle(event)
@@ -4708,6 +4876,7 @@ class App(wx.App):
     Hardware.close()
     self.SaveState()
     self.local_conf.SaveState()
+    self.state_writer.stop()	# write all files before exit
     if self.hamlib_socket:
       self.hamlib_socket.close()
       self.hamlib_socket = None
@@ -4716,6 +4885,10 @@ class App(wx.App):
       self.k4_tcp_socket = None
     if self.dxCluster:
       self.dxCluster.stop()
+    for history in self.spectrum_histories.values():
+      if history:
+        history.Close()
+    self.spectrum_histories = {}
     if self.hamlib_com1_handler:
       self.hamlib_com1_handler.close()
     if self.hamlib_com2_handler:
@@ -4810,9 +4983,7 @@ class App(wx.App):
       self.savedState[n] = v
     path = os.path.join(self.QuiskFilesDir, 'quisk_init.json')
     try:
-      fp = open(path, "w")
-      json.dump(state, fp, indent=2)
-      fp.close()
+      self.state_writer.SaveDict(path, state)
     except:
       pass #traceback.print_exc()
   def Mode2Filters(self, mode):		# return the list of filter bandwidths for each mode
@@ -5118,6 +5289,8 @@ class App(wx.App):
       t = "Audio FFT"
     elif self.bandscope_clock:		# Hermes UDP protocol
       t = "Bscope"
+    elif conf.sweep_stop > conf.sweep_start:
+      t = "Sweep"
     else:
       t = "RX Filter"
     if conf.button_layout == 'Large screen':
@@ -5366,6 +5539,110 @@ class App(wx.App):
     t = '%13.2f' % (QS.measure_frequency(-1) + vfo)
     t = t[0:4] + ' ' + t[4:7] + ' ' + t[7:] + ' Hz'
     self.smeter.SetLabel(t)
+  def SetBandPower(self, windows, source=0):
+    """Measure the power in each (start, stop) frequency window in Hertz from the averaged FFT.
+
+    For the graph (source 0) the frequencies are absolute.  For the bandscope (source 1) they are
+    zero to half the ADC clock.  For the sub-receivers (source 2) they are relative to the center
+    of the sub-receiver FFT.  Use an empty list to stop measuring."""
+    windows = list(windows)
+    if windows:
+      self.band_power_windows[source] = windows
+    elif source in self.band_power_windows:
+      del self.band_power_windows[source]
+    self.SendBandPower(source, windows)
+  def SendBandPower(self, source, windows):
+    if source == 0:
+      self.band_power_vfo = self.VFO
+      windows = [(f1 - self.VFO, f2 - self.VFO) for f1, f2 in windows]
+    QS.set_band_power(source, windows)
+  def GetBandPower(self, source=0):
+    """Return (index, data) for a new measurement or None.  The index is the sub-receiver for source 2.
+
+    The data is an array of three floats for each window: the total power, the peak bin
+    and the noise floor (median bin), all in dB relative to full scale."""
+    windows = self.band_power_windows.get(source)
+    if not windows:
+      return None
+    if source == 0 and self.band_power_vfo != self.VFO:	# tuning changed the window offsets
+      self.SendBandPower(source, windows)
+      return None
+    data = array.array('d', bytes(len(windows) * 3 * 8))
+    index = QS.get_band_power(source, data)
+    if index < 0:
+      return None
+    return index, data
+  def SetChannelizer(self):
+    # Start the channelizer for the current sample rate, and restart the channel receivers.
+    self.channel_rate = QS.set_channelizer(conf.channelizer_channels, conf.channelizer_taps)
+    self.RetuneChannelRx()
+  def RetuneChannelRx(self):
+    self.channel_rx_vfo = self.VFO
+    for index, freq in self.channel_rx_freqs.items():
+      QS.set_channel_rx(index, 1, freq - self.VFO)
+  def AddChannelRx(self, freq):
+    """Start a channel receiver at the frequency freq in Hertz and return its index.
+
+    The samples are read with ReadChannelRx() at the rate self.channel_rate.
+    The frequency must be within the sample rate of the radio."""
+    if not self.channel_rate:
+      raise RuntimeError("The channelizer is not running")
+    for index in range(64):
+      if index not in self.channel_rx_freqs:
+        break
+    else:
+      raise RuntimeError("No more channel receivers are available")
+    if self.channel_rx_vfo != self.VFO:
+      self.RetuneChannelRx()
+    QS.set_channel_rx(index, 1, freq - self.VFO)
+    self.channel_rx_freqs[index] = freq
+    return index
+  def RemoveChannelRx(self, index):
+    if index in self.channel_rx_freqs:
+      del self.channel_rx_freqs[index]
+      QS.set_channel_rx(index, 0, 0)
+  def ReadChannelRx(self, index, size=4096):
+    """Return an array of up to size new samples from a channel receiver with I and Q interleaved."""
+    if self.channel_rx_vfo != self.VFO:	# tuning changed the channel offsets
+      self.RetuneChannelRx()
+    data = array.array('d', bytes(size * 16))
+    n = QS.get_channel_rx(index, data)
+    del data[n * 2:]
+    return data
+  def DetectSignals(self):
+    # Get the signals found by the signal detector in the last graph frame.
+    buf = self.detect_buf
+    n = QS.get_signals(buf)
+    vfo = self.VFO
+    signals = []
+    for i in range(0, n * 4, 4):
+      signals.append((int(buf[i]) + vfo, buf[i + 1], buf[i + 2] > 0.5))
+    signals.sort()
+    changed = [x[0] // 50 for x in signals] != [x[0] // 50 for x in self.detected_signals]
+    self.detected_signals = signals
+    if conf.signal_detect_subrx:
+      self.DetectTuneSubrx()
+    if changed:
+      self.station_screen.Refresh()
+  def DetectTuneSubrx(self):
+    # Tune sub-receivers that are not playing to the strongest carriers that no receiver is tuned to.
+    panes = self.multi_rx_screen.receiver_list
+    if not panes:
+      return
+    tuned = [pane.VFO + pane.txFreq for pane in panes]
+    carriers = [(snr, freq) for freq, snr, narrow in self.detected_signals if narrow]
+    carriers.sort(reverse=True)
+    for pane in panes:
+      if pane.is_playing:
+        continue
+      freq = pane.VFO + pane.txFreq
+      if any(abs(freq - f) < conf.signal_detect_width for snr, f in carriers):
+        continue		# this receiver is already on a signal
+      for snr, f in carriers:
+        if all(abs(f - t) >= conf.signal_detect_width for t in tuned):
+          pane.ChangeRxTxFrequency(f)
+          tuned.append(f)
+          break
   def NewSmeter(self):
     self.smeter_db_count += 1		# count for average
     x = QS.get_smeter()
@@ -5403,57 +5680,78 @@ class App(wx.App):
       else:
         buttons[i].Enable(0)
   def MakeFilterCoef(self, rate, N, bw, center):
-    """Make an I/Q filter with rectangular passband."""
-    center = abs(center)
+    """Make an I/Q filter with rectangular passband.  Return (filterI, filterQ) from the cache if possible."""
+    key = (rate, N, bw, abs(center), 'Blackman')
+    with self.filter_cache_lock:
+      coefs = self.filter_cache.get(key)
+      if coefs is not None:
+        self.filter_cache.move_to_end(key)
+        return coefs
+    coefs = self.DesignFilterCoef(key)
+    self.CacheFilterCoef(key, coefs)
+    return coefs
+  def DesignFilterCoef(self, key):
+    rate, N, bw, center, window = key
     lowpass = bw * 24000 // rate // 2
     if lowpass in Filters:
-      filtD = Filters[lowpass]
-      #print ("Custom filter key %d rate %d bandwidth %d size %d" % (lowpass, rate, bw, len(filtD)))
-    else:
-      #print ("Window filter key %d rate %d bandwidth %d" % (lowpass, rate, bw))
-      if N is None:
-        shape = 1.5       # Shape factor at 88 dB
-        trans = (bw / 2.0 / rate) * (shape - 1.0)     # 88 dB atten
-        N = int(4.0 / trans)
-        if N > 1000:
-          N = 1000
-        N = (N // 2) * 2 + 1
-      K = bw * N // rate
-      filtD = []
-      pi = math.pi
-      sin = math.sin
-      cos = math.cos
-      for k in range(-N//2, N//2 + 1):
-        # Make a lowpass filter
-        if k == 0:
-          z = float(K) / N
-        else:
-          z = 1.0 / N * sin(pi * k * K / N) / sin(pi * k / N)
-        # Apply a windowing function
-        if 1:	# Blackman window
-          w = 0.42 + 0.5 * cos(2. * pi * k / N) + 0.08 * cos(4. * pi * k / N)
-        elif 0:	# Hamming
-          w = 0.54 + 0.46 * cos(2. * pi * k / N)
-        elif 0:	# Hanning
-          w = 0.5 + 0.5 * cos(2. * pi * k / N)
-        else:
-          w = 1
-        z *= w
-        filtD.append(z)
-    if center:
-      # Make a bandpass filter by tuning the low pass filter to new center frequency.
-      # Make two quadrature filters.
-      filtI = []
-      filtQ = []
-      tune = -1j * 2.0 * math.pi * center / rate
-      NN = len(filtD)
-      D = (NN - 1.0) / 2.0
-      for i in range(NN):
-        z = 2.0 * cmath.exp(tune * (i - D)) * filtD[i]
-        filtI.append(z.real)
-        filtQ.append(z.imag)
-      return filtI, filtQ
-    return filtD, filtD
+      return QS.design_filter(rate, 0, bw, center, Filters[lowpass])
+    if N is None:
+      N = 0
+    return QS.design_filter(rate, N, bw, center)
+  def CacheFilterCoef(self, key, coefs):
+    with self.filter_cache_lock:
+      self.filter_cache[key] = coefs
+      while len(self.filter_cache) > self.filter_cache_size:
+        self.filter_cache.popitem(last=False)	# remove the least recently used filter
+  def PrefetchFilterCoef(self, mode, bw, index):
+    # Design the filters likely to be needed next in the background.  These are the
+    # neighbors of the adjustable filter and the other filter buttons, and last the
+    # filters the other modes will use after a mode change.
+    bandwidths = []
+    if index == 5:
+      values = FilterSliderValues()
+      if bw in values:
+        i = values.index(bw)
+        bandwidths = values[max(0, i - 2):i + 3]
+    for button in self.filterButns.GetButtons()[0:5]:
+      try:
+        bandwidths.append(int(button.GetLabel()))
+      except ValueError:
+        pass
+    modes = [mode] * len(bandwidths)
+    for other, group in (('CWU', 'CW'), ('USB', 'SSB'), ('AM', 'AM'), ('FM', 'FM'),
+                         ('DGT-U', 'DGT'), ('FDV-U', 'FDV'), ('IMD', 'IMD')):
+      if other == mode or group not in self.modeFilter:
+        continue
+      i = self.modeFilter[group]
+      if i < 5:
+        b = self.Mode2Filters(other)[i]
+      else:		# the adjustable filter button keeps its label when the mode changes
+        b = self.filterButns.GetButtons()[5].GetLabel()
+      try:
+        bandwidths.append(int(b))
+      except ValueError:
+        continue
+      modes.append(other)
+    keys = []
+    for m, b in zip(modes, bandwidths):
+      frate = QS.get_filter_rate(Mode2Index.get(m, 3), b)
+      b = min(b, frate // 2)
+      keys.append((frate, None, b, abs(self.GetFilterCenter(m, b)), 'Blackman'))
+    if self.filter_thread is None:
+      self.filter_thread = threading.Thread(target=self.FilterThread, name="QuiskFilter", daemon=True)
+      self.filter_thread.start()
+    self.filter_queue.put(keys)
+  def FilterThread(self):
+    while True:
+      keys = self.filter_queue.get()
+      while not self.filter_queue.empty():	# only the latest request matters
+        keys = self.filter_queue.get()
+      for key in keys:
+        with self.filter_cache_lock:
+          if key in self.filter_cache:
+            continue
+        self.CacheFilterCoef(key, self.DesignFilterCoef(key))
   def SetFilterByMode(self, mode):
     index = self.modeFilter[mode]
     try:
@@ -5524,6 +5822,7 @@ class App(wx.App):
     filtI, filtQ = self.MakeFilterCoef(frate, None, bw, center)
     lower_edge = center - bw // 2
     QS.set_filters(filtI, filtQ, bw, lower_edge, 0)
+    self.PrefetchFilterCoef(mode, bw, index)
     self.multi_rx_screen.graph.filter_mode = mode
     self.multi_rx_screen.graph.filter_bandwidth = bw
     self.multi_rx_screen.graph.filter_center = center
@@ -5540,10 +5839,44 @@ class App(wx.App):
       self.OnBtnScreen(None, 'Help')
     else:
       self.OnBtnScreen(None, self.screenBtnGroup.GetLabel())
+  def MakeScreen(self, attr):
+    # Make a screen when it is first shown.  Return the screen.
+    screen = getattr(self, attr)
+    if screen:
+      if hasattr(screen, 'MakeBuffers'):	# The buffers may have been freed by ReleaseScreen()
+        screen.MakeBuffers()
+      return screen
+    frame = self.main_frame
+    width = self.graph_screen_width
+    if attr == 'scope':
+      screen = ScopeScreen(frame, width, self.data_width, self.graph_width)
+    elif attr == 'bandscope_screen':
+      screen = BandscopeScreen(frame, width, self.graph_width, self.graph_width, self.bandscope_clock)
+    elif attr == 'sweep_screen':
+      screen = SweepScreen(frame, width, self.graph_width, self.graph_width)
+    elif attr == 'filter_screen':
+      screen = FilterScreen(frame, self.data_width, self.graph_width)
+      screen.sample_rate = QS.get_filter_rate(-1, -1)
+    elif attr == 'audio_fft_screen':
+      screen = AudioFFTScreen(frame, self.data_width, self.graph_width, self.rate_audio_fft)
+    elif attr == 'help_screen':
+      screen = HelpScreen(frame, width, self.screen_height // 10)
+    screen.Hide()
+    self.vertBox.Insert(2, screen, 1, wx.EXPAND)	# after the config and multi_rx screens
+    setattr(self, attr, screen)
+    return screen
+  def ReleaseScreen(self, screen):
+    # Free the waterfall rows and data arrays of a hidden screen made by MakeScreen().  The screen is kept with its settings.
+    for attr in ('scope', 'bandscope_screen', 'sweep_screen', 'filter_screen', 'audio_fft_screen', 'help_screen'):
+      if screen is getattr(self, attr):
+        if hasattr(screen, 'FreeBuffers'):
+          screen.FreeBuffers()
+        break
   def OnBtnScreen(self, event, name=None):
     if event is not None:
       win = event.GetEventObject()
       name = win.GetLabel()
+    old_screen = self.screen
     self.screen.Hide()
     self.station_screen.Hide()
     if name == 'Config':
@@ -5565,23 +5898,32 @@ class App(wx.App):
       sash = self.screen.GetSashPosition()
       self.station_screen.Show()
     elif name == 'Scope':
-      if win.direction:				# Another push on the same button
+      self.MakeScreen('scope')
+      if win.direction and old_screen is self.scope:	# Another push on the same button
         self.scope.running = 1 - self.scope.running		# Toggle run state
       else:				# Initial push of button
         self.scope.running = 1
       self.screen = self.scope
     elif name == 'RX Filter':
-      self.screen = self.filter_screen
+      self.screen = self.MakeScreen('filter_screen')
       self.freqDisplay.Display(self.screen.txFreq)
       self.screen.NewFilter()
     elif name == 'Bscope':
-      self.screen = self.bandscope_screen
+      self.screen = self.MakeScreen('bandscope_screen')
+      self.screen.SetTxFreq(self.txFreq, self.rxFreq)
+    elif name == 'Sweep':
+      self.screen = self.MakeScreen('sweep_screen')
       self.screen.SetTxFreq(self.txFreq, self.rxFreq)
+      self.StartSweep()
     elif name == 'Audio FFT':
-      self.screen = self.audio_fft_screen
+      self.screen = self.MakeScreen('audio_fft_screen')
       self.freqDisplay.Display(self.screen.txFreq)
     elif name == 'Help':
-      self.screen = self.help_screen
+      self.screen = self.MakeScreen('help_screen')
+    if old_screen is not self.screen:
+      if old_screen is self.sweep_screen:
+        self.StopSweep()
+      self.ReleaseScreen(old_screen)
     self.screen.Show()
     self.vertBox.Layout()	# This destroys the initialized sash position!
     self.sliderYs.SetValue(self.screen.y_scale)
@@ -5614,6 +5956,8 @@ class App(wx.App):
       self.bandscope_screen.ChangeZoom(zoom_control)
       self.bandscope_screen.SetTxFreq(self.txFreq, self.rxFreq)
       return
+    if self.screen == self.sweep_screen:
+      return
     # The display runs from f1 to f2. The original sample rate is "rate".
     # The new effective sample rate is rate * zoom.
     # f1 = deltaf + rate * (1 - zoom) / 2
@@ -5739,6 +6083,8 @@ class App(wx.App):
       self.sample_rate = rate
       self.multi_rx_screen.ChangeSampleRate(rate)
       QS.change_rate(rate, 1)
+      if self.channel_rate:
+        self.SetChannelizer()
       #print ('FFT size %d, FFT mult %d, average_count %d, rate %d, Refresh %.2f Hz' % (
       #  self.fft_size, self.fft_size / self.data_width, average_count, rate,
       #  float(rate) / self.fft_size / average_count))
@@ -6092,6 +6438,12 @@ class App(wx.App):
       vfo = freq - tune
       tune, vfo = Hardware.ChangeFrequency(vfo + tune, vfo, source, band, event)
       self.ChangeDisplayFrequency(tune - vfo, vfo, rx_freq is not None)
+    elif self.sweep:		# The sweep tunes the hardware.  Change to this frequency when the sweep stops.
+      if self.screen == self.sweep_screen:		# tune is relative to the center of the sweep
+        freq = vfo + tune
+        tune = freq % 10000
+        vfo = freq - tune
+      self.ChangeDisplayFrequency(tune, vfo, rx_freq is not None)
     elif conf.fixed_tune_offset:
       # Tune with the VFO and keep a constant audio offset from the center. Tx tune is always conf.fixed_tune_offset.
       tune_freq = vfo + tune
@@ -6113,7 +6465,7 @@ class App(wx.App):
       self.txFreq = tune
       if not self.split_rxtx:
         self.rxFreq = self.txFreq
-      if self.screen == self.bandscope_screen:
+      if self.screen == self.bandscope_screen or self.screen == self.sweep_screen:
         self.screen.SetFrequency(tune + vfo)
       else:
         self.screen.SetTxFreq(self.txFreq, self.rxFreq)
@@ -6126,8 +6478,16 @@ class App(wx.App):
       self.station_screen.Refresh()
     if change:
       if (conf.name_of_sound_capt or conf.name_of_mic_play) and QS.get_params("softrock_correct_active") == 0:
-        ampl, phase = self.GetAmplPhase('rx')
-        QS.set_ampl_phase(ampl, phase, 0)
+        if conf.iq_equalizer_taps and conf.name_of_sound_capt:
+          # The adaptive filter tracks changes within a band; start it again from the table for a new band
+          if self.image_reject_band != self.lastBand:
+            self.image_reject_band = self.lastBand
+            ampl, phase = self.GetAmplPhase('rx')
+            QS.set_ampl_phase(ampl, phase, 0)
+            QS.set_image_reject(conf.iq_equalizer_taps, conf.iq_equalizer_frames, 0.5)
+        else:
+          ampl, phase = self.GetAmplPhase('rx')
+          QS.set_ampl_phase(ampl, phase, 0)
         ampl, phase = self.GetAmplPhase('tx')
         QS.set_ampl_phase(ampl, phase, 1)
       self.freqDisplay.Display(self.txFreq + self.VFO)
@@ -6541,6 +6901,65 @@ class App(wx.App):
     #if txt:
     #  self.config_text = txt
     #  self.main_frame.SetConfigText(txt)
+  def AddSpectrumHistory(self, key, data, vfo, span, center=0):	# Save a row of graph data in the spectrum history
+    history = self.spectrum_histories.get(key)
+    if history is None:
+      path = os.path.join(conf.spectrum_history_dir or self.QuiskFilesDir, "quisk_spectrum_%s.bin" % key)
+      try:
+        history = quisk_utils.SpectrumHistory(path, len(data), conf.spectrum_history_hours, conf.spectrum_history_rate)
+      except:
+        print("Failure to open the spectrum history", path)
+        traceback.print_exc()
+        history = False		# Do not try again
+      self.spectrum_histories[key] = history
+    if history:
+      history.Add(data, vfo, span, center)
+  def ExportSpectrum(self, path, time1, time2, freq1=None, freq2=None, key='main'):
+    # Write the spectrum history from time1 to time2 to a CSV file.  Return the number of rows.
+    history = self.spectrum_histories.get(key)
+    if not history:
+      return 0
+    return history.Export(path, time1, time2, freq1, freq2)
+  def StartSweep(self):	# Start the panoramic sweep from conf.sweep_start to conf.sweep_stop
+    if self.sweep or QS.is_key_down():
+      return
+    self.sweep = quisk_utils.PanoramicSweep(Hardware, conf.sweep_start, conf.sweep_stop, self.graph_width, self.sample_rate,
+        conf.sweep_valid, conf.sweep_overlap, conf.sweep_settle, conf.sweep_average, conf.sweep_threshold, conf.sweep_max_age)
+    self.pttButton.Enable(False)	# Do not transmit on the sweep frequencies
+    self.sweep_screen.SetDisplayMsg("Sweep %d segments" % len(self.sweep.centers))
+  def StopSweep(self):	# Stop the sweep and tune the hardware back to the current frequency
+    if not self.sweep:
+      return
+    self.sweep.Stop()
+    self.sweep = None
+    self.ChangeHwFrequency(self.txFreq, self.VFO, 'Sweep')
+    if self.lastBand in ('Time', 'Audio') or conf.tx_level.get(self.lastBand, 127) == 0:
+      self.pttButton.Enable(False)
+    else:
+      self.pttButton.Enable(True)
+  def PollSweep(self):
+    if QS.is_key_down():
+      self.StopSweep()
+      if self.sweep_screen:
+        self.sweep_screen.SetDisplayMsg("Sweep stopped for transmit")
+      return
+    sweep = self.sweep
+    if sweep.Poll():
+      if self.screen == self.sweep_screen:
+        self.sweep_screen.OnGraphData(sweep.data)
+        if sweep.passes:
+          self.sweep_screen.SetDisplayMsg("Sweep %d segments in %.1f sec" % (len(sweep.centers), sweep.sweep_time))
+      if conf.spectrum_history_hours > 0:
+        self.AddSpectrumHistory('sweep', sweep.data, self.sweep_screen.VFO, self.sweep_screen.sample_rate)
+  def AddDemodPlugin(self, name, spec):	# Add a demodulator plug-in; see extern_demod_plugin in quisk_conf_defaults.py
+    try:
+      function, address = quisk_utils.LoadDemodPlugin(spec)
+      QS.add_demod_plugin(name, function=function, address=address)
+    except:
+      print("Failure to load the demodulator plug-in", spec)
+      traceback.print_exc()
+      return False
+    return True
   def FldigiPoll(self):		# Keep Quisk and Fldigi frequencies equal; control Fldigi PTT from Quisk
     if self.fldigi_server is None:
       return
@@ -6776,23 +7195,36 @@ class App(wx.App):
         Hardware.OnChangeRxTx(x)
     self.timer = time.time()
     if self.bandscope_clock:		# Hermes UDP protocol
-      data = QS.get_bandscope(self.bandscope_clock, self.bandscope_screen.zoom, float(self.bandscope_screen.zoom_deltaf))
+      if self.bandscope_screen:
+        data = QS.get_bandscope(self.bandscope_clock, self.bandscope_screen.zoom, float(self.bandscope_screen.zoom_deltaf))
+      else:		# discard data
+        data = QS.get_bandscope(self.bandscope_clock, 1.0, 0.0)
+      if data and conf.spectrum_history_hours > 0:
+        if self.bandscope_screen:
+          zoom, deltaf = self.bandscope_screen.zoom, self.bandscope_screen.zoom_deltaf
+        else:
+          zoom, deltaf = 1.0, 0
+        self.AddSpectrumHistory('bandscope', data, self.bandscope_clock // 4, int(self.bandscope_clock // 2 * zoom), deltaf)
       if data and self.screen == self.bandscope_screen:
         self.screen.OnGraphData(data)
     if self.screen == self.scope:
       # Get raw data, not FFT
-      data = QS.get_graph(0, 1.0, 0)
-      if data:
-        self.scope.OnGraphData(data)			# Send message to draw new data
+      count = QS.get_graph(0, 1.0, 0, self.scope.scope_data)
+      if count:
+        self.scope.OnGraphData(count)			# Send message to draw new data
         return 1		# we got new graph/scope data
     elif self.screen == self.audio_fft_screen:
       QS.get_graph(2, self.zoom, float(self.zoom_deltaf))	# discard data
-      audio_data = QS.get_audio_graph()		# Display the audio FFT
-      if audio_data:
-        self.screen.OnGraphData(audio_data)
+      count = QS.get_audio_graph(self.screen.audio_data)		# Display the audio FFT
+      if count:
+        self.screen.OnGraphData(count)
     else:
       data = QS.get_graph(1, self.zoom, float(self.zoom_deltaf))	# get FFT data
+      if self.sweep:
+        self.PollSweep()
       if data:
+        if conf.spectrum_history_hours > 0 and not self.sweep:
+          self.AddSpectrumHistory('main', data, self.VFO, int(self.sample_rate * self.zoom), self.zoom_deltaf)
         #T('')
         if self.remote_control_slave:
           Hardware.RemoteCtlSend("M;%s\n" % self.smeter.GetLabel())
@@ -6809,9 +7241,11 @@ class App(wx.App):
           self.MeasureFrequency()	# display measured frequency
         else:
           self.MeasureAudioVoltage()		# display audio voltage
+        if conf.signal_detect:
+          self.DetectSignals()
         if self.screen == self.config_screen:
           pass
-        elif self.screen == self.bandscope_screen:
+        elif self.screen == self.bandscope_screen or self.screen == self.sweep_screen:
           pass
         else:
           self.screen.OnGraphData(data)			# Send message to draw new data
@@ -6821,6 +7255,9 @@ class App(wx.App):
         return 1		# We got new graph/scope data
     data, index = QS.get_multirx_graph()	# get FFT data for sub-receivers
     if data:
+      if conf.spectrum_history_hours > 0 and index < len(self.multi_rx_screen.receiver_list):
+        pane = self.multi_rx_screen.receiver_list[index]
+        self.AddSpectrumHistory('rx%d' % (index + 1), data, pane.VFO, pane.sample_rate)
       self.multi_rx_screen.OnGraphData(data, index)
     if QS.get_overrange():
       self.clip_time0 = self.timer
@@ -6876,6 +7313,13 @@ class App(wx.App):
         if self.dxCluster:
           if self.dxCluster.Poll():
             self.station_screen.Refresh()
+          spots = self.dxCluster.NewSpots()
+          if spots and conf.iq_ring_seconds > 0 and 'spot' in conf.iq_ring_triggers:
+            # Save the I/Q ring for a new spot within the receive bandwidth
+            for entry in spots:
+              if abs(entry.freq - self.VFO) < self.sample_rate // 2:
+                QS.iq_ring(trigger="spot " + entry.dx)
+                break
       if self.timer - self.slowheart_time0 > 0.5:
         self.slowheart_time0 = self.timer
         if self.w_phase:
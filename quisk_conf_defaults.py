@@ -649,6 +649,13 @@ hermes_code_version = -1
 # hermes devices, you can use this to specify a unique device.  Or use -1 to accept any board.
 hermes_board_id = -1
 
+## hermes_protocol			OpenHPSDR protocol, integer choice
+# Use 1 for the original OpenHPSDR protocol.  Use 2 for radios that support protocol 2.  Protocol 2 sends
+# each receiver as a separate UDP stream and supports sample rates up to 1536 ksps for all receivers.
+# Transmit is not yet supported with protocol 2.
+hermes_protocol = 1
+#hermes_protocol = 2
+
 ## Hermes_BandDict		Hermes Bus, dict
 # The Hermes_BandDict sets the 7 bits on the J16 connector.
 Hermes_BandDict = {
@@ -1286,6 +1293,67 @@ file_name_samples = ""
 file_name_playback = ""
 #file_name_playback = "/home/jim/sounds/cqcq_contest.wav"
 
+## iq_ring_seconds		I/Q ring seconds, number
+# Quisk can keep the most recent raw I/Q samples in memory so that you can save a signal that
+# was received before you noticed it.  This is the number of seconds kept before a trigger.  When a
+# trigger happens, the samples are written to a WAV file named quisk_iq_<date>_<time>_<reason>.wav.
+# The WAV file has a LIST INFO comment with the trigger, the sample rate and the tuning.  The memory
+# needed is about (iq_ring_seconds + iq_ring_post_seconds + 1) * sample_rate * 4 bytes.  Use zero for no ring.
+iq_ring_seconds = 0
+#iq_ring_seconds = 10
+#iq_ring_seconds = 30
+
+## iq_ring_post_seconds		I/Q ring post seconds, number
+# This is the number of seconds of I/Q samples saved after the trigger.  Another trigger during
+# this time makes the file longer.
+iq_ring_post_seconds = 5.0
+#iq_ring_post_seconds = 0
+#iq_ring_post_seconds = 20.0
+
+## iq_ring_format		I/Q ring format, text choice
+# The I/Q ring stores samples as 16-bit integers or as 16-bit floating point numbers.  Float16
+# keeps weak signals more accurately in the same memory, and is written as a 32-bit float WAV file.
+iq_ring_format = "int16"
+#iq_ring_format = "float16"
+
+## iq_ring_triggers		I/Q ring triggers, text
+# This is a list of the events that save the I/Q ring.  Use "ptt" for the PTT button, "squelch" for
+# the squelch opening on the sub-receiver played with the main receiver, and "spot" for a new DX cluster
+# spot within the receive bandwidth.  Python code can always save the ring with QS.iq_ring(trigger="reason").
+# The ring always holds the I/Q samples of the main receiver.  For a squelch trigger, the sub-receiver
+# signal is only in the file if its frequency is within the main receiver sample rate.
+iq_ring_triggers = ""
+#iq_ring_triggers = "ptt"
+#iq_ring_triggers = "squelch spot"
+
+## iq_ring_dir		I/Q ring directory, text
+# This is the directory for the I/Q ring files.  The default is the directory of the config file.
+iq_ring_dir = ""
+#iq_ring_dir = "/home/jim/tmp"
+#iq_ring_dir = "C:/tmp"
+
+## channelizer_channels     Channelizer channels, integer
+# The polyphase channelizer splits the receive samples into this many channels uniformly spaced
+# across the sample rate.  Channel receivers started with App.AddChannelRx() use the nearest channel
+# plus fine tuning, so many narrow channels cost about the same CPU as one.  Each channel has a sample
+# rate of sample_rate / channelizer_channels.  Use zero for no channelizer.
+channelizer_channels = 0
+#channelizer_channels = 64
+
+## channelizer_taps         Channelizer taps per channel, integer
+# The prototype filter of the channelizer has this many taps for each channel.  More taps give
+# sharper channel edges at the cost of more CPU.
+channelizer_taps = 8
+
+## float_pipeline           Single precision decimation, integer choice
+# At high sample rates most of the receive CPU time is spent in the filters that lower the
+# sample rate to 48 ksps.  Set this to 1 to run those filters on complex float samples instead of
+# complex double.  This halves the memory traffic and doubles the SIMD width, and helps at 768 ksps
+# and above, or on small boards like the Raspberry Pi.  The precision is still far better than any
+# ADC.  The default 0 uses double precision.
+float_pipeline = 0
+#float_pipeline = 1
+
 ## do_repeater_offset       Use repeater offset, boolean
 # Quisk can implement the frequency shift needed for repeaters.  If the repeater frequency
 # is on the favorites screen, and you tune close (500 Hz) to that frequency in FM mode,
@@ -1379,6 +1447,11 @@ pulse_audio_verbose_output = 0
 #pulse_audio_verbose_output = 1
 #pulse_audio_verbose_output = 2
 
+## startup_profile		Startup profile, boolean
+# Set this to True to print the time taken by each step of startup to the file quisk_logfile.txt.
+startup_profile = False
+#startup_profile = True
+
 ## favorites_file_path	Path to favorites file, text
 # The quisk config screen has a "favorites" tab where you can enter the frequencies and modes of
 # stations.  The data is stored in this file.  If this is blank, the default is the file
@@ -1407,6 +1480,20 @@ dc_remove_bw = 100
 #dc_remove_bw = 200
 #dc_remove_bw = 400
 
+## iq_equalizer_taps		Adaptive image rejection taps, integer
+# For sound card radios, Quisk can continuously measure the image of signals from the spectrum and
+# cancel it with a short filter.  Unlike the amplitude and phase corrections, this corrects an
+# imbalance that changes across the spectrum.  The corrections from the
+# amplitude and phase tables are still applied first and are only updated on a band change.
+# This is the number of filter taps; more taps follow a faster change across the spectrum.
+# Enter zero to turn off the adaptive filter.
+iq_equalizer_taps = 0
+#iq_equalizer_taps = 7
+
+## iq_equalizer_frames		Adaptive image rejection FFTs, integer
+# The adaptive image rejection filter is updated after this many graph FFTs.
+iq_equalizer_frames = 20
+
 ## fixed_tune_offset		Fixed tune offset, integer
 # If this is zero, Quisk tunes as usual. The hardware frequency (the VFO or center frequency)
 # is fixed and Quisk tunes
@@ -1524,9 +1611,11 @@ k4_tcp_port = 0
 ## dxClHost             Dx cluster host name, text
 # The Dx cluster options log into a Dx cluster server, and put station information
 # on the station window under the graph and waterfall screens.
-# dxClHost is the telnet host name.
+# dxClHost is the telnet host name. You can enter several nodes separated by commas, and each may
+# have a port number as "host:port". If a node fails, Quisk tries the next node.
 dxClHost = ''
 #dxClHost = 'example.host.net'
+#dxClHost = 'example.host.net, other.host.net:7300'
 
 ## dxClPort             Dx cluster port number, integer
 # The Dx cluster options log into a Dx cluster server, and put station information
@@ -1553,6 +1642,13 @@ dxClPassword = ''
 # dxClExpireTime is the time in minutes until DX Cluster entries are removed.
 dxClExpireTime = 20
 
+## dxClMaxBackoff       Dx cluster max retry seconds, number
+# The Dx cluster options log into a Dx cluster server, and put station information
+# on the station window under the graph and waterfall screens.
+# dxClMaxBackoff is the longest time in seconds to wait before reconnecting after a failure.
+# The wait starts at two seconds and doubles after each failure.
+dxClMaxBackoff = 120
+
 
 
 hamlib_com1_name = ""
@@ -1634,6 +1730,30 @@ station_display_lines = 1
 #station_display_lines = 0
 #station_display_lines = 3
 
+## signal_detect			Signal detector, boolean
+# The signal detector finds CW and other signals in the graph data and shows them on the station window.
+# It uses the same FFT as the graph.  Station display lines must be greater than zero.
+signal_detect = False
+#signal_detect = True
+
+## signal_detect_snr			Signal detector SNR dB, number
+# A signal is detected if it is this many dB above the noise floor.
+signal_detect_snr = 12.0
+
+## signal_detect_persist		Signal detector frames, integer
+# A signal is shown after it is detected in this many graph frames, and is removed
+# after it is missing for this many frames.
+signal_detect_persist = 4
+
+## signal_detect_width			Signal detector carrier width, integer
+# A signal narrower than this many Hertz is classified as a carrier (CW, beacon, etc.).
+signal_detect_width = 150
+
+## signal_detect_subrx			Tune idle sub-receivers, boolean
+# If True, sub-receivers that are not playing audio are tuned to the strongest detected carriers.
+signal_detect_subrx = False
+#signal_detect_subrx = True
+
 ## display_fraction				Display fraction, number
 # This is the fraction of spectrum to display from zero to one.  It causes the edges
 # of the display to be suppressed.  For example, 0.85 displays the central 85% of the spectrum.
@@ -1752,6 +1872,31 @@ win_latency_millisecs = 150
 
 latency_millisecs = 150
 
+## playback_rate_ppm		Play rate correction ppm, integer
+# The sound card clocks differ slightly from the radio sample rate.  Quisk resamples the sound
+# sent to the play devices so that each play buffer stays half full.  This is the largest
+# rate correction in parts per million.  Set to zero to turn off the correction.
+playback_rate_ppm = 1000
+#playback_rate_ppm = 0
+#playback_rate_ppm = 300
+#playback_rate_ppm = 3000
+
+## low_latency_mode		Low latency sound, integer
+# Set this to 1 to reduce the delay from the antenna to the speaker for CW break-in and monitoring.
+# Quisk then uses small blocks of samples, a play latency of at most 50 msec, period-sized transfers
+# for ALSA sound cards, and real-time priority for the sound thread if the system allows it.  On Linux
+# real-time priority needs permission, for example "@audio - rtprio 95" in /etc/security/limits.conf.
+# The measured latency is shown on the Config screen.
+low_latency_mode = 0
+#low_latency_mode = 1
+
+## alsa_mmap		ALSA mmap access, integer
+# Quisk uses mmap access for ALSA sound cards when the device supports it.  Samples are then converted
+# directly to and from the sound card buffer without an extra copy.  Set this to 0 to always use
+# read and write access.
+alsa_mmap = 1
+#alsa_mmap = 0
+
 
 ## lin_data_poll_usec			Hardware poll usecs, integer
 # Quisk polls the hardware for samples at intervals.  This is the poll time in microseconds.
@@ -1914,10 +2059,24 @@ add_imd_button = 0
 
 ## add_extern_demod			Add ext demod button, text
 # If you want to write your own I/Q filter and demodulation module, set
-# this to the name of the button to add, and change extdemod.c.
+# this to the name of the button to add, and set extern_demod_plugin or change extdemod.c.
 add_extern_demod = ""
 #add_extern_demod = "WFM"
 
+## extern_demod_plugin			Ext demod plug-in, text
+# This is the demodulator for the button in add_extern_demod.  Use "module.function" for a Python
+# function, or the path to a shared library for a C function.  Add ":symbol" to the path if the function
+# is not named quisk_demod.  The function is called with decimated I/Q samples at 48000 sps as
+# func(iq, audio, rate), where iq and audio are memoryviews of complex samples with a full scale of 1.0.
+# It writes stereo audio to audio and returns the number of audio samples.  A C function is
+# int quisk_demod(double * iq, int nIQ, double * audio, int max_audio, int rate) with interleaved I and Q.
+# The plug-in runs on its own thread, and its timing is shown on the Config screen.  If this is
+# empty, the function in extdemod.c is used.
+extern_demod_plugin = ""
+#extern_demod_plugin = "my_demod.wfm"
+#extern_demod_plugin = "/home/jim/lib/demod.so"
+#extern_demod_plugin = "C:/quisk/demod.dll:wfm_demod"
+
 ## add_fdx_button			Add FDX button, integer choice
 # If you want Quisk to add a full duplex button (transmit and receive at the
 # same time), set this to 1.
@@ -2008,10 +2167,12 @@ Usym_stat_fav = u"\u2605"	# Symbol for favorites, a star
 Usym_stat_mem = u"\u24C2"	# Symbol for memory stations, an "M" in a circle
 #Usym_stat_dx = u"\u2691"	# Symbol for DX Cluster stations, a flag
 Usym_stat_dx = u"\u25B2"	# Symbol for DX Cluster stations, a Delta
+Usym_stat_sig = u"\u2022"	# Symbol for detected signals, a bullet
 # These are the text symbols used in the station window.
 Tsym_stat_fav = 'F'
 Tsym_stat_mem = 'M'
 Tsym_stat_dx = 'Dx'
+Tsym_stat_sig = 'S'
 #
 # These are the Unicode symbols to display on buttons.  Thanks to Christof, DJ4CM.
 Ubtn_text_range_dn = u"\u2B07"						# Down band, left arrow
@@ -2064,6 +2225,77 @@ waterfall_palette = 'A'
 #waterfall_palette = 'C'
 #waterfall_palette = 'DK1MI_AM'
 
+## spectrum_history_hours		Spectrum history hours, number
+# Quisk can save the waterfall spectrum in a history file so you can look back at signals that have scrolled
+# off the screen.  Hold the Control key and turn the mouse wheel over the waterfall to scroll back, and
+# scroll forward to return to the live waterfall.  The history is kept between runs.  This is the time saved.
+# Each waterfall uses a file of about spectrum_history_hours * 3600 * spectrum_history_rate * data width bytes.
+# Use zero for no history.
+spectrum_history_hours = 0
+#spectrum_history_hours = 1.0
+#spectrum_history_hours = 8.0
+
+## spectrum_history_rate		Spectrum history rows/sec, number
+# This is the number of spectrum rows saved in the history each second.
+spectrum_history_rate = 4.0
+#spectrum_history_rate = 1.0
+#spectrum_history_rate = 10.0
+
+## spectrum_history_dir		Spectrum history directory, text
+# This is the directory for the spectrum history files.  The default is the directory of the config file.
+spectrum_history_dir = ""
+#spectrum_history_dir = "/home/jim/tmp"
+
+## sweep_start				Sweep start Hertz, integer
+# Quisk can show a wide panorama on radios with a narrow bandwidth by retuning the radio across a range of
+# frequencies and joining the spectra.  If sweep_stop is greater than sweep_start, the screen button "RX Filter"
+# changes to "Sweep".  While the Sweep screen is shown, the radio is tuned through the range and you will not
+# hear the receiver.  Click on the sweep screen to choose the frequency to return to.  This is the start frequency.
+sweep_start = 0
+
+## sweep_stop				Sweep stop Hertz, integer
+# This is the stop frequency of the panoramic sweep.  Use zero for no sweep.
+sweep_stop = 0
+#sweep_stop = 30000000
+
+## sweep_valid				Sweep valid fraction, number
+# This is the fraction of the sample rate used from each segment of the sweep.  The edges of the spectrum
+# are not used because of the anti-alias filters of the sound card or SDR.
+sweep_valid = 0.8
+#sweep_valid = 0.9
+#sweep_valid = 0.6
+
+## sweep_overlap				Sweep overlap fraction, number
+# Adjacent segments of the sweep overlap by this fraction of the valid width, and the spectra are blended in the overlap.
+sweep_overlap = 0.1
+#sweep_overlap = 0.0
+#sweep_overlap = 0.25
+
+## sweep_settle				Sweep settle seconds, number
+# After each retune the samples for this time are discarded while the hardware and filters settle.
+sweep_settle = 0.05
+#sweep_settle = 0.01
+#sweep_settle = 0.2
+
+## sweep_average				Sweep average FFTs, integer
+# This is the number of FFTs averaged for each segment of the sweep.
+sweep_average = 4
+#sweep_average = 1
+#sweep_average = 16
+
+## sweep_threshold			Sweep threshold dB, number
+# After the first sweep only the segments that changed by more than this average dB are swept again.
+# The other segments are swept again after sweep_max_age seconds.
+sweep_threshold = 3.0
+#sweep_threshold = 1.0
+#sweep_threshold = 6.0
+
+## sweep_max_age				Sweep max age seconds, number
+# Segments that did not change are swept again after this time.
+sweep_max_age = 60.0
+#sweep_max_age = 10.0
+#sweep_max_age = 300.0
+
 
 
 
@@ -1,6 +1,9 @@
 from __future__ import print_function
 from __future__ import division
 
+import os, json, threading, traceback, struct, mmap, time, math
+import _quisk as QS
+
 class SplineInterpolator:	# From Numerical Recipes in C
   """Interpolate a table of [x, y] values."""
   def __init__(self, table, Xmin=None, Xmax=None):
@@ -68,3 +71,416 @@ class SplineInterpolator:	# From Numerical Recipes in C
     b = (x - xa[klo]) / h
     y = a * ya[klo] + b * ya[khi] + ((a * a * a - a) * y2a[klo] + (b * b * b - b) * y2a[khi]) * (h * h) / 6.0
     return y
+
+def WriteFileAtomic(path, text, mode="w"):
+  """Write text to a temporary file, flush it to disk and rename it to path."""
+  temp = path + ".tmp"
+  with open(temp, mode) as fp:
+    fp.write(text)
+    fp.flush()
+    os.fsync(fp.fileno())
+  os.replace(temp, path)
+
+_demod_libraries = []	# keep the shared libraries of the demodulator plug-ins loaded
+
+def LoadDemodPlugin(spec):
+  """Load a demodulator plug-in and return (function, address) for QS.add_demod_plugin().
+
+  The spec is "module.function" for a Python function, or "path/library.so:symbol" for a C function in
+  a shared library.  The default symbol is quisk_demod."""
+  path, sep, symbol = spec.rpartition(':')
+  if not sep or not symbol or '/' in symbol or '\\' in symbol or '.' in symbol:
+    path = spec
+    symbol = 'quisk_demod'
+  if os.path.splitext(path)[1].lower() in ('.so', '.dll', '.dylib'):
+    import ctypes
+    lib = ctypes.CDLL(path)
+    _demod_libraries.append(lib)
+    func = getattr(lib, symbol)
+    return None, ctypes.cast(func, ctypes.c_void_p).value
+  import importlib
+  module, sep, name = spec.rpartition('.')
+  if not sep:
+    raise ValueError("The demodulator plug-in must be module.function or a shared library: %s" % spec)
+  function = getattr(importlib.import_module(module), name)
+  return function, 0
+
+def ReadJsonJournal(path):
+  """Read a JSON dictionary written by StateWriter.SaveDict() and apply its journal.  Return None on failure.
+
+  Journal lines with a generation different from the dictionary were written for an older copy, and are skipped."""
+  try:
+    with open(path, "r") as fp:
+      state = json.load(fp)
+  except:
+    return None
+  generation = state.pop(StateWriter.generation_key, None)
+  try:
+    with open(path + ".journal", "r") as fp:
+      for line in fp:
+        try:
+          changes = json.loads(line)
+        except ValueError:	# the last line may be incomplete after a crash
+          break
+        if changes.pop(StateWriter.generation_key, None) == generation:
+          state.update(changes)
+  except IOError:
+    pass
+  return state
+
+class StateWriter(threading.Thread):
+  """Write state files in a background thread so slow disks do not delay the GUI.
+
+  Each file is written to a temporary file, flushed to disk and renamed, so a crash leaves either the old or the
+  new file.  Requests for the same file are combined and only the latest is written.  Dictionaries saved with
+  SaveDict() only write the changed keys to a journal file, and write a full copy after journal_max changes.
+  The full copy and each journal line hold a generation number, so an old journal left by a crash after a new
+  full copy was written is not applied.
+  """
+  journal_max = 50
+  generation_key = "_journal_generation"
+  def __init__(self):
+    threading.Thread.__init__(self)
+    self.daemon = True
+    self.lock = threading.Lock()
+    self.wake = threading.Condition(self.lock)
+    self.pending = {}		# for each path, the text to write or the dictionary job
+    self.busy = False
+    self.doQuit = False
+    self.dict_texts = {}	# for each path, the JSON text of each key as last saved; GUI thread only
+    self.journal_count = {}	# for each path, the number of lines in the journal; writer thread only
+    self.generation = {}	# for each path, the generation of the full copy; writer thread only
+  def SaveText(self, path, text):	# Called from the GUI thread
+    with self.lock:
+      self.pending[path] = text
+      self.wake.notify_all()
+  def SaveDict(self, path, state):	# Called from the GUI thread
+    # Save a dictionary of JSON values.  Return True if anything changed.
+    texts = {}
+    for key in state:
+      texts[key] = json.dumps(state[key])
+    old = self.dict_texts.get(path, {})
+    changed = {}
+    for key in texts:
+      if old.get(key) != texts[key]:
+        changed[key] = texts[key]
+    if not changed:
+      return False
+    self.dict_texts[path] = texts
+    with self.lock:
+      job = self.pending.get(path)
+      if isinstance(job, dict):		# combine with the changes not yet written
+        job["changed"].update(changed)
+        job["texts"] = texts
+      else:
+        self.pending[path] = {"texts":texts, "changed":changed}
+      self.wake.notify_all()
+    return True
+  def Flush(self, timeout=5.0):		# Wait until all files are written
+    with self.lock:
+      self.wake.notify_all()
+      while (self.pending or self.busy) and self.is_alive():
+        if not self.wake.wait(timeout):
+          break
+  def stop(self):
+    self.Flush()
+    with self.lock:
+      self.doQuit = True
+      self.wake.notify_all()
+  def run(self):
+    while True:
+      with self.lock:
+        while not self.pending and not self.doQuit:
+          self.wake.wait()
+        if not self.pending:
+          return
+        jobs = self.pending
+        self.pending = {}
+        self.busy = True
+      for path in jobs:
+        try:
+          self.WriteJob(path, jobs[path])
+        except:
+          traceback.print_exc()
+      with self.lock:
+        self.busy = False
+        self.wake.notify_all()
+  def WriteJob(self, path, job):
+    if not isinstance(job, dict):
+      WriteFileAtomic(path, job)
+      return
+    texts = job["texts"]
+    count = self.journal_count.get(path)
+    if count is None:		# Write a full copy the first time
+      count = self.journal_max
+    if count >= self.journal_max or not os.path.isfile(path):
+      generation = max(self.generation.get(path, 0) + 1, int(time.time() * 1000))
+      self.generation[path] = generation
+      lines = ["  %s: %d" % (json.dumps(self.generation_key), generation)]
+      for key in sorted(texts):
+        lines.append("  %s: %s" % (json.dumps(key), texts[key]))
+      WriteFileAtomic(path, "{\n" + ",\n".join(lines) + "\n}\n")
+      try:
+        os.remove(path + ".journal")
+      except OSError:
+        pass
+      self.journal_count[path] = 0
+    else:
+      items = ["%s: %d" % (json.dumps(self.generation_key), self.generation[path])]
+      for key in sorted(job["changed"]):
+        items.append("%s: %s" % (json.dumps(key), job["changed"][key]))
+      with open(path + ".journal", "a") as fp:
+        fp.write("{" + ", ".join(items) + "}\n")
+        fp.flush()
+        os.fsync(fp.fileno())
+      self.journal_count[path] = count + 1
+
+class SpectrumHistory:
+  """Save rows of spectrum dB data in a ring file mapped into memory.
+
+  Each row holds the averaged FFT data quantized to one byte with the time, VFO, span and center frequency.
+  The file is kept between runs so the waterfall can scroll back through hours of spectrum and the rows can
+  be exported.  The layout must agree with struct spectrum_hist_t and struct spectrum_row_t in quisk.c."""
+  magic = b'QUISKSH1'
+  header_size = 4096
+  header_fmt = '<8siiiiqdd'
+  row_fmt = '<dqiiii'
+  row_head = struct.calcsize(row_fmt)
+  db_min = -170.0
+  db_step = 0.75
+  def __init__(self, path, width, hours, rate):
+    self.path = path
+    self.width = width
+    self.interval = 1.0 / rate
+    self.time0 = 0
+    self.max_rows = max(10, int(hours * 3600 * rate))
+    self.row_bytes = (self.row_head + width + 7) // 8 * 8
+    size = self.header_size + self.max_rows * self.row_bytes
+    header = None
+    if os.path.isfile(path):
+      self.fp = open(path, "r+b")
+      try:
+        header = struct.unpack(self.header_fmt, self.fp.read(struct.calcsize(self.header_fmt)))
+      except struct.error:
+        pass
+    else:
+      self.fp = open(path, "w+b")
+    self.fp.truncate(size)
+    self.buffer = mmap.mmap(self.fp.fileno(), size)
+    # Keep the old rows if the file has the same layout
+    if not header or header[0:4] != (self.magic, width, self.max_rows, self.row_bytes) or header[6:8] != (self.db_min, self.db_step):
+      struct.pack_into(self.header_fmt, self.buffer, 0, self.magic, width, self.max_rows, self.row_bytes, 0, 0,
+          self.db_min, self.db_step)
+  def Close(self):
+    if self.buffer:
+      self.buffer.flush()
+      self.buffer.close()
+      self.buffer = None
+      self.fp.close()
+  def Add(self, data, vfo, span, center=0):
+    # Add a row of dB data at most once each interval.
+    now = time.time()
+    if now - self.time0 < self.interval:
+      return
+    self.time0 = now
+    QS.spectrum_hist_add(self.buffer, data, now, vfo, int(span), int(center))
+  def TotalRows(self):
+    # Return the number of rows written.  The newest row is TotalRows() - 1.
+    return struct.unpack_from('<q', self.buffer, 24)[0]
+  def OldestRow(self):
+    return max(0, self.TotalRows() - self.max_rows)
+  def RowInfo(self, row):
+    # Return (time, vfo, span, center, width) for a row.
+    tm, vfo, span, center, reserved, width = struct.unpack_from(self.row_fmt, self.buffer, self.RowOffset(row))
+    return tm, vfo, span, center, width
+  def RowOffset(self, row):
+    return self.header_size + (row % self.max_rows) * self.row_bytes
+  def FindRow(self, tm):
+    # Return the first row at or after time tm.
+    lo = self.OldestRow()
+    hi = self.TotalRows()
+    while lo < hi:
+      mid = (lo + hi) // 2
+      if struct.unpack_from('<d', self.buffer, self.RowOffset(mid))[0] < tm:
+        lo = mid + 1
+      else:
+        hi = mid
+    return lo
+  def Read(self, time1, time2, freq1=None, freq2=None):
+    """Return a list of rows from time1 to time2 as (time, freq, step, dB_list).
+
+    The times are seconds since the epoch.  If freq1 and freq2 are given, only the dB values between these
+    absolute frequencies are returned.  The first value is at frequency freq and the values are step Hertz apart."""
+    rows = []
+    for row in range(self.FindRow(time1), self.TotalRows()):
+      tm, vfo, span, center, width = self.RowInfo(row)
+      if tm > time2:
+        break
+      if span <= 0 or width <= 0:
+        continue
+      step = float(span) / width
+      freq = vfo + center - span / 2.0
+      i1 = 0
+      i2 = width
+      if freq1 is not None:
+        i1 = min(width, max(0, int((freq1 - freq) / step + 0.999)))
+      if freq2 is not None:
+        i2 = min(width, max(i1, int((freq2 - freq) / step) + 1))
+      offset = self.RowOffset(row) + self.row_head
+      data = self.buffer[offset + i1:offset + i2]
+      rows.append((tm, freq + i1 * step, step, [self.db_min + x * self.db_step for x in bytearray(data)]))
+    return rows
+  def Export(self, path, time1, time2, freq1=None, freq2=None):
+    # Write rows to a CSV file with columns time, frequency of the first value, frequency step and the dB values.
+    rows = self.Read(time1, time2, freq1, freq2)
+    with open(path, "w") as fp:
+      fp.write("# Quisk spectrum history: time, first frequency, frequency step, dB values\n")
+      for tm, freq, step, data in rows:
+        fp.write("%.3f,%.1f,%.3f," % (tm, freq, step))
+        fp.write(",".join(["%.2f" % x for x in data]))
+        fp.write("\n")
+    return len(rows)
+
+class PanoramicSweep:
+  """Sweep a narrow band radio over a wide frequency range and stitch the spectra into one panorama.
+
+  The range freq1 to freq2 is divided into width pixels and into segments.  Each segment uses the valid
+  center fraction of the sample rate, and adjacent segments overlap by the fraction overlap of the valid span.
+  For each segment the hardware is retuned, the FFTs from the settling time are discarded and the power of
+  average FFTs is returned by QS.sweep_result().  The result is kept for each segment, and the overlaps are
+  blended with weights that fall to zero at the segment edges.  After the first pass only segments whose
+  spectrum changed by more than threshold dB are swept again, and the other segments when they are older
+  than max_age seconds.  Call Poll() after each call to QS.get_graph()."""
+  def __init__(self, hardware, freq1, freq2, width, sample_rate,
+               valid=0.8, overlap=0.1, settle=0.05, average=4, threshold=3.0, max_age=60.0, timeout=2.0):
+    self.hardware = hardware
+    self.freq1 = freq1
+    self.freq2 = freq2
+    self.width = width
+    self.sample_rate = sample_rate
+    self.settle = int(settle * sample_rate)
+    self.average = average
+    self.threshold = threshold
+    self.max_age = max_age
+    self.timeout = timeout
+    self.df = float(freq2 - freq1) / width		# Hertz per pixel
+    overlap = min(0.5, max(0.0, overlap))
+    self.span = sample_rate * valid			# valid width of a segment
+    self.ramp = self.span * overlap			# width of the blended edges
+    step = self.span - self.ramp
+    count = max(1, int(math.ceil((freq2 - freq1 - self.span) / step)) + 1)
+    self.centers = [int(freq1 + self.span / 2 + step * i) for i in range(count)]
+    self.segments = [None] * count		# For each segment: (time, first pixel, list of dB, is active)
+    self.data = [-200.0] * width		# The stitched panorama in dB
+    self.index = None		# The segment being measured
+    self.vfo = 0
+    self.time0 = 0
+    self.todo = []			# The segments to sweep in this pass
+    self.passes = 0
+    self.sweep_time = 0		# seconds for the last pass
+    self.pass_time0 = 0
+  def Invalidate(self, freq1=None, freq2=None):
+    # Sweep the segments that overlap freq1 to freq2 again as soon as possible.
+    for i in range(len(self.segments)):
+      center = self.centers[i]
+      if freq1 is None or (center + self.span / 2 > freq1 and center - self.span / 2 < freq2):
+        if self.segments[i]:
+          self.segments[i] = (0, ) + self.segments[i][1:]
+    if self.index is None:
+      self.time0 = 0
+  def NewPass(self):
+    # Make the list of segments to sweep: the new and invalid segments, the segments that changed, and the
+    # segments older than max_age.
+    now = time.time()
+    self.todo = []
+    for i in range(len(self.segments)):
+      seg = self.segments[i]
+      if seg is None or seg[0] == 0 or seg[3] or now - seg[0] > self.max_age:
+        self.todo.append(i)
+    self.pass_time0 = now
+    return bool(self.todo)
+  def Start(self):
+    # Retune to the next segment.  Return False if no segment needs a sweep.
+    if not self.todo:
+      self.index = None
+      return False
+    index = self.todo.pop(0)
+    center = self.centers[index]
+    tune, vfo = self.hardware.ChangeFrequency(center, center, 'Sweep')
+    self.vfo = vfo		# The hardware may tune to a different frequency
+    QS.sweep_start(self.settle, self.average)
+    self.index = index
+    self.time0 = time.time()
+    return True
+  def Stop(self):
+    QS.sweep_start(0, 0)
+    self.index = None
+    self.todo = []
+  def Poll(self):
+    # Return True if the panorama data changed.
+    now = time.time()
+    if self.index is None:		# Idle; look for segments to sweep once a second
+      if now - self.time0 >= 1.0:
+        self.time0 = now
+        if self.NewPass():
+          self.Start()
+      return False
+    index = self.index
+    vfo = self.vfo
+    lo = vfo - self.span / 2
+    hi = vfo + self.span / 2
+    k1 = max(0, int(math.ceil((lo - self.freq1) / self.df - 0.5)))
+    k2 = min(self.width, int(math.floor((hi - self.freq1) / self.df - 0.5)) + 1)
+    if k2 <= k1:		# The segment is outside the panorama
+      data = ()
+    else:
+      data = QS.sweep_result(self.freq1 + k1 * self.df - vfo, self.freq1 + k2 * self.df - vfo, k2 - k1)
+      if data is None:
+        if now - self.time0 > self.timeout:		# No samples; try again
+          self.todo.insert(0, index)
+          self.Start()
+        return False
+    old = self.segments[index]
+    active = False
+    if old and old[1] == k1 and len(old[2]) == len(data) and data:
+      diff = 0.0
+      for i in range(len(data)):
+        diff += abs(data[i] - old[2][i])
+      active = diff / len(data) > self.threshold
+    self.segments[index] = (now, k1, data, active)
+    self.Stitch(index)
+    if not self.todo:
+      self.passes += 1
+      self.sweep_time = now - self.pass_time0
+      self.NewPass()
+    self.Start()
+    return True
+  def Stitch(self, index):
+    # Blend the power of the segment and its neighbors into the panorama.
+    segments = []
+    for i in (index - 1, index, index + 1):
+      if 0 <= i < len(self.segments) and self.segments[i] and self.segments[i][2]:
+        segments.append(self.segments[i])
+    tm, k1, data, active = self.segments[index]
+    if not data:
+      return
+    df = self.df
+    ramp = self.ramp
+    for k in range(k1, k1 + len(data)):
+      wsum = 0.0
+      psum = 0.0
+      for seg in segments:
+        first, sdata = seg[1:3]
+        i = k - first
+        if 0 <= i < len(sdata):
+          if ramp > 0:		# distance from the edge of the segment
+            w = min(i + 0.5, len(sdata) - i - 0.5) * df / ramp
+            w = min(1.0, max(1E-3, w))
+          else:
+            w = 1.0
+          wsum += w
+          psum += w * 10.0 ** (sdata[i] / 10.0)
+      if psum > 1E-20:
+        self.data[k] = 10.0 * math.log10(psum / wsum)
+      else:
+        self.data[k] = -200.0
@@ -782,26 +782,31 @@ class QuiskBitField(wx.Window):
     if self.command:
       self.command(self)
 
+def FilterSliderValues():
+  """Return the list of bandwidths of the adjustable filter slider."""
+  l = []
+  bw = 10
+  incr = 10
+  for i in range(0, 101):
+    l.append(bw)
+    bw += incr
+    if bw == 100:
+      incr = 20
+    elif bw == 500:
+      incr = 50
+    elif bw == 1000:
+      incr = 100
+    elif bw == 5000:
+      incr = 500
+    elif bw == 10000:
+      incr = 1000
+  return l
+
 class QFilterButtonWindow(wx.Frame):
   """Create a window with controls for the button"""
   def __init__(self, wrap, value):
     self.wrap = wrap
-    l = self.valuelist = []
-    bw = 10
-    incr = 10
-    for i in range(0, 101):
-      l.append(bw)
-      bw += incr
-      if bw == 100:
-        incr = 20
-      elif bw == 500:
-        incr = 50
-      elif bw == 1000:
-        incr = 100
-      elif bw == 5000:
-        incr = 500
-      elif bw == 10000:
-        incr = 1000
+    self.valuelist = FilterSliderValues()
     x, y = wrap.GetPosition().Get()
     x, y = wrap.GetParent().ClientToScreen(wx.Point(x, y))
     w, h = wrap.GetSize()
@@ -8,6 +8,9 @@
 #include <sys/time.h>
 #include <time.h>
 #include <errno.h>
+#include <ctype.h>
+#include <stdint.h>
+#include <pthread.h>
 
 #ifdef MS_WINDOWS
 #include <winsock2.h>
@@ -185,71 +188,213 @@ static void correct_sample (struct sound_dev * dev, complex double * cSamples, i
 	}
 }
 
-static void DCremove(complex double * cSamples, int nSamples, int sample_rate, int key_state)
-{
+// The receive front end delays the I or Q channel by one sample, removes DC and corrects the amplitude and phase
+// in a single pass over the samples.  There is a specialized loop for each combination of corrections.
+#define FE_DELAY_NONE	0
+#define FE_DELAY_I	1
+#define FE_DELAY_Q	2
+#define FE_DC_NONE	0
+#define FE_DC_SUB	1	// subtract the average DC
+#define FE_DC_AVG	2	// subtract the average DC and add the samples to the next average
+#define FE_DC_IIR	3	// DC removal filter
+
+static struct {
+	int sample_rate;
+	int bandwidth;
+	double alpha;			// coefficient of the DC removal filter
+	complex double dc_remove;	// state of the DC removal filter
+	complex double dc_average;	// average DC component in samples
+	complex double dc_sum;
+	int dc_count;
+	int dc_key_delay;
+} front_end = {0, 0, 0.95, 0, 0, 0, 0, 0};
+
+static inline void front_end_loop(struct sound_dev * dev, complex double * cSamples, int nSamples,
+		const int delay, const int dc, const int correct)
+{	// The constant arguments let the compiler remove the unused code from each variant.
 	int i;
-	double omega, Qsin, Qcos, H0, x;
+	double re, im, save;
+	double alpha = front_end.alpha;
+	complex double c, c2;
+	complex double dc_remove = front_end.dc_remove;
+	complex double dc_average = front_end.dc_average;
+	complex double dc_sum = 0;
+
+	save = delay == FE_DELAY_NONE ? 0 : dev->save_sample;
+	for (i = 0; i < nSamples; i++) {
+		re = creal(cSamples[i]);
+		im = cimag(cSamples[i]);
+		if (delay == FE_DELAY_I) {
+			c = save;
+			save = re;
+			re = creal(c);
+		}
+		else if (delay == FE_DELAY_Q) {
+			c = save;
+			save = im;
+			im = creal(c);
+		}
+		c = re + I * im;
+		if (dc == FE_DC_AVG) {
+			dc_sum += c;
+			c -= dc_average;
+		}
+		else if (dc == FE_DC_SUB) {
+			c -= dc_average;
+		}
+		else if (dc == FE_DC_IIR) {	// DC removal; R.G. Lyons page 553; 3rd Ed. p 762
+			c2 = c + dc_remove * alpha;
+			c = c2 - dc_remove;
+			dc_remove = c2;
+		}
+		if (correct) {		// amplitude and phase corrections
+			re = creal(c);
+			im = cimag(c);
+			c = re * dev->AmPhAAAA + I * (re * dev->AmPhCCCC + im * dev->AmPhDDDD);
+		}
+		cSamples[i] = c;
+	}
+	if (delay != FE_DELAY_NONE)
+		dev->save_sample = save;
+	if (dc == FE_DC_IIR)
+		front_end.dc_remove = dc_remove;
+	else if (dc == FE_DC_AVG)
+		front_end.dc_sum += dc_sum;
+}
+
+typedef void (* ty_front_end)(struct sound_dev *, complex double *, int);
+
+#define FRONT_END_VARIANT(delay, dc, correct) \
+static void front_end_##delay##_##dc##_##correct(struct sound_dev * dev, complex double * cSamples, int nSamples) \
+{ \
+	front_end_loop(dev, cSamples, nSamples, delay, dc, correct); \
+}
+#define FRONT_END_VARIANTS(delay, dc) FRONT_END_VARIANT(delay, dc, 0) FRONT_END_VARIANT(delay, dc, 1)
+#define FRONT_END_DELAY(delay) FRONT_END_VARIANTS(delay, 0) FRONT_END_VARIANTS(delay, 1) \
+	FRONT_END_VARIANTS(delay, 2) FRONT_END_VARIANTS(delay, 3)
+FRONT_END_DELAY(0)
+FRONT_END_DELAY(1)
+FRONT_END_DELAY(2)
+#define FRONT_END_NAMES(delay, dc) {front_end_##delay##_##dc##_0, front_end_##delay##_##dc##_1}
+
+static ty_front_end front_end_variants[3][4][2] = {
+	{FRONT_END_NAMES(0, 0), FRONT_END_NAMES(0, 1), FRONT_END_NAMES(0, 2), FRONT_END_NAMES(0, 3)},
+	{FRONT_END_NAMES(1, 0), FRONT_END_NAMES(1, 1), FRONT_END_NAMES(1, 2), FRONT_END_NAMES(1, 3)},
+	{FRONT_END_NAMES(2, 0), FRONT_END_NAMES(2, 1), FRONT_END_NAMES(2, 2), FRONT_END_NAMES(2, 3)},
+};
+
+// The adaptive image rejection filter adds a complex FIR filter of the conjugate samples to the delayed samples.
+// The GUI thread writes new coefficients into the unused half of coefs and then changes index.
+static struct {
+	volatile int index;		// index of the coefficients in use
+	int taps[2];
+	complex double coefs[2][IQ_EQ_MAX_TAPS];
+	int history_taps;		// number of taps when history was saved
+	complex double history[IQ_EQ_MAX_TAPS];		// the last taps - 1 samples
+	complex double buffer[SAMP_BUFFER_SIZE + IQ_EQ_MAX_TAPS];
+} image_reject;
+
+void quisk_set_image_reject(complex double * coefs, int taps)	// Called from the GUI thread
+{
+	int i, k;
+
+	k = image_reject.index ? 0 : 1;
+	for (i = 0; i < taps; i++)
+		image_reject.coefs[k][i] = coefs[i];
+	image_reject.taps[k] = taps;
+	image_reject.index = k;
+}
+
+static void image_reject_process(complex double * cSamples, int nSamples)
+{	// Filter the samples:  y[n] = x[n - D] + sum of w[k] * conj(x[n - k]) where D = (taps - 1) / 2.
+	int i, k, n, taps, D;
+	complex double * x, * w;
 	complex double c;
-	static int old_sample_rate = 0;
-	static int old_bandwidth = 0;
-	static double alpha = 0.95;
-	static complex double dc_remove = 0;
-	static complex double dc_average = 0;		// Average DC component in samples
-	static complex double dc_sum = 0;
-	static int dc_count = 0;
-	static int dc_key_delay = 0;
-
-	if (sample_rate != old_sample_rate || dc_remove_bw != old_bandwidth) {
-		old_sample_rate = sample_rate;	// calculate a new alpha
-		old_bandwidth = dc_remove_bw;
-		if (old_bandwidth > 0) {
-			omega = M_PI * old_bandwidth / (old_sample_rate / 2.0);
+
+	k = image_reject.index;
+	taps = image_reject.taps[k];
+	w = image_reject.coefs[k];
+	if (taps != image_reject.history_taps) {
+		image_reject.history_taps = taps;
+		memset(image_reject.history, 0, sizeof(image_reject.history));
+	}
+	if (taps <= 0 || nSamples > SAMP_BUFFER_SIZE)
+		return;
+	D = (taps - 1) / 2;
+	x = image_reject.buffer;
+	memcpy(x, image_reject.history, (taps - 1) * sizeof(complex double));
+	memcpy(x + taps - 1, cSamples, nSamples * sizeof(complex double));
+	for (n = 0; n < nSamples; n++) {
+		c = x[n + taps - 1 - D];
+		for (i = 0; i < taps; i++)
+			c += w[i] * conj(x[n + taps - 1 - i]);
+		cSamples[n] = c;
+	}
+	memcpy(image_reject.history, x + nSamples, (taps - 1) * sizeof(complex double));
+}
+
+static void front_end_process(struct sound_dev * dev, complex double * cSamples, int nSamples, int sample_rate, int key_state)
+{	// Apply the front end corrections to the samples.  The dev is NULL for samples that are not from a sound card.
+	int delay, dc, correct;
+	double omega, Qsin, Qcos, H0, x;
+
+	if (sample_rate != front_end.sample_rate || dc_remove_bw != front_end.bandwidth) {
+		front_end.sample_rate = sample_rate;	// calculate a new alpha
+		front_end.bandwidth = dc_remove_bw;
+		if (front_end.bandwidth > 1) {
+			omega = M_PI * front_end.bandwidth / (front_end.sample_rate / 2.0);
 			Qsin = sin(omega);
 			Qcos = cos(omega);
 			H0 = 1.0 / sqrt(2.0);
 			x = ((Qcos - 1) * (Qcos - 1) + Qsin * Qsin) / (H0 * H0) - Qsin * Qsin;
 			x = sqrt(x);
-			alpha = Qcos - x;
-			//printf ("DC remove: alpha %.3f rate %i bw %i\n", alpha, old_sample_rate, old_bandwidth);
-		}
-		else {
-			//printf("DC remove: disable\n");
+			front_end.alpha = Qcos - x;
+			//printf ("DC remove: alpha %.3f rate %i bw %i\n", front_end.alpha, front_end.sample_rate, front_end.bandwidth);
 		}
 	}
-	if (quisk_is_vna || old_bandwidth == 0) {
+	if (nSamples <= 0)
+		return;
+	// Choose the DC removal method.  Method 1 averages the DC while the key is up.
+	if (quisk_is_vna || front_end.bandwidth <= 0) {
+		dc = FE_DC_NONE;
 	}
-	else if (old_bandwidth == 1) {
+	else if (front_end.bandwidth == 1) {
+		dc = FE_DC_SUB;
 		if (key_state) {
-			dc_key_delay = 0;
-			dc_sum = 0;
-			dc_count = 0;
+			front_end.dc_key_delay = 0;
+			front_end.dc_sum = 0;
+			front_end.dc_count = 0;
 		}
-		else if (dc_key_delay < old_sample_rate) {
-			dc_key_delay += nSamples;
+		else if (front_end.dc_key_delay < front_end.sample_rate) {
+			front_end.dc_key_delay += nSamples;
 		}
 		else {
-			dc_count += nSamples;
-			for (i = 0; i < nSamples; i++)		// Correction for DC offset in samples
-				dc_sum += cSamples[i];
-			if (dc_count > old_sample_rate * 2) {
-				dc_average = dc_sum / dc_count;
-				//printf("dc average %lf   %lf %d\n", creal(dc_average), cimag(dc_average), dc_count);
-				//printf("dc polar %.0lf   %d\n", cabs(dc_average),
-			   			//	(int)(360.0 / 2 / M_PI * atan2(cimag(dc_average), creal(dc_average))));
-				dc_sum = 0;
-				dc_count = 0;
-			}
-		}
-		for (i = 0; i < nSamples; i++)	// Correction for DC offset in samples
-			cSamples[i] -= dc_average;
-	}
-	else if (old_bandwidth > 1) {
-		for (i = 0; i < nSamples; i++) {	// DC removal; R.G. Lyons page 553; 3rd Ed. p 762
-			c = cSamples[i] + dc_remove * alpha;
-			cSamples[i] = c - dc_remove;
-			dc_remove = c;
+			dc = FE_DC_AVG;
+			front_end.dc_count += nSamples;
 		}
 	}
+	else {
+		dc = FE_DC_IIR;
+	}
+	delay = FE_DELAY_NONE;
+	correct = 0;
+	if (dev) {
+		if (dev->channel_Delay >= 0 && dev->channel_Delay == dev->channel_I)
+			delay = FE_DELAY_I;
+		else if (dev->channel_Delay >= 0 && dev->channel_Delay == dev->channel_Q)
+			delay = FE_DELAY_Q;
+		correct = dev->doAmplPhase ? 1 : 0;
+	}
+	if (dc != FE_DC_NONE || delay != FE_DELAY_NONE || correct)
+		(*front_end_variants[delay][dc][correct])(dev, cSamples, nSamples);
+	if (dev && image_reject.taps[image_reject.index])
+		image_reject_process(cSamples, nSamples);
+	if (dc == FE_DC_AVG && front_end.dc_count > front_end.sample_rate * 2) {
+		front_end.dc_average = front_end.dc_sum / front_end.dc_count;
+		//printf("dc average %lf   %lf %d\n", creal(front_end.dc_average), cimag(front_end.dc_average), front_end.dc_count);
+		front_end.dc_sum = 0;
+		front_end.dc_count = 0;
+	}
 }
 
 void quisk_record_audio(struct wav_file * wavfile, complex double * cSamples, int nSamples)
@@ -490,6 +635,130 @@ int read_sound_interface(
    return nSamples;
 }
 
+// The play rate correction resamples the samples sent to each play device by a ratio close to 1.0 so that
+// the play buffer stays half full.  The ratio is set by a PI control loop on the average buffer fill.
+#define CR_UPDATE_SEC	1.0	// time between changes to the resample ratio
+#define CR_TIME_P	4.0	// time constant of the proportional term in seconds
+#define CR_TIME_I	30.0	// time constant of the integral term in seconds
+static double cr_max_ratio = 1000E-6;	// maximum change to the resample ratio
+
+static int cr_controlled(struct sound_dev * dev)
+{	// Return 1 if the rate of this play device is corrected
+	switch (dev->dev_index) {
+	case t_Playback:
+	case t_DigitalOutput:
+	case t_DigitalRx1Output:
+		return 1;
+	case t_MicPlayback:
+		return ! (rxMode == CWL || rxMode == CWU);	// Do not change the timing of CW
+	default:
+		return 0;
+	}
+}
+
+static void cr_reset(struct sound_dev * dev)
+{
+	dev->cr_delay = 3;
+	dev->cr_average_fill = 0;
+	dev->cr_average_count = 0;
+	dev->cr_time = 0;
+	dev->cr_ratio = 1.0;
+	dev->cr_integral = 0;
+	dev->cr_phase = 1.0;
+	dev->cr_hist[0] = dev->cr_hist[1] = dev->cr_hist[2] = 0;
+}
+
+static void cr_control(struct sound_dev * dev)
+{	// Calculate a new resample ratio from the average buffer fill
+	double tm, dt, fill, error, gain, limit;
+	int span;
+
+	tm = QuiskTimeSec();
+	if (dev->cr_time == 0) {
+		dev->cr_time = tm;
+		return;
+	}
+	dt = tm - dev->cr_time;
+	if (dt < CR_UPDATE_SEC)
+		return;
+	dev->cr_time = tm;
+	if (dev->cr_average_count <= 0)
+		return;
+	fill = dev->cr_average_fill / dev->cr_average_count;
+	dev->cr_average_fill = 0;
+	dev->cr_average_count = 0;
+	if (dev->cr_delay > 0) {	// wait for the buffer to settle after a start
+		dev->cr_delay--;
+		return;
+	}
+	if ( ! cr_controlled(dev) || cr_max_ratio <= 0) {
+		dev->cr_ratio = 1.0;
+		return;
+	}
+	// A ratio change of "gain" moves the buffer fill by 1.0 in one second.
+	span = dev->play_buf_size > 0 ? dev->play_buf_size : dev->latency_frames * 2;
+	if (span <= 0 || dev->sample_rate <= 0)
+		return;
+	gain = (double)span / dev->sample_rate;
+	error = 0.5 - fill;		// positive when the buffer is emptying
+	limit = cr_max_ratio * CR_TIME_P * CR_TIME_I / gain;
+	dev->cr_integral += error * dt;
+	if (dev->cr_integral > limit)
+		dev->cr_integral = limit;
+	else if (dev->cr_integral < -limit)
+		dev->cr_integral = -limit;
+	dev->cr_ratio = 1.0 + gain / CR_TIME_P * (error + dev->cr_integral / CR_TIME_I);
+	if (dev->cr_ratio > 1.0 + cr_max_ratio)
+		dev->cr_ratio = 1.0 + cr_max_ratio;
+	else if (dev->cr_ratio < 1.0 - cr_max_ratio)
+		dev->cr_ratio = 1.0 - cr_max_ratio;
+	if (quisk_sound_state.verbose_sound > 1)
+		QuiskPrintf("%s:  Buffer average %5.2lf rate correction %6.0lf ppm\n",
+			dev->stream_description, fill * 100, (dev->cr_ratio - 1.0) * 1E6);
+}
+
+static int cr_resample(struct sound_dev * dev, complex double * cSamples, int nSamples, complex double ** pOut)
+{	// Resample by dev->cr_ratio with a cubic Lagrange interpolator in Farrow form.
+	// Return the number of output samples in *pOut.
+	int i, j, nOut, size;
+	double pos, step, mu;
+	complex double * in, * out, c1, c2, c3;
+
+	size = nSamples * 2 + nSamples / 64 + 16;
+	if (size > dev->cr_buffer_size) {
+		in = (complex double *)realloc(dev->cr_buffer, size * sizeof(complex double));
+		if ( ! in) {
+			*pOut = cSamples;
+			return nSamples;
+		}
+		dev->cr_buffer = in;
+		dev->cr_buffer_size = size;
+	}
+	in = dev->cr_buffer;		// the history samples followed by the input samples
+	out = in + nSamples + 3;
+	in[0] = dev->cr_hist[0];
+	in[1] = dev->cr_hist[1];
+	in[2] = dev->cr_hist[2];
+	memcpy(in + 3, cSamples, nSamples * sizeof(complex double));
+	step = 1.0 / dev->cr_ratio;
+	pos = dev->cr_phase;
+	nOut = 0;
+	// Interpolate between in[j] and in[j + 1] using in[j - 1] to in[j + 2].
+	while ((j = (int)pos) <= nSamples) {
+		mu = pos - j;
+		c1 = in[j + 1] - in[j - 1] / 3.0 - in[j] / 2.0 - in[j + 2] / 6.0;
+		c2 = (in[j - 1] + in[j + 1]) / 2.0 - in[j];
+		c3 = (in[j + 2] - in[j - 1]) / 6.0 + (in[j] - in[j + 1]) / 2.0;
+		out[nOut++] = ((c3 * mu + c2) * mu + c1) * mu + in[j];
+		pos += step;
+	}
+	dev->cr_phase = pos - nSamples;
+	for (i = 0; i < 3; i++)
+		dev->cr_hist[i] = in[nSamples + i];
+	*pOut = out;
+	return nOut;
+}
+
 /*!
  * \brief Driver interface for playing samples to a device
  * 
@@ -500,11 +769,10 @@ int read_sound_interface(
  * \param volume Input. [0,1] volume ratio
  * \returns number of samples read
  */
-#define AVG_SEC		10.0
 void play_sound_interface(struct sound_dev* dev, int nSamples, complex double * cSamples, int report_latency, double volume)
 {
 	int i;
-	double avg, samp, re, im, frac, diff, tm;
+	double avg, samp, re, im, frac, diff;
 
 	if (cSamples && nSamples > 0 && dev->sample_rate > 0) {
 		// Calculate average squared level
@@ -521,32 +789,9 @@ void play_sound_interface(struct sound_dev* dev, int nSamples, complex double *
 				avg = avg + frac * diff;
 		}
 		dev->average_square = avg;
-	}
-#if 0
-	static int disturb_time = 0;
-	// Damage the sample rate for debug
-	disturb_time += nSamples;
-	if (disturb_time > 300) {
-		nSamples++;
-		disturb_time = 0;
-	}
-#endif
-	// Correct sample rate by reference to the buffer_fill <> 0.5
-	if (dev->cr_correction != 0) {
-		dev->cr_sample_time += nSamples;
-		if (dev->cr_sample_time >= dev->cr_correct_time && nSamples >= 2) {
-			dev->cr_sample_time = 0;
-			if (dev->cr_correction > 0) {	// add a sample
-				//printf("Add    a sample\n");
-				cSamples[nSamples] = cSamples[nSamples - 1];
-				cSamples[nSamples - 1] = (cSamples[nSamples - 2] + cSamples[nSamples]) / 2.0;
-				nSamples++;
-			}
-			else {			// remove a sample
-				//printf("Remove a sample\n");
-				nSamples--;
-			}
-		}
+		// Correct the sample rate by reference to the buffer_fill <> 0.5.  The caller's samples are not changed.
+		if (cr_controlled(dev))
+			nSamples = cr_resample(dev, cSamples, nSamples, &cSamples);
 	}
 	// Play using correct driver.
   	switch( dev->driver ) {
@@ -573,49 +818,7 @@ void play_sound_interface(struct sound_dev* dev, int nSamples, complex double *
 		break;
 	}
 	// Calculate a new sample rate correction
-	tm = QuiskTimeSec();
-	if (tm - dev->TimerTime0 > AVG_SEC) {
-		dev->TimerTime0 = tm;
-		if (dev->cr_average_count <= 0) {
-			dev->cr_correction = 0;
-		}
-		else if (dev->dev_index == t_MicPlayback && (rxMode == CWL || rxMode == CWU)) {
-			dev->cr_correction = 0;
-			dev->cr_average_fill /= dev->cr_average_count;
-			if (quisk_sound_state.verbose_sound > 1)
-				QuiskPrintf("%s:  Buffer average %5.2lf\n", dev->stream_description, dev->cr_average_fill * 100);
-		}
-		else if (dev->cr_delay > 0) {
-			dev->cr_delay--;
-			dev->cr_correction = 0;
-			dev->cr_average_fill /= dev->cr_average_count;
-			if (quisk_sound_state.verbose_sound > 1)
-				QuiskPrintf("%s:  Buffer average %5.2lf\n", dev->stream_description, dev->cr_average_fill * 100);
-		}
-		else if ( ! (dev->dev_index == t_Playback || dev->dev_index == t_MicPlayback)) {
-			dev->cr_correction = 0;
-			dev->cr_average_fill /= dev->cr_average_count;
-			if (quisk_sound_state.verbose_sound > 1)
-				QuiskPrintf("%s:  Buffer average %5.2lf\n", dev->stream_description, dev->cr_average_fill * 100);
-		}
-		else {
-			dev->cr_average_fill /= dev->cr_average_count;
-			if (dev->cr_average_fill > 0.55)
-				dev->cr_correction = -0.05 * dev->play_buf_size;
-			else if (dev->cr_average_fill < 0.45)
-				dev->cr_correction = 0.05 * dev->play_buf_size;
-			else
-				dev->cr_correction = (0.5 - dev->cr_average_fill) * dev->play_buf_size;
-			if (dev->cr_correction != 0)
-				dev->cr_correct_time = abs(dev->sample_rate * AVG_SEC / dev->cr_correction);
-			if (quisk_sound_state.verbose_sound > 1)
-				QuiskPrintf("%s:  Buffer average %5.2lf cr_correction %5d\n",
-					dev->stream_description, dev->cr_average_fill * 100, dev->cr_correction);
-		}
-		dev->cr_average_fill = 0;
-		dev->cr_average_count = 0;
-		dev->cr_sample_time = 0;
-	}
+	cr_control(dev);
 }
 
 static int read_radio_sound_socket(complex double * cSamples)
@@ -870,6 +1073,471 @@ static void testing(double complex * cSamples, int nSamples)
 }
 #endif
 
+// The I/Q ring keeps the last seconds of raw I/Q samples in memory as 16-bit integers or half floats.
+// When a trigger fires, a writer thread saves the samples from before the trigger until some seconds
+// after it to a WAV file.  The writer reads the ring while the sound thread keeps writing, so the ring
+// holds the pre-trigger time plus the post-trigger time plus one second of slack.
+#define IQ_RING_EVENTS		64
+#define IQ_RING_CHUNK		8192
+
+static struct {
+	double pre_seconds;		// seconds of samples saved before the trigger
+	double post_seconds;		// seconds of samples saved after the trigger
+	int use_float16;		// store samples as half floats instead of 16-bit integers
+	int trigger_ptt;		// trigger on PTT
+	int trigger_squelch;		// trigger when the squelch opens on a sub-receiver
+	int rate;			// sample rate of the samples in the ring
+	int new_rate;			// the sample rate changed during a dump
+	long long size;			// size of the ring in samples
+	uint16_t * buffer;		// I and Q for each sample
+	volatile long long head;	// total samples written
+	struct {
+		long long index;	// sample index of the tuning change
+		int vfo;
+		int tune;
+	} events[IQ_RING_EVENTS];	// ring of tuning changes
+	int event_count;
+	int active;			// a dump is in progress
+	long long dump_start, dump_trigger, dump_end;
+	time_t dump_time;
+	char reason[QUISK_SC_SIZE];
+	char directory[QUISK_PATH_SIZE];
+	char last_file[QUISK_PATH_SIZE];
+	int dumps;
+	int overruns;
+	int thread_started;
+	int quit;
+	pthread_t thread;
+	pthread_mutex_t mutex;
+	pthread_cond_t cond;
+} iq_ring = {.mutex = PTHREAD_MUTEX_INITIALIZER, .cond = PTHREAD_COND_INITIALIZER};
+
+static uint16_t float_to_half(float f)
+{
+	union {float f; uint32_t u;} v;
+	uint32_t sign, mant;
+	int exp;
+
+	v.f = f;
+	sign = (v.u >> 16) & 0x8000;
+	exp = (int)((v.u >> 23) & 0xFF) - 127 + 15;
+	mant = v.u & 0x7FFFFF;
+	if (exp <= 0) {		// subnormal or zero
+		if (exp < -10)
+			return sign;
+		mant |= 0x800000;
+		return sign | (mant >> (14 - exp));
+	}
+	if (exp >= 31)		// clip to the largest value
+		return sign | 0x7BFF;
+	v.u = (exp << 10) | (mant >> 13);
+	if (mant & 0x1000)	// round
+		v.u++;
+	return sign | v.u;
+}
+
+static float half_to_float(uint16_t h)
+{
+	union {float f; uint32_t u;} v;
+	uint32_t exp, mant;
+
+	exp = (h >> 10) & 0x1F;
+	mant = h & 0x3FF;
+	if (exp == 0) {		// subnormal or zero
+		v.f = mant / 16777216.0f;
+		return (h & 0x8000) ? -v.f : v.f;
+	}
+	v.u = ((h & 0x8000u) << 16) | ((exp - 15 + 127) << 23) | (mant << 13);
+	return v.f;
+}
+
+static int iq_ring_alloc(int rate)
+{	// Allocate the ring for a new sample rate.  Called from the sound thread.  Return 1 if the ring is ready.
+	long long size;
+
+	pthread_mutex_lock(&iq_ring.mutex);
+	if (iq_ring.active) {		// wait for the writer to finish
+		iq_ring.new_rate = rate;
+		pthread_mutex_unlock(&iq_ring.mutex);
+		return 0;
+	}
+	free(iq_ring.buffer);
+	size = (long long)((iq_ring.pre_seconds + iq_ring.post_seconds + 1.0) * rate);
+	iq_ring.buffer = (uint16_t *)malloc(size * 2 * sizeof(uint16_t));
+	iq_ring.size = iq_ring.buffer ? size : 0;
+	iq_ring.rate = rate;
+	iq_ring.new_rate = 0;
+	iq_ring.head = 0;
+	iq_ring.event_count = 0;
+	pthread_mutex_unlock(&iq_ring.mutex);
+	return iq_ring.buffer != NULL;
+}
+
+static void iq_ring_write(complex double * cSamples, int nSamples)
+{	// Add the raw I/Q samples to the ring.  Called from the sound thread.
+	int i, vfo, tune, last;
+	long long head, index;
+	uint16_t * pt;
+	double scale, d;
+
+	if (iq_ring.pre_seconds <= 0 || nSamples <= 0)
+		return;
+	if (quisk_sound_state.sample_rate != iq_ring.rate || ! iq_ring.buffer)
+		if ( ! iq_ring_alloc(quisk_sound_state.sample_rate))
+			return;
+	head = iq_ring.head;
+	// Record a change of tuning
+	quisk_get_tuning(&vfo, &tune);
+	last = (iq_ring.event_count - 1) % IQ_RING_EVENTS;
+	if (iq_ring.event_count == 0 || iq_ring.events[last].vfo != vfo || iq_ring.events[last].tune != tune) {
+		pthread_mutex_lock(&iq_ring.mutex);
+		i = iq_ring.event_count % IQ_RING_EVENTS;
+		iq_ring.events[i].index = head;
+		iq_ring.events[i].vfo = vfo;
+		iq_ring.events[i].tune = tune;
+		iq_ring.event_count++;
+		pthread_mutex_unlock(&iq_ring.mutex);
+	}
+	index = head % iq_ring.size;
+	pt = iq_ring.buffer + index * 2;
+	scale = iq_ring.use_float16 ? 1.0 / CLIP32 : 1.0 / 65536;
+	for (i = 0; i < nSamples; i++) {
+		if (iq_ring.use_float16) {
+			pt[0] = float_to_half((float)(creal(cSamples[i]) * scale));
+			pt[1] = float_to_half((float)(cimag(cSamples[i]) * scale));
+		}
+		else {
+			d = creal(cSamples[i]) * scale;
+			pt[0] = (uint16_t)(int16_t)(d >= 32767 ? 32767 : d <= -32767 ? -32767 : lround(d));
+			d = cimag(cSamples[i]) * scale;
+			pt[1] = (uint16_t)(int16_t)(d >= 32767 ? 32767 : d <= -32767 ? -32767 : lround(d));
+		}
+		pt += 2;
+		if (++index >= iq_ring.size) {
+			index = 0;
+			pt = iq_ring.buffer;
+		}
+	}
+	__sync_synchronize();		// the samples are written before the head moves
+	iq_ring.head = head + nSamples;
+}
+
+void quisk_iq_ring_trigger(const char * reason)
+{	// Save the ring to a file.  A trigger during a dump extends the dump.  Called from any thread.
+	long long head;
+	int n;
+
+	if (iq_ring.pre_seconds <= 0)
+		return;
+	pthread_mutex_lock(&iq_ring.mutex);
+	if ( ! iq_ring.buffer || ! iq_ring.thread_started) {	// iq_ring_close() may run in the sound thread
+		pthread_mutex_unlock(&iq_ring.mutex);
+		return;
+	}
+	head = iq_ring.head;
+	if ( ! iq_ring.active) {
+		iq_ring.dump_trigger = head;
+		iq_ring.dump_start = head - (long long)(iq_ring.pre_seconds * iq_ring.rate);
+		if (iq_ring.dump_start < 0)
+			iq_ring.dump_start = 0;
+		iq_ring.dump_end = head + (long long)(iq_ring.post_seconds * iq_ring.rate);
+		iq_ring.dump_time = time(NULL);
+		strMcpy(iq_ring.reason, reason, QUISK_SC_SIZE);
+		iq_ring.active = 1;
+		pthread_cond_signal(&iq_ring.cond);
+	}
+	else {
+		if (iq_ring.dump_end < head + (long long)(iq_ring.post_seconds * iq_ring.rate))
+			iq_ring.dump_end = head + (long long)(iq_ring.post_seconds * iq_ring.rate);
+		n = strlen(iq_ring.reason);
+		snprintf(iq_ring.reason + n, QUISK_SC_SIZE - n, "; %s", reason);
+	}
+	pthread_mutex_unlock(&iq_ring.mutex);
+}
+
+void quisk_iq_ring_squelch(int squelch_active)
+{	// Save the ring when the squelch opens on the sub-receiver.  Called from the sound thread.
+	// The ring holds the main receiver I/Q samples, not the multirx_cSamples of the sub-receiver.
+	static int old_squelch = 0;
+
+	if (iq_ring.trigger_squelch && old_squelch && ! squelch_active)
+		quisk_iq_ring_trigger("squelch");
+	old_squelch = squelch_active;
+}
+
+static int iq_ring_comment(char * text, int size, long long start, long long end)
+{	// Write the metadata for the dump into text.  Return the length.
+	int i, n, first;
+	long long index;
+	char str40[40];
+
+	strftime(str40, 40, "%Y-%m-%dT%H:%M:%SZ", gmtime(&iq_ring.dump_time));
+	n = snprintf(text, size, "Quisk I/Q ring; trigger %s; trigger time %s; sample rate %d; samples %s; "
+		"pre-trigger seconds %.3f; post-trigger seconds %.3f; tuning",
+		iq_ring.reason, str40, iq_ring.rate, iq_ring.use_float16 ? "float16" : "int16",
+		(double)(iq_ring.dump_trigger - start) / iq_ring.rate, (double)(end - iq_ring.dump_trigger) / iq_ring.rate);
+	pthread_mutex_lock(&iq_ring.mutex);
+	first = iq_ring.event_count > IQ_RING_EVENTS ? iq_ring.event_count - IQ_RING_EVENTS : 0;
+	for (i = first; i < iq_ring.event_count && n < size; i++) {
+		index = iq_ring.events[i % IQ_RING_EVENTS].index;
+		if (index >= end)
+			break;
+		// The tuning before the start applies at the start
+		if (i + 1 < iq_ring.event_count && iq_ring.events[(i + 1) % IQ_RING_EVENTS].index <= start)
+			continue;
+		if (index < start)
+			index = start;
+		n += snprintf(text + n, size - n, "%s at %+.3f s VFO %d Hz Rx %+d Hz", i == first ? "" : ",",
+			(double)(index - iq_ring.dump_trigger) / iq_ring.rate,
+			iq_ring.events[i % IQ_RING_EVENTS].vfo, iq_ring.events[i % IQ_RING_EVENTS].tune);
+	}
+	pthread_mutex_unlock(&iq_ring.mutex);
+	if (n >= size)
+		n = size - 1;
+	return n;
+}
+
+static void iq_ring_dump(void)
+{	// Write the dump to a WAV file.  Called from the writer thread.
+	FILE * fp;
+	long long start, pos, end, head, index;
+	int i, n, bytes, stop;
+	unsigned int u, data_bytes;
+	unsigned short s;
+	char name[QUISK_PATH_SIZE], str40[40];
+	static char text[2048];
+	static float fbuf[IQ_RING_CHUNK * 2];
+	static int16_t ibuf[IQ_RING_CHUNK * 2];
+	uint16_t * pt;
+
+	pthread_mutex_lock(&iq_ring.mutex);
+	start = iq_ring.dump_start;
+	strftime(str40, 40, "%Y%m%d_%H%M%S", gmtime(&iq_ring.dump_time));
+	snprintf(name, QUISK_PATH_SIZE, "%s/quisk_iq_%s_%.20s.wav", iq_ring.directory[0] ? iq_ring.directory : ".",
+		str40, iq_ring.reason);
+	pthread_mutex_unlock(&iq_ring.mutex);
+	for (i = strlen(name) - 5; i > 0 && name[i] != '/' && name[i] != '\\'; i--)	// make a safe file name
+		if ( ! isalnum((unsigned char)name[i]) && name[i] != '_' && name[i] != '.' && name[i] != '-')
+			name[i] = '_';
+	fp = fopen(name, "wb");
+	if ( ! fp) {
+		QuiskPrintf("I/Q ring: Can not open %s\n", name);
+		return;
+	}
+	bytes = iq_ring.use_float16 ? 4 : 2;	// bytes per channel in the file
+	fwrite("RIFF", 1, 4, fp);
+	u = 36;
+	fwrite(&u, 4, 1, fp);
+	fwrite("WAVE", 1, 4, fp);
+	fwrite("fmt ", 1, 4, fp);
+	u = 16;
+	fwrite(&u, 4, 1, fp);
+	s = iq_ring.use_float16 ? 3 : 1;	// wave_format_ieee_float or wave_format_pcm
+	fwrite(&s, 2, 1, fp);
+	s = 2;		// number of channels
+	fwrite(&s, 2, 1, fp);
+	u = iq_ring.rate;
+	fwrite(&u, 4, 1, fp);
+	u *= 2 * bytes;
+	fwrite(&u, 4, 1, fp);
+	s = 2 * bytes;
+	fwrite(&s, 2, 1, fp);
+	s = 8 * bytes;
+	fwrite(&s, 2, 1, fp);
+	fwrite("data", 1, 4, fp);
+	u = 0;
+	fwrite(&u, 4, 1, fp);
+	pos = start;
+	data_bytes = 0;
+	while (1) {
+		pthread_mutex_lock(&iq_ring.mutex);
+		end = iq_ring.dump_end;
+		stop = iq_ring.quit || iq_ring.new_rate;
+		pthread_mutex_unlock(&iq_ring.mutex);
+		head = iq_ring.head;
+		__sync_synchronize();
+		if (stop && end > head)
+			end = head;
+		if (head - pos > iq_ring.size - iq_ring.rate / 10) {	// the samples were overwritten
+			iq_ring.overruns++;
+			pos = head - iq_ring.size + iq_ring.rate;
+		}
+		n = (int)((head < end ? head : end) - pos);
+		if (n > IQ_RING_CHUNK)
+			n = IQ_RING_CHUNK;
+		if (n <= 0) {
+			if (pos >= end)
+				break;
+			QuiskSleepMicrosec(20000);
+			continue;
+		}
+		index = pos % iq_ring.size;
+		for (i = 0; i < n; i++) {
+			pt = iq_ring.buffer + index * 2;
+			if (iq_ring.use_float16) {
+				fbuf[i * 2] = half_to_float(pt[0]);
+				fbuf[i * 2 + 1] = half_to_float(pt[1]);
+			}
+			else {
+				ibuf[i * 2] = (int16_t)pt[0];
+				ibuf[i * 2 + 1] = (int16_t)pt[1];
+			}
+			if (++index >= iq_ring.size)
+				index = 0;
+		}
+		if (iq_ring.use_float16)
+			fwrite(fbuf, 4, n * 2, fp);
+		else
+			fwrite(ibuf, 2, n * 2, fp);
+		data_bytes += n * 2 * bytes;
+		pos += n;
+	}
+	// Add a LIST chunk of type INFO with the metadata
+	n = iq_ring_comment(text, sizeof(text), start, pos) + 1;	// include the terminating zero
+	u = 4 + 8 + n + (n & 1);
+	fwrite("LIST", 1, 4, fp);
+	fwrite(&u, 4, 1, fp);
+	fwrite("INFO", 1, 4, fp);
+	fwrite("ICMT", 1, 4, fp);
+	u = n;
+	fwrite(&u, 4, 1, fp);
+	fwrite(text, 1, n + (n & 1), fp);
+	u = 36 + data_bytes + 8 + 4 + 8 + n + (n & 1);
+	fseek(fp, 4, SEEK_SET);
+	fwrite(&u, 4, 1, fp);
+	fseek(fp, 40, SEEK_SET);
+	fwrite(&data_bytes, 4, 1, fp);
+	fclose(fp);
+	pthread_mutex_lock(&iq_ring.mutex);
+	strMcpy(iq_ring.last_file, name, QUISK_PATH_SIZE);
+	iq_ring.dumps++;
+	pthread_mutex_unlock(&iq_ring.mutex);
+	if (quisk_sound_state.verbose_sound)
+		QuiskPrintf("I/Q ring: Wrote %s\n", name);
+}
+
+static void * iq_ring_writer(void * arg)
+{	// Thread to write the dumps
+	pthread_mutex_lock(&iq_ring.mutex);
+	while ( ! iq_ring.quit) {
+		if ( ! iq_ring.active) {
+			pthread_cond_wait(&iq_ring.cond, &iq_ring.mutex);
+			continue;
+		}
+		pthread_mutex_unlock(&iq_ring.mutex);
+		iq_ring_dump();
+		pthread_mutex_lock(&iq_ring.mutex);
+		iq_ring.active = 0;
+	}
+	pthread_mutex_unlock(&iq_ring.mutex);
+	return NULL;
+}
+
+static void iq_ring_open(void)
+{	// Read the configuration and start the writer thread.  Called from the GUI thread.
+	char * triggers;
+
+	iq_ring.pre_seconds = QuiskGetConfigDouble("iq_ring_seconds", 0);
+	iq_ring.post_seconds = QuiskGetConfigDouble("iq_ring_post_seconds", 5.0);
+	if (iq_ring.post_seconds < 0)
+		iq_ring.post_seconds = 0;
+	iq_ring.use_float16 = strcmp(QuiskGetConfigString("iq_ring_format", "int16"), "float16") == 0;
+	triggers = QuiskGetConfigString("iq_ring_triggers", "");
+	iq_ring.trigger_ptt = strstr(triggers, "ptt") != NULL;
+	iq_ring.trigger_squelch = strstr(triggers, "squelch") != NULL;
+	iq_ring.rate = 0;
+	if (iq_ring.pre_seconds <= 0 || iq_ring.thread_started)
+		return;
+	iq_ring.quit = 0;
+	if (pthread_create(&iq_ring.thread, NULL, iq_ring_writer, NULL) == 0) {
+		pthread_mutex_lock(&iq_ring.mutex);
+		iq_ring.thread_started = 1;
+		pthread_mutex_unlock(&iq_ring.mutex);
+	}
+	else {
+		QuiskPrintf("I/Q ring: Failure to start the writer thread\n");
+	}
+}
+
+static void iq_ring_close(void)
+{	// Finish any dump and stop the writer thread.  Called from the sound thread.
+	if (iq_ring.thread_started) {
+		pthread_mutex_lock(&iq_ring.mutex);
+		iq_ring.quit = 1;
+		pthread_cond_signal(&iq_ring.cond);
+		pthread_mutex_unlock(&iq_ring.mutex);
+		pthread_join(iq_ring.thread, NULL);
+	}
+	pthread_mutex_lock(&iq_ring.mutex);		// a trigger from the GUI thread checks these under the lock
+	iq_ring.thread_started = 0;
+	iq_ring.active = 0;
+	free(iq_ring.buffer);
+	iq_ring.buffer = NULL;
+	iq_ring.size = 0;
+	iq_ring.rate = 0;
+	pthread_mutex_unlock(&iq_ring.mutex);
+}
+
+PyObject * quisk_iq_ring(PyObject * self, PyObject * args, PyObject * keywds)	// Called from the GUI thread
+{	// Set the dump directory, perhaps trigger a dump, and return the status of the I/Q ring.
+	const char * directory = NULL;
+	const char * trigger = NULL;
+	PyObject * dict;
+	static char * kwlist[] = {"directory", "trigger", NULL} ;
+
+	if (!PyArg_ParseTupleAndKeywords (args, keywds, "|ss", kwlist, &directory, &trigger))
+		return NULL;
+	if (directory) {
+		pthread_mutex_lock(&iq_ring.mutex);
+		strMcpy(iq_ring.directory, directory, QUISK_PATH_SIZE);
+		pthread_mutex_unlock(&iq_ring.mutex);
+	}
+	if (trigger)
+		quisk_iq_ring_trigger(trigger);
+	pthread_mutex_lock(&iq_ring.mutex);
+	dict = Py_BuildValue("{sisdsdsisisisisN}",
+		"enabled", iq_ring.pre_seconds > 0 && iq_ring.thread_started,
+		"seconds", iq_ring.pre_seconds,
+		"post_seconds", iq_ring.post_seconds,
+		"active", iq_ring.active,
+		"dumps", iq_ring.dumps,
+		"overruns", iq_ring.overruns,
+		"sample_rate", iq_ring.rate,
+		"last_file", PyUnicode_DecodeUTF8(iq_ring.last_file, strlen(iq_ring.last_file), "replace"));
+	pthread_mutex_unlock(&iq_ring.mutex);
+	return dict;
+}
+
+static double dev_latency_sec(struct sound_dev * dev)
+{	// Return the device latency in seconds.  PulseAudio reports microseconds, the other drivers report frames.
+	if ( ! dev->handle || dev->dev_latency <= 0 || dev->sample_rate <= 0)
+		return 0;
+	switch (dev->driver) {
+	case DEV_DRIVER_NONE:
+		return 0;
+	case DEV_DRIVER_PULSEAUDIO:
+		if (dev->stream_dir_record)
+			return dev->dev_latency * 1E-6 / dev->num_channels;
+		return dev->dev_latency * 1E-6;
+	default:
+		return (double)dev->dev_latency / dev->sample_rate;
+	}
+}
+
+static void measure_latency(double time_read)
+{	// Measure the latency from the ADC to the speaker as the sum of the time the samples waited in the
+	// capture buffer, the time to process them, and the sound already in the play buffer.
+	double capt, dsp, play;
+	const double alpha = 0.05;
+
+	capt = pt_sample_read ? 0 : dev_latency_sec(&Capture);
+	dsp = QuiskTimeSec() - time_read;
+	play = dev_latency_sec(&quisk_Playback);
+	quisk_sound_state.latency_capt += alpha * (capt - quisk_sound_state.latency_capt);
+	quisk_sound_state.latency_dsp += alpha * (dsp - quisk_sound_state.latency_dsp);
+	quisk_sound_state.latency_play += alpha * (play - quisk_sound_state.latency_play);
+}
+
 int quisk_read_sound(void)	// Called from sound thread
 {  // called in an infinite loop by the main program
 	int i, nSamples, mic_count, mic_interp, retval, is_cw, mic_sample_rate;
@@ -879,7 +1547,9 @@ int quisk_read_sound(void)	// Called from sound thread
 	static double cwCount=0;
 	static complex double tuneVector = (double)CLIP32 / CLIP16;	// Convert 16-bit to 32-bit samples
 	static struct quisk_cFilter filtInterp={NULL};
+	static int old_key_state = 0;
 	int key_state, is_DGT;
+	double time_read;
 #if DEBUG_IO > 1
 	char str80[80];		// Extra debug output by Ben Cahill, AC2YD
 #endif
@@ -937,7 +1607,7 @@ int quisk_read_sound(void)	// Called from sound thread
 
 	if (pt_sample_read) {			// read samples from SDR-IQ or UDP or SoapySDR
 		nSamples = (*pt_sample_read)(cSamples);
-		DCremove(cSamples, nSamples, quisk_sound_state.sample_rate, key_state);
+		front_end_process(NULL, cSamples, nSamples, quisk_sound_state.sample_rate, key_state);
 		if (nSamples <= 0)
 			QuiskSleepMicrosec(2000);
 	}
@@ -945,12 +1615,9 @@ int quisk_read_sound(void)	// Called from sound thread
 	//QuiskPrintTime("quisk_read_sound start", 0);
 		nSamples = read_sound_interface(&Capture, cSamples);
 	//QuiskPrintTime("quisk_read_sound end", 0);
-		if (Capture.channel_Delay >= 0)	// delay the I or Q channel by one sample
-			delay_sample(&Capture, (double *)cSamples, nSamples);
-		DCremove(cSamples, nSamples, quisk_sound_state.sample_rate, key_state);
+		// delay the I or Q channel by one sample, remove DC, and correct the amplitude and phase
+		front_end_process(&Capture, cSamples, nSamples, quisk_sound_state.sample_rate, key_state);
 		//testing(cSamples, nSamples);
-		if (Capture.doAmplPhase)		// amplitude and phase corrections
-			correct_sample(&Capture, cSamples, nSamples);
 		if (nSamples <= 0)
 			QuiskSleepMicrosec(2000);
 #if DEBUG_IO > 1
@@ -968,6 +1635,7 @@ int quisk_read_sound(void)	// Called from sound thread
 	}
 	//QuiskPrintTime("quisk_read_sound end", 0);
 	retval = nSamples;		// retval remains the number of samples read
+	time_read = QuiskTimeSec();
 #if DEBUG_IO
 	debug_timer += nSamples;
 	if (debug_timer >= quisk_sound_state.sample_rate)		// one second
@@ -980,6 +1648,11 @@ int quisk_read_sound(void)	// Called from sound thread
 	// Perhaps record the Rx samples to a file
 	if ( ! key_state && file_rec_samples.fp)
 		record_samples(&file_rec_samples, cSamples, nSamples);
+	// Keep the raw samples in the I/Q ring, and perhaps save the ring when the PTT is pressed
+	iq_ring_write(cSamples, nSamples);
+	if (iq_ring.trigger_ptt && key_state && ! old_key_state)
+		quisk_iq_ring_trigger("ptt");
+	old_key_state = key_state;
 	// Perhaps write samples to a loopback device for use by another program
 	if (RawSamplePlayback.handle)
 		play_sound_interface(&RawSamplePlayback, nSamples, cSamples, 0, 1.0);
@@ -1012,6 +1685,8 @@ int quisk_read_sound(void)	// Called from sound thread
 			play_sound_interface(&quisk_Playback, nSamples, cSamples, 1, 0);	// play silence
 		else
 			play_sound_interface(&quisk_Playback, nSamples, cSamples, 1, quisk_audioVolume);	// play radio sound
+		if (retval > 0 && quisk_Playback.handle)
+			measure_latency(time_read);
 	}
 #endif
 	if (radio_sound_socket != INVALID_SOCKET)
@@ -1215,6 +1890,7 @@ void quisk_close_sound(void)	// Called from sound thread
 	quisk_close_sound_pulseaudio();
 	if (pt_sample_stop)
 		(*pt_sample_stop)();
+	iq_ring_close();
 	strMcpy (quisk_sound_state.err_msg, CLOSED_TEXT, QUISK_SC_SIZE);
 	if (radio_sound_socket != INVALID_SOCKET) {
 		close(radio_sound_socket);
@@ -1255,6 +1931,7 @@ static void open_radio_sound_socket(void)
 #endif
 
 	dc_remove_bw = QuiskGetConfigInt ("dc_remove_bw", 100);
+	cr_max_ratio = QuiskGetConfigInt ("playback_rate_ppm", 1000) * 1E-6;
 	strMcpy(radio_sound_ip, QuiskGetConfigString ("radio_sound_ip", ""), QUISK_SC_SIZE);
 	strMcpy(radio_sound_mic_ip, QuiskGetConfigString ("radio_sound_mic_ip", ""), QUISK_SC_SIZE);
 	if (radio_sound_ip[0] == 0 && radio_sound_mic_ip[0] == 0)
@@ -1386,6 +2063,7 @@ void quisk_open_sound(void)	// Called from GUI thread
 	struct sound_dev * pPlay;
 
 	quisk_play_state = SHUTDOWN;
+	iq_ring_open();
 	quisk_sound_state.read_error = 0;
 	quisk_sound_state.write_error = 0;
 	quisk_sound_state.underrun_error = 0;
@@ -1457,12 +2135,7 @@ void quisk_open_sound(void)	// Called from GUI thread
 
 	for (i = 0; (pPlay = quiskPlaybackDevices[i]); i++) {
 		pPlay->started = 0;
-		pPlay->cr_correction = 0;
-		pPlay->cr_delay = 3;
-		pPlay->cr_average_fill = 0;
-		pPlay->cr_average_count = 0;
-		pPlay->cr_sample_time = 0;
-		pPlay->cr_correct_time = 0;
+		cr_reset(pPlay);
 	}
 
 	Capture.average_square = 0;
@@ -25,6 +25,7 @@ static union {
 	int buffer4[SAMP_BUFFER_SIZE];				// Buffer for 4-byte samples from sound
 } bufs ;
 static int bufferz[SAMP_BUFFER_SIZE];				// Buffer for zero samples
+static int use_mmap = 1;		// Try to use mmap access for ALSA devices
 
 static snd_pcm_sframes_t frames_in_buffer(struct sound_dev * dev)
 {  // return the number of frames in the play buffer
@@ -45,7 +46,10 @@ static snd_pcm_sframes_t write_frames(struct sound_dev * dev, void * buffer, int
 
 	if (count <= 0)
 		return 0;
-	frames = snd_pcm_writei (dev->handle, buffer, count);
+	if (dev->alsa_mmap)
+		frames = snd_pcm_mmap_writei (dev->handle, buffer, count);
+	else
+		frames = snd_pcm_writei (dev->handle, buffer, count);
 	if (frames <= 0) {
 		if (frames == -EPIPE) {	// underrun
 			quisk_sound_state.underrun_error++;
@@ -60,11 +64,224 @@ static snd_pcm_sframes_t write_frames(struct sound_dev * dev, void * buffer, int
 				printf("Error write_frames %s\n", dev->stream_description);
 		}
 		snd_pcm_prepare(dev->handle);
-		frames = snd_pcm_writei (dev->handle, buffer, count);
+		if (dev->alsa_mmap)
+			frames = snd_pcm_mmap_writei (dev->handle, buffer, count);
+		else
+			frames = snd_pcm_writei (dev->handle, buffer, count);
 	}
 	return frames;
 }
 
+// With mmap access the samples are converted directly between the sound card buffer and the complex
+// sample arrays without the copy through bufs.
+
+static inline unsigned char * area_addr(const snd_pcm_channel_area_t * area, snd_pcm_uframes_t offset)
+{	// Return the address of the sample at offset in a channel area
+	return (unsigned char *)area->addr + (area->first + offset * area->step) / 8;
+}
+
+static void mmap_capture_convert(struct sound_dev * dev, const snd_pcm_channel_area_t * areas,
+		snd_pcm_uframes_t offset, snd_pcm_uframes_t frames, complex double * cSamples)
+{	// Convert frames from the mmap area to 32-bit samples in cSamples
+	snd_pcm_uframes_t n;
+	unsigned char * pI, * pQ;
+	int step, ii, qq;
+	short si, sq;
+
+	pI = area_addr(areas + dev->channel_I, offset);
+	pQ = area_addr(areas + dev->channel_Q, offset);
+	step = areas[dev->channel_I].step / 8;
+	switch (dev->sample_bytes) {
+	case 2:
+		for (n = 0; n < frames; n++, pI += step, pQ += step) {
+			si = *(short *)pI;
+			sq = *(short *)pQ;
+			if (si >=  CLIP16 || si <= -CLIP16)
+				dev->overrange++;	// assume overrange returns max int
+			if (sq >=  CLIP16 || sq <= -CLIP16)
+				dev->overrange++;
+			ii = si * 65536;
+			qq = sq * 65536;
+			cSamples[n] = ii + I * qq;
+		}
+		break;
+	case 3:
+		for (n = 0; n < frames; n++, pI += step, pQ += step) {
+			ii = qq = 0;
+			if (!is_little_endian) {	// convert to big-endian
+				*((unsigned char *)&ii    ) = pI[2];
+				*((unsigned char *)&ii + 1) = pI[1];
+				*((unsigned char *)&ii + 2) = pI[0];
+				*((unsigned char *)&qq    ) = pQ[2];
+				*((unsigned char *)&qq + 1) = pQ[1];
+				*((unsigned char *)&qq + 2) = pQ[0];
+			}
+			else {		// convert to little-endian
+				memcpy((unsigned char *)&ii + 1, pI, 3);
+				memcpy((unsigned char *)&qq + 1, pQ, 3);
+			}
+			if (ii >=  CLIP32 || ii <= -CLIP32)
+				dev->overrange++;	// assume overrange returns max int
+			if (qq >=  CLIP32 || qq <= -CLIP32)
+				dev->overrange++;
+			cSamples[n] = ii + I * qq;
+		}
+		break;
+	case 4:
+		for (n = 0; n < frames; n++, pI += step, pQ += step) {
+			ii = *(int *)pI;
+			qq = *(int *)pQ;
+			if (ii >=  CLIP32 || ii <= -CLIP32)
+				dev->overrange++;	// assume overrange returns max int
+			if (qq >=  CLIP32 || qq <= -CLIP32)
+				dev->overrange++;
+			cSamples[n] = ii + I * qq;
+		}
+		break;
+	}
+}
+
+static void mmap_play_convert(struct sound_dev * dev, const snd_pcm_channel_area_t * areas,
+		snd_pcm_uframes_t offset, snd_pcm_uframes_t frames, complex double * cSamples, double volume)
+{	// Convert 32-bit samples in cSamples to frames in the mmap area
+	snd_pcm_uframes_t n;
+	unsigned char * pI, * pQ;
+	int step, ii, qq;
+
+	if (dev->num_channels > 2) {	// zero the unused channels
+		switch (dev->sound_format) {
+		case Int16:
+			snd_pcm_areas_silence(areas, offset, dev->num_channels, frames, SND_PCM_FORMAT_S16);
+			break;
+		case Int24:
+			snd_pcm_areas_silence(areas, offset, dev->num_channels, frames, SND_PCM_FORMAT_S24_3LE);
+			break;
+		case Int32:
+			snd_pcm_areas_silence(areas, offset, dev->num_channels, frames, SND_PCM_FORMAT_S32);
+			break;
+		default:
+			break;
+		}
+	}
+	pI = area_addr(areas + dev->channel_I, offset);
+	pQ = area_addr(areas + dev->channel_Q, offset);
+	step = areas[dev->channel_I].step / 8;
+	switch (dev->sound_format) {
+	case Int16:
+		for (n = 0; n < frames; n++, pI += step, pQ += step) {
+			*(short *)pI = (short)(volume * creal(cSamples[n]) / 65536);
+			*(short *)pQ = (short)(volume * cimag(cSamples[n]) / 65536);
+		}
+		break;
+	case Int24:
+		for (n = 0; n < frames; n++, pI += step, pQ += step) {
+			ii = (int)(volume * creal(cSamples[n]) / 256);
+			qq = (int)(volume * cimag(cSamples[n]) / 256);
+			if (!is_little_endian) {	// convert to big-endian
+				pI[0] = *((unsigned char *)&ii + 2);
+				pQ[0] = *((unsigned char *)&qq + 2);
+				pI[1] = *((unsigned char *)&ii + 1);
+				pQ[1] = *((unsigned char *)&qq + 1);
+				pI[2] = *((unsigned char *)&ii    );
+				pQ[2] = *((unsigned char *)&qq    );
+			}
+			else {	// convert to little-endian
+				memcpy(pI, (unsigned char *)&ii, 3);
+				memcpy(pQ, (unsigned char *)&qq, 3);
+			}
+		}
+		break;
+	case Int32:
+		for (n = 0; n < frames; n++, pI += step, pQ += step) {
+			*(int *)pI = (int)(volume * creal(cSamples[n]));
+			*(int *)pQ = (int)(volume * cimag(cSamples[n]));
+		}
+		break;
+	case Float32:
+		break;
+	}
+}
+
+static int read_alsa_mmap(struct sound_dev * dev, complex double * cSamples, snd_pcm_sframes_t want)
+{	// Read up to "want" frames from the mmap area.  cSamples can be NULL to discard samples.
+	const snd_pcm_channel_area_t * areas;
+	snd_pcm_uframes_t offset, frames;
+	snd_pcm_sframes_t avail, committed;
+	int nSamples = 0;
+
+	avail = snd_pcm_avail_update(dev->handle);
+	if (avail >= 0 && avail < want && dev->read_frames > 0) {	// blocking read: wait for the frames
+		snd_pcm_wait(dev->handle, 1 + 2000 * want / dev->sample_rate);
+		avail = snd_pcm_avail_update(dev->handle);
+	}
+	if (avail < 0) {		// error
+		dev->dev_error++;
+#if DEBUG_IO
+		QuiskPrintTime("read_alsa_mmap: avail < 0", 0);
+#endif
+		snd_pcm_prepare (dev->handle);
+		snd_pcm_start (dev->handle);
+		return 0;
+	}
+	if (want > avail)
+		want = avail;
+	while (want > 0) {
+		frames = want;
+		if (snd_pcm_mmap_begin(dev->handle, &areas, &offset, &frames) < 0 || frames == 0)
+			break;
+		if (cSamples)
+			mmap_capture_convert(dev, areas, offset, frames, cSamples + nSamples);
+		committed = snd_pcm_mmap_commit(dev->handle, offset, frames);
+		if (committed < 0 || (snd_pcm_uframes_t)committed != frames) {
+			dev->dev_error++;
+			snd_pcm_prepare (dev->handle);
+			snd_pcm_start (dev->handle);
+			break;
+		}
+		nSamples += frames;
+		want -= frames;
+	}
+	return nSamples;
+}
+
+static void write_alsa_mmap(struct sound_dev * dev, complex double * cSamples, int nSamples, double volume)
+{	// Write the samples to the mmap area and start the device at the start threshold.
+	const snd_pcm_channel_area_t * areas;
+	snd_pcm_uframes_t offset, frames;
+	snd_pcm_sframes_t avail, committed;
+	int index;
+
+	avail = snd_pcm_avail_update(dev->handle);
+	if (avail < 0) {
+		quisk_sound_state.write_error++;
+		dev->dev_error++;
+		if (quisk_sound_state.verbose_sound)
+			printf("Error write_alsa_mmap %s\n", dev->stream_description);
+		snd_pcm_prepare(dev->handle);
+		avail = snd_pcm_avail_update(dev->handle);
+		if (avail < 0)
+			return;
+	}
+	if (nSamples > avail)
+		nSamples = avail;
+	index = 0;
+	while (index < nSamples) {
+		frames = nSamples - index;
+		if (snd_pcm_mmap_begin(dev->handle, &areas, &offset, &frames) < 0 || frames == 0)
+			break;
+		mmap_play_convert(dev, areas, offset, frames, cSamples + index, volume);
+		committed = snd_pcm_mmap_commit(dev->handle, offset, frames);
+		if (committed < 0 || (snd_pcm_uframes_t)committed != frames) {
+			quisk_sound_state.write_error++;
+			dev->dev_error++;
+			break;
+		}
+		index += frames;
+	}
+	if (snd_pcm_state(dev->handle) == SND_PCM_STATE_PREPARED && frames_in_buffer(dev) >= dev->latency_frames)
+		snd_pcm_start(dev->handle);
+}
+
 int quisk_read_alsa(struct sound_dev * dev, complex double * cSamples)
 {	// cSamples can be NULL to discard samples.
 	// Read sound samples from the ALSA soundcard.
@@ -107,7 +324,20 @@ int quisk_read_alsa(struct sound_dev * dev, complex double * cSamples)
 		QuiskPrintTime("read_alsa: snd_pcm_avail_delay failed", 0);
 #endif
 	}
-	if (dev->read_frames == 0) {		// non-blocking: read available frames
+	if (dev->period_frames > 0) {		// low latency: wait for a period, then read all whole periods
+		if (avail < dev->period_frames) {
+			snd_pcm_wait(dev->handle, 1 + 2000 * dev->period_frames / dev->sample_rate);
+			if (snd_pcm_avail_delay(dev->handle, &avail, &delay) >= 0)
+				dev->dev_latency = avail + delay;
+			else
+				avail = 0;
+		}
+		if (avail >= dev->period_frames)
+			avail -= avail % dev->period_frames;
+		else
+			avail = dev->period_frames;
+	}
+	else if (dev->read_frames == 0) {		// non-blocking: read available frames
 		if (avail < 32)
 			avail = 32;	// read frames to restart from error
 	}
@@ -118,7 +348,12 @@ int quisk_read_alsa(struct sound_dev * dev, complex double * cSamples)
 	if (avail > i)
 		avail = i;
 	nSamples = 0;
-	switch (dev->sample_bytes) {
+	if (dev->alsa_mmap) {
+		nSamples = read_alsa_mmap(dev, cSamples, avail);
+		if ( ! cSamples)
+			return 0;
+	}
+	else switch (dev->sample_bytes) {
 	case 2:
 		frames = snd_pcm_readi (dev->handle, bufs.buffer2, avail);	// read samples
 		if ( ! cSamples)
@@ -291,7 +526,7 @@ void quisk_alsa_sidetone(struct sound_dev * dev)
 void quisk_play_alsa(struct sound_dev * playdev, int nSamples,
 		complex double * cSamples, int report_latency, double volume)
 {	// Play the samples; write them to the ALSA soundcard.
-	int i, n, index, buffer_frames;
+	int i, n, index, buffer_frames, chunk;
 	snd_pcm_sframes_t frames, rewind;
 	int ii, qq;
 
@@ -337,11 +572,19 @@ void quisk_play_alsa(struct sound_dev * playdev, int nSamples,
 		if (quisk_sound_state.verbose_sound)
 			printf("play_alsa: Buffer overflow in %s\n", playdev->stream_description);
 	}
+	if (playdev->alsa_mmap) {
+		write_alsa_mmap(playdev, cSamples, nSamples, volume);
+		return;
+	}
 	index = 0;
+	if (playdev->period_frames > 0)		// low latency: write one period at a time
+		chunk = playdev->period_frames;
+	else
+		chunk = nSamples;
 	switch(playdev->sound_format) {
 	case Int16:
 		while (index < nSamples) {
-			for (i = 0, n = index; n < nSamples; i += playdev->num_channels, n++) {
+			for (i = 0, n = index; n < nSamples && n - index < chunk; i += playdev->num_channels, n++) {
 				ii = (int)(volume * creal(cSamples[n]) / 65536);
 				qq = (int)(volume * cimag(cSamples[n]) / 65536);
 				bufs.buffer2[i + playdev->channel_I] = (short)ii;
@@ -357,7 +600,7 @@ void quisk_play_alsa(struct sound_dev * playdev, int nSamples,
 		break;
 	case Int24:
 		while (index < nSamples) {
-			for (i = 0, n = index; n < nSamples; i += playdev->num_channels, n++) {
+			for (i = 0, n = index; n < nSamples && n - index < chunk; i += playdev->num_channels, n++) {
 				ii = (int)(volume * creal(cSamples[n]) / 256);
 				qq = (int)(volume * cimag(cSamples[n]) / 256);
 				if (!is_little_endian) {	// convert to big-endian
@@ -383,7 +626,7 @@ void quisk_play_alsa(struct sound_dev * playdev, int nSamples,
 		break;
 	case Int32:
 		while (index < nSamples) {
-			for (i = 0, n = index; n < nSamples; i += playdev->num_channels, n++) {
+			for (i = 0, n = index; n < nSamples && n - index < chunk; i += playdev->num_channels, n++) {
 				ii = (int)(volume * creal(cSamples[n]));
 				qq = (int)(volume * cimag(cSamples[n]));
 				bufs.buffer4[i + playdev->channel_I] = ii;
@@ -664,10 +907,16 @@ static int quisk_open_alsa_capture(struct sound_dev * dev)
 			sample_rate);
 		goto errend;
 	}
-	if (snd_pcm_hw_params_set_access (handle, hware, SND_PCM_ACCESS_RW_INTERLEAVED) < 0) {
+	dev->alsa_mmap = 0;
+	if (use_mmap && snd_pcm_hw_params_set_access (handle, hware, SND_PCM_ACCESS_MMAP_INTERLEAVED) == 0) {
+		dev->alsa_mmap = 1;
+	}
+	else if (snd_pcm_hw_params_set_access (handle, hware, SND_PCM_ACCESS_RW_INTERLEAVED) < 0) {
 		strMcpy(quisk_sound_state.err_msg, "Interleaved access is not available", QUISK_SC_SIZE);
 		goto errend;
 	}
+	if (quisk_sound_state.verbose_sound)
+		printf("    Capture access is %s\n", dev->alsa_mmap ? "mmap" : "read");
 	if (snd_pcm_hw_params_get_channels_min(hware, &ui) != 0)
 		ui = 0;	// Error
 	if (dev->num_channels < (int)ui)		// increase number of channels to minimum available
@@ -676,14 +925,23 @@ static int quisk_open_alsa_capture(struct sound_dev * dev)
 		snprintf (quisk_sound_state.err_msg, QUISK_SC_SIZE, "Can not set channels to %d", dev->num_channels);
 		goto errend;
 	}
-	// Try to set a capture buffer larger than needed
-	frames = sample_rate * 200 / 1000;	// buffer size in milliseconds
+	poll_size = (int)(quisk_sound_state.data_poll_usec * 1e-6 * sample_rate + 0.5);
+	dev->period_frames = 0;
+	if (quisk_sound_state.low_latency && dev->dev_index == t_Capture) {	// Radio sound card: use a period of one poll and a buffer of a few periods
+		frames = poll_size > 32 ? poll_size : 32;
+		dir = 0;
+		if (snd_pcm_hw_params_set_period_size_near (handle, hware, &frames, &dir) >= 0)
+			dev->period_frames = frames;
+		frames = dev->period_frames ? dev->period_frames * 8 : sample_rate * 50 / 1000;
+	}
+	else {	// Try to set a capture buffer larger than needed
+		frames = sample_rate * 200 / 1000;	// buffer size in milliseconds
+	}
 	if (snd_pcm_hw_params_set_buffer_size_near (handle, hware, &frames) < 0) {
 		snprintf (quisk_sound_state.err_msg, QUISK_SC_SIZE, "Can not set capture buffer size");
 		goto errend;
 	}
 	dev->play_buf_size = frames;	// play_buf_size used for capture buffer size too
-	poll_size = (int)(quisk_sound_state.data_poll_usec * 1e-6 * sample_rate + 0.5);
 	if ((int)frames < poll_size * 3) {		// buffer size is too small, reduce poll time
 		quisk_sound_state.data_poll_usec = (int)(frames * 1.e6 / sample_rate / 3 + 0.5);
 #if DEBUG_IO
@@ -694,6 +952,8 @@ static int quisk_open_alsa_capture(struct sound_dev * dev)
 	if (quisk_sound_state.verbose_sound) {
 		printf("    %s\n", dev->msg1);
 		printf("    Capture buffer size %d\n", dev->play_buf_size);
+		if (dev->period_frames)
+			printf("    Capture period size %d\n", dev->period_frames);
 		if ((int)frames > SAMP_BUFFER_SIZE / dev->num_channels)
 			printf("Capture buffer exceeds size of sample buffers\n");
 	}
@@ -813,10 +1073,16 @@ static int quisk_open_alsa_playback(struct sound_dev * dev)
 			dev->sample_rate);
 		goto errend;
 	}
-	if (snd_pcm_hw_params_set_access (handle, hware, SND_PCM_ACCESS_RW_INTERLEAVED) < 0) {
+	dev->alsa_mmap = 0;
+	if (use_mmap && snd_pcm_hw_params_set_access (handle, hware, SND_PCM_ACCESS_MMAP_INTERLEAVED) == 0) {
+		dev->alsa_mmap = 1;
+	}
+	else if (snd_pcm_hw_params_set_access (handle, hware, SND_PCM_ACCESS_RW_INTERLEAVED) < 0) {
 		snprintf (quisk_sound_state.err_msg, QUISK_SC_SIZE, "Cannot set playback access to interleaved.");
 		goto errend;
 	}
+	if (quisk_sound_state.verbose_sound)
+		printf("    Play access is %s\n", dev->alsa_mmap ? "mmap" : "write");
 	if (snd_pcm_hw_params_get_channels_min(hware, &ui) != 0)
 		ui = 0;	// Error
 	if (dev->num_channels < (int)ui)		// increase number of channels to minimum available
@@ -834,6 +1100,13 @@ static int quisk_open_alsa_playback(struct sound_dev * dev)
 	if (quisk_sound_state.verbose_sound)
 		printf("    %s\n", dev->msg1);
 	// Set the buffer size
+	dev->period_frames = 0;
+	if (quisk_sound_state.low_latency) {	// Use a period of a quarter of the buffer
+		frames = dev->latency_frames / 2;
+		dir = 0;
+		if (snd_pcm_hw_params_set_period_size_near (handle, hware, &frames, &dir) >= 0)
+			dev->period_frames = frames;
+	}
 	frames = dev->latency_frames * 2;
 	if (snd_pcm_hw_params_set_buffer_size_near (handle, hware, &frames) < 0) {
 		snprintf (quisk_sound_state.err_msg, QUISK_SC_SIZE, "Can not set playback buffer size");
@@ -898,6 +1171,7 @@ void quisk_start_sound_alsa (struct sound_dev ** pCapture, struct sound_dev ** p
 	struct sound_dev * pDev;
 
 	memset(bufferz, 0, sizeof(int) * SAMP_BUFFER_SIZE);
+	use_mmap = QuiskGetConfigInt("alsa_mmap", 1);
 	is_little_endian = 1;	// Test machine byte order
 	if (*(char *)&is_little_endian == 1)
 		is_little_endian = 1;